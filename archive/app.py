@@ -3,14 +3,76 @@ from query import execute_query
 from data_processor import SimpleDataProcessor
 from schema_utils import build_query
 import pandas as pd
+from src.api.deadlines import install_request_deadlines
+from src.api.tracing import install_request_tracing
+from src.api.compression import install_response_compression, strong_etag, not_modified, not_modified_response, with_etag
+from src.api.spill import install_result_spill, stream_json
+from src.core.deadline import DeadlineExceeded
+from src.core.result_cache import get_default_cache
+from src.core.result_spill import SpillCache, SpilledResult, spill_if_large
+from src.core.result_store import get_default_store, parse_token, page_token, CursorNotFound
 
 app = Flask(__name__)
+install_request_deadlines(app)  # Prazo por requisição (header X-Request-Timeout)
+install_response_compression(app)  # gzip/br via Accept-Encoding e 304 por ETag (antes do tracing)
+install_request_tracing(app)  # Tempos por estágio (header Server-Timing e campo 'trace')
+install_result_spill(app)  # Resultados grandes em disco, apagados no fim da requisição
 processor = SimpleDataProcessor()
+result_cache = get_default_cache()
+spill_cache = SpillCache()
+result_store = get_default_store()  # cursores paginados dos resultados em chunks
 
-@app.route("/query", methods=["POST"])
+def result_etag(sql_query, question, paginate=False, cursor=None):
+    """ETag da resposta: chave/versão do resultado em cache + pergunta (+ cursor) (None se não está em cache)"""
+    version = result_cache.version(sql_query) if result_cache else None
+    if not version:
+        return None
+    return strong_etag(version, question, paginate, cursor) if cursor else strong_etag(version, question, paginate)
+
+def revalidated_etag(sql_query, question, paginate):
+    """
+    ETag que o cliente já tem e ainda vale (None: refazer a resposta).
+
+    A resposta paginada aponta para um cursor, que expira: o ETag dela inclui o
+    cursor, e o 304 só sai se o cursor ainda existe (e ganha mais
+    BISCOITAO_CURSOR_TTL segundos). Cursor varrido: resposta completa, com cursor novo.
+    """
+    etag = result_etag(sql_query, question, paginate)
+    if etag and not_modified(etag):
+        return etag
+    if not paginate or result_cache is None:
+        return None
+    version = result_cache.version(sql_query)
+    cursor = result_store.cursor_id(version) if version else None
+    etag = result_etag(sql_query, question, paginate, cursor) if cursor else None
+    if not etag or not not_modified(etag):
+        return None
+    try:
+        result_store.touch(cursor)
+    except CursorNotFound:
+        return None
+    return etag
+
+def fetch_result(sql_query):
+    """DataFrame (resultado pequeno) ou SpilledResult mapeado do disco (grande)"""
+    version = result_cache.version(sql_query) if result_cache else None
+    spilled = spill_cache.get(version) if version else None
+    if spilled is not None:
+        return spilled  # mesma versão já em disco: nem desserializa o DataFrame do cache
+    if result_cache is None:
+        return spill_if_large(execute_query(sql_query))
+    df = result_cache.get_or_execute(sql_query)
+    version = result_cache.version(sql_query)
+    # Em disco pela vida da versão no cache (apagado quando ela for atualizada)
+    return spill_cache.put(version, df) if version else spill_if_large(df)
+
+@app.route("/query", methods=["GET", "POST"])
 def query():
-    data = request.json
+    # GET ?question=...: revalidável por If-None-Match (304); POST sempre responde com o corpo
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
     question = data.get("question", "")
+    # Resultado em chunks: cursor no servidor + primeira página ("paginate": false = todos os chunks)
+    paginate = str(data.get("paginate", True)).lower() in ("1", "true", "sim", "yes") and result_store is not None
 
     # Exemplo: extrair tabela e filtros da pergunta (hardcoded para protótipo)
     table = "dw.monetization_total"
@@ -20,9 +82,16 @@ def query():
     sql_query = build_query(table, filters)
     sql_query += " LIMIT 5"  # Limita a 5 registros para teste rápido
 
+    # Cliente já tem o resultado desta versão dos dados: 304 sem executar nem serializar (só GET)
+    etag = revalidated_etag(sql_query, question, paginate) if request.method == "GET" else None
+    if etag:
+        return not_modified_response(etag)
+
     try:
-        df = execute_query(sql_query)
-        processed = processor.process(df, question)
+        df = fetch_result(sql_query)  # grande: SpilledResult lido em fatias do disco
+        version = result_cache.version(sql_query) if result_cache else None
+        processed = processor.process(df, question, result_store=result_store if paginate else None,
+                                      version=version)
         # Sumarização simples: soma de vendas
         summary = None
         vendas_col = None
@@ -36,9 +105,46 @@ def query():
         else:
             summary = "Coluna de vendas não encontrada para sumarização."
         output = {"result": processed, "sql_query": sql_query, "summary": summary}
-        return jsonify(output)
+        # Resultado em disco: chunks serializados um a um durante o envio
+        response = stream_json(output) if isinstance(df, SpilledResult) and not paginate else jsonify(output)
+        etag = result_etag(sql_query, question, paginate, processed.get("metadata", {}).get("cursor")) \
+            if request.method == "GET" else None
+        return with_etag(response, etag) if etag else response
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return jsonify({"error": str(e), "sql_query": sql_query})
 
+@app.route("/query/pages/<token>", methods=["GET"])
+def query_page(token):
+    """Página seguinte de um resultado em chunks (token de next_page_token)"""
+    if result_store is None:
+        return jsonify({"error": "Paginação indisponível (pyarrow não instalado)"}), 404
+    try:
+        cursor, page = parse_token(token)
+        etag = strong_etag(cursor, page)  # páginas de um cursor não mudam
+        if not_modified(etag):
+            return not_modified_response(etag)
+        meta, chunk = result_store.page(cursor, page)
+    except CursorNotFound:
+        return jsonify({"error": "Cursor inexistente ou expirado: refaça a consulta"}), 404
+    except IndexError:
+        return jsonify({"error": f"Página {token.rsplit('.', 1)[-1]} fora do resultado"}), 404
+    output = {
+        "cursor": cursor,
+        "page": page,
+        "pages": meta["pages"],
+        "chunk": chunk,
+        "next_page_token": page_token(cursor, page + 1) if page + 1 < meta["pages"] else None,
+    }
+    return with_etag(jsonify(output), etag)
+
+@app.route("/query/cursors/<cursor>", methods=["DELETE"])
+def delete_cursor(cursor):
+    """Libera o cursor antes de expirar (cliente não precisa das páginas restantes)"""
+    if result_store is None or not result_store.delete(cursor):
+        return jsonify({"error": "Cursor inexistente ou expirado"}), 404
+    return jsonify({"deleted": cursor})
+
 if __name__ == "__main__":
     app.run(debug=True)
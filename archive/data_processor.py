@@ -1,21 +1,55 @@
 import pandas as pd
-from typing import Any, Dict
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+class CsvChunks(Sequence):
+    """
+    Chunks CSV gerados sob demanda (um de cada vez) a partir de um resultado fatiável.
+    Usado para resultados enviados ao disco (SpilledResult): nunca há mais de um chunk em memória.
+    """
+
+    def __init__(self, df, chunk_size: int):
+        self.df = df
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return (len(self.df) + self.chunk_size - 1) // self.chunk_size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index * self.chunk_size
+        return self.df[start:start + self.chunk_size].to_csv(index=False)
 
 class SimpleDataProcessor:
     """
     Processa DataFrames para consumo por LLM, usando formatação direta ou chunking básico.
+    Aceita também um SpilledResult (src/core/result_spill.py): nesse caso os chunks
+    são um CsvChunks preguiçoso, a ser serializado em streaming.
+    Com um result_store (src/core/result_store.py) o resultado em chunks vira um
+    cursor no servidor: só a primeira página segue na resposta.
     """
     SMALL_THRESHOLD = 50000
     CHUNK_SIZE = 25000
 
-    def process(self, df: pd.DataFrame, user_query: str = "") -> Dict[str, Any]:
+    def process(self, df: pd.DataFrame, user_query: str = "", result_store=None,
+                version: Optional[str] = None) -> Dict[str, Any]:
         rows = len(df)
         if rows <= self.SMALL_THRESHOLD:
             return self._format_direct(df)
+        elif result_store is not None:
+            return self._format_paged(df, result_store, version)
         else:
             return self._format_chunked(df, user_query)
 
     def _format_direct(self, df: pd.DataFrame) -> Dict[str, Any]:
+        if not isinstance(df, pd.DataFrame):
+            df = df.to_pandas()
         return {
             "metadata": {
                 "rows": len(df),
@@ -28,6 +62,10 @@ class SimpleDataProcessor:
 
     def _format_chunked(self, df: pd.DataFrame, user_query: str = "") -> Dict[str, Any]:
         chunks = self._create_chunks(df)
+        if not isinstance(df, pd.DataFrame):
+            csv_chunks = chunks
+        else:
+            csv_chunks = [chunk.to_csv(index=False) for chunk in chunks]
         return {
             "metadata": {
                 "total_rows": len(df),
@@ -36,9 +74,29 @@ class SimpleDataProcessor:
                 "chunk_size": self.CHUNK_SIZE
             },
             "schema": dict(df.dtypes.astype(str)),
-            "chunks": [chunk.to_csv(index=False) for chunk in chunks]
+            "chunks": csv_chunks
+        }
+
+    def _format_paged(self, df: pd.DataFrame, result_store, version: Optional[str] = None) -> Dict[str, Any]:
+        cursor = result_store.create(df, version=version)
+        first_page, next_page_token = result_store.first_page(cursor["cursor"])
+        return {
+            "metadata": {
+                "total_rows": len(df),
+                "chunks": cursor["pages"],
+                "strategy": "chunked",
+                "chunk_size": cursor["page_rows"],
+                "cursor": cursor["cursor"],
+                "expires_at": datetime.fromtimestamp(cursor["expires_at"]).isoformat()
+            },
+            "schema": dict(df.dtypes.astype(str)),
+            "chunks": [first_page],
+            "next_page_token": next_page_token
         }
 
     def _create_chunks(self, df: pd.DataFrame):
+        if not isinstance(df, pd.DataFrame):
+            # Resultado em disco: fatias lidas só quando o chunk for serializado
+            return CsvChunks(df, self.CHUNK_SIZE)
         # Chunking simples por tamanho
         return [df[i:i+self.CHUNK_SIZE] for i in range(0, len(df), self.CHUNK_SIZE)]
@@ -3,7 +3,7 @@ Servidor Flask para Integração Biscoitão - Google Sheets
 Recebe consultas do Google Apps Script e gera relatórios PDF
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import json
 import os
@@ -13,9 +13,20 @@ import traceback
 # Importa nossos módulos locais
 from pdf_report_generator import ProfessionalPDFReportGenerator
 from sheets_integrator import BiscoitaoSheetsIntegrator
+from src.api.deadlines import install_request_deadlines
+from src.api.tracing import install_request_tracing
+from src.api.compression import install_response_compression
+from src.api.metrics import install_metrics_endpoint
+from src.api.health import run_health_checks, check_database, check_pdf_converter, check_result_cache, check_toqan, check_output_dir
+from src.core.deadline import DeadlineExceeded
+from src.core.batch_planner import MAX_BATCH_QUESTIONS
 
 app = Flask(__name__)
 CORS(app)  # Permite chamadas do Google Apps Script
+install_request_deadlines(app)  # Prazo por requisição (header X-Request-Timeout)
+install_response_compression(app)  # gzip/br via Accept-Encoding e 304 por ETag (antes do tracing)
+install_request_tracing(app)  # Tempos por estágio (header Server-Timing e campo 'trace')
+install_metrics_endpoint(app)  # Scrape do Prometheus em /metrics
 
 # Instância global dos processadores
 pdf_generator = ProfessionalPDFReportGenerator()
@@ -60,6 +71,8 @@ def generate_pdf_report():
             print(f"❌ Erro na geração: {result['error']}")
             return jsonify(result), 500
     
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"❌ Erro no servidor: {e}")
         traceback.print_exc()
@@ -72,19 +85,20 @@ def generate_pdf_report():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Verifica se o servidor está funcionando"""
+    """Verifica os componentes de que o servidor depende"""
     
+    health, status_code = run_health_checks({
+        'database': check_database,
+        'pdf_converter': check_pdf_converter,
+        'result_cache': check_result_cache,
+        'toqan': check_toqan,
+        'output_dir': check_output_dir
+    })
     return jsonify({
-        'status': 'healthy',
         'service': 'Biscoitão PDF Generator',
         'version': '2.0',
-        'timestamp': datetime.now().isoformat(),
-        'components': {
-            'pdf_generator': 'ready',
-            'sheets_integrator': 'ready',
-            'visual_assistant': 'ready'
-        }
-    })
+        **health
+    }), status_code
 
 @app.route('/api/test-query', methods=['POST'])
 def test_query():
@@ -106,6 +120,8 @@ def test_query():
             'timestamp': datetime.now().isoformat()
         })
     
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"❌ Erro no teste: {e}")
         return jsonify({
@@ -114,6 +130,84 @@ def test_query():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/batch', methods=['POST'])
+def batch_query():
+    """Responde várias perguntas em uma requisição (ex: recálculo de uma planilha inteira)"""
+    
+    try:
+        data = request.get_json() or {}
+        questions = data.get('questions')
+        
+        if not questions or not isinstance(questions, list):
+            return jsonify({
+                'success': False,
+                'error': 'Lista de perguntas não fornecida'
+            }), 400
+        
+        if len(questions) > MAX_BATCH_QUESTIONS:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo de {MAX_BATCH_QUESTIONS} perguntas por lote'
+            }), 413
+        
+        # Perguntas podem vir como texto ou {"id": "B2", "question": "..."}
+        ids = [item.get('id', index) if isinstance(item, dict) else index for index, item in enumerate(questions)]
+        texts = [str(item.get('question', '')) if isinstance(item, dict) else str(item) for item in questions]
+        
+        print(f"📚 LOTE - {len(texts)} perguntas recebidas")
+        
+        result = pdf_generator.visual_generator.generate_batch_report(
+            texts,
+            table_name=data.get('table', 'dw.monetization_total'),
+            # "chart_format": "text" = sparkline/barras Unicode direto na célula, sem arquivo
+            render_charts=bool(data.get('charts', False)) or data.get('chart_format') is not None,
+            chart_format=data.get('chart_format'),
+            # Prévia na célula: perfil 'thumbnail' (48 dpi) salvo se a planilha pedir outro
+            render_profile=data.get('render_profile') or 'thumbnail'
+        )
+        
+        answers = []
+        for answer_id, answer in zip(ids, result['answers']):
+            item = {'id': answer_id, 'question': answer['question'], 'success': answer['success']}
+            if answer['success']:
+                item.update({
+                    'response': answer['response'],
+                    'insights': answer['insights'],
+                    'visualization_type': answer['viz_type'],
+                    'query_sql': answer['query'],
+                    'shared_query': answer['shared_query'],
+                    'data_points': len(answer['data']),
+                    'data_sample': answer['data'].head(10).to_dict('records')
+                })
+                if answer.get('chart_file'):
+                    item['chart_file'] = answer['chart_file']
+                if answer.get('chart_text'):
+                    item['chart_text'] = answer['chart_text']
+            else:
+                item['error'] = answer['error']
+            answers.append(item)
+        
+        print(f"✅ Lote respondido: {result['plan']['answered']}/{len(texts)} perguntas, "
+              f"{result['plan']['queries_executed']} queries executadas")
+        
+        return jsonify({
+            'success': True,
+            'answers': answers,
+            'plan': result['plan'],
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"❌ Erro no lote: {e}")
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': f'Erro interno do servidor: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
 @app.route('/api/list-reports', methods=['GET'])
 def list_reports():
     """Lista relatórios gerados recentemente"""
@@ -133,7 +227,8 @@ def list_reports():
                     'size': file_stats.st_size,
                     'created': datetime.fromtimestamp(file_stats.st_ctime).isoformat(),
                     'modified': datetime.fromtimestamp(file_stats.st_mtime).isoformat(),
-                    'type': 'pdf' if file.endswith('.pdf') else 'markdown'
+                    'type': 'pdf' if file.endswith('.pdf') else 'markdown',
+                    'download_url': f'/api/report/{file}'
                 })
         
         # Ordena por data de criação (mais recente primeiro)
@@ -153,6 +248,20 @@ def list_reports():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/report/<filename>', methods=['GET'])
+def download_report(filename):
+    """Download de relatório (ETag/304 pelo arquivo; Markdown comprimido via Accept-Encoding)"""
+    
+    if not filename.startswith('relatorio_biscoitao_') or not filename.endswith(('.pdf', '.md')) \
+            or os.path.basename(filename) != filename:
+        return jsonify({'success': False, 'error': 'Nome de arquivo inválido'}), 400
+    
+    if not os.path.exists(filename):
+        return jsonify({'success': False, 'error': 'Relatório não encontrado'}), 404
+    
+    mimetype = 'application/pdf' if filename.endswith('.pdf') else 'text/markdown'
+    return send_file(os.path.abspath(filename), mimetype=mimetype, as_attachment=True)
+
 @app.route('/', methods=['GET'])
 def home():
     """Página inicial do servidor"""
@@ -226,12 +335,23 @@ def home():
                 Verifica status do servidor e componentes
             </div>
             
+            <div class="endpoint">
+                <strong>GET /metrics</strong><br>
+                Métricas no formato do Prometheus (latência, queries, caches, PDF, Toqan)
+            </div>
+            
             <div class="endpoint">
                 <strong>POST /api/test-query</strong><br>
                 Testa funcionamento com consulta exemplo<br>
                 <code>{"query": "sua consulta de teste"}</code>
             </div>
             
+            <div class="endpoint">
+                <strong>POST /api/batch</strong><br>
+                Responde várias perguntas de uma vez, com queries compartilhadas<br>
+                <code>{"questions": ["pergunta 1", {"id": "B2", "question": "pergunta 2"}], "charts": false, "chart_format": "text", "render_profile": "thumbnail"}</code>
+            </div>
+            
             <div class="endpoint">
                 <strong>GET /api/list-reports</strong><br>
                 Lista relatórios PDF e Markdown gerados recentemente
@@ -277,9 +397,12 @@ if __name__ == '__main__':
     print("🔗 Endpoints disponíveis:")
     print("  • GET  /              - Página inicial")
     print("  • GET  /api/health    - Status do servidor")
+    print("  • GET  /metrics       - Métricas Prometheus")
     print("  • POST /api/generate-pdf-report - Gera PDF")
     print("  • POST /api/test-query - Teste do sistema")
+    print("  • POST /api/batch     - Várias perguntas por requisição")
     print("  • GET  /api/list-reports - Lista relatórios")
+    print("  • GET  /api/report/<arquivo> - Download de relatório")
     print()
     print("📱 Para testar do Google Sheets:")
     print('  =perguntarToqan("evolução do preço de jan-24 a jan-25")')
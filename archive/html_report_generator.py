@@ -15,11 +15,19 @@ import base64
 from io import BytesIO
 import warnings
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.deadline import check_deadline
+from src.core.tracing import span, file_size
+from src.generators.render_profiles import get_profile, save_figure, file_format, mime_type, MIME_TYPES
+
 warnings.filterwarnings("ignore")
 
 class ProfessionalHTMLReportGenerator:
     """Gerador de relatórios HTML profissionais e elegantes"""
     
+    # O navegador mostra o gráfico a ~1000px: 300 dpi só aumentariam o HTML
+    CHART_PROFILE = 'web'
+    
     def __init__(self):
         self.visual_generator = IntelligentReportGenerator()
         # Configuração da paleta viridis profissional
@@ -55,6 +63,7 @@ class ProfessionalHTMLReportGenerator:
     
     def create_chart_base64(self, data, viz_type, instruction):
         """Cria gráfico em base64 para embedding no HTML"""
+        check_deadline('chart_render')
         
         # Figura com fundo transparente
         fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
@@ -66,10 +75,9 @@ class ProfessionalHTMLReportGenerator:
         else:
             self._create_professional_line_chart(ax, data, instruction)
         
-        # Salva em base64
+        # Salva em base64 no perfil de renderização do HTML
         buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', 
-                   facecolor='white', edgecolor='none', dpi=300)
+        save_figure(fig, [(buffer, get_profile(self.CHART_PROFILE), None)])
         buffer.seek(0)
         image_base64 = base64.b64encode(buffer.getvalue()).decode()
         plt.close(fig)
@@ -439,7 +447,7 @@ class ProfessionalHTMLReportGenerator:
             </div>
             <div class="section-content">
                 <div class="chart-container">
-                    <img src="data:image/png;base64,{chart_base64}" alt="Gráfico de Análise">
+                    <img src="data:{chart_mime};base64,{chart_base64}" alt="Gráfico de Análise">
                 </div>
             </div>
         </div>
@@ -600,14 +608,22 @@ class ProfessionalHTMLReportGenerator:
         
         return html
     
-    def generate_professional_report(self, instruction, table_name="dw.monetization_total"):
-        """Gera relatório HTML profissional completo"""
+    def generate_professional_report(self, instruction, table_name="dw.monetization_total", context=None):
+        """
+        Gera relatório HTML profissional completo
+        
+        context (AnalysisContext): análise já feita da pergunta; sem consultar de novo, o
+        relatório embute o gráfico do perfil 'web' do contexto quando ele já foi renderizado
+        """
         
         print(f"📄 Gerando relatório HTML profissional para: {instruction}")
         print("=" * 60)
         
         # Gera análise visual
-        result = self.visual_generator.generate_complete_report(instruction, table_name)
+        # Sem contexto, o gráfico do relatório é desenhado aqui (tema viridis): o do Visual Assistant não é usado
+        if context is None:
+            context = self.visual_generator.analyze(instruction, table_name, render_chart=False)
+        result = context.report
         
         if not result:
             print("❌ Não foi possível gerar análise para o relatório HTML.")
@@ -615,12 +631,19 @@ class ProfessionalHTMLReportGenerator:
         
         print("✅ Análise concluída, gerando HTML...")
         
-        # Cria gráfico em base64
-        chart_base64 = self.create_chart_base64(
-            result['data'], 
-            result['viz_type'], 
-            instruction
-        )
+        # Cria gráfico em base64 (ou reaproveita o já renderizado no perfil do HTML)
+        chart_file = context.artifact(self.CHART_PROFILE)
+        if chart_file and file_format(chart_file) in ('png', 'webp'):
+            with open(chart_file, 'rb') as f:
+                chart_base64 = base64.b64encode(f.read()).decode()
+            chart_mime = mime_type(chart_file)
+        else:
+            chart_base64 = self.create_chart_base64(
+                result['data'], 
+                result['viz_type'], 
+                instruction
+            )
+            chart_mime = MIME_TYPES[get_profile(self.CHART_PROFILE).image_format]
         
         # Monta componentes HTML
         data_table_html = self.create_data_table_html(result['data'])
@@ -632,6 +655,7 @@ class ProfessionalHTMLReportGenerator:
             timestamp=datetime.now().strftime("%d/%m/%Y às %H:%M:%S"),
             query=instruction,
             chart_base64=chart_base64,
+            chart_mime=chart_mime,
             data_table=data_table_html,
             insights_section=insights_html,
             stats_section=stats_html,
@@ -639,11 +663,15 @@ class ProfessionalHTMLReportGenerator:
         )
         
         # Salva arquivo HTML
+        check_deadline('html_write')
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"relatorio_biscoitao_{timestamp}.html"
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with span('file.write', format='html') as write_span:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            write_span.set(file=filename, bytes=file_size(filename))
+        context.add_artifact('html', os.path.abspath(filename))
         
         print(f"📄 Relatório HTML gerado: {filename}")
         
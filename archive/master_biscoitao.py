@@ -7,30 +7,33 @@ import sys
 import os
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.analysis_context import AnalysisContext
+
 # Importa todos os componentes do sistema
 from html_report_generator import ProfessionalHTMLReportGenerator
-from visual_assistant import IntelligentReportGenerator
-try:
-    from nl_query_assistant_v2 import AdvancedQueryBuilder
-except ImportError:
-    print("⚠️ nl_query_assistant_v2 não encontrado, continuando sem ele...")
-    AdvancedQueryBuilder = None
 
 class BiscoitaoMasterSystem:
     """Sistema master que integra todas as funcionalidades do Biscoitão"""
     
+    # Perfil do gráfico da análise visual: o mesmo que o relatório HTML embute
+    CHART_PROFILE = ProfessionalHTMLReportGenerator.CHART_PROFILE
+    
     def __init__(self):
         print("🚀 Inicializando Sistema Biscoitão Master...")
         self.html_generator = ProfessionalHTMLReportGenerator()
-        self.visual_generator = IntelligentReportGenerator()
-        if AdvancedQueryBuilder:
-            self.query_builder = AdvancedQueryBuilder()
-        else:
-            self.query_builder = None
+        # Um só IntelligentReportGenerator (caches, rollup, schema) para todos os componentes
+        self.visual_generator = self.html_generator.visual_generator
         print("✅ Sistema inicializado com sucesso!")
     
     def process_complete_analysis(self, user_query):
-        """Processa análise completa com todos os componentes"""
+        """
+        Processa análise completa com todos os componentes
+        
+        A pergunta é analisada uma vez (AnalysisContext: intenção, SQL, dados, insights e
+        gráficos) e cada componente consome o mesmo contexto: o Trino é consultado e o
+        gráfico renderizado uma só vez.
+        """
         
         print(f"\n🎯 ANÁLISE COMPLETA: {user_query}")
         print("=" * 60)
@@ -41,34 +44,33 @@ class BiscoitaoMasterSystem:
             'components': {}
         }
         
-        # 1. Análise textual (se disponível)
-        if self.query_builder:
-            print("📝 Executando análise textual avançada...")
-            try:
-                text_result = self.query_builder.process_instruction(user_query)
-                results['components']['text_analysis'] = text_result
-                print("✅ Análise textual concluída")
-            except Exception as e:
-                print(f"⚠️ Análise textual falhou: {e}")
-                results['components']['text_analysis'] = None
-        else:
-            print("⏭️ Análise textual não disponível")
-            results['components']['text_analysis'] = None
-        
-        # 2. Análise visual
+        # 1. Análise visual (consulta, gráfico e insights: a base de todos os componentes)
         print("📊 Executando análise visual...")
         try:
-            visual_result = self.visual_generator.generate_complete_report(user_query)
-            results['components']['visual_analysis'] = visual_result
-            print("✅ Análise visual concluída")
+            context = self.visual_generator.analyze(user_query, render_profile=self.CHART_PROFILE)
         except Exception as e:
             print(f"❌ Análise visual falhou: {e}")
-            results['components']['visual_analysis'] = None
+            context = AnalysisContext(user_query)
+        results['context'] = context
+        results['components']['visual_analysis'] = context.report
+        print("✅ Análise visual concluída" if context.ok else "❌ Análise visual falhou")
+        
+        # 2. Análise textual, a partir do mesmo resultado
+        if context.ok:
+            results['components']['text_analysis'] = {
+                'response': context.response,
+                'sql': context.query,
+                'intent': context.intent
+            }
+            print("✅ Análise textual concluída")
+        else:
+            print("⏭️ Análise textual não disponível")
+            results['components']['text_analysis'] = None
         
         # 3. Relatório HTML profissional
         print("📄 Gerando relatório HTML profissional...")
         try:
-            html_result = self.html_generator.generate_professional_report(user_query)
+            html_result = self.html_generator.generate_professional_report(user_query, context=context)
             results['components']['html_report'] = html_result
             print("✅ Relatório HTML concluído")
         except Exception as e:
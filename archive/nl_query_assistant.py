@@ -7,6 +7,11 @@ import requests
 import os
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.strategy_racer import StrategyRacer, DEFAULT_MAX_PARALLEL, DEFAULT_DEADLINE
+from src.core.deadline import check_deadline, deadline_sleep, remaining_time, DeadlineExceeded
+from src.core.tracing import span
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -401,12 +406,15 @@ class ToqanAIHelper:
         try:
             # Implementação similar à versão anterior, mas com contexto aprimorado
             create_payload = {"user_message": context}
-            create_resp = requests.post(
-                f"{self.base_url}/create_conversation",
-                headers={"x-api-key": self.api_key},
-                json=create_payload,
-                timeout=10
-            )
+            check_deadline('toqan_create')
+            with span('llm.toqan.create_conversation') as llm_span:
+                create_resp = requests.post(
+                    f"{self.base_url}/create_conversation",
+                    headers={"x-api-key": self.api_key},
+                    json=create_payload,
+                    timeout=remaining_time(10)
+                )
+                llm_span.set(status_code=create_resp.status_code, prompt_chars=len(context))
             
             if create_resp.status_code != 200:
                 return None
@@ -420,11 +428,12 @@ class ToqanAIHelper:
             
             # Busca resposta com timeout menor para ser mais responsivo
             for _ in range(10):  # 10 segundos máximo
-                import time
-                time.sleep(1)
+                deadline_sleep(1, 'toqan_polling')
                 
                 get_url = f"{self.base_url}/get_answer?conversation_id={conversation_id}&request_id={request_id}"
-                ans_resp = requests.get(get_url, headers={"x-api-key": self.api_key}, timeout=5)
+                with span('llm.toqan.get_answer') as llm_span:
+                    ans_resp = requests.get(get_url, headers={"x-api-key": self.api_key}, timeout=remaining_time(5))
+                    llm_span.set(status_code=ans_resp.status_code)
                 
                 if ans_resp.status_code == 200:
                     ans_data = ans_resp.json()
@@ -440,6 +449,8 @@ class ToqanAIHelper:
             
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"⚠️ Toqan temporariamente indisponível: {e}")
             return None
@@ -744,12 +755,15 @@ class InsightGenerator:
         try:
             # Cria conversa
             create_payload = {"user_message": context}
-            create_resp = requests.post(
-                f"{self.base_url}/create_conversation",
-                headers={"x-api-key": self.api_key},
-                json=create_payload,
-                timeout=10
-            )
+            check_deadline('toqan_create')
+            with span('llm.toqan.create_conversation') as llm_span:
+                create_resp = requests.post(
+                    f"{self.base_url}/create_conversation",
+                    headers={"x-api-key": self.api_key},
+                    json=create_payload,
+                    timeout=remaining_time(10)
+                )
+                llm_span.set(status_code=create_resp.status_code, prompt_chars=len(context))
             
             if create_resp.status_code != 200:
                 return None
@@ -763,11 +777,12 @@ class InsightGenerator:
             
             # Busca resposta
             for _ in range(15):  # Tenta por 15 segundos
-                import time
-                time.sleep(1)
+                deadline_sleep(1, 'toqan_polling')
                 
                 get_url = f"{self.base_url}/get_answer?conversation_id={conversation_id}&request_id={request_id}"
-                ans_resp = requests.get(get_url, headers={"x-api-key": self.api_key}, timeout=5)
+                with span('llm.toqan.get_answer') as llm_span:
+                    ans_resp = requests.get(get_url, headers={"x-api-key": self.api_key}, timeout=remaining_time(5))
+                    llm_span.set(status_code=ans_resp.status_code)
                 
                 if ans_resp.status_code == 200:
                     ans_data = ans_resp.json()
@@ -786,6 +801,8 @@ class InsightGenerator:
             
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Erro ao consultar Toqan: {e}")
             return None
@@ -818,10 +835,25 @@ def nl_to_sql_adaptive(instruction):
     
     return queries
 
-def execute_with_adaptive_fallback(queries):
-    """Executa queries com fallback automático e análise de resultados"""
+def execute_with_adaptive_fallback(queries, max_parallel=DEFAULT_MAX_PARALLEL, deadline=DEFAULT_DEADLINE):
+    """Executa queries com fallback automático e análise de resultados
+    
+    Com max_parallel > 1 as estratégias de maior prioridade correm em paralelo
+    no Trino (StrategyRacer) em vez de uma viagem completa por falha.
+    """
     insight_gen = InsightGenerator()
     
+    if max_parallel > 1 and len(queries) > 1:
+        racer = StrategyRacer(max_parallel=max_parallel, deadline=deadline)
+        result, query_type, query = racer.race(queries)
+        
+        if result is None:
+            return None, None, None, [], ""
+        
+        insights = insight_gen.analyze_trends(result)
+        visualization = insight_gen.generate_data_visualization(result, "")
+        return result, query_type, query, insights, visualization
+    
     for query_type, query in queries:
         try:
             print(f"🔄 Tentando estratégia: {query_type}")
@@ -836,6 +868,8 @@ def execute_with_adaptive_fallback(queries):
                 
                 return result, query_type, query, insights, visualization
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"❌ Estratégia {query_type} falhou: {str(e)[:100]}...")
             continue
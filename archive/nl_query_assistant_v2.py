@@ -7,6 +7,10 @@ import requests
 import os
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.strategy_racer import StrategyRacer, DEFAULT_MAX_PARALLEL, DEFAULT_DEADLINE
+from src.core.deadline import DeadlineExceeded
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -247,8 +251,43 @@ class InsightGenerator:
         
         return insights
     
-    def create_visualization(self, data):
-        """Cria visualização textual"""
+    SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+    MONTH_NAMES = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
+                   'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+    
+    def _period(self, data, i):
+        """Rótulo do período da linha i (ex: Jan-24), ou P1, P2..."""
+        if 'year' in data.columns and 'month' in data.columns:
+            year = data.iloc[i]['year']
+            month = data.iloc[i]['month']
+            return f"{self.MONTH_NAMES[int(month)]}-{str(int(year))[2:]}"
+        return f"P{i+1}"
+    
+    def create_sparkline(self, values):
+        """Série em uma linha de blocos Unicode (▁ mínimo, █ máximo; ausentes viram espaço)"""
+        valid = [v for v in values if not pd.isna(v)]
+        if not valid:
+            return ""
+        max_val, min_val = max(valid), min(valid)
+        levels = len(self.SPARK_BLOCKS) - 1
+        blocks = []
+        for val in values:
+            if pd.isna(val):
+                blocks.append(" ")
+            elif max_val > min_val:
+                blocks.append(self.SPARK_BLOCKS[round((val - min_val) / (max_val - min_val) * levels)])
+            else:
+                blocks.append(self.SPARK_BLOCKS[levels // 2])
+        return "".join(blocks)
+    
+    def create_visualization(self, data, mode="bars"):
+        """
+        Cria visualização textual
+        
+        Args:
+            mode (str): "bars" (uma barra por período) ou "sparkline" (série em uma
+                linha, para respostas curtas como células do Sheets)
+        """
         if len(data) < 2:
             return ""
         
@@ -266,6 +305,11 @@ class InsightGenerator:
         max_val = max([v for v in values if not pd.isna(v)])
         min_val = min([v for v in values if not pd.isna(v)])
         
+        if mode == "sparkline":
+            last = [i for i, v in enumerate(values) if not pd.isna(v)][-1]
+            return (f"📈 {self.create_sparkline(values)} {self._period(data, 0)} → {self._period(data, len(values) - 1)} "
+                    f"(mín {min_val:,.2f}, máx {max_val:,.2f}, último {values[last]:,.2f})")
+        
         chart_lines = ["📊 Visualização:"]
         
         for i, val in enumerate(values):
@@ -281,22 +325,28 @@ class InsightGenerator:
             bar = "█" * bar_length + "░" * (15 - bar_length)
             
             # Identifica período
-            period = f"P{i+1}"
-            if 'year' in data.columns and 'month' in data.columns:
-                year = data.iloc[i]['year']
-                month = data.iloc[i]['month']
-                month_names = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                              'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-                period = f"{month_names[int(month)]}-{str(int(year))[2:]}"
+            period = self._period(data, i)
             
             chart_lines.append(f"  {period:>6}: {bar} {val:,.2f}")
         
         return "\n".join(chart_lines)
 
-def execute_adaptive_queries(queries):
-    """Executa queries com fallback"""
+def execute_adaptive_queries(queries, max_parallel=DEFAULT_MAX_PARALLEL, deadline=DEFAULT_DEADLINE,
+                             visualization_mode="bars"):
+    """Executa queries com fallback (em paralelo quando max_parallel > 1)"""
     insight_gen = InsightGenerator()
     
+    if max_parallel > 1 and len(queries) > 1:
+        racer = StrategyRacer(max_parallel=max_parallel, deadline=deadline)
+        result, strategy, query = racer.race(queries)
+        
+        if result is None:
+            return None, None, None, [], ""
+        
+        insights = insight_gen.analyze_data(result, "")
+        visualization = insight_gen.create_visualization(result, visualization_mode)
+        return result, strategy, query, insights, visualization
+    
     for strategy, query in queries:
         try:
             print(f"🔄 Estratégia: {strategy}")
@@ -305,9 +355,11 @@ def execute_adaptive_queries(queries):
             if not result.empty:
                 print(f"✅ Sucesso com: {strategy}")
                 insights = insight_gen.analyze_data(result, "")
-                visualization = insight_gen.create_visualization(result)
+                visualization = insight_gen.create_visualization(result, visualization_mode)
                 return result, strategy, query, insights, visualization
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"❌ {strategy} falhou: {str(e)[:80]}...")
             continue
@@ -365,13 +417,15 @@ def generate_response(result_df, instruction, strategy):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Uso: python nl_query_assistant_v2.py 'sua pergunta'")
+        print("Uso: python nl_query_assistant_v2.py [--sparkline] 'sua pergunta'")
         print("Exemplos:")
         print("  'Qual a média do preço em jan-24?'")
         print("  'Qual a média do preço em jan-24 e jan-25, bem como sua variação?'")
         sys.exit(1)
     
-    instruction = " ".join(sys.argv[1:])
+    # --sparkline: série em uma linha em vez de uma barra por período
+    visualization_mode = "sparkline" if "--sparkline" in sys.argv[1:] else "bars"
+    instruction = " ".join(arg for arg in sys.argv[1:] if arg != "--sparkline")
     
     print(f"🤖 Processando: {instruction}")
     print("=" * 50)
@@ -386,7 +440,7 @@ if __name__ == "__main__":
         
         print(f"🎯 Geradas {len(queries)} estratégias")
         
-        result_df, strategy, sql_query, insights, visualization = execute_adaptive_queries(queries)
+        result_df, strategy, sql_query, insights, visualization = execute_adaptive_queries(queries, visualization_mode=visualization_mode)
         
         if result_df is None:
             print("❌ Todas as estratégias falharam.")
@@ -17,11 +17,19 @@ from io import BytesIO
 import warnings
 import tempfile
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.deadline import check_deadline, remaining_time, record_abandoned, DeadlineExceeded
+from src.core.tracing import span, file_size
+from src.generators.render_profiles import get_profile, save_figure
+
 warnings.filterwarnings("ignore")
 
 class ProfessionalPDFReportGenerator:
     """Gerador de relatórios PDF profissionais via Markdown"""
     
+    # Impressão: 300 dpi (ou SVG vetorial com BISCOITAO_RENDER_PROFILE_PRINT=svg)
+    CHART_PROFILE = 'print'
+    
     def __init__(self):
         self.visual_generator = IntelligentReportGenerator()
         # Configuração da paleta viridis profissional
@@ -57,6 +65,7 @@ class ProfessionalPDFReportGenerator:
     
     def create_chart_file(self, data, viz_type, instruction, timestamp):
         """Cria arquivo de gráfico para embedding no Markdown"""
+        check_deadline('chart_render')
         
         # Figura com fundo transparente
         fig, ax = plt.subplots(figsize=(12, 7), facecolor='white')
@@ -68,10 +77,10 @@ class ProfessionalPDFReportGenerator:
         else:
             self._create_professional_line_chart(ax, data, instruction)
         
-        # Salva arquivo PNG
-        chart_filename = f"chart_{viz_type}_{timestamp}.png"
-        plt.savefig(chart_filename, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none', dpi=300)
+        # Salva no perfil de impressão (PNG a 300 dpi por padrão)
+        profile = get_profile(self.CHART_PROFILE)
+        chart_filename = f"chart_{viz_type}_{timestamp}.{profile.image_format}"
+        save_figure(fig, [(chart_filename, profile, None)])
         plt.close(fig)
         
         return chart_filename
@@ -312,6 +321,8 @@ class ProfessionalPDFReportGenerator:
     def convert_markdown_to_pdf(self, markdown_file, pdf_file):
         """Converte Markdown para PDF usando pandoc"""
         
+        check_deadline('pdf_conversion')
+        
         try:
             # Verifica se pandoc está instalado
             subprocess.run(['pandoc', '--version'], 
@@ -330,9 +341,13 @@ class ProfessionalPDFReportGenerator:
                 '--enable-local-file-access'
             ]
             
-            subprocess.run(cmd, check=True)
+            # O pandoc é encerrado se a requisição passar do prazo
+            subprocess.run(cmd, check=True, timeout=remaining_time())
             return True
             
+        except subprocess.TimeoutExpired:
+            record_abandoned('pdf_conversion')
+            raise DeadlineExceeded('pdf_conversion')
         except subprocess.CalledProcessError as e:
             print(f"❌ Erro na conversão com pandoc: {e}")
             return False
@@ -379,9 +394,12 @@ class ProfessionalPDFReportGenerator:
             """
             
             # Converte HTML para PDF
+            check_deadline('pdf_conversion')
             HTML(string=styled_html).write_pdf(pdf_file)
             return True
             
+        except DeadlineExceeded:
+            raise
         except ImportError:
             print("❌ Bibliotecas de conversão não encontradas.")
             print("   Instale: pip install markdown2 weasyprint")
@@ -390,14 +408,21 @@ class ProfessionalPDFReportGenerator:
             print(f"❌ Erro na conversão alternativa: {e}")
             return False
     
-    def generate_professional_pdf_report(self, instruction, table_name="dw.monetization_total"):
-        """Gera relatório PDF profissional completo"""
+    def generate_professional_pdf_report(self, instruction, table_name="dw.monetization_total", context=None):
+        """
+        Gera relatório PDF profissional completo
+        
+        context (AnalysisContext): análise já feita da pergunta; sem consultar de novo, o
+        PDF usa o gráfico do perfil de impressão do contexto (e registra o que desenhar)
+        """
         
         print(f"📄 Gerando relatório PDF via Markdown para: {instruction}")
         print("=" * 60)
         
-        # Gera análise visual
-        result = self.visual_generator.generate_complete_report(instruction, table_name)
+        # Gera análise visual (o gráfico do PDF é desenhado abaixo, no perfil de impressão)
+        if context is None:
+            context = self.visual_generator.analyze(instruction, table_name, render_chart=False)
+        result = context.report
         
         if not result:
             print("❌ Não foi possível gerar análise para o relatório PDF.")
@@ -408,13 +433,16 @@ class ProfessionalPDFReportGenerator:
         # Timestamp para arquivos
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # Cria gráfico como arquivo
-        chart_filename = self.create_chart_file(
-            result['data'], 
-            result['viz_type'], 
-            instruction,
-            timestamp
-        )
+        # Cria gráfico como arquivo (uma vez por contexto)
+        chart_filename = context.artifact(self.CHART_PROFILE)
+        if chart_filename is None:
+            with span('chart.render', viz_type=result['viz_type'], format='pdf'):
+                chart_filename = context.add_artifact(self.CHART_PROFILE, self.create_chart_file(
+                    result['data'], 
+                    result['viz_type'], 
+                    instruction,
+                    timestamp
+                ))
         
         # Gera conteúdo Markdown
         markdown_content = self.generate_markdown_content(
@@ -423,8 +451,10 @@ class ProfessionalPDFReportGenerator:
         
         # Salva arquivo Markdown
         markdown_filename = f"relatorio_biscoitao_{timestamp}.md"
-        with open(markdown_filename, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        with span('file.write', format='markdown') as write_span:
+            with open(markdown_filename, 'w', encoding='utf-8') as f:
+                f.write(markdown_content)
+            write_span.set(file=markdown_filename, bytes=file_size(markdown_filename))
         
         print(f"📝 Arquivo Markdown gerado: {markdown_filename}")
         
@@ -432,7 +462,9 @@ class ProfessionalPDFReportGenerator:
         pdf_filename = f"relatorio_biscoitao_{timestamp}.pdf"
         print(f"📄 Convertendo para PDF: {pdf_filename}")
         
-        pdf_success = self.convert_markdown_to_pdf(markdown_filename, pdf_filename)
+        with span('file.write', format='pdf') as write_span:
+            pdf_success = self.convert_markdown_to_pdf(markdown_filename, pdf_filename)
+            write_span.set(file=pdf_filename, converted=pdf_success, bytes=file_size(pdf_filename))
         
         if pdf_success:
             print(f"✅ Relatório PDF gerado: {pdf_filename}")
@@ -450,6 +482,8 @@ class ProfessionalPDFReportGenerator:
         else:
             print("⚠️ Falha na conversão para PDF. Markdown disponível.")
             pdf_filename = None
+        context.add_artifact('markdown', markdown_filename)
+        context.add_artifact('pdf', pdf_filename)
         
         return {
             'markdown_file': markdown_filename,
@@ -10,6 +10,8 @@ from datetime import datetime
 from pdf_report_generator import ProfessionalPDFReportGenerator
 import requests
 import time
+from src.core.deadline import DeadlineExceeded
+from src.core.conversation_store import create_conversation_store
 
 class BiscoitaoSheetsIntegrator:
     """Integrador entre Google Sheets e sistema de relatórios PDF"""
@@ -17,10 +19,11 @@ class BiscoitaoSheetsIntegrator:
     def __init__(self):
         self.pdf_generator = ProfessionalPDFReportGenerator()
         self.toqan_api_url = "https://api.toqan.ai"  # URL base da API Toqan
-        self.conversation_storage = {}  # Armazena conversações ativas
+        # Conversações ativas (LRU + TTL; SQLite é compartilhado entre os workers)
+        self.conversation_storage = create_conversation_store()
     
-    def process_sheets_query(self, user_query, conversation_id=None):
-        """Processa consulta vinda do Google Sheets e gera PDF"""
+    def process_sheets_query(self, user_query, conversation_id=None, context=None):
+        """Processa consulta vinda do Google Sheets e gera PDF (context: AnalysisContext já pronto)"""
         
         print(f"📊 BISCOITÃO SHEETS INTEGRATOR")
         print("=" * 50)
@@ -31,7 +34,7 @@ class BiscoitaoSheetsIntegrator:
         try:
             # 1. Gera relatório PDF completo
             print("📄 Gerando relatório PDF...")
-            result = self.pdf_generator.generate_professional_pdf_report(user_query)
+            result = self.pdf_generator.generate_professional_pdf_report(user_query, context=context)
             
             if not result:
                 return {
@@ -62,11 +65,13 @@ class BiscoitaoSheetsIntegrator:
             
             # 3. Armazena na conversa (se houver ID)
             if conversation_id:
-                self.conversation_storage[conversation_id] = response_data
+                self.conversation_storage.put(conversation_id, response_data)
             
             print("✅ Processamento concluído!")
             return response_data
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"❌ Erro no processamento: {e}")
             return {
@@ -119,8 +124,9 @@ class BiscoitaoSheetsIntegrator:
     def get_conversation_response(self, conversation_id):
         """Obtém resposta de uma conversação"""
         
-        if conversation_id in self.conversation_storage:
-            return self.conversation_storage[conversation_id]
+        stored = self.conversation_storage.get(conversation_id)
+        if stored is not None:
+            return stored
         else:
             return {
                 'success': False,
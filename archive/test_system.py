@@ -7,7 +7,7 @@ import sys
 import os
 import subprocess
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 def test_environment():
     """Testa ambiente Python e dependências"""
@@ -241,6 +241,328 @@ def test_end_to_end():
         print(f"❌ Erro no teste end-to-end: {e}")
         return False
 
+def test_local_pipeline():
+    """Testa o pipeline de análise sobre o Trino local (DuckDB sintético)"""
+    
+    print("\n🧪 TESTE DO PIPELINE COM TRINO LOCAL")
+    print("=" * 40)
+    
+    try:
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from src.core.query import set_backend, get_backend
+        from src.core.local_engine import LocalTrinoEngine
+        from visual_assistant import IntelligentReportGenerator
+        
+        previous_backend = get_backend() if os.getenv('BISCOITAO_QUERY_BACKEND') == 'local' else None
+        set_backend(LocalTrinoEngine(rows=20000, days=120))
+        try:
+            assistant = IntelligentReportGenerator()
+            assistant.query_builder.rollup_store = None
+            assistant.result_cache = None
+            query, viz_type = assistant.query_builder.build_visualization_query("Compare as categorias por preço")
+            if not query:
+                print("❌ Não foi possível planejar a query")
+                return False
+            print(f"✅ Query planejada ({viz_type})")
+            
+            from query import execute_query
+            data = execute_query(query)
+            if data.empty:
+                print("❌ Query local não retornou dados")
+                return False
+            print(f"✅ Query executada no Trino local: {len(data)} registros")
+            return True
+        finally:
+            set_backend(previous_backend)
+    
+    except ImportError as e:
+        print(f"⚠️ Trino local indisponível: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Erro no teste: {e}")
+        return False
+
+def _same_frame(left, right, key):
+    """Mesmas colunas e valores (ordenados pela chave; floats com tolerância)"""
+    import pandas as pd
+    if list(left.columns) != list(right.columns) or len(left) != len(right):
+        return False
+    left = left.sort_values(key, kind='stable').reset_index(drop=True)
+    right = right.sort_values(key, kind='stable').reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(left, right, check_dtype=False, rtol=1e-9)
+    except AssertionError:
+        return False
+    return True
+
+def test_batch_planner():
+    """Testa se as queries unidas do lote devolvem, recortadas, o mesmo que as individuais"""
+    
+    print("\n🧩 TESTE DO PLANEJADOR DE LOTES")
+    print("=" * 40)
+    
+    try:
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from src.core.query import set_backend, get_backend, execute_query
+        from src.core.local_engine import LocalTrinoEngine
+        from src.core.batch_planner import BatchPlanner
+        from src.generators.visual_assistant import AdvancedQueryBuilder
+        
+        previous_backend = get_backend() if os.getenv('BISCOITAO_QUERY_BACKEND') == 'local' else None
+        set_backend(LocalTrinoEngine(rows=20000, days=120))
+        try:
+            builder = AdvancedQueryBuilder()
+            builder.rollup_store = None
+            # Meses dentro da janela de dados sintéticos (últimos 120 dias)
+            months = sorted({(date.year, date.month) for date in
+                             (datetime.now() - timedelta(days=days) for days in (20, 50, 80))})
+            abbreviations = {number: word for word, number in builder.month_mapping.items() if len(word) == 3}
+            labels = [f"{abbreviations[month]}-{year % 100:02d}" for year, month in months]
+            questions = [f"evolução do preço em {label}" for label in labels]
+            questions += [f"compare as categorias por preço em {label}" for label in labels[:2]]
+            questions += [f"compare as categorias por preço em {months[-1][0]}", questions[0]]
+            
+            planned = []
+            for index, question in enumerate(questions):
+                sql, _ = builder.build_visualization_query(question)
+                planned.append((index, sql, 'trino'))
+            shared = BatchPlanner().plan(planned)
+            kinds = sorted(query.kind for query in shared)
+            print(f"✅ {len(questions)} perguntas em {len(shared)} queries compartilhadas ({', '.join(kinds)})")
+            if len(shared) >= len(questions) or 'temporal' not in kinds or 'category' not in kinds:
+                print("❌ Perguntas da mesma família não foram unidas")
+                return False
+            
+            sql_by_index = {index: sql for index, sql, _ in planned}
+            for query in shared:
+                data = execute_query(query.sql)
+                for index, slicer in query.members:
+                    sliced = slicer(data)
+                    individual = execute_query(sql_by_index[index])
+                    key = 'category' if 'category' in individual.columns else ['year', 'month']
+                    if not _same_frame(sliced, individual, key):
+                        print(f"❌ Recorte da query {query.kind} difere da pergunta {index}: {questions[index]}")
+                        print(sliced.head(), individual.head(), sep='\n')
+                        return False
+            print("✅ Recortes iguais aos resultados das queries individuais")
+            return True
+        finally:
+            set_backend(previous_backend)
+    
+    except ImportError as e:
+        print(f"⚠️ Trino local indisponível: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Erro no teste: {e}")
+        return False
+
+def test_rollup_routing():
+    """Testa se o rollup só responde com todos os meses do período materializados, e igual ao Trino"""
+    
+    print("\n🗄️ TESTE DE ROTEAMENTO DO ROLLUP")
+    print("=" * 40)
+    
+    try:
+        import tempfile
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from src.core.query import set_backend, get_backend, execute_query
+        from src.core.local_engine import LocalTrinoEngine
+        from src.core.rollup_store import RollupStore
+        from src.generators.visual_assistant import AdvancedQueryBuilder
+        
+        previous_backend = get_backend() if os.getenv('BISCOITAO_QUERY_BACKEND') == 'local' else None
+        set_backend(LocalTrinoEngine(rows=20000, days=120))
+        try:
+            builder = AdvancedQueryBuilder()
+            year = datetime.now().year
+            questions = ["tendência do preço nos últimos 3 meses", "receita por categoria",
+                         f"ranking de plataforma por preço em {year}", f"evolução do preço ao longo de {year}"]
+            with tempfile.TemporaryDirectory() as directory:
+                # Refresh parcial: períodos abertos não podem ser respondidos pelo rollup
+                partial = RollupStore(os.path.join(directory, 'partial.duckdb'), execute=execute_query)
+                partial.refresh(max_partitions=20)
+                builder.rollup_store = partial
+                sources = [builder.route_query(question)[2] for question in questions[:2]]
+                if sources != ['trino', 'trino']:
+                    print(f"❌ Rollup parcial respondeu período aberto: {sources}")
+                    return False
+                print("✅ Rollup parcial: períodos abertos vão para o Trino")
+                
+                store = RollupStore(os.path.join(directory, 'rollup.duckdb'), execute=execute_query)
+                store.refresh()
+                builder.rollup_store = store
+                months = {(date.year, date.month) for date in
+                          (datetime.now() - timedelta(days=days) for days in range(0, 120, 10))}
+                if not all(store.covers(*month) for month in months):
+                    print("❌ Rollup completo não cobre os meses materializados")
+                    return False
+                for question in questions:
+                    rollup_sql, _, source = builder.route_query(question)
+                    if source != 'rollup':
+                        print(f"❌ Pergunta não roteada ao rollup completo: {question}")
+                        return False
+                    trino_sql, _ = builder.build_visualization_query(question)
+                    rollup_data, trino_data = store.query(rollup_sql), execute_query(trino_sql)
+                    if not _same_frame(rollup_data, trino_data, list(trino_data.columns[:1])):
+                        print(f"❌ Rollup e Trino diferem: {question}")
+                        print(rollup_data.head(), trino_data.head(), sep='\n')
+                        return False
+                print(f"✅ Rollup completo: {len(questions)} perguntas com o mesmo resultado do Trino")
+            return True
+        finally:
+            set_backend(previous_backend)
+    
+    except ImportError as e:
+        print(f"⚠️ Trino local ou DuckDB indisponível: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Erro no teste: {e}")
+        return False
+
+def test_approximate_margins():
+    """Testa as margens de erro do ApproximatePlan: fórmulas e cobertura do valor exato"""
+    
+    print("\n🎯 TESTE DAS MARGENS DA EXECUÇÃO APROXIMADA")
+    print("=" * 40)
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from src.core.query import set_backend, get_backend, execute_query
+        from src.core.local_engine import LocalTrinoEngine
+        from src.core.approximate import ApproximatePlan
+        
+        exact_sql = ("SELECT category_id_fk as category, AVG(price) as avg_value, COUNT(*) as record_count, "
+                     "SUM(price) as sum_value FROM dw.monetization_total GROUP BY category_id_fk")
+        plan = ApproximatePlan(exact_sql, sample_percent=20, confidence=0.95)
+        
+        # Fórmulas sobre um resultado conhecido (amostra de 20%)
+        sample = pd.DataFrame({'category': ['a'], 'avg_value': [10.0], 'avg_value__stddev': [4.0],
+                               'avg_value__n': [100], 'record_count': [500], 'record_count__n': [100],
+                               'sum_value': [5000.0], 'sum_value__sumsq': [11600.0], 'sum_value__n': [100]})
+        estimated = plan.estimate(sample)
+        z = plan.z
+        expected = {
+            'avg_value_margin': z * 4.0 / np.sqrt(100) * np.sqrt(0.8),
+            'record_count_margin': z * np.sqrt(100 * 0.8) / 0.2,
+            'sum_value_margin': z * np.sqrt(0.8 * 11600.0) / 0.2,
+        }
+        for column, value in expected.items():
+            if not np.isclose(estimated[column].iloc[0], value):
+                print(f"❌ {column}: {estimated[column].iloc[0]} (esperado {value})")
+                return False
+        if any('__' in column for column in estimated.columns) or estimated['sample_count'].iloc[0] != 100:
+            print(f"❌ Colunas auxiliares no resultado: {list(estimated.columns)}")
+            return False
+        print("✅ Margens de AVG, COUNT e SUM conforme os estimadores")
+        
+        # Cobertura: o valor exato cai dentro de estimativa ± margem na grande maioria dos grupos
+        previous_backend = get_backend() if os.getenv('BISCOITAO_QUERY_BACKEND') == 'local' else None
+        set_backend(LocalTrinoEngine(rows=50000, days=120))
+        try:
+            exact = execute_query(exact_sql).set_index('category')
+            covered = total = 0
+            for _ in range(3):
+                approximate = plan.estimate(execute_query(plan.sql)).set_index('category')
+                for alias in plan.estimates():
+                    errors = (approximate[alias] - exact.loc[approximate.index, alias]).abs()
+                    covered += int((errors <= approximate[f"{alias}_margin"]).sum())
+                    total += len(errors)
+            coverage = covered / total
+            print(f"📊 Cobertura do intervalo de 95%: {coverage:.1%} ({covered}/{total})")
+            # Grupos pequenos com preço assimétrico ficam abaixo dos 95% nominais (~90% no Trino local)
+            if coverage < 0.85:
+                print("❌ Margens estreitas demais para o nível de confiança")
+                return False
+            print("✅ Valores exatos dentro das margens estimadas")
+            return True
+        finally:
+            set_backend(previous_backend)
+    
+    except ImportError as e:
+        print(f"⚠️ Trino local indisponível: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Erro no teste: {e}")
+        return False
+
+def test_result_cursors():
+    """Testa os cursores paginados do /query: páginas, reuso por versão e expiração"""
+    
+    print("\n📑 TESTE DOS CURSORES PAGINADOS")
+    print("=" * 40)
+    
+    try:
+        import io
+        import tempfile
+        import pandas as pd
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from src.core.result_store import ResultStore, CursorNotFound, page_token, parse_token
+        
+        data = pd.DataFrame({'id': range(2500), 'price': [i * 0.5 for i in range(2500)],
+                             'category': [f"cat_{i % 7}" for i in range(2500)]})
+        with tempfile.TemporaryDirectory() as directory:
+            store = ResultStore(directory, ttl=0.5, page_rows=1000)
+            meta = store.create(data, version='v1')
+            if meta['pages'] != 3 or meta['rows'] != len(data):
+                print(f"❌ Metadados inesperados: {meta}")
+                return False
+            
+            # Páginas seguidas pelo token reconstroem o resultado
+            pages, token = [], page_token(meta['cursor'], 0)
+            while token:
+                cursor, page = parse_token(token)
+                page_meta, chunk = store.page(cursor, page)
+                pages.append(pd.read_csv(io.StringIO(chunk)))
+                token = page_token(cursor, page + 1) if page + 1 < page_meta['pages'] else None
+            rebuilt = pd.concat(pages, ignore_index=True)
+            if not _same_frame(rebuilt, data, 'id'):
+                print("❌ Páginas não reconstroem o resultado")
+                return False
+            print(f"✅ {len(pages)} páginas reconstroem as {len(data)} linhas")
+            
+            if store.create(data, version='v1')['cursor'] != meta['cursor']:
+                print("❌ Mesma versão abriu outro cursor")
+                return False
+            try:
+                store.page(meta['cursor'], 3)
+                print("❌ Página fora do resultado foi servida")
+                return False
+            except IndexError:
+                pass
+            print("✅ Cursor reaproveitado pela versão e páginas limitadas ao resultado")
+            
+            # Expiração: touch renova, cursor vencido some (e seus arquivos também)
+            time.sleep(0.3)
+            store.touch(meta['cursor'])
+            time.sleep(0.3)
+            store.page(meta['cursor'], 1)
+            time.sleep(0.6)
+            try:
+                store.page(meta['cursor'], 1)
+                print("❌ Cursor expirado ainda serve páginas")
+                return False
+            except CursorNotFound:
+                pass
+            if os.listdir(directory):
+                print(f"❌ Arquivos do cursor expirado ficaram no disco: {os.listdir(directory)}")
+                return False
+            store.create(data)  # sem versão: cursor novo
+            time.sleep(0.6)
+            if store.sweep() != 1 or os.listdir(directory):
+                print("❌ Varredura não apagou o cursor expirado")
+                return False
+            print("✅ Cursores expiram após o TTL (renovado por touch) e são apagados")
+        return True
+    
+    except ImportError as e:
+        print(f"⚠️ Cursores indisponíveis (pyarrow): {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Erro no teste: {e}")
+        return False
+
 def generate_test_report():
     """Gera relatório de teste"""
     
@@ -253,6 +575,11 @@ def generate_test_report():
         ("Visual Assistant", test_visual_assistant),
         ("Gerador de PDF", test_pdf_generator),
         ("Integrador Sheets", test_sheets_integrator),
+        ("Pipeline Trino Local", test_local_pipeline),
+        ("Planejador de Lotes", test_batch_planner),
+        ("Roteamento do Rollup", test_rollup_routing),
+        ("Margens Aproximadas", test_approximate_margins),
+        ("Cursores Paginados", test_result_cursors),
         ("Teste End-to-End", test_end_to_end)
     ]
     
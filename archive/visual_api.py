@@ -9,12 +9,46 @@ import os
 import json
 from datetime import datetime
 import traceback
+from src.api.deadlines import install_request_deadlines
+from src.api.tracing import install_request_tracing
+from src.api.compression import install_response_compression, strong_etag, not_modified, not_modified_response, with_etag
+from src.api.metrics import install_metrics_endpoint
+from src.api.health import run_health_checks
+from src.api.sse import sse_response
+from src.core.deadline import DeadlineExceeded
+from src.core.refresh_scheduler import start_in_process_scheduler
+from src.core.prewarm import start_in_process_prewarm, prewarm_report
+from src.core.speculative import speculation_stats
+from src.core.progressive import ProgressiveAnswer, iter_events
+from src.generators.svg_charts import resolve_chart_format
+from src.generators.render_profiles import get_profile, mime_type
 
 app = Flask(__name__)
+install_request_deadlines(app)  # Prazo por requisição (header X-Request-Timeout)
+install_response_compression(app)  # gzip/br via Accept-Encoding e 304 por ETag (antes do tracing)
+install_request_tracing(app)  # Tempos por estágio (header Server-Timing e campo 'trace')
+install_metrics_endpoint(app)  # Scrape do Prometheus em /metrics
 
 # Inicializa o gerador de relatórios
 report_generator = IntelligentReportGenerator()
 
+# Refresh incremental de caches/rollup por partição (BISCOITAO_REFRESH_IN_PROCESS=1)
+refresh_scheduler = start_in_process_scheduler()
+
+# Pré-aquecimento diário das perguntas populares (BISCOITAO_PREWARM_IN_PROCESS=1)
+prewarm_job = start_in_process_prewarm(report_generator)
+
+def analysis_etag(query, data_fingerprint=None, chart_format='png', render_profile='web'):
+    """
+    ETag da análise: chave/versão do resultado no cache (ou os próprios dados, fora do cache) + formato e perfil do gráfico.
+    Usado como ETag fraco: o corpo traz timestamp e nome do arquivo do gráfico, que mudam a cada resposta.
+    """
+    cache = report_generator.result_cache
+    version = cache.version(query) if cache else None
+    if version:
+        return strong_etag(query, version, chart_format, render_profile)
+    return strong_etag(query, data_fingerprint, chart_format, render_profile) if data_fingerprint else None
+
 @app.route('/', methods=['GET'])
 def home():
     """Endpoint principal com documentação"""
@@ -23,9 +57,12 @@ def home():
         'version': '1.0',
         'description': 'API para análise conversacional com geração automática de gráficos',
         'endpoints': {
-            '/analyze': 'POST - Analisa pergunta e gera relatório visual',
+            '/analyze': 'GET ?q=... (revalidável por If-None-Match) ou POST - Analisa pergunta e gera relatório visual',
+            '/analyze/stream': 'GET ?q=... ou POST - Resposta progressiva (Server-Sent Events)',
             '/charts': 'GET - Lista gráficos gerados',
-            '/chart/<filename>': 'GET - Download de gráfico específico'
+            '/chart/<filename>': 'GET - Download de gráfico específico',
+            '/health': 'GET - Status do serviço e dos componentes',
+            '/metrics': 'GET - Métricas no formato do Prometheus'
         },
         'example_queries': [
             "Mostre a evolução da média do preço de jan-24 a jan-25",
@@ -35,27 +72,43 @@ def home():
         ]
     })
 
-@app.route('/analyze', methods=['POST'])
+@app.route('/analyze', methods=['GET', 'POST'])
 def analyze_query():
-    """Endpoint principal para análise conversacional"""
+    """Endpoint principal para análise conversacional (GET ?q=... é condicional por ETag; POST nunca responde 304)"""
     
     try:
         # Obtém dados da requisição
-        data = request.get_json()
+        data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        user_query = data.get('query') or data.get('q')
         
-        if not data or 'query' not in data:
+        if not user_query:
             return jsonify({
-                'error': 'Campo "query" é obrigatório',
+                'error': 'Campo "query" (ou parâmetro "q") é obrigatório',
                 'example': {'query': 'Mostre a evolução do preço médio'}
             }), 400
         
-        user_query = data['query']
+        flag = lambda name, default: str(data.get(name, default)).lower() in ('1', 'true', 'sim', 'yes')
         table_name = data.get('table', 'dw.monetization_total')
+        exact = flag('exact', False)  # desliga a estimativa por amostragem
+        profile = get_profile(data.get('render_profile'))  # thumbnail, web ou print
+        chart_format = resolve_chart_format(data.get('chart_format'), profile.image_format)  # png, webp, svg ou text
         
         print(f"📝 Processando: {user_query}")
         
+        # Revalidação (If-None-Match, só GET): se os dados em cache não mudaram, 304 sem executar nem renderizar
+        if request.method == 'GET' and request.if_none_match:
+            planned_query, _, source = report_generator.query_builder.route_query(user_query, table_name)
+            plan = report_generator.query_builder.approximate_query(user_query, planned_query, exact) \
+                if source == 'trino' else None
+            planned_query = plan.sql if plan else planned_query
+            etag = analysis_etag(planned_query, chart_format=chart_format, render_profile=profile.name) \
+                if planned_query and source == 'trino' else None
+            if etag and not_modified(etag, weak=True):
+                return not_modified_response(etag, weak=True)
+        
         # Gera relatório completo
-        result = report_generator.generate_complete_report(user_query, table_name)
+        result = report_generator.generate_complete_report(user_query, table_name, exact=exact,
+                                                           chart_format=chart_format, render_profile=profile.name)
         
         if not result:
             return jsonify({
@@ -78,18 +131,27 @@ def analyze_query():
                 'visualization_type': result['viz_type'],
                 'data_points': len(result['data']),
                 'insights': result['insights'],
-                'conversational_response': result['response']
+                'conversational_response': result['response'],
+                'approximation': result.get('approximation')
             },
             'chart': {
+                'format': result.get('chart_format'),
+                'profile': result.get('render_profile'),
                 'filename': result['chart_file'],
-                'download_url': f"/chart/{result['chart_file']}"
+                'download_url': f"/chart/{result['chart_file']}" if result['chart_file'] else None,
+                'text': result.get('chart_text')
             },
             'data_sample': result['data'].head(10).to_dict('records') if len(result['data']) > 10 else result['data'].to_dict('records'),
             'timestamp': datetime.now().isoformat()
         }
         
-        return jsonify(response)
+        # POST não é revalidável: ETag só na representação do GET
+        etag = analysis_etag(result['query'], result.get('data_fingerprint'), chart_format, profile.name) \
+            if request.method == 'GET' else None
+        return with_etag(jsonify(response), etag, weak=True) if etag else jsonify(response)
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"❌ Erro na análise: {e}")
         print(traceback.format_exc())
@@ -101,6 +163,26 @@ def analyze_query():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/analyze/stream', methods=['GET', 'POST'])
+def analyze_stream():
+    """Resposta progressiva via SSE: intent/SQL, estimativa, tabela exata, insights e gráfico"""
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    user_query = data.get('query') or data.get('q')
+    if not user_query:
+        return jsonify({
+            'error': 'Campo "query" (ou parâmetro "q") é obrigatório',
+            'example': '/analyze/stream?q=Qual a tendência do preço médio nos últimos 6 meses?'
+        }), 400
+    
+    flag = lambda name, default: str(data.get(name, default)).lower() in ('1', 'true', 'sim', 'yes')
+    print(f"📡 Resposta progressiva: {user_query}")
+    profile = get_profile(data.get('render_profile'))
+    answer = ProgressiveAnswer(report_generator, user_query, data.get('table', 'dw.monetization_total'),
+                               exact=flag('exact', False), render_chart=flag('charts', True),
+                               chart_format=resolve_chart_format(data.get('chart_format'), profile.image_format),
+                               render_profile=profile.name)
+    return sse_response(iter_events(answer))
+
 @app.route('/charts', methods=['GET'])
 def list_charts():
     """Lista todos os gráficos gerados"""
@@ -108,9 +190,9 @@ def list_charts():
     try:
         chart_files = []
         
-        # Lista arquivos PNG no diretório atual
+        # Lista arquivos PNG/WebP/SVG no diretório atual
         for filename in os.listdir('.'):
-            if filename.startswith('grafico_') and filename.endswith('.png'):
+            if filename.startswith('grafico_') and filename.endswith(('.png', '.webp', '.svg')):
                 file_info = os.stat(filename)
                 chart_files.append({
                     'filename': filename,
@@ -140,13 +222,15 @@ def download_chart(filename):
     
     try:
         # Verifica se o arquivo existe e é seguro
-        if not filename.startswith('grafico_') or not filename.endswith('.png'):
+        if not filename.startswith('grafico_') or not filename.endswith(('.png', '.webp', '.svg')):
             return jsonify({'error': 'Nome de arquivo inválido'}), 400
         
         if not os.path.exists(filename):
             return jsonify({'error': 'Arquivo não encontrado'}), 404
         
-        return send_file(filename, as_attachment=True)
+        # Caminho absoluto: o Flask resolve relativos a partir de archive/, não do diretório atual
+        # (send_file responde 304 para o ETag do arquivo; PNG/WebP não são recomprimidos)
+        return send_file(os.path.abspath(filename), mimetype=mime_type(filename), as_attachment=True)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -163,43 +247,51 @@ def quick_analyze():
             'example': '/quick-analyze?q=Mostre a evolução do preço médio'
         }), 400
     
-    # Redireciona para análise completa
+    # Mesma análise do GET /analyze (parâmetro q)
     return analyze_query()
 
+@app.route('/prewarm/stats', methods=['GET'])
+def prewarm_stats():
+    """Taxa de acerto das perguntas pré-aquecidas"""
+    days = request.args.get('days', 1, type=int)
+    return jsonify({
+        'success': True,
+        'stats': prewarm_report(days),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/speculative/stats', methods=['GET'])
+def speculative_stats():
+    """Taxa de acerto e tempo poupado pela execução especulativa (BISCOITAO_SPECULATIVE=on)"""
+    return jsonify({
+        'success': True,
+        'enabled': report_generator.speculative is not None,
+        'stats': speculation_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Verificação de saúde do serviço"""
+    """Verificação de saúde do serviço e de seus componentes"""
     
-    try:
-        # Testa conexão com banco
-        from query import execute_query
-        test_result = execute_query("SELECT 1 as test")
-        
-        database_ok = len(test_result) > 0
-        
-        return jsonify({
-            'status': 'healthy',
-            'database_connection': 'ok' if database_ok else 'error',
-            'timestamp': datetime.now().isoformat(),
-            'service': 'Biscoitão Visual Assistant API'
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'error': str(e),
-            'timestamp': datetime.now().isoformat()
-        }), 500
+    health, status_code = run_health_checks(rollup_store=report_generator.query_builder.rollup_store)
+    return jsonify({
+        'service': 'Biscoitão Visual Assistant API',
+        'database_connection': health['components']['database']['status'],
+        **health
+    }), status_code
 
 if __name__ == '__main__':
     print("🚀 Iniciando Biscoitão Visual Assistant API")
     print("=" * 50)
     print("📊 Endpoints disponíveis:")
     print("   • POST /analyze - Análise conversacional completa")
+    print("   • GET /analyze/stream?q=<pergunta> - Resposta progressiva (SSE)")
     print("   • GET /charts - Lista gráficos gerados")
     print("   • GET /chart/<filename> - Download de gráfico")
     print("   • GET /quick-analyze?q=<pergunta> - Análise rápida")
     print("   • GET /health - Status do serviço")
+    print("   • GET /metrics - Métricas Prometheus")
     print()
     print("💡 Exemplo de uso:")
     print("   curl -X POST http://localhost:5000/analyze \\")
@@ -0,0 +1,243 @@
+"""
+Benchmark - Leitura Arrow vs. read_sql para resultados grandes do Trino
+Sobe um substituto local da API REST do Trino (/v1/statement, páginas JSON
+pré-serializadas, opcionalmente no protocolo de spooling) em outro processo e
+compara, no processo cliente, o tempo total e de CPU de:
+
+    read_sql      pd.read_sql sobre o DB-API do PyHive
+    from_records  caminho atual do TrinoQuery (fetchall + DataFrame.from_records)
+    arrow         ArrowTrinoQuery -> pyarrow.Table (+ to_pandas à parte)
+
+em um resultado longo (poucas colunas, muitas linhas) e um largo.
+
+Uso:
+    python scripts/benchmark_arrow_fetch.py --long-rows 500000 --wide-rows 100000 --wide-columns 40
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import argparse
+import multiprocessing
+from datetime import datetime, date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.core.arrow_fetch import ArrowTrinoQuery, TrinoStatementClient
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+
+def synthetic_columns(kind, rows, wide_columns, seed=7):
+    """[(nome, tipo Trino, valores)] no formato em que o Trino serializa em JSON"""
+    rng = np.random.default_rng(seed)
+    dates = [(date(2024, 1, 1) + timedelta(days=int(day))).isoformat() for day in range(730)]
+    categories = [f"categoria_{index:03d}" for index in range(200)]
+
+    def bigint():
+        return rng.integers(0, 10**9, rows).tolist()
+
+    def double(nulls=0.0):
+        values = rng.normal(500, 150, rows).round(4).tolist()
+        for index in np.flatnonzero(rng.random(rows) < nulls):
+            values[index] = None
+        return values
+
+    def varchar():
+        return [categories[index] for index in rng.integers(0, len(categories), rows)]
+
+    def day():
+        return [dates[index] for index in rng.integers(0, len(dates), rows)]
+
+    if kind == 'long':
+        return [('ad_id', 'bigint', bigint()), ('category', 'varchar', varchar()),
+                ('price', 'double', double(nulls=0.01)), ('quantity', 'integer', rng.integers(1, 50, rows).tolist()),
+                ('creation_date', 'date', day()), ('active', 'boolean', (rng.random(rows) < 0.8).tolist())]
+    makers = [('bigint', bigint), ('double', double), ('varchar', varchar), ('date', day)]
+    columns = []
+    for index in range(wide_columns):
+        trino_type, maker = makers[index % len(makers)]
+        columns.append((f"col_{index:02d}_{trino_type}", trino_type, maker()))
+    return columns
+
+def serve(port, datasets, page_rows, ready):
+    """Substituto da API REST do Trino com páginas pré-serializadas"""
+    pages = {}
+    for name, columns in datasets.items():
+        header = [{'name': column, 'type': trino_type} for column, trino_type, _ in columns]
+        rows = [list(row) for row in zip(*(values for _, _, values in columns))]
+        chunks = [rows[start:start + page_rows] for start in range(0, len(rows), page_rows)] or [[]]
+        pages[name] = (json.dumps(header).encode(), [json.dumps(chunk).encode() for chunk in chunks])
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Cabeçalho e corpo saem em escritas separadas: sem Nagle para não somar 40ms por página
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b''):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _page(self, name, token, spooling):
+            header, chunks = pages[name]
+            base = f"http://127.0.0.1:{port}"
+            body = b'{"id":"' + name.encode() + b'","columns":' + header
+            if spooling:
+                segment = {'type': 'spooled', 'uri': f"{base}/v1/spooled/{name}/{token}",
+                           'ackUri': f"{base}/v1/spooled/ack/{name}/{token}", 'metadata': {}}
+                if token % 2:  # alterna segmentos inline e em URI
+                    segment = {'type': 'inline', 'data': base64.b64encode(chunks[token]).decode(), 'metadata': {}}
+                body += b',"data":' + json.dumps({'encoding': 'json', 'segments': [segment]}).encode()
+            else:
+                body += b',"data":' + chunks[token]
+            if token + 1 < len(chunks):
+                body += f',"nextUri":"{base}/v1/statement/executing/{name}/{token + 1}"'.encode()
+            return body + b'}'
+
+        def do_POST(self):
+            sql = self.rfile.read(int(self.headers['Content-Length'])).decode()
+            name = 'wide' if 'wide' in sql else 'long'
+            # Primeira resposta do Trino: só o id e o próximo URI
+            self._send(200, json.dumps({'id': name, 'nextUri':
+                                        f"http://127.0.0.1:{port}/v1/statement/executing/{name}/0"}).encode())
+
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            if parts[1] == 'spooled':
+                if parts[2] == 'ack':
+                    self._send(200)
+                else:
+                    self._send(200, pages[parts[2]][1][int(parts[3])])
+                return
+            spooling = self.headers.get('X-Trino-Query-Data-Encoding') == 'json'
+            self._send(200, self._page(parts[3], int(parts[4]), spooling))
+
+        def do_DELETE(self):
+            self._send(204)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    ready.set()
+    server.serve_forever()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def measure(function, repeat):
+    """Melhor de repeat: (resultado, segundos, segundos de CPU do cliente)"""
+    best = None
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = function()
+        sample = (result, time.perf_counter() - wall, time.process_time() - cpu)
+        if best is None or sample[1] < best[1]:
+            best = sample
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do caminho Arrow de leitura do Trino")
+    parser.add_argument('--long-rows', type=int, default=500000)
+    parser.add_argument('--wide-rows', type=int, default=100000)
+    parser.add_argument('--wide-columns', type=int, default=40)
+    parser.add_argument('--page-rows', type=int, default=8192, help="Linhas por página JSON")
+    parser.add_argument('--spooling', action='store_true', help="Serve no protocolo de spooling (segmentos)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    from pyhive import trino
+
+    print("🏁 BENCHMARK - LEITURA ARROW vs READ_SQL")
+    print("=" * 78)
+    datasets = {'long': synthetic_columns('long', args.long_rows, args.wide_columns),
+                'wide': synthetic_columns('wide', args.wide_rows, args.wide_columns)}
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, datasets, args.page_rows, ready), daemon=True)
+    server.start()
+    ready.wait(300)
+    del datasets
+    url = f"http://127.0.0.1:{port}"
+    print(f"🧪 Trino substituto em {url} ({args.page_rows} linhas/página, spooling={'on' if args.spooling else 'off'})")
+
+    def connection():
+        return trino.connect(host='127.0.0.1', port=port, protocol='http', username='benchmark')
+
+    def read_sql(sql):
+        return pd.read_sql(sql, connection())
+
+    def from_records(sql):
+        cursor = connection().cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        columns = [col[0] for col in cursor.description]
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+    def arrow(sql):
+        return ArrowTrinoQuery(sql, client=TrinoStatementClient(url, username='benchmark',
+                                                                 spooling=args.spooling))._fetch_arrow()
+
+    results = []
+    try:
+        for name, rows in (('long', args.long_rows), ('wide', args.wide_rows)):
+            sql = f"SELECT * FROM {name}"
+            print(f"\n📦 {name}: {rows:,} linhas")
+            item = {'dataset': name, 'rows': rows, 'paths': {}}
+            baseline, baseline_seconds, baseline_cpu = measure(lambda: read_sql(sql), args.repeat)
+            _, records_seconds, records_cpu = measure(lambda: from_records(sql), args.repeat)
+            table, arrow_seconds, arrow_cpu = measure(lambda: arrow(sql), args.repeat)
+            frame, pandas_seconds, pandas_cpu = measure(table.to_pandas, args.repeat)
+
+            # Mesmos números nas colunas numéricas
+            for column in frame.columns:
+                if pd.api.types.is_numeric_dtype(frame[column]) and not pd.api.types.is_bool_dtype(frame[column]):
+                    assert np.allclose(frame[column].to_numpy(dtype=float),
+                                       pd.to_numeric(baseline[column]).to_numpy(dtype=float), equal_nan=True)
+
+            for path, seconds, cpu in (('read_sql', baseline_seconds, baseline_cpu),
+                                       ('from_records', records_seconds, records_cpu),
+                                       ('arrow', arrow_seconds, arrow_cpu),
+                                       ('arrow+to_pandas', arrow_seconds + pandas_seconds, arrow_cpu + pandas_cpu)):
+                item['paths'][path] = {'seconds': round(seconds, 4), 'cpu_seconds': round(cpu, 4),
+                                       'speedup': round(baseline_seconds / seconds, 2)}
+                print(f"   {path:<16} {seconds * 1000:9.1f}ms  CPU {cpu * 1000:9.1f}ms  "
+                      f"{baseline_seconds / seconds:5.2f}x")
+            item['arrow_bytes'] = table.nbytes
+            item['pandas_bytes'] = int(baseline.memory_usage(index=False, deep=True).sum())
+            print(f"   memória: Arrow {table.nbytes / 1e6:.1f}MB vs read_sql {item['pandas_bytes'] / 1e6:.1f}MB")
+            results.append(item)
+    finally:
+        server.terminate()
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'long_rows': args.long_rows, 'wide_rows': args.wide_rows, 'wide_columns': args.wide_columns,
+                   'page_rows': args.page_rows, 'spooling': args.spooling, 'repeat': args.repeat},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"arrow_fetch_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
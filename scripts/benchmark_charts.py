@@ -0,0 +1,119 @@
+"""
+Benchmark - Gráficos PNG (matplotlib) vs. SVG (templates) vs. texto (Unicode)
+Renderiza os mesmos line_chart/bar_chart nos três formatos de chart_format e
+compara o tempo de renderização e o tamanho do que vai para o cliente: arquivo
+bruto, base64 (como o HTML embute o PNG) e gzip (como a API o envia).
+
+Cenários:
+    mensal     line_chart, 24 meses (pergunta típica de evolução)
+    diario     line_chart, 3 anos de pontos diários
+    categorias bar_chart, 10 categorias
+
+Uso:
+    python scripts/benchmark_charts.py --repeat 5
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import base64
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+import pandas as pd
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.generators.visual_assistant import VisualizationEngine
+from src.generators.svg_charts import SvgChartEngine, text_chart
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+INSTRUCTION = "Mostre a evolução da média do preço"
+FORMATS = ['png', 'svg', 'text']
+
+def scenarios(seed=7):
+    rng = np.random.default_rng(seed)
+    months = pd.period_range('2024-01', periods=24, freq='M')
+    monthly = pd.DataFrame({'year': months.year, 'month': months.month,
+                            'avg_value': 500 + np.cumsum(rng.normal(2, 15, len(months)))})
+    days = pd.date_range('2023-01-01', periods=3 * 365, freq='D')
+    daily = pd.DataFrame({'day': days.strftime('%Y-%m-%d'),
+                          'avg_value': 500 + np.cumsum(rng.normal(0.1, 4, len(days)))})
+    categories = pd.DataFrame({'category': [f"categoria_{index}" for index in range(10)],
+                               'avg_price': rng.uniform(100, 900, 10).round(2)}) \
+        .sort_values('avg_price', ascending=False)
+    return {
+        'mensal': ('line_chart', monthly),
+        'diario': ('line_chart', daily),
+        'categorias': ('bar_chart', categories),
+    }
+
+def render(chart_format, viz_type, data, directory, engines):
+    """Renderiza uma vez e retorna os bytes que seguiriam para o cliente"""
+    if chart_format == 'text':
+        return text_chart(data, viz_type, INSTRUCTION).encode('utf-8')
+    engine = engines[chart_format]
+    filename = os.path.join(directory, f"grafico_{viz_type}.{chart_format}")
+    if viz_type == 'bar_chart':
+        engine.create_bar_chart(data.copy(), INSTRUCTION, filename)
+    else:
+        engine.create_line_chart(data.copy(), INSTRUCTION, filename)
+    with open(filename, 'rb') as f:
+        return f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de gráfico (png/svg/text)")
+    parser.add_argument('--repeat', type=int, default=5, help="Renderizações medidas por formato")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    engines = {'png': VisualizationEngine(), 'svg': SvgChartEngine()}
+    directory = tempfile.mkdtemp(prefix='biscoitao_charts_')
+    print("🏁 BENCHMARK - FORMATOS DE GRÁFICO")
+    print("=" * 78)
+    results = []
+    for name, (viz_type, data) in scenarios().items():
+        print(f"\n📈 {name}: {viz_type}, {len(data):,} pontos")
+        baseline = None
+        for chart_format in FORMATS:
+            render(chart_format, viz_type, data, directory, engines)  # aquecimento (fontes, caches)
+            timings = []
+            for _ in range(args.repeat):
+                started_at = time.perf_counter()
+                payload = render(chart_format, viz_type, data, directory, engines)
+                timings.append(time.perf_counter() - started_at)
+            item = {
+                'scenario': name,
+                'format': chart_format,
+                'points': len(data),
+                'render_ms': round(statistics.median(timings) * 1000, 2),
+                'bytes': len(payload),
+                'base64_bytes': len(base64.b64encode(payload)),
+                'gzip_bytes': len(gzip.compress(payload)),
+            }
+            baseline = baseline or item
+            item['speedup'] = round(baseline['render_ms'] / item['render_ms'], 1) if item['render_ms'] else None
+            item['size_ratio'] = round(baseline['gzip_bytes'] / item['gzip_bytes'], 1)
+            results.append(item)
+            print(f"   {chart_format:<5} {item['render_ms']:9.2f}ms  {item['bytes'] / 1024:9.1f}KB  "
+                  f"base64 {item['base64_bytes'] / 1024:9.1f}KB  gzip {item['gzip_bytes'] / 1024:8.1f}KB  "
+                  f"({item['speedup']}x mais rápido, {item['size_ratio']}x menor que PNG)")
+
+    report = {'created_at': datetime.now().isoformat(), 'config': {'repeat': args.repeat}, 'results': results}
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"charts_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark - Compressão e ETags nas respostas
+Mede, para respostas do /query (CSV processado dentro do JSON) de vários
+tamanhos, os bytes enviados sem compressão, com gzip e com Brotli, o custo
+de CPU da compressão e o ganho de uma revalidação 304 via If-None-Match.
+O tempo de transferência economizado é estimado para a banda informada.
+
+Uso:
+    python scripts/benchmark_compression.py --sizes 1000,10000,60000 --bandwidth-mbps 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+from flask import Flask, jsonify
+
+# Adiciona raiz do projeto (e o protótipo em archive/) ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.append(os.path.join(PROJECT_ROOT, 'archive'))
+from src.core.local_engine import LocalTrinoEngine
+from src.api.compression import install_response_compression, strong_etag, with_etag, ENCODERS
+from data_processor import SimpleDataProcessor
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+
+def build_app(payloads):
+    """App mínima com o mesmo formato de resposta do /query"""
+    app = Flask(__name__)
+    install_response_compression(app)
+
+    @app.route('/query/<int:rows>')
+    def query(rows):
+        output = payloads[rows]
+        return with_etag(jsonify(output), strong_etag('benchmark', rows))
+
+    return app
+
+def measure(client, rows, encoding, repeat, headers=None):
+    headers = {'Accept-Encoding': encoding, **(headers or {})}
+    samples = []
+    response = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(f'/query/{rows}', headers=headers)
+        samples.append(time.perf_counter() - start)
+    return response, statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de compressão/ETag das respostas do Biscoitão")
+    parser.add_argument('--sizes', default='1000,10000,60000', help="Linhas do resultado")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--bandwidth-mbps', type=float, default=10.0,
+                        help="Banda até o cliente (Apps Script) para estimar o tempo de transferência")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    engine = LocalTrinoEngine(rows=max(sizes), days=90)
+    processor = SimpleDataProcessor()
+    payloads = {}
+    for rows in sizes:
+        df = engine.execute(f"SELECT * FROM dw.monetization_total LIMIT {rows}")
+        payloads[rows] = {'result': processor.process(df, 'benchmark'), 'summary': None}
+
+    client = build_app(payloads).test_client()
+    encodings = ['identity'] + [name for name in ('gzip', 'br') if name in ENCODERS]
+    bytes_per_second = args.bandwidth_mbps * 1e6 / 8
+
+    print("🏁 BENCHMARK - COMPRESSÃO E ETAG")
+    print("=" * 78)
+    print(f"Codificações: {', '.join(encodings)} | banda estimada: {args.bandwidth_mbps} Mbps")
+
+    results = []
+    for rows in sizes:
+        print(f"\n📦 {rows:,} linhas")
+        item = {'rows': rows, 'encodings': {}}
+        identity_bytes = None
+        for encoding in encodings:
+            response, server_seconds = measure(client, rows, encoding, args.repeat)
+            sent = len(response.get_data())
+            identity_bytes = identity_bytes or sent
+            transfer = sent / bytes_per_second
+            item['encodings'][encoding] = {
+                'bytes': sent,
+                'ratio': round(sent / identity_bytes, 4),
+                'server_seconds': round(server_seconds, 5),
+                'transfer_seconds': round(transfer, 4),
+                'total_seconds': round(server_seconds + transfer, 4),
+            }
+            print(f"   {encoding:<9} {sent:>12,} bytes ({sent / identity_bytes:6.1%})  "
+                  f"servidor {server_seconds * 1000:7.1f}ms  + rede {transfer * 1000:8.1f}ms")
+
+        # Revalidação: o cliente manda o ETag que recebeu
+        best = encodings[-1]
+        first, _ = measure(client, rows, best, 1)
+        revalidated, server_seconds = measure(client, rows, best, args.repeat,
+                                              {'If-None-Match': first.headers['ETag']})
+        item['not_modified'] = {
+            'status': revalidated.status_code,
+            'bytes': len(revalidated.get_data()),
+            'server_seconds': round(server_seconds, 5),
+        }
+        print(f"   304       {len(revalidated.get_data()):>12,} bytes  servidor {server_seconds * 1000:7.1f}ms "
+              f"(status {revalidated.status_code})")
+
+        identity_total = item['encodings']['identity']['total_seconds']
+        saved = identity_total - item['encodings'][best]['total_seconds']
+        item['seconds_saved'] = round(saved, 4)
+        item['not_modified']['seconds_saved'] = round(identity_total - server_seconds, 4)
+        print(f"   ⚡ {best} economiza {saved * 1000:.0f}ms por resposta; 304 economiza "
+              f"{(identity_total - server_seconds) * 1000:.0f}ms")
+        results.append(item)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'sizes': sizes, 'repeat': args.repeat, 'bandwidth_mbps': args.bandwidth_mbps},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"compression_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark - Downsampling (LTTB / min-max) de séries longas antes de desenhar
+Gera séries sintéticas (passeio aleatório com picos isolados) e compara, para
+cada método de BISCOITAO_DOWNSAMPLE (off, lttb, minmax):
+
+    - tempo só da redução para BISCOITAO_CHART_MAX_POINTS pontos
+    - tempo e tamanho do gráfico de linha PNG (matplotlib) e SVG
+    - se o máximo e o mínimo globais (e os picos injetados) continuam desenhados
+
+A linha de tendência é sempre ajustada sobre a série inteira; só os pontos
+desenhados mudam.
+
+Uso:
+    python scripts/benchmark_downsampling.py --points 100000,1000000 --repeat 3
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+import pandas as pd
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.generators import downsampling
+from src.generators.downsampling import downsample_indices, numeric_axis
+from src.generators.visual_assistant import VisualizationEngine
+from src.generators.svg_charts import SvgChartEngine
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+INSTRUCTION = "Mostre a evolução da média do preço"
+METHODS = ['off', 'lttb', 'minmax']
+SPIKES = 5
+
+def series(points, seed=7):
+    """Série por minuto com SPIKES picos isolados (o que um downsampling ingênuo perde)"""
+    rng = np.random.default_rng(seed)
+    values = 500 + np.cumsum(rng.normal(0, 1, points))
+    spikes = rng.choice(np.arange(1, points - 1), SPIKES, replace=False)
+    values[spikes] += rng.choice([-1, 1], SPIKES) * 40 * values.std()
+    data = pd.DataFrame({'minute': pd.date_range('2024-01-01', periods=points, freq='min'), 'avg_value': values})
+    return data, np.sort(spikes)
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started_at)
+    return result, round(statistics.median(timings) * 1000, 2)
+
+def render(engine, data, filename):
+    engine.create_line_chart(data.copy(), INSTRUCTION, filename)
+    with open(filename, 'rb') as f:
+        return f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de downsampling de séries longas")
+    parser.add_argument('--points', default='100000,1000000', help="Tamanhos das séries")
+    parser.add_argument('--max-points', type=int, default=downsampling.MAX_POINTS, help="Pontos desenhados")
+    parser.add_argument('--repeat', type=int, default=3, help="Execuções medidas por combinação")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    downsampling.MAX_POINTS = args.max_points
+    engines = {'png': VisualizationEngine(), 'svg': SvgChartEngine()}
+    directory = tempfile.mkdtemp(prefix='biscoitao_downsampling_')
+    print("🏁 BENCHMARK - DOWNSAMPLING DE SÉRIES LONGAS")
+    print("=" * 78)
+    results = []
+    for points in [int(value) for value in args.points.split(',') if value]:
+        data, spikes = series(points)
+        values = data['avg_value'].to_numpy()
+        x = numeric_axis(data['minute'])
+        print(f"\n📈 {points:,} pontos → {args.max_points:,} desenhados")
+        baseline = {}
+        for method in METHODS:
+            downsampling.METHOD = method  # os motores usam o método padrão do módulo
+            drawn, reduce_ms = timed(lambda: downsample_indices(x, values, args.max_points, method), args.repeat)
+            kept = set(drawn.tolist())
+            item = {
+                'points': points,
+                'method': method,
+                'drawn': len(drawn),
+                'reduce_ms': reduce_ms,
+                'max_kept': int(np.argmax(values)) in kept,
+                'min_kept': int(np.argmin(values)) in kept,
+                'spikes_kept': sum(int(spike) in kept for spike in spikes),
+            }
+            for chart_format, engine in engines.items():
+                filename = os.path.join(directory, f"linha_{points}_{method}.{chart_format}")
+                payload, render_ms = timed(lambda: render(engine, data, filename), args.repeat)
+                item[f'{chart_format}_ms'] = render_ms
+                item[f'{chart_format}_bytes'] = len(payload)
+                item[f'{chart_format}_gzip_bytes'] = len(gzip.compress(payload))
+                baseline.setdefault(chart_format, render_ms)
+                item[f'{chart_format}_speedup'] = round(baseline[chart_format] / render_ms, 1) if render_ms else None
+            results.append(item)
+            print(f"   {method:<7} redução {reduce_ms:8.1f}ms | PNG {item['png_ms']:8.0f}ms "
+                  f"{item['png_bytes'] / 1024:7.0f}KB ({item['png_speedup']}x) | SVG {item['svg_ms']:8.0f}ms "
+                  f"{item['svg_gzip_bytes'] / 1024:8.1f}KB gzip ({item['svg_speedup']}x) | "
+                  f"máx {'✅' if item['max_kept'] else '❌'} mín {'✅' if item['min_kept'] else '❌'} "
+                  f"picos {item['spikes_kept']}/{SPIKES}")
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'max_points': args.max_points, 'repeat': args.repeat, 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"downsampling_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark - Insights vetorizados vs. lógica por série
+Gera um resultado em formato longo (mês × categoria × métrica) com milhares
+de séries e compara o InsightEngine (uma passada vetorizada) com a lógica
+antiga do _generate_insights aplicada série a série (iloc/idxmax/.loc). Os
+números do engine são conferidos contra o pandas antes de medir.
+
+Uso:
+    python scripts/benchmark_insights.py --series 100,1000,10000 --months 24
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.generators.insight_engine import InsightEngine
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+
+def build_long_result(series, months, metrics, seed=42):
+    """year, month, category e métricas para series categorias × months meses"""
+    rng = np.random.default_rng(seed)
+    ordinals = np.arange(2024 * 12, 2024 * 12 + months)
+    data = pd.DataFrame({
+        'category': np.repeat(np.arange(series), months),
+        'year': np.tile(ordinals // 12, series),
+        'month': np.tile(ordinals % 12 + 1, series),
+    })
+    trend = rng.normal(0, 0.02, series)
+    for index in range(metrics):
+        base = rng.uniform(10, 1000, series)
+        noise = rng.normal(0, rng.choice([0.05, 0.3], series)[:, None], (series, months))
+        values = base[:, None] * (1 + trend[:, None] * np.arange(months) + noise)
+        data[f'metric_{index}'] = values.ravel()
+    # Alguns buracos: meses sem dado em séries aleatórias
+    holes = rng.random(len(data)) < 0.02
+    data.loc[holes, 'metric_0'] = np.nan
+    return data
+
+def per_series_insights(values, data):
+    """Lógica antiga do _generate_insights para uma série temporal"""
+    insights = []
+    values = values.dropna()
+    if len(values) > 1:
+        first_val = values.iloc[0]
+        last_val = values.iloc[-1]
+        growth = ((last_val - first_val) / first_val) * 100
+        insights.append(growth)
+        std_dev = values.std()
+        mean_val = values.mean()
+        insights.append(std_dev / mean_val * 100)
+        max_idx = values.idxmax()
+        min_idx = values.idxmin()
+        insights.append(f"{data.loc[max_idx, 'month']}/{data.loc[max_idx, 'year']}")
+        insights.append(f"{data.loc[min_idx, 'month']}/{data.loc[min_idx, 'year']}")
+    return insights
+
+def run_baseline(data, metrics, limit):
+    """Loop por série (como N chamadas ao _generate_insights); limitado a limit séries"""
+    categories = data['category'].unique()[:limit]
+    subset = data[data['category'].isin(categories)]
+    started_at = time.perf_counter()
+    for _, frame in subset.groupby('category', sort=False):
+        for metric in metrics:
+            per_series_insights(frame[metric], frame)
+    return time.perf_counter() - started_at, len(categories) * len(metrics)
+
+def check_against_pandas(engine, data, metrics):
+    """Confere crescimento, CV e pico do engine com groupby do pandas"""
+    summary = engine.summarize(data, dimension_columns=['category'], metric_columns=metrics)
+    summary = summary[summary['metric'] == metrics[0]].set_index('category')
+    grouped = data.dropna(subset=[metrics[0]]).groupby('category')[metrics[0]]
+    first, last = grouped.first(), grouped.last()
+    expected_growth = (last - first) / first * 100
+    expected_cv = grouped.std() / grouped.mean() * 100
+    assert np.allclose(summary['growth_pct'], expected_growth.loc[summary.index])
+    assert np.allclose(summary['cv_pct'], expected_cv.loc[summary.index])
+    assert np.allclose(summary['peak_value'], grouped.max().loc[summary.index])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do InsightEngine vetorizado")
+    parser.add_argument('--series', default='100,1000,10000', help="Números de séries (categorias)")
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--metrics', type=int, default=2, help="Métricas por categoria")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline-limit', type=int, default=2000,
+                        help="Máximo de categorias no loop por série (acima disso, extrapola)")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    engine = InsightEngine()
+    sizes = [int(size) for size in args.series.split(',') if size]
+
+    print("🏁 BENCHMARK - INSIGHTS VETORIZADOS")
+    print("=" * 78)
+    print(f"{args.months} meses × {args.metrics} métricas por categoria")
+
+    results = []
+    for series in sizes:
+        data = build_long_result(series, args.months, args.metrics)
+        metrics = [f'metric_{index}' for index in range(args.metrics)]
+        check_against_pandas(engine, data, metrics)
+
+        samples = []
+        for _ in range(args.repeat):
+            started_at = time.perf_counter()
+            summary = engine.summarize(data, dimension_columns=['category'], metric_columns=metrics)
+            engine.concentration(summary)
+            samples.append(time.perf_counter() - started_at)
+        vectorized = min(samples)
+
+        baseline_seconds, baseline_series = run_baseline(data, metrics, args.baseline_limit)
+        total_series = series * args.metrics
+        baseline = baseline_seconds * total_series / baseline_series
+        item = {
+            'categories': series,
+            'series': total_series,
+            'rows': len(data),
+            'vectorized_seconds': round(vectorized, 4),
+            'per_series_seconds': round(baseline, 4),
+            'per_series_extrapolated': baseline_series < total_series,
+            'speedup': round(baseline / vectorized, 1),
+        }
+        results.append(item)
+        print(f"   {total_series:>7,} séries ({len(data):>9,} linhas)  vetorizado {vectorized * 1000:8.1f}ms  "
+              f"por série {baseline * 1000:9.1f}ms{'*' if item['per_series_extrapolated'] else ' '}  "
+              f"speedup {item['speedup']}x")
+
+    if any(item['per_series_extrapolated'] for item in results):
+        print(f"   * extrapolado a partir de {args.baseline_limit} categorias")
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'series': sizes, 'months': args.months, 'metrics': args.metrics, 'repeat': args.repeat,
+                   'baseline_limit': args.baseline_limit},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"insights_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
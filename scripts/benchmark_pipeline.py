@@ -0,0 +1,260 @@
+"""
+Benchmark - Pipeline completo sobre o Trino local
+Mede latência e vazão de cada estágio (plan, execute, process, render, html,
+pdf) com o backend local (DuckDB sintético) em vários tamanhos de dados e
+salva o resultado em JSON para comparação de regressões entre versões.
+
+Uso:
+    python scripts/benchmark_pipeline.py --sizes 10000,100000,1000000 --repeat 3
+    python scripts/benchmark_pipeline.py --compare output/benchmarks/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+import matplotlib
+matplotlib.use('Agg')  # sem janelas durante o benchmark
+import matplotlib.pyplot as plt
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.core.query import execute_query, set_backend
+from src.core.local_engine import LocalTrinoEngine
+from src.core.data_processor import DataProcessor
+from src.generators.visual_assistant import IntelligentReportGenerator
+from src.generators.html_generator import HTMLReportGenerator
+
+STAGES = ['plan', 'execute', 'process', 'render', 'html', 'pdf']
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+
+def benchmark_questions():
+    """Perguntas típicas dos analistas, com datas dentro do período sintético"""
+    last_month = (datetime.now().replace(day=1) - timedelta(days=1))
+    months = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+    month_label = f"{months[last_month.month - 1]}-{last_month.year % 100:02d}"
+    return [
+        "Evolução da média do preço nos últimos 6 meses",
+        "Compare as categorias por preço",
+        f"Média de preço em {month_label}",
+    ]
+
+def load_pdf_generator():
+    """Gerador de PDF do protótipo (archive/) ou None se indisponível"""
+    sys.path.append(os.path.join(PROJECT_ROOT, 'archive'))
+    try:
+        from pdf_report_generator import ProfessionalPDFReportGenerator
+        return ProfessionalPDFReportGenerator()
+    except Exception as e:
+        print(f"⚠️ Estágio pdf desativado: {e}")
+        return None
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+def run_question(generator, html_generator, pdf_generator, instruction, timings, notes):
+    """Executa uma pergunta estágio por estágio, acumulando os tempos"""
+    builder = generator.query_builder
+    (query, viz_type), elapsed = timed(builder.build_visualization_query, instruction)
+    timings['plan'].append(elapsed)
+    if not query:
+        notes.append(f"sem plano: {instruction}")
+        return
+
+    data, elapsed = timed(execute_query, query)
+    timings['execute'].append(elapsed)
+    if data.empty:
+        notes.append(f"sem dados: {instruction}")
+        return
+
+    def process():
+        processed = DataProcessor().process(data.copy(), instruction)
+        insights = generator._generate_insights(data, instruction, viz_type)
+        response = generator._generate_conversational_response(data, instruction, viz_type)
+        return processed, insights, response
+    (_, insights, response), elapsed = timed(process)
+    timings['process'].append(elapsed)
+
+    filename = f"grafico_{viz_type}_{time.time_ns()}.png"
+    render = generator.viz_engine.create_bar_chart if viz_type == 'bar_chart' else generator.viz_engine.create_line_chart
+    chart_file, elapsed = timed(render, data.copy(), instruction, filename)
+    plt.close('all')
+    timings['render'].append(elapsed)
+
+    result = {'data': data, 'chart_file': chart_file, 'query': query, 'viz_type': viz_type,
+              'insights': insights, 'response': response}
+
+    def html():
+        content = html_generator._create_html_content(result, instruction, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        with open(f"relatorio_{time.time_ns()}.html", 'w', encoding='utf-8') as f:
+            f.write(content)
+    _, elapsed = timed(html)
+    timings['html'].append(elapsed)
+
+    if pdf_generator is not None:
+        def pdf():
+            stamp = str(time.time_ns())
+            chart = pdf_generator.create_chart_file(data.copy(), viz_type, instruction, stamp)
+            plt.close('all')
+            markdown = pdf_generator.generate_markdown_content(result, instruction, stamp, chart)
+            markdown_file = f"relatorio_{stamp}.md"
+            with open(markdown_file, 'w', encoding='utf-8') as f:
+                f.write(markdown)
+            return pdf_generator.convert_markdown_to_pdf(markdown_file, f"relatorio_{stamp}.pdf")
+        converted, elapsed = timed(pdf)
+        if converted:
+            timings['pdf'].append(elapsed)
+        elif 'pdf: conversor indisponível (pandoc/weasyprint)' not in notes:
+            notes.append('pdf: conversor indisponível (pandoc/weasyprint)')
+
+def summarize(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        'samples': len(samples),
+        'median': round(statistics.median(samples), 5),
+        'p95': round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 5),
+        'min': round(ordered[0], 5),
+        'max': round(ordered[-1], 5),
+    }
+
+def run_size(rows, args, questions, pdf_generator):
+    engine = LocalTrinoEngine(rows=rows, days=args.days, skew=args.skew, seed=args.seed, latency=args.latency)
+    set_backend(engine)
+
+    generator = IntelligentReportGenerator()
+    # Mede o pipeline frio: sem rollup, cache de resultados ou artefatos pré-aquecidos
+    generator.query_builder.rollup_store = None
+    generator.result_cache = None
+    html_generator = HTMLReportGenerator()
+    html_generator.visual_generator = generator
+
+    timings = {stage: [] for stage in STAGES}
+    notes = []
+    started_at = time.perf_counter()
+    for _ in range(args.repeat):
+        for instruction in questions:
+            run_question(generator, html_generator, pdf_generator, instruction, timings, notes)
+    total = time.perf_counter() - started_at
+
+    stages = {stage: summarize(samples) for stage, samples in timings.items()}
+    execute = stages['execute']
+    return {
+        'rows': rows,
+        'stages': stages,
+        'questions_per_second': round(args.repeat * len(questions) / total, 3),
+        'rows_scanned_per_second': round(rows / execute['median']) if execute else None,
+        'notes': sorted(set(notes)),
+    }
+
+def compare(current, baseline, threshold):
+    """Lista regressões de mediana acima do limite (ignora diferenças < 5ms)"""
+    regressions = []
+    baseline_sizes = {str(item['rows']): item for item in baseline.get('results', [])}
+    print()
+    print(f"📉 Comparação com baseline ({baseline.get('created_at', '?')})")
+    print(f"{'Linhas':>10} {'Estágio':<9} {'Base (s)':>10} {'Atual (s)':>10} {'Δ':>8}")
+    for item in current['results']:
+        base = baseline_sizes.get(str(item['rows']))
+        if not base:
+            continue
+        for stage in STAGES:
+            now, before = item['stages'].get(stage), base['stages'].get(stage)
+            if not now or not before:
+                continue
+            delta = (now['median'] - before['median']) / before['median'] if before['median'] else 0.0
+            flag = ''
+            if delta > threshold and now['median'] - before['median'] > 0.005:
+                flag = ' ⚠️'
+                regressions.append({'rows': item['rows'], 'stage': stage, 'baseline': before['median'],
+                                    'current': now['median'], 'delta': round(delta, 3)})
+            print(f"{item['rows']:>10,} {stage:<9} {before['median']:>10.4f} {now['median']:>10.4f} {delta:>+7.0%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do Biscoitão sobre o Trino local")
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="Tamanhos da tabela sintética")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições de cada pergunta")
+    parser.add_argument('--days', type=int, default=365, help="Partições diárias")
+    parser.add_argument('--skew', type=float, default=1.1, help="Assimetria de categorias/usuários")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latência simulada do cluster por query (s)")
+    parser.add_argument('--skip-pdf', action='store_true', help="Não mede o estágio pdf")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="JSON de baseline para detectar regressões")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Regressão tolerada na mediana (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    questions = benchmark_questions()
+    pdf_generator = None if args.skip_pdf else load_pdf_generator()
+
+    print("🏁 BENCHMARK - PIPELINE COMPLETO (TRINO LOCAL)")
+    print("=" * 78)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='biscoitao_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)  # gráficos/relatórios gerados ficam fora do projeto
+    try:
+        for rows in sizes:
+            print(f"\n📦 {rows:,} linhas")
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')  # silencia os prints do pipeline
+            try:
+                result = run_size(rows, args, questions, pdf_generator)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            results.append(result)
+            for stage in STAGES:
+                summary = result['stages'][stage]
+                if summary:
+                    print(f"   {stage:<8} mediana {summary['median']:.4f}s  p95 {summary['p95']:.4f}s  (n={summary['samples']})")
+                else:
+                    print(f"   {stage:<8} —")
+            print(f"   ⚡ {result['questions_per_second']} perguntas/s, "
+                  f"{result['rows_scanned_per_second'] or 0:,} linhas/s no execute")
+            for note in result['notes']:
+                print(f"   ℹ️ {note}")
+    finally:
+        os.chdir(cwd)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'sizes': sizes, 'repeat': args.repeat, 'days': args.days, 'skew': args.skew,
+                   'seed': args.seed, 'latency': args.latency, 'questions': questions},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'results': results,
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+    if regressions:
+        print(f"⚠️ {len(regressions)} regressões acima de {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
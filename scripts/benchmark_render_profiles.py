@@ -0,0 +1,112 @@
+"""
+Benchmark - Perfis de renderização (thumbnail, web, print)
+Renderiza os mesmos gráficos do benchmark de formatos em cada perfil de
+render_profiles e mede tempo e tamanho do arquivo, contra o legado (PNG a
+300 dpi para todo destino). Também compara os três perfis saindo de um só
+layout (VisualizationEngine.render com vários destinos) com três
+renderizações separadas.
+
+Uso:
+    python scripts/benchmark_render_profiles.py --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import matplotlib.pyplot as plt
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark_charts import scenarios, INSTRUCTION
+from src.generators.visual_assistant import VisualizationEngine
+from src.generators.render_profiles import PROFILES
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+
+def timed(function, repeat):
+    function()  # aquecimento (fontes, caches)
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started_at)
+    return result, round(statistics.median(timings) * 1000, 2)
+
+def legacy(engine, viz_type, data, filename):
+    """Como todo gráfico era salvo antes dos perfis: PNG a 300 dpi com bbox_inches='tight'"""
+    draw = engine._draw_bar_chart if viz_type == 'bar_chart' else engine._draw_line_chart
+    figure = draw(data.copy(), INSTRUCTION)
+    figure.savefig(filename, dpi=300, bbox_inches='tight')
+    plt.close(figure)
+    return [filename]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de perfis de renderização")
+    parser.add_argument('--repeat', type=int, default=5, help="Renderizações medidas por perfil")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    engine = VisualizationEngine()
+    directory = tempfile.mkdtemp(prefix='biscoitao_profiles_')
+    print("🏁 BENCHMARK - PERFIS DE RENDERIZAÇÃO")
+    print("=" * 78)
+    for profile in PROFILES.values():
+        print(f"   {profile.name:<10} {profile.to_dict()}")
+    results = []
+    for name, (viz_type, data) in scenarios().items():
+        print(f"\n📈 {name}: {viz_type}, {len(data):,} pontos")
+        base = os.path.join(directory, f"{name}")
+        files, baseline_ms = timed(lambda: legacy(engine, viz_type, data, f"{base}_legado.png"), args.repeat)
+        baseline_bytes = os.path.getsize(files[0])
+        print(f"   {'legado':<10} {baseline_ms:9.1f}ms  {baseline_bytes / 1024:8.1f}KB  (PNG 300 dpi)")
+        item = {'scenario': name, 'points': len(data),
+                'legacy': {'render_ms': baseline_ms, 'bytes': baseline_bytes}, 'profiles': {}}
+
+        separate_ms = 0.0
+        for profile in PROFILES.values():
+            if profile.vector:
+                continue  # SVG vem do SvgChartEngine (ver benchmark_charts.py)
+            filename = f"{base}_{profile.name}.{profile.image_format}"
+            files, render_ms = timed(lambda: engine.render(viz_type, data.copy(), INSTRUCTION,
+                                                           [(filename, profile, None)]), args.repeat)
+            size = os.path.getsize(files[0])
+            separate_ms += render_ms
+            item['profiles'][profile.name] = {'format': profile.image_format, 'dpi': profile.dpi,
+                                              'render_ms': render_ms, 'bytes': size,
+                                              'speedup': round(baseline_ms / render_ms, 1),
+                                              'size_ratio': round(baseline_bytes / size, 1)}
+            print(f"   {profile.name:<10} {render_ms:9.1f}ms  {size / 1024:8.1f}KB  "
+                  f"({profile.image_format} {profile.dpi} dpi: {baseline_ms / render_ms:.1f}x mais rápido, "
+                  f"{baseline_bytes / size:.1f}x menor)")
+
+        targets = [(f"{base}_todos_{profile.name}.{profile.image_format}", profile, None)
+                   for profile in PROFILES.values() if not profile.vector]
+        _, shared_ms = timed(lambda: engine.render(viz_type, data.copy(), INSTRUCTION, targets), args.repeat)
+        item['all_profiles'] = {'one_layout_ms': shared_ms, 'separate_ms': round(separate_ms, 2)}
+        print(f"   {len(targets)} perfis num só layout: {shared_ms:.1f}ms (separados: {separate_ms:.1f}ms)")
+        results.append(item)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'repeat': args.repeat, 'profiles': {name: profile.to_dict() for name, profile in PROFILES.items()}},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"render_profiles_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark - Pico de memória com e sem spill de resultados grandes
+Cada variante roda em um processo novo (o pico de RSS, ru_maxrss, não volta
+a cair dentro do processo) sobre o mesmo resultado sintético:
+
+    memoria   caminho antigo do /query: DataFrame + lista com todos os chunks
+              CSV + corpo JSON inteiro (jsonify)
+    spill     spill_if_large -> DataFrame liberado -> CsvChunks preguiçosos
+              serializados em streaming (stream_json), um chunk por vez
+
+Os corpos das duas variantes são conferidos (mesmo hash) antes de comparar.
+
+Uso:
+    python scripts/benchmark_spill.py --rows 500000,2000000
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import resource
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Adiciona raiz do projeto ao path para imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.core.data_processor import DataProcessor
+from src.core.result_spill import spill_if_large, spill_scope
+from src.api.spill import iter_json
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+VARIANTS = ['memoria', 'spill']
+
+def synthetic_result(rows, seed=11):
+    """Resultado no formato de dw.monetization_total (ids, categoria, preço, data)"""
+    rng = np.random.default_rng(seed)
+    categories = np.array([f"categoria_{index:03d}" for index in range(200)], dtype=object)
+    return pd.DataFrame({
+        'ad_id': rng.integers(0, 10**9, rows),
+        'category': categories[rng.integers(0, len(categories), rows)],
+        'price': rng.normal(500, 150, rows).round(2),
+        'quantity': rng.integers(1, 50, rows),
+        'creation_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 730, rows), unit='D'),
+    })
+
+def current_rss_mb():
+    """RSS atual (Linux: /proc; senão o pico até aqui)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB no Linux
+
+def run_variant(variant, rows):
+    """Executa uma variante no processo atual e retorna as medidas"""
+    df = synthetic_result(rows)
+    loaded = current_rss_mb()
+    digest = hashlib.sha1()
+    size = 0
+    started_at = time.perf_counter()
+    if variant == 'memoria':
+        processed = DataProcessor().process(df, "benchmark")
+        body = json.dumps({'result': processed, 'summary': float(df['price'].sum())},
+                          ensure_ascii=False).encode('utf-8')
+        digest.update(body)
+        size = len(body)
+    else:
+        with spill_scope():
+            result = spill_if_large(df, max_rows=0)
+            del df  # a partir daqui só as páginas do arquivo lidas pelos chunks
+            processed = DataProcessor().process(result, "benchmark")
+            output = {'result': processed, 'summary': float(result['price'].sum())}
+            for piece in iter_json(output):
+                data = piece.encode('utf-8')
+                digest.update(data)
+                size += len(data)
+    return {
+        'variant': variant,
+        'rows': rows,
+        'seconds': round(time.perf_counter() - started_at, 3),
+        'loaded_rss_mb': round(loaded, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'body_mb': round(size / 1e6, 1),
+        'body_sha1': digest.hexdigest(),
+    }
+
+def measure(variant, rows):
+    """Roda a variante em um processo novo (pico de RSS isolado)"""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', variant, '--rows', str(rows)],
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de pico de memória do spill de resultados")
+    parser.add_argument('--rows', default='500000,2000000', help="Tamanhos do resultado (linhas)")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--worker', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_variant(args.worker, int(args.rows))))
+        return
+
+    sizes = [int(size) for size in args.rows.split(',') if size]
+    print("🏁 BENCHMARK - SPILL DE RESULTADOS GRANDES (PICO DE RSS)")
+    print("=" * 78)
+    results = []
+    for rows in sizes:
+        print(f"\n📦 {rows:,} linhas")
+        measured = {variant: measure(variant, rows) for variant in VARIANTS}
+        assert measured['memoria']['body_sha1'] == measured['spill']['body_sha1'], "corpos diferentes"
+        baseline = measured['memoria']
+        for variant, item in measured.items():
+            extra = item['peak_rss_mb'] - item['loaded_rss_mb']
+            print(f"   {variant:<8} pico {item['peak_rss_mb']:8.1f}MB  (+{extra:7.1f}MB sobre o DataFrame)  "
+                  f"{item['seconds']:6.2f}s  corpo {item['body_mb']:.1f}MB")
+        reduction = 1 - measured['spill']['peak_rss_mb'] / baseline['peak_rss_mb']
+        print(f"   ➡️  pico {reduction * 100:.0f}% menor com spill")
+        results.append({'rows': rows, 'variants': measured, 'peak_reduction_pct': round(reduction * 100, 1)})
+
+    report = {'created_at': datetime.now().isoformat(), 'config': {'rows': sizes}, 'results': results}
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"spill_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark - Tempo até o primeiro byte útil das respostas progressivas (SSE)
+Sobe a Visual API (backend local, um worker com threads) e abre N streams
+simultâneas em /analyze/stream, medindo quando cada evento chega ao cliente
+(intent, estimate, table, insights, chart, done). Depois dispara as mesmas
+perguntas, com a mesma concorrência, no /analyze bloqueante: o analista só
+vê algo quando o pipeline inteiro termina.
+
+Também registra o RSS e o número de threads do servidor com todas as streams
+abertas (custo de segurar as conexões).
+
+Uso:
+    python scripts/benchmark_sse.py --streams 1,20,50 --latency 0.5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import free_port, wait_ready, start_server, recent_months, percentile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+EVENTS = ['intent', 'estimate', 'table', 'insights', 'chart', 'done', 'error']
+
+def questions():
+    items = ["Qual a tendência do preço médio nos últimos 6 meses?", "Compare as categorias por faturamento"]
+    for month in recent_months(3):
+        items.append(f"Evolução do preço médio até {month}")
+        items.append(f"Compare as categorias por preço em {month}")
+    return items
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+def server_usage(pid):
+    """RSS (MB) e threads do servidor: processo mestre e workers do pré-fork (Linux)"""
+    usage = {'rss_mb': 0.0, 'threads': 0}
+    for process in [pid] + _children(pid):
+        try:
+            with open(f'/proc/{process}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        usage['rss_mb'] += int(line.split()[1]) / 1024
+                    elif line.startswith('Threads:'):
+                        usage['threads'] += int(line.split()[1])
+        except OSError:
+            pass
+    usage['rss_mb'] = round(usage['rss_mb'], 1)
+    return usage
+
+def read_stream(base_url, question, opened):
+    """Tempos de chegada de cada evento de uma stream (a partir do envio da requisição)"""
+    started_at = time.perf_counter()
+    arrivals = {}
+    with requests.get(base_url + '/analyze/stream', params={'q': question}, stream=True, timeout=300) as response:
+        opened.release()
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith(b'event: '):
+                name = line[len(b'event: '):].decode('utf-8')
+                arrivals.setdefault(name, time.perf_counter() - started_at)
+    arrivals.setdefault('closed', time.perf_counter() - started_at)
+    return arrivals
+
+def run_streams(base_url, plan, count, pid):
+    """count streams simultâneas; mede o servidor quando todas estão abertas"""
+    results, errors = [], []
+    opened = threading.Semaphore(0)
+    lock = threading.Lock()
+
+    def client(index):
+        try:
+            arrivals = read_stream(base_url, plan[index % len(plan)], opened)
+            with lock:
+                results.append(arrivals)
+        except requests.RequestException as e:
+            opened.release()
+            with lock:
+                errors.append(type(e).__name__)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        opened.acquire()
+    usage = server_usage(pid)
+    for thread in threads:
+        thread.join()
+    return results, errors, usage
+
+def run_blocking(base_url, plan, count):
+    """Mesmas perguntas no /analyze: só há resposta com o pipeline completo"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client(index):
+        started_at = time.perf_counter()
+        try:
+            response = requests.post(base_url + '/analyze', json={'query': plan[index % len(plan)]}, timeout=300)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        with lock:
+            (latencies if ok else errors).append(time.perf_counter() - started_at)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+def describe(values):
+    if not values:
+        return None
+    return {'p50': round(statistics.median(values), 4), 'p95': round(percentile(values, 0.95), 4),
+            'count': len(values)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tempo até o primeiro byte útil via SSE")
+    parser.add_argument('--streams', default='1,20,50', help="Números de streams simultâneas")
+    parser.add_argument('--latency', type=float, default=0.5, help="Latência simulada por query no backend local")
+    parser.add_argument('--rows', type=int, default=200000, help="Linhas da tabela sintética local")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.streams.split(',') if count]
+    plan = questions()
+    workdir = tempfile.mkdtemp(prefix='biscoitao_sse_')
+    env = dict(os.environ,
+               MPLBACKEND='Agg',
+               BISCOITAO_QUERY_BACKEND='local',
+               BISCOITAO_LOCAL_LATENCY=str(args.latency),
+               BISCOITAO_LOCAL_ROWS=str(args.rows),
+               BISCOITAO_RESULT_CACHE='off',  # toda pergunta vai ao backend
+               BISCOITAO_APPROX_SAMPLE_PERCENT='10',
+               BISCOITAO_CONVERSATION_DB=os.path.join(workdir, 'conversations.sqlite'),
+               BISCOITAO_QUERY_LOG=os.path.join(workdir, 'questions.jsonl'),
+               BISCOITAO_SLOW_QUERY_LOG=os.path.join(workdir, 'slow_queries.jsonl'),
+               BISCOITAO_ROLLUP_DB=os.path.join(workdir, 'rollup.duckdb'),
+               BISCOITAO_PREWARM_DIR=os.path.join(workdir, 'prewarm'))
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    print("🏁 BENCHMARK - RESPOSTAS PROGRESSIVAS (SSE)")
+    print("=" * 78)
+    print(f"Latência simulada por query: {args.latency:.2f}s | {args.rows:,} linhas | logs em {workdir}")
+    process, log = start_server('visual_api', 1, 64, 'builtin', port, workdir, env)
+    results = []
+    try:
+        wait_ready(base_url, '/', process)
+        read_stream(base_url, plan[0], threading.Semaphore(0))  # aquece DuckDB e matplotlib
+        idle = server_usage(process.pid)
+        print(f"   servidor ocioso: {idle.get('rss_mb')}MB, {idle.get('threads')} threads")
+        for count in counts:
+            arrivals, errors, usage = run_streams(base_url, plan, count, process.pid)
+            blocking, blocking_errors = run_blocking(base_url, plan, count)
+            events = {name: describe([item[name] for item in arrivals if name in item])
+                      for name in EVENTS + ['closed']}
+            events = {name: value for name, value in events.items() if value}
+            item = {'streams': count, 'errors': len(errors), 'events': events, 'server_with_streams': usage,
+                    'blocking': describe(blocking), 'blocking_errors': len(blocking_errors)}
+            results.append(item)
+
+            print(f"\n📡 {count} stream(s) simultânea(s) - servidor com as streams abertas: "
+                  f"{usage.get('rss_mb')}MB, {usage.get('threads')} threads")
+            for name, value in events.items():
+                print(f"   {name:<9} p50 {value['p50'] * 1000:7.0f}ms  p95 {value['p95'] * 1000:7.0f}ms  "
+                      f"({value['count']} streams)")
+            if item['blocking']:
+                print(f"   /analyze  p50 {item['blocking']['p50'] * 1000:7.0f}ms  "
+                      f"p95 {item['blocking']['p95'] * 1000:7.0f}ms  (bloqueante)")
+                if 'intent' in events:
+                    print(f"   ➡️  primeiro byte útil {item['blocking']['p50'] / events['intent']['p50']:.0f}x "
+                          f"mais cedo (p50)")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'streams': counts, 'latency': args.latency, 'rows': args.rows, 'cpus': os.cpu_count()},
+        'idle_server': idle,
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"sse_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark - Fallback serial vs corrida paralela de estratégias
+Compara a latência das duas abordagens usando um Trino falso com latência e
+falhas injetadas por estratégia (não precisa de acesso ao datalake)
+"""
+
+import os
+import sys
+import threading
+import time
+import statistics
+import pandas as pd
+
+# Adiciona raiz do projeto ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.strategy_racer import StrategyRacer
+
+class FakeTrinoQuery:
+    """Handle falso com a mesma interface de TrinoQuery (result/cancel)"""
+
+    def __init__(self, fake, sql):
+        self.fake = fake
+        self.sql = sql
+        self.cancelled = threading.Event()
+        self.latency, self.fails, self.rows = fake.profiles[sql]
+
+    def result(self):
+        # Dorme em fatias curtas para reagir rápido a cancelamentos
+        finish_at = time.monotonic() + self.latency
+        while time.monotonic() < finish_at:
+            if self.cancelled.wait(0.005):
+                raise RuntimeError("Query cancelada")
+        if self.fails:
+            raise RuntimeError("TABLE_NOT_FOUND (falha injetada)")
+        return pd.DataFrame({'value': range(self.rows)})
+
+    def cancel(self):
+        if not self.cancelled.is_set():
+            self.cancelled.set()
+            with self.fake.lock:
+                self.fake.cancelled += 1
+
+class FakeTrino:
+    """Trino falso: cada SQL tem (latência em s, falha?, linhas retornadas)"""
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.lock = threading.Lock()
+        self.cancelled = 0
+
+    def submit(self, sql):
+        return FakeTrinoQuery(self, sql)
+
+def run_serial(fake, queries):
+    """Mesmo algoritmo do execute_with_adaptive_fallback original"""
+    for strategy, sql in queries:
+        try:
+            result = fake.submit(sql).result()
+            if not result.empty:
+                return strategy
+        except Exception:
+            continue
+    return None
+
+def run_race(fake, queries, max_parallel, deadline):
+    racer = StrategyRacer(submit=fake.submit, max_parallel=max_parallel, deadline=deadline)
+    _, strategy, _ = racer.race(queries)
+    return strategy
+
+SCENARIOS = {
+    # nome: [(estratégia, latência, falha, linhas)] em ordem de prioridade
+    'primeira_ok': [('advanced_statistical', 0.40, False, 12), ('temporal_comparison', 0.30, False, 12),
+                    ('simple_aggregation', 0.20, False, 1), ('exploration', 0.05, False, 5)],
+    'primeira_falha': [('advanced_statistical', 0.40, True, 0), ('temporal_comparison', 0.30, False, 12),
+                       ('simple_aggregation', 0.20, False, 1), ('exploration', 0.05, False, 5)],
+    'duas_falham': [('advanced_statistical', 0.40, True, 0), ('temporal_comparison', 0.35, True, 0),
+                    ('simple_aggregation', 0.20, False, 1), ('exploration', 0.05, False, 5)],
+    'perdedoras_lentas': [('advanced_statistical', 0.20, False, 12), ('temporal_comparison', 1.00, False, 12),
+                          ('simple_aggregation', 1.50, False, 1), ('exploration', 0.05, False, 5)],
+    'vazia_e_lenta': [('advanced_statistical', 0.60, False, 0), ('temporal_comparison', 0.50, False, 0),
+                      ('simple_aggregation', 0.30, True, 0), ('exploration', 0.05, False, 5)],
+}
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    max_parallel = 3
+
+    print("🏁 BENCHMARK - FALLBACK SERIAL vs CORRIDA PARALELA")
+    print("=" * 78)
+    print(f"{'Cenário':<18} {'Serial (s)':>11} {'Corrida (s)':>12} {'Ganho':>8} {'Cancel.':>8}  Vencedora")
+    print("-" * 78)
+
+    for name, spec in SCENARIOS.items():
+        profiles = {f"-- {strategy}": (latency, fails, rows) for strategy, latency, fails, rows in spec}
+        queries = [(strategy, f"-- {strategy}") for strategy, *_ in spec]
+
+        serial_times, race_times = [], []
+        fake = FakeTrino(profiles)
+        winners = set()
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            serial_winner = run_serial(fake, queries)
+            serial_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            race_winner = run_race(fake, queries, max_parallel, deadline=10)
+            race_times.append(time.perf_counter() - start)
+
+            # A corrida precisa escolher a mesma estratégia que o fallback serial
+            assert race_winner == serial_winner, (name, race_winner, serial_winner)
+            winners.add(race_winner)
+
+        serial = statistics.median(serial_times)
+        race = statistics.median(race_times)
+        print(f"{name:<18} {serial:>11.3f} {race:>12.3f} {serial / race:>7.1f}x {fake.cancelled:>8}  {', '.join(winners)}")
+
+    print("=" * 78)
+
+if __name__ == "__main__":
+    main()
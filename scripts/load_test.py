@@ -0,0 +1,216 @@
+"""
+Load test - Vazão do servidor pré-fork por número de workers
+Sobe src/api/server.py com 1, 2, 4... workers (backend local por padrão),
+aquece os workers e dispara requisições concorrentes por alguns segundos,
+medindo requisições/s, latência p50/p95 e erros. Cada rodada usa um diretório
+temporário próprio para caches e gráficos, compartilhado pelos seus workers.
+
+--latency simula a espera do Trino por query (BISCOITAO_LOCAL_LATENCY) e
+--no-result-cache obriga toda requisição a consultar o backend: é o cenário
+em que workers síncronos mais ganham com o pré-fork.
+
+Uso:
+    python scripts/load_test.py --workers 1,2,4 --duration 20
+    python scripts/load_test.py --scenario analyze --latency 0.3 --no-result-cache
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(PROJECT_ROOT, 'src', 'api', 'server.py')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output', 'benchmarks')
+
+def recent_months(count=6):
+    """Rótulos jan-26, fev-26... dentro do período dos dados sintéticos"""
+    months = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+    labels = []
+    current = datetime.now().replace(day=1)
+    for _ in range(count):
+        current = (current - timedelta(days=1)).replace(day=1)
+        labels.append(f"{months[current.month - 1]}-{current.year % 100:02d}")
+    return labels
+
+def analyze_requests():
+    questions = []
+    for month in recent_months():
+        questions.append(f"Média de preço em {month}")
+        questions.append(f"Compare as categorias por preço em {month}")
+    return [('POST', '/analyze', {'query': question}) for question in questions]
+
+def batch_requests():
+    months = recent_months()
+    return [('POST', '/api/batch', {'questions': [f"Média de preço em {month}" for month in months[:3]] +
+                                                 [f"Compare as categorias por preço em {month}" for month in months[3:]]})]
+
+def query_requests():
+    return [('POST', '/query', {'question': 'Qual a soma das vendas?'})]
+
+# cenário -> (app servido, caminho de prontidão, requisições em rodízio)
+SCENARIOS = {
+    'analyze': ('visual_api', '/', analyze_requests),
+    'batch': ('flask_server', '/api/health', batch_requests),
+    'query': ('app', '/', query_requests),  # sem GET: 404 já indica que o worker responde
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(app_name, workers, threads, engine, port, workdir, env):
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, app_name, '--workers', str(workers), '--threads', str(threads),
+         '--engine', engine, '--host', '127.0.0.1', '--port', str(port)],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+def wait_ready(base_url, path, process, timeout=180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Servidor saiu com código {process.returncode}")
+        try:
+            if requests.get(base_url + path, timeout=5).status_code < 500:
+                return
+        except (OSError, requests.RequestException):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Servidor não ficou pronto em {timeout}s")
+
+def run_load(base_url, plan, concurrency, duration):
+    """Clientes em laço fechado: cada um manda a próxima requisição ao receber a resposta"""
+    stop_at = time.monotonic() + duration
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client(offset):
+        session = requests.Session()
+        index = offset
+        while time.monotonic() < stop_at:
+            method, path, payload = plan[index % len(plan)]
+            index += 1
+            started_at = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=payload, timeout=120)
+                ok = response.status_code < 500
+                status = response.status_code
+            except requests.RequestException as e:
+                ok, status = False, type(e).__name__
+            elapsed = time.perf_counter() - started_at
+            with lock:
+                (latencies if ok else errors).append(elapsed if ok else status)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    started_at = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started_at
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test do servidor pré-fork do Biscoitão")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='analyze')
+    parser.add_argument('--workers', default='1,2,4', help="Números de workers a comparar")
+    parser.add_argument('--threads', type=int, default=1, help="Threads por worker")
+    parser.add_argument('--concurrency', type=int, help="Clientes simultâneos (padrão: 2x o maior número de workers)")
+    parser.add_argument('--duration', type=float, default=20.0, help="Segundos medidos por rodada")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Segundos de aquecimento (não medidos)")
+    parser.add_argument('--engine', choices=['auto', 'gunicorn', 'builtin'], default='auto')
+    parser.add_argument('--backend', default='local', help="BISCOITAO_QUERY_BACKEND dos workers")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latência simulada por query no backend local")
+    parser.add_argument('--no-result-cache', action='store_true', help="Desliga o cache de resultados")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(',') if count]
+    concurrency = args.concurrency or 2 * max(worker_counts)
+    app_name, ready_path, build_plan = SCENARIOS[args.scenario]
+    plan = build_plan()
+
+    print("🏁 LOAD TEST - SERVIDOR PRÉ-FORK")
+    print("=" * 78)
+    print(f"Cenário: {args.scenario} ({app_name}) | clientes: {concurrency} | {args.duration:.0f}s por rodada | "
+          f"CPUs: {os.cpu_count()}")
+
+    results = []
+    for workers in worker_counts:
+        workdir = tempfile.mkdtemp(prefix=f'biscoitao_load_{workers}w_')
+        env = dict(os.environ,
+                   BISCOITAO_QUERY_BACKEND=args.backend,
+                   BISCOITAO_LOCAL_LATENCY=str(args.latency),
+                   BISCOITAO_RESULT_CACHE='off' if args.no_result_cache else os.path.join(workdir, 'results.sqlite'),
+                   BISCOITAO_CONVERSATION_DB=os.path.join(workdir, 'conversations.sqlite'),
+                   BISCOITAO_QUERY_LOG=os.path.join(workdir, 'questions.jsonl'),
+                   BISCOITAO_SLOW_QUERY_LOG=os.path.join(workdir, 'slow_queries.jsonl'),
+                   BISCOITAO_ROLLUP_DB=os.path.join(workdir, 'rollup.duckdb'),
+                   BISCOITAO_PREWARM_DIR=os.path.join(workdir, 'prewarm'))
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"\n👷 {workers} worker(s) - logs em {workdir}")
+        process, log = start_server(app_name, workers, args.threads, args.engine, port, workdir, env)
+        try:
+            started_at = time.monotonic()
+            wait_ready(base_url, ready_path, process)
+            print(f"   pronto em {time.monotonic() - started_at:.1f}s")
+            if args.warmup:
+                run_load(base_url, plan, concurrency, args.warmup)
+            latencies, errors, elapsed = run_load(base_url, plan, concurrency, args.duration)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+        item = {
+            'workers': workers,
+            'requests': len(latencies),
+            'errors': len(errors),
+            'throughput': round(len(latencies) / elapsed, 2),
+            'p50_seconds': round(statistics.median(latencies), 4) if latencies else None,
+            'p95_seconds': round(percentile(latencies, 0.95), 4) if latencies else None,
+        }
+        baseline = results[0]['throughput'] if results else item['throughput']
+        item['speedup'] = round(item['throughput'] / baseline, 2) if baseline else None
+        results.append(item)
+        print(f"   {item['throughput']:8.1f} req/s  p50 {(item['p50_seconds'] or 0) * 1000:7.0f}ms  "
+              f"p95 {(item['p95_seconds'] or 0) * 1000:7.0f}ms  erros {item['errors']}  speedup {item['speedup']}x")
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'config': {'scenario': args.scenario, 'app': app_name, 'threads': args.threads,
+                   'concurrency': concurrency, 'duration': args.duration, 'warmup': args.warmup,
+                   'backend': args.backend, 'latency': args.latency,
+                   'result_cache': not args.no_result_cache, 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 78)
+    print(f"💾 Resultados: {output}")
+
+if __name__ == "__main__":
+    main()
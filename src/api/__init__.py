@@ -3,6 +3,11 @@ Biscoitão API Module
 APIs e serviços web
 """
 
-from .flask_app import create_app
+from .deadlines import install_request_deadlines
+from .tracing import install_request_tracing
+from .metrics import install_metrics_endpoint
+from .health import run_health_checks
+from .compression import install_response_compression
 
-__all__ = ['create_app']
+__all__ = ['install_request_deadlines', 'install_request_tracing', 'install_metrics_endpoint', 'run_health_checks',
+           'install_response_compression']
@@ -0,0 +1,290 @@
+"""
+Servidor assíncrono (ASGI) para as perguntas do Google Sheets
+Mesma análise do /analyze da Visual API, mas sobre o AsyncReportPipeline:
+cada pergunta pendente (esperando o Trino ou o polling do Toqan) é só uma
+corrotina, então poucos workers seguram centenas de requisições abertas.
+Aplicação ASGI pura (sem framework); rode com qualquer servidor ASGI:
+
+    uvicorn src.api.asgi:app --workers 4 --port 5002
+
+Endpoints:
+    POST /api/analyze  {"query": "...", "table": "...", "charts": true, "toqan": false, "exact": false,
+                        "chart_format": "png|webp|svg|text", "render_profile": "thumbnail|web|print"}
+    GET  /api/analyze/stream?q=...  (ou POST com o mesmo JSON) - resposta progressiva (SSE)
+    GET  /api/health
+    GET  /metrics
+"""
+
+import os
+import sys
+import json
+import asyncio
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.async_pipeline import AsyncReportPipeline
+from src.core.deadline import deadline_scope, DeadlineExceeded, DEFAULT_REQUEST_TIMEOUT
+from src.core.metrics import REGISTRY, render_metrics
+from src.core.progressive import ProgressiveAnswer, aiter_events
+from src.core.tracing import start_span, end_span, trace_summary
+from src.integrations.toqan_api import AsyncToqanAPIClient
+from src.api.health import run_health_checks
+from src.api.deadlines import TIMEOUT_HEADER, MAX_REQUEST_TIMEOUT
+from src.api.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from src.api.tracing import TRACE_HEADER, _server_timing
+from src.api.sse import SSE_HEADERS, asse_stream
+from src.generators.svg_charts import resolve_chart_format
+from src.generators.render_profiles import get_profile
+
+MAX_BODY_BYTES = 1024 * 1024
+SHEETS_RENDER_PROFILE = 'thumbnail'
+
+PENDING_REQUESTS = REGISTRY.gauge(
+    'biscoitao_async_pending_requests', 'Requisições aguardando no servidor assíncrono')
+
+def _json_response(payload, status=200, headers=None):
+    return status, json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'), \
+        [('content-type', 'application/json; charset=utf-8')] + list(headers or [])
+
+def _request_timeout(headers, payload):
+    value = headers.get(TIMEOUT_HEADER.lower()) or (payload or {}).get('timeout')
+    try:
+        timeout = float(value) if value is not None else DEFAULT_REQUEST_TIMEOUT
+    except (TypeError, ValueError):
+        timeout = DEFAULT_REQUEST_TIMEOUT
+    return min(max(timeout, 1.0), MAX_REQUEST_TIMEOUT)
+
+def _flag(payload, name, default):
+    # JSON traz booleanos; a query string, texto
+    value = payload.get(name, default)
+    return value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'sim', 'yes')
+
+def _analysis_payload(user_query, result):
+    data = result['data']
+    payload = {
+        'success': True,
+        'query': user_query,
+        'analysis': {
+            'query_sql': result['query'],
+            'visualization_type': result['viz_type'],
+            'data_points': len(data),
+            'insights': result['insights'],
+            'conversational_response': result['response']
+        },
+        'chart': {
+            'format': result.get('chart_format'),
+            'profile': result.get('render_profile'),
+            'filename': result['chart_file'],
+            'download_url': f"/chart/{result['chart_file']}" if result['chart_file'] else None,
+            'text': result.get('chart_text')
+        },
+        'data_sample': data.head(10).to_dict('records'),
+        'timestamp': datetime.now().isoformat()
+    }
+    if result.get('approximation'):
+        payload['analysis']['approximation'] = result['approximation']
+    if 'toqan' in result:
+        payload['toqan'] = result['toqan']
+    return payload
+
+class BiscoitaoASGI:
+    """Aplicação ASGI; o pipeline é criado no startup de cada worker"""
+
+    def __init__(self):
+        self.pipeline = None
+        self.routes = {
+            ('POST', '/api/analyze'): self.analyze,
+            ('GET', '/api/health'): self.health,
+        }
+        self.streams = {
+            ('GET', '/api/analyze/stream'): self.analyze_stream,
+            ('POST', '/api/analyze/stream'): self.analyze_stream,
+        }
+
+    def _get_pipeline(self):
+        if self.pipeline is None:
+            self.pipeline = AsyncReportPipeline(toqan=AsyncToqanAPIClient())
+        return self.pipeline
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._get_pipeline()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.pipeline is not None:
+                    await self.pipeline.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                raise ValueError("Corpo da requisição muito grande")
+            if not message.get('more_body'):
+                return body
+
+    async def _http(self, scope, receive, send):
+        method, path = scope['method'], scope['path']
+        if (method, path) == ('GET', '/metrics'):
+            # Scrapes do Prometheus não viram traces
+            await self._send(send, 200, render_metrics().encode('utf-8'), [('content-type', METRICS_CONTENT_TYPE)])
+            return
+
+        handler = self.routes.get((method, path))
+        stream = self.streams.get((method, path))
+        root, token = start_span('http.request', method=method, path=path,
+                                 endpoint=path if handler or stream else 'unmatched')
+        PENDING_REQUESTS.inc()
+        error = None
+        try:
+            if stream is not None:
+                await self._stream(stream, scope, receive, send, root)
+                return
+            if handler is None:
+                status, body, headers = _json_response({'error': 'Endpoint não encontrado'}, 404)
+            else:
+                headers = {key.decode('latin-1').lower(): value.decode('latin-1')
+                           for key, value in scope.get('headers', [])}
+                try:
+                    raw = await self._read_body(receive)
+                    payload = json.loads(raw) if raw else None
+                except ValueError as e:
+                    status, body, headers = _json_response({'success': False, 'error': f'JSON inválido: {e}'}, 400)
+                else:
+                    status, body, headers = await self._dispatch(handler, headers, payload)
+            root.set(status_code=status)
+            summary = trace_summary()
+            headers = headers + [(TRACE_HEADER.lower(), root.trace.trace_id),
+                                 ('server-timing', _server_timing(summary))]
+            await self._send(send, status, body, headers)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            PENDING_REQUESTS.dec()
+            end_span(root, token, error)
+
+    async def _dispatch(self, handler, headers, payload):
+        loop = asyncio.get_running_loop()
+        with deadline_scope(_request_timeout(headers, payload), request_id=headers.get('x-request-id'),
+                            loop=loop) as deadline:
+            try:
+                return await handler(payload)
+            except DeadlineExceeded as e:
+                print(f"⏰ Requisição abandonada em '{e.stage}'")
+                return _json_response({
+                    'success': False,
+                    'error': 'Prazo da requisição esgotado',
+                    'stage': e.stage,
+                    'timestamp': datetime.now().isoformat()
+                }, 504)
+            except Exception as e:
+                print(f"❌ Erro na análise: {e}")
+                return _json_response({'success': False, 'error': str(e),
+                                       'timestamp': datetime.now().isoformat()}, 500)
+            finally:
+                deadline.cancel()
+
+    async def _stream(self, handler, scope, receive, send, root):
+        """Resposta em streaming: o handler devolve uma resposta comum (erro) ou um iterador assíncrono de bytes"""
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1')
+                   for key, value in scope.get('headers', [])}
+        try:
+            raw = await self._read_body(receive)
+            payload = json.loads(raw) if raw else {}
+        except ValueError as e:
+            root.set(status_code=400)
+            await self._send(send, *_json_response({'success': False, 'error': f'JSON inválido: {e}'}, 400))
+            return
+        payload = {**dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))), **(payload or {})}
+
+        loop = asyncio.get_running_loop()
+        with deadline_scope(_request_timeout(headers, payload), request_id=headers.get('x-request-id'),
+                            loop=loop) as deadline:
+            try:
+                result = handler(payload)
+                if isinstance(result, tuple):
+                    root.set(status_code=result[0])
+                    await self._send(send, *result)
+                    return
+                root.set(status_code=200)
+                await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                    (key.encode('latin-1'), value.encode('latin-1'))
+                    for key, value in [('content-type', 'text/event-stream; charset=utf-8'), *SSE_HEADERS,
+                                       (TRACE_HEADER.lower(), root.trace.trace_id)]]})
+                async for chunk in result:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                deadline.cancel()
+
+    async def _send(self, send, status, body, headers):
+        headers = [(key.encode('latin-1'), value.encode('latin-1')) for key, value in headers]
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def analyze(self, payload):
+        if not payload or 'query' not in payload:
+            return _json_response({
+                'error': 'Campo "query" é obrigatório',
+                'example': {'query': 'Mostre a evolução do preço médio'}
+            }, 400)
+
+        user_query = payload['query']
+        print(f"📝 Processando (async): {user_query}")
+        result = await self._get_pipeline().generate(
+            user_query, payload.get('table', 'dw.monetization_total'),
+            render_chart=bool(payload.get('charts', True)), ask_toqan=bool(payload.get('toqan', False)),
+            exact=bool(payload.get('exact', False)), chart_format=payload.get('chart_format'),
+            # Respostas do Sheets: a prévia na célula pede o perfil mais barato
+            render_profile=payload.get('render_profile', SHEETS_RENDER_PROFILE))
+
+        if not result:
+            return _json_response({
+                'success': False,
+                'error': 'Não foi possível gerar análise para esta consulta',
+                'query': user_query
+            }, 400)
+        response = _analysis_payload(user_query, result)
+        response['trace'] = result.get('trace')
+        return _json_response(response)
+
+    def analyze_stream(self, payload):
+        user_query = payload.get('query') or payload.get('q')
+        if not user_query:
+            return _json_response({
+                'error': 'Campo "query" (ou parâmetro "q") é obrigatório',
+                'example': '/api/analyze/stream?q=Qual a tendência do preço médio nos últimos 6 meses?'
+            }, 400)
+
+        print(f"📡 Resposta progressiva (async): {user_query}")
+        pipeline = self._get_pipeline()
+        profile = get_profile(payload.get('render_profile', SHEETS_RENDER_PROFILE))
+        answer = ProgressiveAnswer(pipeline.generator, user_query, payload.get('table', 'dw.monetization_total'),
+                                   exact=_flag(payload, 'exact', False), render_chart=_flag(payload, 'charts', True),
+                                   io_executor=pipeline.io_executor, cpu_executor=pipeline.cpu_executor,
+                                   chart_format=resolve_chart_format(payload.get('chart_format'), profile.image_format),
+                                   render_profile=profile.name)
+        return asse_stream(aiter_events(answer))
+
+    async def health(self, payload):
+        # Os checks são bloqueantes (SELECT 1, SQLite, DuckDB): fora do event loop
+        rollup_store = self.pipeline.generator.query_builder.rollup_store if self.pipeline is not None else None
+        body, status = await asyncio.to_thread(run_health_checks, rollup_store=rollup_store)
+        return _json_response(body, status)
+
+app = BiscoitaoASGI()
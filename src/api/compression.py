@@ -0,0 +1,189 @@
+"""
+Compressão e ETags para os servidores Flask
+Comprime respostas JSON/texto (e downloads de relatórios em texto) com
+Brotli ou gzip conforme o Accept-Encoding, e responde 304 Not Modified
+quando o If-None-Match do cliente ainda corresponde ao ETag da resposta. Os
+endpoints derivam o ETag da chave do cache de resultados (SQL + versão dos
+dados), o que permite responder 304 antes de executar a análise.
+
+Só GET/HEAD são condicionais: 304 para outros métodos violaria a RFC 9110
+(seria 412), então POSTs ignoram o If-None-Match. ETag forte só para corpos
+idênticos byte a byte (um por codificação); respostas equivalentes mas não
+idênticas (ex: com timestamp) usam ETag fraco, comparado sem a codificação.
+"""
+
+import os
+import sys
+import zlib
+import gzip
+import time
+import hashlib
+from flask import request, Response
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional: sem ele, apenas gzip
+    brotli = None
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.metrics import REGISTRY
+
+MIN_COMPRESS_BYTES = int(os.getenv('BISCOITAO_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('BISCOITAO_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BISCOITAO_BROTLI_QUALITY', '5'))
+
+# PNG e PDF já são comprimidos: recomprimir só gasta CPU
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'image/svg+xml', 'application/javascript')
+
+ENCODERS = {'gzip': lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL)}
+if brotli is not None:
+    ENCODERS['br'] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+PREFERRED_ENCODINGS = ['br', 'gzip']
+
+def _stream_compressor(encoding):
+    """(process, finish) de um compressor incremental para respostas em streaming"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: formato gzip
+    return compressor.compress, compressor.flush
+
+RESPONSE_BYTES = REGISTRY.counter(
+    'biscoitao_http_response_bytes_total', 'Bytes de corpo das respostas (stage = original|sent)', ['encoding', 'stage'])
+COMPRESSION_TIME = REGISTRY.histogram(
+    'biscoitao_http_compression_seconds', 'Tempo gasto comprimindo respostas', ['encoding'],
+    (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+# Métodos em que If-None-Match pode virar 304
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+NOT_MODIFIED = REGISTRY.counter(
+    'biscoitao_http_not_modified_total', 'Respostas 304 servidas a partir do ETag', ['endpoint'])
+
+def strong_etag(*parts):
+    """ETag forte a partir de componentes estáveis (ex: chave do cache + versão dos dados)"""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return digest[:32]
+
+def negotiate_encoding():
+    """Melhor codificação aceita pelo cliente entre as disponíveis (None = identity)"""
+    accepted = request.accept_encodings
+    candidates = [name for name in PREFERRED_ENCODINGS if name in ENCODERS]
+    best = accepted.best_match(candidates) if candidates else None
+    return best if best and accepted[best] > 0 else None
+
+def _variant(etag, encoding):
+    # Cada codificação é uma representação diferente: ETag forte distinto
+    return f"{etag}-{encoding}" if encoding else etag
+
+def _matches(etag, weak, encoding=None):
+    if weak:
+        return request.if_none_match.contains_weak(etag)
+    return request.if_none_match.contains(_variant(etag, encoding))
+
+def not_modified(etag, weak=False):
+    """Indica se o cliente já tem a representação atual (qualquer codificação; só em GET/HEAD)"""
+    if not etag or request.method not in CONDITIONAL_METHODS or not request.if_none_match:
+        return False
+    return any(_matches(etag, weak, encoding) for encoding in [None, *ENCODERS])
+
+def not_modified_response(etag, weak=False):
+    """304 para um ETag verificado antes de executar a análise"""
+    encoding = negotiate_encoding()
+    response = Response(status=304)
+    response.set_etag(etag if weak else _variant(etag, encoding), weak=weak)
+    response.vary.add('Accept-Encoding')
+    NOT_MODIFIED.inc(endpoint=request.url_rule.rule if request.url_rule else 'unmatched')
+    return response
+
+def with_etag(response, etag, weak=False):
+    """Anexa o ETag à resposta gerada pela view (a compressão acrescenta a codificação ao forte)"""
+    response.set_etag(etag, weak=weak)
+    return response
+
+def _compress_stream(chunks, encoding):
+    """Comprime um corpo em streaming pedaço a pedaço (sem juntar o corpo inteiro)"""
+    process, finish = _stream_compressor(encoding)
+    original = sent = 0
+    elapsed = 0.0
+    for chunk in chunks:
+        original += len(chunk)
+        started_at = time.perf_counter()
+        data = process(chunk)
+        elapsed += time.perf_counter() - started_at
+        if data:
+            sent += len(data)
+            yield data
+    data = finish()
+    sent += len(data)
+    yield data
+    COMPRESSION_TIME.observe(elapsed, encoding=encoding)
+    RESPONSE_BYTES.inc(original, encoding=encoding, stage='original')
+    RESPONSE_BYTES.inc(sent, encoding=encoding, stage='sent')
+
+def _compressible(response):
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype == 'text/event-stream':
+        return False  # SSE: cada evento precisa sair na hora, sem esperar o compressor
+    if request.method == 'HEAD' or request.range is not None:
+        return False
+    return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+def install_response_compression(app, min_size=MIN_COMPRESS_BYTES):
+    """
+    Registra compressão e respostas condicionais em uma aplicação Flask.
+
+    Instale antes de install_request_tracing: os hooks after_request rodam em
+    ordem inversa, então a compressão vê o corpo já com o campo 'trace'.
+    """
+
+    @app.after_request
+    def _compress(response):
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.vary.add('Accept-Encoding')
+        if not _compressible(response):
+            return response
+
+        encoding = negotiate_encoding()
+        if etag and response.status_code == 200 and request.method in CONDITIONAL_METHODS:
+            if _matches(etag, weak, encoding):
+                NOT_MODIFIED.inc(endpoint=request.url_rule.rule if request.url_rule else 'unmatched')
+                reply = Response(status=304)
+                reply.set_etag(etag if weak else _variant(etag, encoding), weak=weak)
+                reply.vary.add('Accept-Encoding')
+                return reply
+
+        if response.is_streamed and not response.direct_passthrough:
+            # JSON em streaming (resultados grandes): comprime sem materializar o corpo
+            response.vary.add('Accept-Encoding')
+            if encoding is not None:
+                response.response = _compress_stream(response.response, encoding)
+                response.headers['Content-Encoding'] = encoding
+                response.headers.pop('Content-Length', None)
+                if etag and not weak:
+                    response.set_etag(_variant(etag, encoding))
+            return response
+
+        response.direct_passthrough = False  # send_file: lê o arquivo para comprimir
+        data = response.get_data()
+        response.vary.add('Accept-Encoding')
+        if encoding is None or len(data) < min_size:
+            RESPONSE_BYTES.inc(len(data), encoding='identity', stage='original')
+            RESPONSE_BYTES.inc(len(data), encoding='identity', stage='sent')
+            return response
+
+        started_at = time.perf_counter()
+        compressed = ENCODERS[encoding](data)
+        COMPRESSION_TIME.observe(time.perf_counter() - started_at, encoding=encoding)
+        RESPONSE_BYTES.inc(len(data), encoding=encoding, stage='original')
+        RESPONSE_BYTES.inc(len(compressed), encoding=encoding, stage='sent')
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            response.set_etag(_variant(etag, encoding))
+        return response
+
+    return app
@@ -0,0 +1,58 @@
+"""
+Prazos por requisição para os servidores Flask
+Abre um deadline_scope no início de cada requisição e converte trabalho
+abandonado em resposta 504 (o Apps Script já desistiu de esperar).
+"""
+
+import os
+import sys
+from datetime import datetime
+from flask import g, request, jsonify
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.deadline import deadline_scope, DeadlineExceeded, DEFAULT_REQUEST_TIMEOUT
+
+TIMEOUT_HEADER = 'X-Request-Timeout'
+MAX_REQUEST_TIMEOUT = 300.0
+
+def _requested_timeout():
+    """Prazo pedido pelo cliente (header ou campo 'timeout' do JSON)"""
+    value = request.headers.get(TIMEOUT_HEADER)
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('timeout')
+    try:
+        timeout = float(value) if value is not None else DEFAULT_REQUEST_TIMEOUT
+    except (TypeError, ValueError):
+        timeout = DEFAULT_REQUEST_TIMEOUT
+    return min(max(timeout, 1.0), MAX_REQUEST_TIMEOUT)
+
+def install_request_deadlines(app, default_timeout=None):
+    """Registra os hooks de prazo/cancelamento em uma aplicação Flask"""
+
+    @app.before_request
+    def _open_deadline():
+        timeout = _requested_timeout() if default_timeout is None else default_timeout
+        scope = deadline_scope(timeout, request_id=request.headers.get('X-Request-Id'))
+        g.request_deadline = scope.__enter__()
+        g.request_deadline_scope = scope
+
+    @app.teardown_request
+    def _close_deadline(exc):
+        scope = g.pop('request_deadline_scope', None)
+        if scope is not None:
+            # Cancela o que ainda estiver pendente (ex: queries de estratégias perdedoras)
+            g.request_deadline.cancel()
+            scope.__exit__(None, None, None)
+
+    @app.errorhandler(DeadlineExceeded)
+    def _deadline_exceeded(error):
+        print(f"⏰ Requisição abandonada em '{error.stage}' ({request.path})")
+        return jsonify({
+            'success': False,
+            'error': 'Prazo da requisição esgotado',
+            'stage': error.stage,
+            'timestamp': datetime.now().isoformat()
+        }), 504
+
+    return app
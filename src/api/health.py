@@ -0,0 +1,125 @@
+"""
+Health checks dos componentes para os servidores Flask
+Substitui os 'ready' fixos por verificações reais: conexão com o banco,
+conversor de PDF, cache de resultados, rollup local, chave do Toqan e
+diretório de saída.
+
+No servidor pré-fork cada health check é respondido por um único worker (o
+pid vai no payload); contadores entre workers ficam no /metrics, que soma os
+retratos de todos os processos (ver src/core/metrics.py).
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.deadline import deadline_scope
+
+DATABASE_TIMEOUT = float(os.getenv('BISCOITAO_HEALTH_DB_TIMEOUT', '5'))
+
+# Componentes sem os quais o serviço não responde nenhuma pergunta
+CRITICAL_COMPONENTS = ('database',)
+
+def check_database():
+    from src.core.query import execute_query, get_backend
+    with deadline_scope(DATABASE_TIMEOUT):
+        result = execute_query("SELECT 1 AS test")
+    if result is None or len(result) == 0:
+        raise RuntimeError("SELECT 1 sem resultado")
+    return {'backend': getattr(get_backend(), 'name', 'trino')}
+
+def check_pdf_converter():
+    if shutil.which('pandoc'):
+        return {'converter': 'pandoc'}
+    try:
+        import markdown2  # noqa: F401
+        import weasyprint  # noqa: F401
+        return {'converter': 'weasyprint'}
+    except ImportError:
+        raise RuntimeError("Nem pandoc nem markdown2+weasyprint disponíveis")
+
+def check_result_cache():
+    from src.core.result_cache import get_default_cache
+    cache = get_default_cache()
+    if cache is None:
+        raise RuntimeError("Cache de resultados indisponível")
+    stats = cache.stats()
+    return {'entries': stats['entries'], 'hits': stats['hits']}
+
+# Rollup aberto pelo health check quando o processo não tem um carregado
+_rollup_store = None
+
+def check_rollup(store=None):
+    """
+    Frescor do rollup local. store: o RollupStore já aberto pelo processo (o do
+    AdvancedQueryBuilder); o DuckDB recusa abrir o mesmo arquivo somente leitura
+    ao lado de uma conexão de escrita. Sem store, abre somente leitura uma vez.
+    """
+    global _rollup_store
+    if store is None:
+        if _rollup_store is None:
+            from src.core.rollup_store import RollupStore
+            _rollup_store = RollupStore.open_default(read_only=True)
+        store = _rollup_store
+    if store is None:
+        raise RuntimeError("Rollup não materializado")
+    if not store.is_fresh():
+        raise RuntimeError("Rollup desatualizado (última partição com mais de 2 dias)")
+    return {}
+
+def check_toqan():
+    if not os.getenv('TOQAN_API_KEY'):
+        raise RuntimeError("TOQAN_API_KEY não configurada")
+    return {}
+
+def check_output_dir(directory=None):
+    directory = directory or os.getcwd()
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.health_'):
+        pass
+    return {'directory': directory}
+
+DEFAULT_CHECKS = {
+    'database': check_database,
+    'pdf_converter': check_pdf_converter,
+    'result_cache': check_result_cache,
+    'rollup': check_rollup,
+    'toqan': check_toqan,
+    'output_dir': check_output_dir,
+}
+
+def run_health_checks(checks=None, rollup_store=None):
+    """
+    Executa as verificações e consolida o status do serviço.
+    rollup_store: rollup já aberto no processo, verificado no lugar de abrir outra conexão.
+
+    Returns:
+        tuple: (payload, http_status) — 503 se um componente crítico falhar,
+        'degraded' se apenas componentes opcionais falharem.
+    """
+    checks = dict(checks or DEFAULT_CHECKS)
+    if rollup_store is not None and 'rollup' in checks:
+        checks['rollup'] = lambda: check_rollup(rollup_store)
+    components = {}
+    for name, check in checks.items():
+        started_at = time.perf_counter()
+        try:
+            component = {'status': 'ok', **(check() or {})}
+        except Exception as e:
+            component = {'status': 'error', 'error': str(e)[:200]}
+        component['latency_ms'] = round((time.perf_counter() - started_at) * 1000, 2)
+        components[name] = component
+
+    failed = [name for name, component in components.items() if component['status'] != 'ok']
+    if any(name in CRITICAL_COMPONENTS for name in failed):
+        status, http_status = 'unhealthy', 503
+    elif failed:
+        status, http_status = 'degraded', 200
+    else:
+        status, http_status = 'healthy', 200
+    return {'status': status, 'timestamp': datetime.now().isoformat(), 'worker': os.getpid(),
+            'components': components}, http_status
@@ -0,0 +1,26 @@
+"""
+Endpoint /metrics para os servidores Flask
+Expõe no formato de exposição do Prometheus as métricas alimentadas pelos
+spans (latência por endpoint, queries, caches, renderização, PDF, Toqan).
+No servidor pré-fork a resposta soma todos os workers, qualquer que seja o
+worker que atendeu o scrape (REGISTRY.enable_multiprocess).
+"""
+
+import os
+import sys
+from flask import Response
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.metrics import render_metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def install_metrics_endpoint(app, path='/metrics'):
+    """Registra a rota de scrape do Prometheus em uma aplicação Flask"""
+
+    def metrics():
+        return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule(path, 'prometheus_metrics', metrics, methods=['GET'])
+    return app
@@ -0,0 +1,221 @@
+"""
+Servidor de produção - modo pré-fork para os apps Flask
+Carrega a aplicação uma única vez no processo mestre (pandas, matplotlib com o
+tema dos gráficos, singletons dos geradores e o catálogo de schema) e só
+depois cria os workers com fork: cada worker começa pronto, compartilhando
+essas páginas de memória com o mestre (copy-on-write). Entre os workers, o
+estado é compartilhado em disco: cache de resultados e conversas em SQLite
+(WAL), rollup DuckDB somente leitura, manifesto de pré-aquecimento e logs.
+
+Usa o gunicorn quando instalado; sem ele, um pré-fork mínimo sobre o
+servidor WSGI do werkzeug (mesmo socket aceito por todos os workers).
+
+Refresh do rollup: um único escritor, que publica gerações novas do arquivo
+DuckDB (ver rollup_store); os workers abrem a geração atual só para leitura e
+passam para a nova na consulta seguinte. O escritor é o worker separado
+(python src/core/refresh_scheduler.py) ou, com BISCOITAO_REFRESH_IN_PROCESS=1,
+a thread do scheduler no mestre, que não atende requisições.
+
+Métricas: cada worker tem seu registro em memória; o mestre liga o modo
+multiprocesso antes do fork e cada processo grava um retrato em
+BISCOITAO_METRICS_DIR, que o /metrics de qualquer worker soma. Contadores
+não voltam quando o scrape cai em outro worker nem quando um worker é
+substituído.
+
+Uso:
+    python src/api/server.py flask_server --workers 4 --port 5000
+    python src/api/server.py visual_api --workers 8 --threads 2
+"""
+
+import os
+import gc
+import io
+import sys
+import time
+import signal
+import logging
+import argparse
+import importlib
+import threading
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn é opcional: sem ele usamos o pré-fork próprio
+    BaseApplication = None
+
+# Imports relativos para nova estrutura
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.join(PROJECT_ROOT, 'archive'))
+from src.core.deadline import deadline_scope, DeadlineExceeded, DEFAULT_REQUEST_TIMEOUT
+from src.api.deadlines import MAX_REQUEST_TIMEOUT
+from src.core.prefork import release_before_fork
+from src.core.metrics import REGISTRY
+
+# Apps Flask disponíveis (módulos em archive/)
+APPS = {
+    'flask_server': 'Biscoitão PDF Generator (Google Sheets)',
+    'visual_api': 'Visual Assistant API',
+    'app': 'API de consultas',
+}
+DEFAULT_WORKERS = int(os.getenv('BISCOITAO_WORKERS', str(os.cpu_count() or 2)))
+DEFAULT_THREADS = int(os.getenv('BISCOITAO_WORKER_THREADS', '1'))
+DEFAULT_ENGINE = os.getenv('BISCOITAO_SERVER_ENGINE', 'auto')
+PRELOAD_TIMEOUT = float(os.getenv('BISCOITAO_PRELOAD_TIMEOUT', '60'))
+PRELOAD_TABLES = [table for table in os.getenv('BISCOITAO_PRELOAD_TABLES', 'dw.monetization_total').split(',') if table]
+
+def warm_schema_catalog(tables=PRELOAD_TABLES):
+    """Colunas e tipos das tabelas no catálogo compartilhado (herdado pelos workers)"""
+    from src.generators.visual_assistant import DatabaseExplorer
+    explorer = DatabaseExplorer()
+    for table in tables:
+        try:
+            with deadline_scope(PRELOAD_TIMEOUT):
+                loaded = explorer.preload(table)
+            print(f"   📚 Schema de {table}: {loaded['columns']} colunas, {loaded['numeric_columns']} numéricas")
+        except DeadlineExceeded:
+            print(f"   ⚠️ Schema de {table} não carregado em {PRELOAD_TIMEOUT:.0f}s (fica para os workers)")
+        except Exception as e:
+            print(f"   ⚠️ Schema de {table} não carregado: {e}")
+
+def warm_chart_theme():
+    """Renderiza um gráfico mínimo: carrega fontes, tema e backend Agg antes do fork"""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(2, 1))
+    ax.plot([0, 1], [0, 1])
+    ax.bar([0.5], [0.5])
+    ax.set_title('Biscoitão')
+    fig.savefig(io.BytesIO(), format='png')
+    plt.close(fig)
+
+def preload(app_name):
+    """Importa o app e aquece o estado compartilhado; retorna o objeto WSGI"""
+    if app_name not in APPS:
+        raise ValueError(f"App desconhecido: {app_name} (disponíveis: {', '.join(APPS)})")
+
+    started_at = time.monotonic()
+    print(f"📦 Pré-carregando {APPS[app_name]} ({app_name})...")
+    import matplotlib
+    matplotlib.use('Agg')  # workers não têm display
+    module = importlib.import_module(app_name)
+    warm_schema_catalog()
+    warm_chart_theme()
+
+    # Objetos do preload nunca são coletados: congelá-los evita que o GC dos
+    # workers toque (e copie) as páginas herdadas do mestre
+    gc.collect()
+    gc.freeze()
+    REGISTRY.enable_multiprocess()
+    release_before_fork()
+    print(f"✅ Pré-carga concluída em {time.monotonic() - started_at:.1f}s")
+    return module.app
+
+def serve_prefork(app, host, port, workers, threads=DEFAULT_THREADS, access_log=False):
+    """Pré-fork sobre o werkzeug: mestre abre o socket, workers aceitam conexões dele"""
+    from werkzeug.serving import make_server
+    import socket
+
+    if not access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    listener = socket.create_server((host, port), backlog=2048)
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # o mestre coordena o encerramento
+            try:
+                server = make_server(host, port, app, threaded=threads > 1, fd=listener.fileno())
+                # SIGTERM: termina a requisição em andamento e sai
+                signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+                server.serve_forever()
+            except Exception as e:
+                print(f"❌ Worker {os.getpid()} falhou: {e}")
+            finally:
+                try:
+                    REGISTRY.flush()  # o que foi contado depois do último retrato periódico
+                finally:
+                    os._exit(0)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+    print(f"🚀 {workers} workers ({threads} thread(s) cada) em http://{host}:{port} [pré-fork werkzeug]")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"⚠️ Worker {pid} saiu (status {status}); iniciando substituto")
+            spawn(index)
+    listener.close()
+    print("👋 Servidor encerrado")
+
+if BaseApplication is not None:
+    class GunicornServer(BaseApplication):
+        """gunicorn com o app já carregado no mestre (equivale a preload_app)"""
+
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+def serve(app, host, port, workers, threads=DEFAULT_THREADS, engine=DEFAULT_ENGINE, access_log=False):
+    if engine == 'gunicorn' and BaseApplication is None:
+        raise RuntimeError("gunicorn não instalado (pip install gunicorn) - use --engine builtin")
+    if engine in ('auto', 'gunicorn') and BaseApplication is not None:
+        print(f"🚀 {workers} workers ({threads} thread(s) cada) em http://{host}:{port} [gunicorn]")
+        GunicornServer(app, {
+            'bind': f"{host}:{port}",
+            'workers': workers,
+            'threads': threads,
+            'preload_app': True,
+            # gthread: o heartbeat do worker não depende da requisição, então streams SSE longas
+            # não são mortas; o timeout só derruba worker travado (acima do maior prazo aceito)
+            'worker_class': 'gthread',
+            'timeout': int(max(DEFAULT_REQUEST_TIMEOUT, MAX_REQUEST_TIMEOUT)) + 30,
+            'accesslog': '-' if access_log else None,
+            'worker_exit': lambda server, worker: REGISTRY.flush(),
+        }).run()
+    else:
+        serve_prefork(app, host, port, workers, threads, access_log)
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de produção (pré-fork) dos apps do Biscoitão")
+    parser.add_argument('app', choices=sorted(APPS), help="App Flask a servir")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help="Threads por worker")
+    parser.add_argument('--engine', choices=['auto', 'gunicorn', 'builtin'], default=DEFAULT_ENGINE)
+    parser.add_argument('--access-log', action='store_true', help="Loga cada requisição")
+    args = parser.parse_args()
+
+    app = preload(args.app)
+    serve(app, args.host, args.port, args.workers, args.threads, args.engine, args.access_log)
+
+if __name__ == "__main__":
+    main()
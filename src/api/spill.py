@@ -0,0 +1,57 @@
+"""
+Resultados grandes nos servidores Flask
+Abre um spill_scope por requisição (arquivos Arrow de resultados grandes são
+apagados no fim dela) e serializa respostas com chunks preguiçosos em
+streaming: o JSON sai chunk a chunk, sem montar a lista de CSVs nem o corpo
+inteiro em memória.
+"""
+
+import os
+import sys
+import json
+from collections.abc import Sequence
+from flask import g, Response, stream_with_context
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.result_spill import spill_scope
+
+def iter_json(value):
+    """Pedaços de texto JSON de value; sequências (ex: CsvChunks) são percorridas item a item"""
+    if isinstance(value, dict):
+        yield '{'
+        for index, (key, item) in enumerate(value.items()):
+            yield (', ' if index else '') + json.dumps(str(key), ensure_ascii=False) + ': '
+            yield from iter_json(item)
+        yield '}'
+    elif isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+        yield '['
+        for index, item in enumerate(value):
+            if index:
+                yield ', '
+            yield from iter_json(item)
+        yield ']'
+    else:
+        yield json.dumps(value, ensure_ascii=False, default=str)
+
+def stream_json(value, status=200):
+    """Resposta JSON em streaming (o escopo da requisição fica aberto até o último byte)"""
+    body = (piece.encode('utf-8') for piece in iter_json(value))
+    return Response(stream_with_context(body), status=status, mimetype='application/json')
+
+def install_result_spill(app):
+    """Registra o escopo de spill por requisição em uma aplicação Flask"""
+
+    @app.before_request
+    def _open_spill_scope():
+        scope = spill_scope()
+        scope.__enter__()
+        g.spill_scope = scope
+
+    @app.teardown_request
+    def _close_spill_scope(exc):
+        scope = g.pop('spill_scope', None)
+        if scope is not None:
+            scope.__exit__(None, None, None)
+
+    return app
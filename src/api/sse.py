@@ -0,0 +1,70 @@
+"""
+Server-Sent Events para as respostas progressivas
+Formata os eventos de src.core.progressive no protocolo SSE (event/id/data)
+e os entrega em streaming pelo Flask (sse_response) ou pelo servidor ASGI
+(asse_stream). Os heartbeats viram comentários (': keep-alive'), que mantêm
+proxies e o EventSource do navegador conectados sem gerar eventos.
+"""
+
+import os
+import sys
+import json
+from flask import Response, stream_with_context
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.metrics import REGISTRY
+
+SSE_HEADERS = [
+    ('Cache-Control', 'no-cache'),
+    ('X-Accel-Buffering', 'no'),  # nginx: não segurar o stream em buffer
+]
+KEEP_ALIVE = b': keep-alive\n\n'
+
+OPEN_STREAMS = REGISTRY.gauge(
+    'biscoitao_sse_open_streams', 'Streams SSE de respostas progressivas abertas')
+EVENT_LATENCY = REGISTRY.histogram(
+    'biscoitao_sse_event_seconds', 'Tempo desde o início da pergunta até cada evento progressivo', ['event'])
+
+def format_sse(name, payload, event_id=None):
+    """Um evento SSE (data em JSON numa única linha)"""
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(payload, ensure_ascii=False, default=str)}")
+    return ("\n".join(lines) + "\n\n").encode('utf-8')
+
+def sse_stream(events):
+    """Bytes SSE a partir dos eventos (nome, payload) de iter_events"""
+    OPEN_STREAMS.inc()
+    try:
+        event_id = 0
+        for name, payload in events:
+            if name == 'heartbeat':
+                yield KEEP_ALIVE
+                continue
+            EVENT_LATENCY.observe(payload.get('elapsed', 0.0), event=name)
+            yield format_sse(name, payload, event_id)
+            event_id += 1
+    finally:
+        OPEN_STREAMS.dec()
+
+async def asse_stream(events):
+    """Versão assíncrona de sse_stream (eventos de aiter_events)"""
+    OPEN_STREAMS.inc()
+    try:
+        event_id = 0
+        async for name, payload in events:
+            if name == 'heartbeat':
+                yield KEEP_ALIVE
+                continue
+            EVENT_LATENCY.observe(payload.get('elapsed', 0.0), event=name)
+            yield format_sse(name, payload, event_id)
+            event_id += 1
+    finally:
+        OPEN_STREAMS.dec()
+
+def sse_response(events):
+    """Resposta Flask text/event-stream (o escopo da requisição fica aberto até o fim do stream)"""
+    return Response(stream_with_context(sse_stream(events)), mimetype='text/event-stream',
+                    headers=SSE_HEADERS)
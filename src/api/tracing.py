@@ -0,0 +1,63 @@
+"""
+Tracing por requisição para os servidores Flask
+Abre o span raiz 'http.request' em cada requisição e devolve o resumo por
+estágio no header Server-Timing e no campo 'trace' das respostas JSON.
+"""
+
+import os
+import sys
+import json
+from flask import g, request
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.tracing import start_span, end_span, trace_summary
+
+TRACE_HEADER = 'X-Trace-Id'
+
+def _server_timing(summary):
+    """Header Server-Timing (visível no DevTools) com os estágios mais lentos"""
+    metrics = [f"total;dur={summary['total_ms']}"] if summary.get('total_ms') is not None else []
+    for name, stage in list(summary['stages'].items())[:8]:
+        metrics.append(f"{name.replace('.', '-')};dur={stage['total_ms']};desc=\"{stage['count']}x\"")
+    return ", ".join(metrics)
+
+def install_request_tracing(app, include_in_body=True, exclude_paths=('/metrics',)):
+    """Registra os hooks de tracing em uma aplicação Flask"""
+
+    @app.before_request
+    def _open_trace():
+        if request.path in exclude_paths:
+            return  # scrapes do Prometheus não viram traces
+        # Rota (ex: /chart/<filename>) em vez do path: cardinalidade limitada nas métricas
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.trace_span, g.trace_token = start_span('http.request', method=request.method,
+                                                 path=request.path, endpoint=endpoint)
+
+    @app.after_request
+    def _attach_trace(response):
+        root = g.get('trace_span')
+        if root is None:
+            return response
+        root.set(status_code=response.status_code)
+        summary = trace_summary()
+        response.headers[TRACE_HEADER] = root.trace.trace_id
+        response.headers['Server-Timing'] = _server_timing(summary)
+
+        # Respostas com ETag forte precisam de corpo estável: o trace fica só nos headers
+        tagged = response.get_etag()[0] is not None
+        if include_in_body and not tagged and response.is_json and not response.direct_passthrough \
+                and not response.is_streamed and 'Content-Encoding' not in response.headers:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict) and 'trace' not in body:
+                body['trace'] = summary
+                response.set_data(json.dumps(body, ensure_ascii=False, default=str))
+        return response
+
+    @app.teardown_request
+    def _close_trace(exc):
+        root = g.pop('trace_span', None)
+        if root is not None:
+            end_span(root, g.pop('trace_token'), exc)
+
+    return app
@@ -0,0 +1,94 @@
+"""
+Analysis Context - Uma pergunta analisada uma vez, consumida por todos os geradores
+O BiscoitaoMasterSystem gerava a análise visual e, em seguida, o relatório
+HTML executava de novo a mesma consulta (e o gráfico). O AnalysisContext é
+criado uma vez por pergunta (IntelligentReportGenerator.analyze) e guarda:
+
+    intent     tipo de gráfico, origem (rollup/trino) e aproximação
+    query      SQL executada
+    data       DataFrame do resultado
+    insights   insights automáticos e resposta conversacional
+    artifacts  arquivos já gerados, por nome: gráficos por perfil de
+               renderização ('web', 'print', ...) e relatórios ('html', 'pdf')
+
+Os geradores (visual, HTML, PDF, Sheets) aceitam context=... e só produzem o
+que ainda falta, registrando o que geram em artifacts: uma análise completa
+vai ao Trino uma vez e desenha cada artefato uma só vez.
+"""
+
+import os
+
+class AnalysisContext:
+    """Resultado de uma pergunta compartilhado entre os geradores"""
+
+    def __init__(self, question, table_name="dw.monetization_total", report=None):
+        """
+        Args:
+            question (str): Pergunta do analista.
+            table_name (str): Tabela consultada.
+            report (dict): Resultado do IntelligentReportGenerator (None se a análise falhou).
+        """
+        self.question = question
+        self.table_name = table_name
+        self.report = report
+        self.artifacts = {}
+        for profile, path in ((report or {}).get('chart_files') or {}).items():
+            self.add_artifact(profile, path)
+
+    @property
+    def ok(self):
+        return self.report is not None
+
+    @property
+    def data(self):
+        return self.report['data'] if self.ok else None
+
+    @property
+    def query(self):
+        return self.report['query'] if self.ok else None
+
+    @property
+    def viz_type(self):
+        return self.report['viz_type'] if self.ok else None
+
+    @property
+    def insights(self):
+        return self.report['insights'] if self.ok else []
+
+    @property
+    def response(self):
+        return self.report['response'] if self.ok else None
+
+    @property
+    def intent(self):
+        """Como a pergunta foi interpretada e respondida"""
+        if not self.ok:
+            return None
+        return {
+            'viz_type': self.report['viz_type'],
+            'source': self.report.get('source'),
+            'approximation': self.report.get('approximation'),
+        }
+
+    def artifact(self, name):
+        """Arquivo já gerado com esse nome (None se não existe ou foi apagado)"""
+        path = self.artifacts.get(name)
+        return path if path and os.path.exists(path) else None
+
+    def add_artifact(self, name, path):
+        if path:
+            self.artifacts[name] = path
+        return path
+
+    def to_dict(self):
+        """Metadados do contexto (sem o DataFrame)"""
+        return {
+            'question': self.question,
+            'table': self.table_name,
+            'intent': self.intent,
+            'query': self.query,
+            'rows': len(self.data) if self.ok else 0,
+            'insights': self.insights,
+            'response': self.response,
+            'artifacts': dict(self.artifacts),
+        }
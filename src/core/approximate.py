@@ -0,0 +1,211 @@
+"""
+Approximate - Execução aproximada de perguntas exploratórias
+Perguntas de tendência/distribuição não precisam de um scan completo de
+dw.monetization_total: a SQL do AdvancedQueryBuilder é reescrita para ler
+uma amostra (TABLESAMPLE BERNOULLI) e cada agregado ganha um estimador com
+margem de erro:
+
+    AVG(x)            média da amostra ± z·s/√n
+    COUNT(*)          contagem da amostra / fração ± z·√(n(1-f))/f
+    SUM(x)            soma da amostra / fração ± z·√((1-f)·Σx²)/f
+    COUNT(DISTINCT x) approx_distinct(x) sobre a tabela inteira (HyperLogLog,
+                      erro padrão de 2,3%): contagens distintas não escalam
+                      a partir de uma amostra
+
+Os intervalos (IC de BISCOITAO_APPROX_CONFIDENCE) vão para colunas
+<agregado>_margin do resultado, para a resposta e para os insights. A
+pergunta volta para a execução exata quando pedida (parâmetro exact ou
+"exato" no texto), quando algum grupo tem amostra pequena demais ou quando a
+margem relativa passa de BISCOITAO_APPROX_MAX_ERROR.
+
+Modos (BISCOITAO_APPROXIMATE): auto (só perguntas exploratórias), on, off.
+"""
+
+import os
+import re
+from statistics import NormalDist
+
+import numpy as np
+
+APPROXIMATE_MODE = os.getenv('BISCOITAO_APPROXIMATE', 'auto').lower()
+SAMPLE_PERCENT = float(os.getenv('BISCOITAO_APPROX_SAMPLE_PERCENT', '10'))
+CONFIDENCE = float(os.getenv('BISCOITAO_APPROX_CONFIDENCE', '0.95'))
+MIN_SAMPLE = int(os.getenv('BISCOITAO_APPROX_MIN_SAMPLE', '30'))
+MAX_RELATIVE_ERROR = float(os.getenv('BISCOITAO_APPROX_MAX_ERROR', '10'))  # % do valor estimado
+HLL_STANDARD_ERROR = 0.023  # erro padrão default do approx_distinct do Trino
+
+EXPLORATORY_TERMS = ['tendência', 'tendencia', 'evolução', 'evolucao', 'distribuição', 'distribuicao',
+                     'ao longo', 'padrão', 'padrao', 'panorama', 'visão geral', 'aproximad', 'estimativ']
+EXACT_TERMS = ['exato', 'exata', 'exatamente', 'sem amostra', 'precisão exata']
+
+_FROM = re.compile(r"\bFROM\s+([\w.\"]+)", re.IGNORECASE)
+_AVG = re.compile(r"\bAVG\(([^()]+)\)\s+as\s+(\w+)", re.IGNORECASE)
+_SUM = re.compile(r"\bSUM\(([^()]+)\)\s+as\s+(\w+)", re.IGNORECASE)
+_COUNT = re.compile(r"\bCOUNT\(\*\)\s+as\s+(\w+)", re.IGNORECASE)
+_COUNT_DISTINCT = re.compile(r"\bCOUNT\(\s*DISTINCT\s+([^()]+)\)(?:\s+as\s+(\w+))?", re.IGNORECASE)
+
+def _table_reference(sql):
+    """Primeiro FROM fora de parênteses (ignora EXTRACT(YEAR FROM ...) e subqueries)"""
+    for match in _FROM.finditer(sql):
+        prefix = sql[:match.start()]
+        if prefix.count('(') == prefix.count(')'):
+            return match
+    return None
+
+def wants_approximation(instruction, mode=None):
+    """Indica se a pergunta pode ser respondida por amostragem"""
+    mode = mode or APPROXIMATE_MODE
+    lower = instruction.lower()
+    if mode in ('off', '0', 'false') or any(term in lower for term in EXACT_TERMS):
+        return False
+    return mode in ('on', '1', 'true') or any(term in lower for term in EXPLORATORY_TERMS)
+
+class ApproximatePlan:
+    """SQL amostrada de uma query exata e os estimadores para interpretar o resultado"""
+
+    def __init__(self, exact_sql, sample_percent=SAMPLE_PERCENT, confidence=CONFIDENCE,
+                 min_sample=MIN_SAMPLE, max_relative_error=MAX_RELATIVE_ERROR):
+        self.exact_sql = exact_sql
+        self.sample_percent = sample_percent
+        self.fraction = sample_percent / 100
+        self.confidence = confidence
+        self.min_sample = min_sample
+        self.max_relative_error = max_relative_error
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.averages, self.counts, self.sums, self.distincts = [], [], [], []
+        self.sql = self._rewrite(exact_sql)
+
+    @property
+    def sampled(self):
+        return bool(self.averages or self.counts or self.sums)
+
+    def _rewrite(self, sql):
+        """SQL aproximada (None se não há agregado que se beneficie)"""
+        if _COUNT_DISTINCT.search(sql):
+            # Distintos em amostra subestimam: HyperLogLog sobre a tabela inteira, sem TABLESAMPLE
+            def distinct(match):
+                alias = match.group(2) or f"distinct_{len(self.distincts)}"
+                self.distincts.append(alias)
+                return f"approx_distinct({match.group(1).strip()}) as {alias}"
+            return _COUNT_DISTINCT.sub(distinct, sql)
+
+        if not 0 < self.sample_percent < 100 or _table_reference(sql) is None:
+            return None
+        scale = 100 / self.sample_percent
+
+        def average(match):
+            expression, alias = match.group(1).strip(), match.group(2)
+            self.averages.append(alias)
+            return (f"AVG({expression}) as {alias}, STDDEV_SAMP({expression}) as {alias}__stddev, "
+                    f"COUNT({expression}) as {alias}__n")
+
+        def count(match):
+            alias = match.group(1)
+            self.counts.append(alias)
+            return f"CAST(ROUND(COUNT(*) * {scale:g}) AS BIGINT) as {alias}, COUNT(*) as {alias}__n"
+
+        def total(match):
+            expression, alias = match.group(1).strip(), match.group(2)
+            self.sums.append(alias)
+            return (f"SUM({expression}) * {scale:g} as {alias}, "
+                    f"SUM(CAST({expression} AS DOUBLE) * {expression}) as {alias}__sumsq, "
+                    f"COUNT({expression}) as {alias}__n")
+
+        rewritten = _AVG.sub(average, sql)
+        rewritten = _COUNT.sub(count, rewritten)
+        rewritten = _SUM.sub(total, rewritten)
+        if not self.sampled:
+            return None
+        table = _table_reference(rewritten)
+        return (f"{rewritten[:table.end()]} TABLESAMPLE BERNOULLI ({self.sample_percent:g})"
+                f"{rewritten[table.end():]}")
+
+    def estimate(self, data):
+        """Resultado com colunas <agregado>_margin e sample_count no lugar das auxiliares"""
+        data = data.copy()
+        fraction = self.fraction
+        helpers, samples = [], []
+        for alias in self.averages:
+            n = data[f"{alias}__n"].astype(float)
+            std = data[f"{alias}__stddev"].astype(float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # Correção de população finita: a amostra Bernoulli é sem reposição
+                data[f"{alias}_margin"] = self.z * std / np.sqrt(n) * np.sqrt(1 - fraction)
+            helpers += [f"{alias}__stddev", f"{alias}__n"]
+            samples.append(n)
+        for alias in self.counts:
+            n = data[f"{alias}__n"].astype(float)
+            data[f"{alias}_margin"] = self.z * np.sqrt(n * (1 - fraction)) / fraction
+            helpers.append(f"{alias}__n")
+            samples.append(n)
+        for alias in self.sums:
+            sumsq = data[f"{alias}__sumsq"].astype(float)
+            data[f"{alias}_margin"] = self.z * np.sqrt((1 - fraction) * sumsq) / fraction
+            helpers += [f"{alias}__sumsq", f"{alias}__n"]
+            samples.append(data[f"{alias}__n"].astype(float))
+        for alias in self.distincts:
+            data[f"{alias}_margin"] = self.z * HLL_STANDARD_ERROR * data[alias].astype(float)
+        if samples:
+            data['sample_count'] = np.minimum.reduce([sample.to_numpy() for sample in samples]).astype(np.int64)
+        return data.drop(columns=helpers)
+
+    def estimates(self):
+        """Colunas estimadas, na ordem da SQL"""
+        return self.averages + self.counts + self.sums + self.distincts
+
+    def relative_error(self, data):
+        """Maior margem relativa (%) entre as estimativas (NaN se não há como medir)"""
+        errors = []
+        for alias in self.estimates():
+            values = data[alias].abs().astype(float).replace(0, np.nan)
+            errors.append((data[f"{alias}_margin"] / values * 100).max())
+        errors = [error for error in errors if not np.isnan(error)]
+        return max(errors) if errors else float('nan')
+
+    def fallback_reason(self, data):
+        """Motivo para refazer a consulta exata (None se a estimativa serve)"""
+        if data.empty:
+            return "amostra sem linhas"
+        if 'sample_count' in data.columns and data['sample_count'].min() < self.min_sample:
+            return f"amostra pequena ({int(data['sample_count'].min())} registros em um grupo)"
+        error = self.relative_error(data)
+        if error > self.max_relative_error:
+            return f"margem de ±{error:.1f}% acima do limite de {self.max_relative_error:g}%"
+        return None
+
+    def summary(self, data):
+        """Bloco 'approximation' da resposta"""
+        error = self.relative_error(data)
+        return {
+            'mode': 'approximate',
+            'method': 'tablesample_bernoulli' if self.sampled else 'approx_distinct',
+            'sample_percent': self.sample_percent if self.sampled else None,
+            'confidence': self.confidence,
+            'max_relative_error_pct': None if np.isnan(error) else round(float(error), 2),
+            'min_sample': int(data['sample_count'].min()) if 'sample_count' in data.columns else None,
+            'estimates': {alias: f"{alias}_margin" for alias in self.estimates()},
+            'exact_sql': self.exact_sql,
+        }
+
+    def insights(self, data, viz_type):
+        """Frases sobre a precisão das estimativas (e conclusões que a margem não sustenta)"""
+        error = self.relative_error(data)
+        source = f"amostra de {self.sample_percent:g}% dos registros" if self.sampled else "approx_distinct"
+        insights = [f"🎲 Estimativa por {source}: margem de até ±{error:.1f}% (IC {self.confidence:.0%})"
+                    if not np.isnan(error) else f"🎲 Estimativa por {source}"]
+        metric = self.estimates()[0] if self.estimates() else None
+        if metric is None or len(data) < 2:
+            return insights
+        values, margins = data[metric].astype(float), data[f"{metric}_margin"].astype(float)
+
+        if viz_type == 'line_chart':
+            if abs(values.iloc[-1] - values.iloc[0]) <= margins.iloc[-1] + margins.iloc[0]:
+                insights.append("⚠️ A variação entre o primeiro e o último período está dentro da margem de erro "
+                                "da amostra")
+        elif viz_type == 'bar_chart':
+            order = values.sort_values(ascending=False).index
+            leader, runner_up = order[0], order[1]
+            if values[leader] - margins[leader] <= values[runner_up] + margins[runner_up]:
+                insights.append(f"⚠️ Liderança de {data.loc[leader, data.columns[0]]} não é conclusiva na amostra "
+                                f"(intervalos de confiança se sobrepõem)")
+        return insights
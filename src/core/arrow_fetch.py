@@ -0,0 +1,205 @@
+"""
+Arrow Fetch - Resultados do Trino direto em colunas Arrow
+O caminho padrão (PyHive DB-API + DataFrame.from_records/read_sql) monta uma
+tupla Python por linha e o pandas re-inspeciona cada valor para inferir os
+tipos. Aqui o protocolo REST do Trino (/v1/statement) é falado diretamente:
+cada página JSON é transposta em colunas e convertida em buffers Arrow com o
+tipo declarado pelo Trino (bigint, double, date, decimal...), sem inferência.
+O resultado é um pyarrow.Table contíguo: colunas numéricas sem nulos viram
+DataFrame/NumPy sem cópia.
+
+Também entende o protocolo de spooling do Trino (segmentos 'json' inline ou
+em URIs), ativado com BISCOITAO_TRINO_SPOOLING=on.
+
+Uso (por chamada):
+    table = execute_arrow(sql)                 # pyarrow.Table
+    df = execute_query(sql, arrow=True)        # DataFrame via Arrow
+"""
+
+import os
+import sys
+import json
+import base64
+
+import requests
+from dotenv import load_dotenv
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow é opcional: só necessário para o caminho Arrow
+    pa = None
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.query import QueryHandle
+from src.core.deadline import remaining_time
+
+TRINO_URL = os.getenv('BISCOITAO_TRINO_URL', 'https://trino-gateway.dataeng.bigdata.olxbr.io:443')
+TRINO_SOURCE = 'dataeng-trino-api'
+SPOOLING_ENABLED = os.getenv('BISCOITAO_TRINO_SPOOLING', 'off').lower() in ('1', 'on', 'true')
+REQUEST_TIMEOUT = 60
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow não instalado (pip install pyarrow)")
+
+def arrow_type(signature):
+    """Tipo Arrow para a assinatura de tipo do Trino (ex: 'decimal(10,2)', 'timestamp(3)')"""
+    signature = signature.lower().strip()
+    base = signature.split('(')[0].strip()
+    if base == 'decimal':
+        precision, scale = (int(part) for part in signature[len('decimal('):-1].split(','))
+        return pa.decimal128(precision, scale)
+    if base == 'timestamp' and 'with time zone' not in signature:
+        precision = int(signature[len('timestamp('):].split(')')[0]) if '(' in signature else 3
+        return pa.timestamp('ms' if precision <= 3 else 'us' if precision <= 6 else 'ns')
+    return {
+        'bigint': pa.int64(), 'integer': pa.int32(), 'smallint': pa.int16(), 'tinyint': pa.int8(),
+        'double': pa.float64(), 'real': pa.float32(), 'boolean': pa.bool_(), 'date': pa.date32(),
+        'varchar': pa.string(), 'char': pa.string(), 'json': pa.string(), 'uuid': pa.string(),
+        'timestamp': pa.string(), 'time': pa.string(), 'varbinary': pa.string(),
+    }.get(base)  # arrays/maps/rows: tipo inferido pelo Arrow
+
+# Tipos que chegam como texto no JSON do Trino e são convertidos com cast
+_PARSED_TYPES = ('date32', 'timestamp', 'decimal')
+
+def _column_chunk(values, target):
+    """Converte os valores de uma coluna de uma página em um array Arrow"""
+    if target is None:
+        return pa.array(values)
+    if any(str(target).startswith(prefix) for prefix in _PARSED_TYPES):
+        return pa.array(values, type=pa.string()).cast(target)
+    try:
+        return pa.array(values, type=target)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if not pa.types.is_floating(target):
+            raise
+        # double/real chegam como "NaN"/"Infinity" em texto
+        return pa.array([None if value is None else float(value) for value in values], type=target)
+
+class ArrowTableBuilder:
+    """Acumula páginas de linhas do Trino como chunks Arrow por coluna"""
+
+    def __init__(self):
+        self.names = None
+        self.types = None
+        self.chunks = None
+        self.rows = 0
+
+    def set_columns(self, columns):
+        if self.names is None and columns:
+            self.names = [column['name'] for column in columns]
+            self.types = [arrow_type(column['type']) for column in columns]
+            self.chunks = [[] for _ in columns]
+
+    def add_rows(self, rows):
+        if not rows:
+            return
+        # Transposição em C (zip) em vez de um objeto por linha
+        for chunks, target, values in zip(self.chunks, self.types, zip(*rows)):
+            chunks.append(_column_chunk(values, target))
+        self.rows += len(rows)
+
+    def table(self):
+        if self.names is None:
+            return pa.table({})
+        arrays = []
+        for chunks, target in zip(self.chunks, self.types):
+            if not chunks:
+                arrays.append(pa.array([], type=target or pa.null()))
+                continue
+            arrays.append(pa.chunked_array(chunks, type=chunks[0].type if target is None else target))
+        # Buffers contíguos: conversão sem cópia para NumPy/pandas nas colunas numéricas
+        return pa.Table.from_arrays(arrays, names=self.names).combine_chunks()
+
+class TrinoStatementClient:
+    """Conexão HTTP com a API REST do Trino (mesmas credenciais do get_connection)"""
+
+    def __init__(self, url=TRINO_URL, username=None, password=None, source=TRINO_SOURCE,
+                 catalog='hive', schema='default', session=None, spooling=SPOOLING_ENABLED):
+        self.url = url.rstrip('/')
+        self.session = session or requests.Session()
+        self.auth = requests.auth.HTTPBasicAuth(username, password) if password else None
+        self.headers = {
+            'X-Trino-User': username or 'biscoitao',
+            'X-Trino-Source': source,
+            'X-Trino-Catalog': catalog,
+            'X-Trino-Schema': schema,
+        }
+        if spooling:
+            self.headers['X-Trino-Query-Data-Encoding'] = 'json'
+
+    @classmethod
+    def from_env(cls):
+        load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+        return cls(username=os.getenv('USUARIO_OLX'), password=os.getenv('SENHA_OLX'))
+
+    def request(self, method, url, **kwargs):
+        response = self.session.request(method, url, auth=self.auth, timeout=remaining_time(REQUEST_TIMEOUT),
+                                        **kwargs)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"Trino respondeu {response.status_code}: {response.text[:200]}")
+        return response
+
+class ArrowTrinoQuery(QueryHandle):
+    """Query no Trino com resultado decodificado direto para Arrow"""
+
+    backend = 'trino'
+
+    def __init__(self, query, client=None):
+        _require_pyarrow()
+        super().__init__(query)
+        self.client = client or TrinoStatementClient.from_env()
+        self._query_id = None
+        self._next_uri = None
+        self._builder = ArrowTableBuilder()
+        response = self.client.request('POST', f"{self.client.url}/v1/statement",
+                                       data=query.encode('utf-8'), headers=self.client.headers)
+        self._process(response.json())
+
+    @property
+    def query_id(self):
+        return self._query_id
+
+    def _process(self, page):
+        if 'error' in page:
+            self._next_uri = None
+            raise RuntimeError(f"Erro no Trino: {page['error'].get('message', page['error'])}")
+        self._query_id = page.get('id', self._query_id)
+        self._next_uri = page.get('nextUri')
+        self._builder.set_columns(page.get('columns'))
+        data = page.get('data')
+        if isinstance(data, dict):
+            self._process_segments(data)
+        elif data:
+            self._builder.add_rows(data)
+
+    def _process_segments(self, data):
+        """Protocolo de spooling: segmentos inline (base64) ou em URIs"""
+        if data.get('encoding', 'json') != 'json':
+            raise RuntimeError(f"Codificação de spooling não suportada: {data.get('encoding')}")
+        for segment in data.get('segments', []):
+            if segment['type'] == 'inline':
+                rows = json.loads(base64.b64decode(segment['data']))
+            else:
+                response = self.client.request('GET', segment['uri'], headers=segment.get('headers') or {})
+                rows = response.json()
+                if segment.get('ackUri'):
+                    self.client.request('GET', segment['ackUri'])
+            self._builder.add_rows(rows)
+
+    def _fetch_arrow(self):
+        while self._next_uri:
+            response = self.client.request('GET', self._next_uri, headers=self.client.headers)
+            self._process(response.json())
+        if self.cancelled:
+            raise RuntimeError(f"Query {self.query_id} cancelada")
+        return self._builder.table()
+
+    def _fetch(self):
+        return self._fetch_arrow().to_pandas()
+
+    def _cancel(self):
+        if self._next_uri:
+            self.client.request('DELETE', self._next_uri, headers=self.client.headers)
+            self._next_uri = None
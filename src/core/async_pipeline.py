@@ -0,0 +1,153 @@
+"""
+Async Pipeline - Versão assíncrona do fluxo schema → Trino → Toqan → gráfico
+Uma requisição pendente não ocupa mais uma thread do worker: as etapas de I/O
+(schema e queries no Trino, via pyhive, que é bloqueante) rodam num pool de
+threads de I/O, o polling do Toqan espera com asyncio.sleep e as etapas de CPU
+(gráfico, insights, resposta) vão para um executor próprio. Assim um worker
+mantém centenas de perguntas do Sheets esperando o Trino/Toqan ao mesmo tempo.
+
+O prazo da requisição e o trace atual acompanham cada etapa (contextvars).
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.deadline import DeadlineExceeded
+from src.core.tracing import span, trace_summary
+from src.integrations.toqan_api import AsyncToqanAPIClient
+
+IO_WORKERS = int(os.getenv('BISCOITAO_ASYNC_IO_WORKERS', '32'))
+# matplotlib (pyplot) não é thread-safe: uma thread de CPU por padrão
+CPU_WORKERS = int(os.getenv('BISCOITAO_ASYNC_CPU_WORKERS', '1'))
+MAX_CONCURRENT_REPORTS = int(os.getenv('BISCOITAO_ASYNC_MAX_REPORTS', '500'))
+
+def toqan_prompt(instruction, data):
+    """Pergunta para o Toqan explicar o resultado já calculado"""
+    return (f"Pergunta do usuário: {instruction}\n\n"
+            f"Resultado da consulta (primeiras linhas):\n{data.head(20).to_string(index=False)}\n\n"
+            "Responda em português com um JSON: "
+            '{"explanation": "...", "highlights": ["..."]}')
+
+class AsyncReportPipeline:
+    """Gera relatórios do IntelligentReportGenerator sem bloquear o event loop"""
+
+    def __init__(self, generator=None, toqan=None, io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS):
+        if generator is None:
+            from src.generators.visual_assistant import IntelligentReportGenerator
+            generator = IntelligentReportGenerator()
+        self.generator = generator
+        self.toqan = toqan
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='async-io')
+        self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='async-cpu')
+
+    async def _run(self, executor, function, *args, **kwargs):
+        """Executa function no executor levando o prazo e o trace da requisição"""
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, lambda: context.run(function, *args, **kwargs))
+
+    async def generate(self, instruction, table_name="dw.monetization_total", render_chart=True, ask_toqan=False,
+                       exact=False, chart_format=None, render_profile=None):
+        """Equivalente assíncrono de generate_complete_report (+ explicação do Toqan opcional)"""
+        with span('report.generate', table=table_name, question=instruction, mode='async') as report_span:
+            result = await self._generate(instruction, table_name, render_chart, ask_toqan, exact, chart_format,
+                                          render_profile)
+            report_span.set(success=result is not None)
+            if result is not None:
+                result['trace'] = trace_summary()
+            return result
+
+    async def _generate(self, instruction, table_name, render_chart, ask_toqan, exact=False, chart_format=None,
+                        render_profile=None):
+        generator = self.generator
+        started_at = time.monotonic()
+
+        with span('plan') as plan_span:
+            query, viz_type, source = await self._run(self.io_executor, generator.query_builder.route_query,
+                                                      instruction, table_name)
+            plan_span.set(viz_type=viz_type, source=source)
+        if not query:
+            return None
+
+        try:
+            data, cache_hit = None, False
+            if source == 'rollup':
+                try:
+                    with span('rollup.query') as rollup_span:
+                        data = await self._run(self.io_executor, generator.query_builder.rollup_store.query, query)
+                        rollup_span.set(rows=len(data))
+                except Exception as e:
+                    print(f"⚠️ Falha no rollup local, consultando o Trino: {e}")
+                    query, viz_type = await self._run(self.io_executor,
+                                                      generator.query_builder.build_visualization_query,
+                                                      instruction, table_name)
+                    source = 'trino'
+                    if not query:
+                        return None
+            approximation = None
+            plan = generator.query_builder.approximate_query(instruction, query, exact) if source == 'trino' else None
+            if data is None and plan is not None:
+                data, cache_hit, query, approximation = await self._run(self.io_executor,
+                                                                        generator._fetch_approximate, plan)
+            if data is None:
+                data, cache_hit = await self._run(self.io_executor, generator._fetch_data, query)
+            if data.empty:
+                return None
+
+            # Gráfico/insights (CPU) e explicação do Toqan (rede) em paralelo
+            report_task = self._run(self.cpu_executor, generator._report_from_data, instruction, table_name,
+                                    query, viz_type, source, data, cache_hit, started_at,
+                                    render_chart=render_chart, chart_tag=uuid.uuid4().hex[:8],
+                                    approximation=approximation, chart_format=chart_format,
+                                    render_profile=render_profile)
+            if ask_toqan and self.toqan is not None and self.toqan.available:
+                report, explanation = await asyncio.gather(report_task, self._ask_toqan(instruction, data))
+            else:
+                report, explanation = await report_task, None
+        except DeadlineExceeded:
+            print("⏰ Prazo da requisição esgotado, análise abandonada.")
+            raise
+        except Exception as e:
+            print(f"❌ Erro ao executar análise: {e}")
+            return None
+
+        if report is not None and explanation is not None:
+            report['toqan'] = explanation
+        return report
+
+    async def _ask_toqan(self, instruction, data):
+        """Explicação do Toqan; falhas não derrubam o relatório"""
+        try:
+            return await self.toqan.ask_json(toqan_prompt(instruction, data))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"⚠️ Toqan indisponível: {e}")
+            return None
+
+    async def generate_many(self, instructions, table_name="dw.monetization_total",
+                            max_concurrency=MAX_CONCURRENT_REPORTS, **options):
+        """Várias perguntas concorrentes (no máximo max_concurrency pendentes)"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def one(instruction):
+            async with semaphore:
+                return await self.generate(instruction, table_name, **options)
+
+        return await asyncio.gather(*(one(instruction) for instruction in instructions))
+
+    async def aclose(self):
+        if isinstance(self.toqan, AsyncToqanAPIClient):
+            await self.toqan.aclose()
+        self.close()
+
+    def close(self):
+        self.io_executor.shutdown(wait=False)
+        self.cpu_executor.shutdown(wait=False)
@@ -0,0 +1,238 @@
+"""
+Batch Planner - Planejamento conjunto de várias perguntas
+Recebe as queries planejadas para um lote de perguntas (ex: 40 células
+=perguntarToqan recalculadas juntas) e monta o menor conjunto de queries
+compartilhadas: SQL idêntico é executado uma vez, séries mensais com filtros
+de mês diferentes viram uma única query sobre a união dos meses, e rankings
+por categoria em meses diferentes viram uma query agrupada por categoria e
+mês (SUM/COUNT), recombinada por pergunta. Cada membro recebe uma função que
+recorta sua resposta do resultado compartilhado.
+"""
+
+import os
+import re
+
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv('BISCOITAO_BATCH_CONCURRENCY', '4'))
+MAX_BATCH_QUESTIONS = int(os.getenv('BISCOITAO_BATCH_MAX_QUESTIONS', '100'))
+
+_QUERY_PATTERN = re.compile(
+    r"^SELECT (?P<select>.+?) FROM (?P<table>[\w.\"$]+)(?: WHERE (?P<where>.+?))? "
+    r"GROUP BY (?P<group>.+?) ORDER BY (?P<order>.+?)(?: LIMIT (?P<limit>\d+))?$",
+    re.IGNORECASE
+)
+# Ano/mês: colunas de partição (year, month) ou EXTRACT sobre uma coluna de data
+_YEAR = r"(year|EXTRACT\(YEAR FROM \w+\))"
+_MONTH = r"(month|EXTRACT\(MONTH FROM \w+\))"
+_YEAR_MONTH_TERM = re.compile(rf"^\(?{_YEAR}=(\d{{4}}) AND {_MONTH}=(\d{{1,2}})\)?$", re.IGNORECASE)
+_YEAR_TERM = re.compile(rf"^{_YEAR}=(\d{{4}})$", re.IGNORECASE)
+_TEMPORAL_GROUP = re.compile(rf"^{_YEAR}, {_MONTH}$", re.IGNORECASE)
+_CATEGORY_SELECT = re.compile(
+    r"^(?P<category>\w+) as category, AVG\((?P<value>\w+)\) as avg_value, COUNT\(\*\) as record_count$",
+    re.IGNORECASE)
+
+def normalize_sql(sql):
+    return " ".join(sql.split())
+
+def parse_query(sql):
+    """Partes de uma query gerada pelo AdvancedQueryBuilder (None se fora do formato)"""
+    match = _QUERY_PATTERN.match(normalize_sql(sql))
+    if not match:
+        return None
+    parts = match.groupdict()
+    parts['limit'] = int(parts['limit']) if parts['limit'] else None
+    return parts
+
+def parse_month_filter(where):
+    """
+    Meses cobertos pelo filtro de data do AdvancedQueryBuilder.
+
+    Returns:
+        tuple | None: ((expressão de ano, de mês), termos SQL, períodos {(ano, mês|None)}),
+        (None, [], None) sem filtro, ou None se o filtro não é só de meses/anos
+        (ex: datas relativas, que não podem ser recortadas depois).
+    """
+    if not where:
+        return None, [], None
+    terms = [term.strip() for term in where.split(" OR ")]
+    column = None
+    periods = set()
+    for term in terms:
+        match = _YEAR_MONTH_TERM.match(term)
+        if match and _same_source(match.group(1), match.group(3)):
+            term_column, period = (match.group(1), match.group(3)), (int(match.group(2)), int(match.group(4)))
+        else:
+            match = _YEAR_TERM.match(term)
+            if not match:
+                return None
+            term_column, period = (match.group(1), _month_of(match.group(1))), (int(match.group(2)), None)
+        if column not in (None, term_column):
+            return None
+        column = term_column
+        periods.add(period)
+    return column, terms, periods
+
+def _month_of(year_expr):
+    """Expressão de mês que acompanha a de ano (mesma coluna de data)"""
+    return re.sub(r"\bYEAR\b", "MONTH", year_expr, flags=re.IGNORECASE) if '(' in year_expr else 'month'
+
+def _same_source(year_expr, month_expr):
+    return _month_of(year_expr).lower() == month_expr.lower()
+
+def _in_periods(data, periods):
+    """Máscara das linhas (year, month) dentro dos períodos (None = todos)"""
+    if periods is None:
+        return slice(None)
+    years = data['year'].astype(int)
+    months = data['month'].astype(int)
+    mask = years < 0
+    for year, month in periods:
+        mask |= (years == year) if month is None else ((years == year) & (months == month))
+    return mask
+
+def _temporal_slicer(periods):
+    def slicer(data):
+        return data.loc[_in_periods(data, periods)].reset_index(drop=True)
+    return slicer
+
+def _category_slicer(periods, limit):
+    def slicer(data):
+        rows = data.loc[_in_periods(data, periods)]
+        grouped = rows.groupby('category', as_index=False, dropna=False)[['sum_value', 'value_count', 'record_count']].sum()
+        # AVG do Trino = soma dos não nulos / quantidade de não nulos
+        grouped['avg_value'] = grouped['sum_value'] / grouped['value_count'].where(grouped['value_count'] > 0)
+        grouped['record_count'] = grouped['record_count'].astype('int64')
+        ranked = grouped.sort_values('avg_value', ascending=False, na_position='last', kind='stable')
+        if limit:
+            ranked = ranked.head(limit)
+        return ranked[['category', 'avg_value', 'record_count']].reset_index(drop=True)
+    return slicer
+
+def _identity(data):
+    return data
+
+class SharedQuery:
+    """Query executada uma vez e recortada para cada pergunta do lote"""
+
+    def __init__(self, sql, source, kind):
+        self.sql = sql
+        self.source = source
+        self.kind = kind  # single | dedup | temporal | category
+        self.members = []  # (índice da pergunta, recorte)
+
+    def to_dict(self):
+        return {'sql': self.sql, 'source': self.source, 'kind': self.kind,
+                'questions': [index for index, _ in self.members]}
+
+class BatchPlanner:
+    """Agrupa as queries de um lote em queries compartilhadas"""
+
+    def __init__(self, merge=True):
+        self.merge = merge
+
+    def plan(self, planned):
+        """
+        Args:
+            planned (list): (índice, sql, source) de cada pergunta com plano.
+
+        Returns:
+            list: SharedQuery em ordem de primeira aparição.
+        """
+        order = []     # SharedQuery ou chave de família, na ordem de aparição
+        singles = {}   # (source, SQL normalizado) -> SharedQuery
+        families = {}  # chave -> membros que podem ser unidos
+
+        for index, sql, source in planned:
+            family = self._family(sql) if self.merge and source == 'trino' else None
+            if family is not None:
+                key, parts, month_filter = family
+                if key not in families:
+                    families[key] = []
+                    order.append(key)
+                families[key].append((index, sql, parts, month_filter))
+                continue
+
+            normalized = (source, normalize_sql(sql))
+            query = singles.get(normalized)
+            if query is None:
+                query = singles[normalized] = SharedQuery(sql, source, 'single')
+                order.append(query)
+            else:
+                query.kind = 'dedup'
+            query.members.append((index, _identity))
+
+        plan = []
+        for item in order:
+            plan.extend([item] if isinstance(item, SharedQuery) else self._merge_family(item, families[item]))
+        return plan
+
+    def _family(self, sql):
+        """Chave de agrupamento para queries que podem ser unidas por mês"""
+        parts = parse_query(sql)
+        if parts is None:
+            return None
+        month_filter = parse_month_filter(parts['where'])
+        if month_filter is None:
+            return None
+        column = month_filter[0]
+
+        temporal = _TEMPORAL_GROUP.match(parts['group'])
+        if temporal and _same_source(*temporal.groups()) and column in (None, temporal.groups()):
+            key = ('temporal', parts['table'], parts['select'], parts['group'], parts['order'], parts['limit'])
+            return key, parts, month_filter
+
+        category = _CATEGORY_SELECT.match(parts['select'])
+        if category and parts['group'] == category.group('category') \
+                and parts['order'].lower() == 'avg_value desc':
+            key = ('category', parts['table'], category.group('category'), category.group('value'), parts['limit'])
+            return key, parts, month_filter
+        return None
+
+    def _merge_family(self, key, members):
+        distinct = {}
+        for index, sql, parts, month_filter in members:
+            distinct.setdefault(normalize_sql(sql), []).append((index, sql, parts, month_filter))
+
+        if len(distinct) == 1:
+            # Mesma query repetida: executa o SQL original (mesma chave de cache da rota individual)
+            (sql_members,) = distinct.values()
+            query = SharedQuery(sql_members[0][1], 'trino', 'single' if len(sql_members) == 1 else 'dedup')
+            query.members.extend((index, _identity) for index, *_ in sql_members)
+            return [query]
+
+        kind = key[0]
+        parts = members[0][2]
+        unfiltered = any(month_filter[2] is None for *_, month_filter in members)
+        terms = []
+        for *_, (_, member_terms, _) in members:
+            terms.extend(term for term in member_terms if term not in terms)
+        where = "" if unfiltered else f"WHERE {' OR '.join(terms)}"
+
+        if kind == 'temporal':
+            sql = (f"SELECT {parts['select']} FROM {parts['table']} {where} "
+                   f"GROUP BY {parts['group']} ORDER BY {parts['order']}")
+            if parts['limit']:
+                sql += f" LIMIT {parts['limit']}"
+            query = SharedQuery(sql, 'trino', 'temporal')
+            query.members.extend((index, _temporal_slicer(month_filter[2]))
+                                 for index, _, _, month_filter in members)
+            return [query]
+
+        _, table, category, value, limit = key
+        # Filtros distintos implicam ao menos um membro com filtro de data
+        year_expr, month_expr = next(month_filter[0] for *_, month_filter in members if month_filter[0])
+        sql = f"""
+        SELECT
+            {category} as category,
+            {year_expr} as year,
+            {month_expr} as month,
+            SUM({value}) as sum_value,
+            COUNT({value}) as value_count,
+            COUNT(*) as record_count
+        FROM {table}
+        {where}
+        GROUP BY {category}, {year_expr}, {month_expr}
+        """
+        query = SharedQuery(sql.strip(), 'trino', 'category')
+        query.members.extend((index, _category_slicer(month_filter[2], limit))
+                             for index, _, _, month_filter in members)
+        return [query]
@@ -0,0 +1,324 @@
+"""
+Conversation Store - Armazenamento das conversas do Google Sheets
+Guarda a resposta de cada conversation_id com limite de entradas, limite de
+bytes e expiração por tempo (TTL). Duas implementações com a mesma interface:
+memória (LRU, só do processo) e SQLite (compartilhada entre os workers do
+servidor, como o cache de resultados). Despejos são contados em /metrics.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.metrics import REGISTRY
+from src.core.prefork import register_fork_safe, abandon
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_BACKEND = os.getenv('BISCOITAO_CONVERSATION_STORE', 'sqlite')
+DEFAULT_STORE_PATH = os.getenv(
+    'BISCOITAO_CONVERSATION_DB',
+    os.path.join(PROJECT_ROOT, 'output', 'cache', 'conversations.sqlite')
+)
+DEFAULT_TTL = float(os.getenv('BISCOITAO_CONVERSATION_TTL', str(24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv('BISCOITAO_CONVERSATION_MAX_ENTRIES', '1000'))
+DEFAULT_MAX_BYTES = int(os.getenv('BISCOITAO_CONVERSATION_MAX_BYTES', str(50 * 1024 * 1024)))
+
+STORE_REQUESTS = REGISTRY.counter(
+    'biscoitao_conversation_store_requests_total', 'Leituras de conversas (result = hit|miss|expired)',
+    ['backend', 'result'])
+STORE_EVICTIONS = REGISTRY.counter(
+    'biscoitao_conversation_store_evictions_total',
+    'Conversas removidas (reason = ttl|entries|bytes|oversized)', ['backend', 'reason'])
+# Um valor por worker: o store em memória é de cada processo, o SQLite é o mesmo para todos
+STORE_ENTRIES = REGISTRY.gauge(
+    'biscoitao_conversation_store_entries', 'Conversas armazenadas', ['backend'], multiprocess_mode='liveall')
+STORE_BYTES = REGISTRY.gauge(
+    'biscoitao_conversation_store_bytes', 'Tamanho serializado das conversas armazenadas', ['backend'],
+    multiprocess_mode='liveall')
+
+def _serialize(data):
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+class ConversationStore:
+    """Interface comum: conversation_id -> resposta (dict serializável em JSON)"""
+
+    backend = None
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def get(self, conversation_id, default=None):
+        raise NotImplementedError
+
+    def put(self, conversation_id, data):
+        raise NotImplementedError
+
+    def delete(self, conversation_id):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Remove as conversas expiradas; retorna quantas saíram"""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def __contains__(self, conversation_id):
+        return self.get(conversation_id) is not None
+
+    def __getitem__(self, conversation_id):
+        data = self.get(conversation_id)
+        if data is None:
+            raise KeyError(conversation_id)
+        return data
+
+    def __setitem__(self, conversation_id, data):
+        self.put(conversation_id, data)
+
+    def _oversized(self, size):
+        if self.max_bytes and size > self.max_bytes:
+            print(f"⚠️ Conversa com {size} bytes excede o limite de {self.max_bytes}; não armazenada")
+            STORE_EVICTIONS.inc(backend=self.backend, reason='oversized')
+            return True
+        return False
+
+    def _report(self, entries, size):
+        STORE_ENTRIES.set(entries, backend=self.backend)
+        STORE_BYTES.set(size, backend=self.backend)
+
+class MemoryConversationStore(ConversationStore):
+    """LRU com TTL em memória (conversas se perdem ao reiniciar o processo)"""
+
+    backend = 'memory'
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 clock=time.monotonic):
+        super().__init__(ttl, max_entries, max_bytes)
+        self.clock = clock
+        self._entries = OrderedDict()  # id -> (expira_em, tamanho, payload serializado)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id, default=None):
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                STORE_REQUESTS.inc(backend=self.backend, result='miss')
+                return default
+            if entry[0] <= self.clock():
+                self._remove(conversation_id, 'ttl')
+                STORE_REQUESTS.inc(backend=self.backend, result='expired')
+                self._report(len(self._entries), self._bytes)
+                return default
+            self._entries.move_to_end(conversation_id)
+            payload = entry[2]
+        STORE_REQUESTS.inc(backend=self.backend, result='hit')
+        return json.loads(payload)
+
+    def put(self, conversation_id, data):
+        payload = _serialize(data)
+        size = len(payload.encode('utf-8'))
+        if self._oversized(size):
+            return False
+        with self._lock:
+            if conversation_id in self._entries:
+                self._bytes -= self._entries.pop(conversation_id)[1]
+            self._entries[conversation_id] = (self.clock() + self.ttl, size, payload)
+            self._bytes += size
+            self._purge_expired()
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)), 'entries')
+            while self.max_bytes and self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), 'bytes')
+            self._report(len(self._entries), self._bytes)
+        return True
+
+    def delete(self, conversation_id):
+        with self._lock:
+            entry = self._entries.pop(conversation_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+            self._report(len(self._entries), self._bytes)
+        return entry is not None
+
+    def purge_expired(self):
+        with self._lock:
+            removed = self._purge_expired()
+            self._report(len(self._entries), self._bytes)
+        return removed
+
+    def _purge_expired(self):
+        now = self.clock()
+        expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key, 'ttl')
+        return len(expired)
+
+    def _remove(self, conversation_id, reason):
+        self._bytes -= self._entries.pop(conversation_id)[1]
+        STORE_EVICTIONS.inc(backend=self.backend, reason=reason)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': self.backend, 'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_entries': self.max_entries, 'max_bytes': self.max_bytes, 'ttl': self.ttl}
+
+class SQLiteConversationStore(ConversationStore):
+    """LRU com TTL em SQLite, compartilhado entre processos (WAL)"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path=DEFAULT_STORE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, clock=time.time):
+        super().__init__(ttl, max_entries, max_bytes)
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.clock = clock  # relógio de parede: os workers comparam os mesmos prazos
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        register_fork_safe(self)
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS conversations_accessed ON conversations (accessed_at)")
+            self.conn.commit()
+
+    def _after_fork(self):
+        abandon(self.conn)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+
+    def get(self, conversation_id, default=None):
+        now = self.clock()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT payload, expires_at FROM conversations WHERE id=?", (conversation_id,)).fetchone()
+            if row is None:
+                STORE_REQUESTS.inc(backend=self.backend, result='miss')
+                return default
+            if row[1] <= now:
+                self.conn.execute("DELETE FROM conversations WHERE id=?", (conversation_id,))
+                self.conn.commit()
+                STORE_EVICTIONS.inc(backend=self.backend, reason='ttl')
+                STORE_REQUESTS.inc(backend=self.backend, result='expired')
+                return default
+            self.conn.execute("UPDATE conversations SET accessed_at=? WHERE id=?", (now, conversation_id))
+            self.conn.commit()
+        STORE_REQUESTS.inc(backend=self.backend, result='hit')
+        return json.loads(row[0])
+
+    def put(self, conversation_id, data):
+        payload = _serialize(data)
+        size = len(payload.encode('utf-8'))
+        if self._oversized(size):
+            return False
+        now = self.clock()
+        with self._lock:
+            # BEGIN IMMEDIATE: outro worker não intercala a inserção e o despejo
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("""
+                    INSERT INTO conversations (id, payload, size, accessed_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        payload=excluded.payload, size=excluded.size,
+                        accessed_at=excluded.accessed_at, expires_at=excluded.expires_at
+                """, (conversation_id, payload, size, now, now + self.ttl))
+                self._purge_expired(now)
+                entries, total = self._evict_lru()
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        self._report(entries, total)
+        return True
+
+    def delete(self, conversation_id):
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM conversations WHERE id=?", (conversation_id,))
+            self.conn.commit()
+        return cursor.rowcount > 0
+
+    def purge_expired(self):
+        with self._lock:
+            removed = self._purge_expired(self.clock())
+            self.conn.commit()
+        return removed
+
+    def _purge_expired(self, now):
+        removed = self.conn.execute("DELETE FROM conversations WHERE expires_at <= ?", (now,)).rowcount
+        if removed:
+            STORE_EVICTIONS.inc(removed, backend=self.backend, reason='ttl')
+        return removed
+
+    def _evict_lru(self):
+        """Remove as conversas menos acessadas até caber nos limites"""
+        entries, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conversations").fetchone()
+        if (not self.max_entries or entries <= self.max_entries) and (not self.max_bytes or total <= self.max_bytes):
+            return entries, total
+
+        victims = {'entries': [], 'bytes': []}
+        for conversation_id, size in self.conn.execute(
+                "SELECT id, size FROM conversations ORDER BY accessed_at, id"):
+            if self.max_entries and entries > self.max_entries:
+                victims['entries'].append(conversation_id)
+            elif self.max_bytes and total > self.max_bytes:
+                victims['bytes'].append(conversation_id)
+            else:
+                break
+            entries -= 1
+            total -= size
+        for reason, ids in victims.items():
+            if ids:
+                self.conn.executemany("DELETE FROM conversations WHERE id=?", [(key,) for key in ids])
+                STORE_EVICTIONS.inc(len(ids), backend=self.backend, reason=reason)
+        return entries, total
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            entries, total = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conversations").fetchone()
+        self._report(entries, total)
+        return {'backend': self.backend, 'entries': entries, 'bytes': total, 'path': self.path,
+                'max_entries': self.max_entries, 'max_bytes': self.max_bytes, 'ttl': self.ttl}
+
+def create_conversation_store(backend=DEFAULT_BACKEND, **options):
+    """
+    Store configurado por BISCOITAO_CONVERSATION_STORE (sqlite | memory).
+
+    Se o SQLite não puder ser aberto, cai para memória (conversas por processo).
+    """
+    if backend == 'sqlite':
+        try:
+            return SQLiteConversationStore(**options)
+        except Exception as e:
+            print(f"⚠️ Store de conversas em SQLite indisponível, usando memória: {e}")
+            options.pop('path', None)
+    elif backend != 'memory':
+        raise ValueError(f"Store de conversas desconhecido: {backend} (use sqlite ou memory)")
+    return MemoryConversationStore(**options)
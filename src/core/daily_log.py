@@ -0,0 +1,105 @@
+"""
+Daily Log - Logs JSON-lines com um arquivo por dia, seguros entre workers
+Com o servidor pré-fork vários processos escrevem no mesmo log: um
+RotatingFileHandler em cada worker rotaciona o arquivo por conta própria e
+perde ou mistura linhas. Aqui não há rotação: cada registro é um único
+write() com O_APPEND no arquivo do dia (questions.2024-05-31.jsonl ao lado
+do caminho configurado), a leitura dos últimos N dias só abre os arquivos da
+janela e dias além da retenção são apagados (uma varredura por dia em cada
+processo). Usado pelo log de perguntas, de queries lentas e de traces.
+"""
+
+import os
+import glob
+import json
+import threading
+from datetime import datetime, timedelta
+
+class DailyJsonLog:
+    """Log append-only em JSON-lines, um arquivo por dia, com retenção em dias"""
+
+    def __init__(self, path, retention_days=30):
+        """
+        Args:
+            path (str): Caminho base (o arquivo do dia ganha a data antes da extensão).
+            retention_days (int): Dias mantidos (0 = sem limite).
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._pruned_on = None
+
+    def day_path(self, day):
+        """Arquivo do dia (date ou 'AAAA-MM-DD')"""
+        root, extension = os.path.splitext(self.path)
+        return f"{root}.{day}{extension}"
+
+    def legacy_files(self):
+        """Arquivo único (e backups .1, .2, ... da rotação por tamanho) anteriores à divisão por dia"""
+        backups = sorted(glob.glob(f"{glob.escape(self.path)}.[0-9]*"),
+                         key=lambda path: int(path.rsplit('.', 1)[1]) if path.rsplit('.', 1)[1].isdigit() else 0,
+                         reverse=True)
+        return backups + ([self.path] if os.path.exists(self.path) else [])
+
+    def files(self, days=None):
+        """Arquivos do log (só os dos últimos N dias, se dado), do mais antigo para o mais novo"""
+        root, extension = os.path.splitext(self.path)
+        files = sorted(glob.glob(f"{glob.escape(root)}.????-??-??{extension}"))
+        if days:
+            oldest = self.day_path((datetime.now() - timedelta(days=days)).date())
+            files = [path for path in files if path >= oldest]
+        # Arquivos anteriores à divisão por dia: lidos até sair da retenção
+        return self.legacy_files() + files
+
+    def prune(self):
+        """Apaga os dias além da retenção"""
+        if not self.retention_days:
+            return
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        oldest = self.day_path(cutoff.date())
+        legacy = set(self.legacy_files())
+        for path in self.files():
+            # Arquivos antigos: apagados quando nada neles foi escrito dentro da retenção
+            expired = os.path.getmtime(path) < cutoff.timestamp() if path in legacy else path < oldest
+            if expired:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # outro worker já apagou
+
+    def append(self, *entries):
+        """Grava registros (dicts ou linhas JSON prontas) no arquivo do dia numa única escrita"""
+        lines = [entry if isinstance(entry, str) else json.dumps(entry, ensure_ascii=False, default=str)
+                 for entry in entries]
+        data = ''.join(line + '\n' for line in lines).encode('utf-8')
+        today = datetime.now().date()
+        # O_APPEND + um write(): registros de workers diferentes não se intercalam
+        fd = os.open(self.day_path(today), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        with self._lock:
+            if self._pruned_on == today:
+                return
+            self._pruned_on = today
+        self.prune()
+
+    def entries(self, days=None):
+        """Registros do log (opcionalmente só dos últimos N dias, pelo campo timestamp)"""
+        since = (datetime.now() - timedelta(days=days)).isoformat() if days else None
+        entries = []
+        for path in self.files(days):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if since is None or entry.get('timestamp', '') >= since:
+                            entries.append(entry)
+            except FileNotFoundError:
+                continue  # apagado pela retenção durante a leitura
+        return entries
@@ -0,0 +1,161 @@
+"""
+Deadline - Prazo e cancelamento por requisição
+Contexto propagado via contextvars desde os endpoints Flask até a execução no
+Trino, o polling do Toqan, a renderização de gráficos e a conversão de PDF.
+Quando o cliente desiste (o Apps Script corta em 30s), o trabalho em andamento
+é interrompido e contabilizado como abandonado.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv('BISCOITAO_REQUEST_TIMEOUT', '28'))
+
+class DeadlineExceeded(Exception):
+    """Prazo da requisição esgotado: o trabalho restante deve ser abandonado"""
+
+    def __init__(self, stage):
+        super().__init__(f"Prazo da requisição esgotado durante '{stage}'")
+        self.stage = stage
+
+class RequestDeadline:
+    """Prazo de uma requisição com callbacks de cancelamento"""
+
+    def __init__(self, timeout, request_id=None, loop=None):
+        self.timeout = timeout
+        self.request_id = request_id
+        self.expires_at = time.monotonic() + timeout
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if loop is not None:
+            # Servidor assíncrono: o próprio event loop dispara o prazo (sem uma thread por requisição)
+            self._timer = loop.call_later(max(timeout, 0), self.cancel)
+            return
+        # Dispara os cancelamentos mesmo com a thread da requisição bloqueada (ex: fetch do Trino)
+        self._timer = threading.Timer(max(timeout, 0), self.cancel)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def remaining(self):
+        """Segundos restantes até o prazo (nunca negativo)"""
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self._cancelled.is_set() or time.monotonic() >= self.expires_at
+
+    def cancel(self):
+        """Marca a requisição como abandonada e executa os callbacks registrados"""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Falha ao cancelar trabalho pendente: {e}")
+
+    def register(self, callback):
+        """Registra callback de cancelamento; retorna função para removê-lo"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            callback()
+            return lambda: None
+
+        def unregister():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+        return unregister
+
+    def check(self, stage):
+        """Levanta DeadlineExceeded se o prazo acabou"""
+        if self.expired():
+            record_abandoned(stage)
+            raise DeadlineExceeded(stage)
+
+    def sleep(self, seconds, stage):
+        """Dorme no máximo até o prazo, acordando na hora se a requisição for cancelada"""
+        self.check(stage)
+        if self._cancelled.wait(min(seconds, self.remaining())) or self.expired():
+            record_abandoned(stage)
+            raise DeadlineExceeded(stage)
+
+    def close(self):
+        self._timer.cancel()
+
+_current_deadline = contextvars.ContextVar('biscoitao_deadline', default=None)
+
+def current_deadline():
+    """Prazo da requisição atual (None fora de uma requisição)"""
+    return _current_deadline.get()
+
+@contextmanager
+def deadline_scope(timeout=DEFAULT_REQUEST_TIMEOUT, request_id=None, loop=None):
+    """Define o prazo para todo o trabalho executado dentro do bloco (loop: agenda no event loop)"""
+    deadline = RequestDeadline(timeout, request_id, loop)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+        deadline.close()
+
+def check_deadline(stage):
+    """Interrompe o estágio atual se o prazo da requisição acabou"""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check(stage)
+
+def remaining_time(default=None):
+    """Tempo restante da requisição, limitado por default (para timeouts de I/O)"""
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    return remaining if default is None else min(default, remaining)
+
+def deadline_sleep(seconds, stage):
+    """time.sleep que respeita o prazo da requisição"""
+    deadline = current_deadline()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds, stage)
+
+async def async_deadline_sleep(seconds, stage):
+    """asyncio.sleep que respeita o prazo da requisição (não ocupa thread enquanto espera)"""
+    deadline = current_deadline()
+    if deadline is None:
+        await asyncio.sleep(seconds)
+        return
+    deadline.check(stage)
+    await asyncio.sleep(min(seconds, deadline.remaining()))
+    deadline.check(stage)
+
+# Contadores de trabalho abandonado por estágio
+_abandoned_lock = threading.Lock()
+_abandoned_work = {}
+
+def record_abandoned(stage):
+    with _abandoned_lock:
+        _abandoned_work[stage] = _abandoned_work.get(stage, 0) + 1
+
+def abandoned_work_counts():
+    """Quantas vezes cada estágio foi abandonado por prazo esgotado"""
+    with _abandoned_lock:
+        return dict(_abandoned_work)
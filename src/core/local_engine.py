@@ -0,0 +1,230 @@
+"""
+Local Engine - Substituto local do Trino para desenvolvimento e benchmarks
+Carrega em DuckDB um dw.monetization_total sintético (mesmo schema do
+datalake, ver scripts/pyhive_trino_example.csv) com tamanho, quantidade de
+partições e assimetria configuráveis, e traduz o pouco de SQL específico do
+Trino usado pelo Biscoitão (DESCRIBE, SHOW TABLES, $partitions, ...).
+
+Uso: BISCOITAO_QUERY_BACKEND=local python archive/visual_assistant.py "..."
+"""
+
+import os
+import re
+import sys
+import threading
+import itertools
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # DuckDB é opcional: só necessário para o backend local
+    duckdb = None
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.query import QueryHandle
+
+DEFAULT_ROWS = int(os.getenv('BISCOITAO_LOCAL_ROWS', '200000'))
+DEFAULT_DAYS = int(os.getenv('BISCOITAO_LOCAL_DAYS', '365'))
+DEFAULT_SKEW = float(os.getenv('BISCOITAO_LOCAL_SKEW', '1.1'))
+DEFAULT_LATENCY = float(os.getenv('BISCOITAO_LOCAL_LATENCY', '0'))
+DEFAULT_SEED = int(os.getenv('BISCOITAO_LOCAL_SEED', '42'))
+
+TABLE_NAME = 'dw.monetization_total'
+
+# Regras de tradução Trino -> DuckDB (padrão, substituição)
+SQL_TRANSLATIONS = [
+    (re.compile(r"^\s*DESCRIBE\s+([\w.\"$]+)\s*;?\s*$", re.IGNORECASE),
+     r"""SELECT column_name AS "Column", lower(column_type) AS "Type",
+                CASE WHEN column_name IN ('year', 'month', 'day') THEN 'partition key' ELSE '' END AS "Extra",
+                '' AS "Comment" FROM (DESCRIBE \1)"""),
+    (re.compile(r"^\s*SHOW\s+TABLES(?:\s+(?:FROM|IN)\s+(\w+))?\s*;?\s*$", re.IGNORECASE),
+     lambda m: ("SELECT table_name AS \"Table\" FROM information_schema.tables "
+                f"WHERE table_schema = '{m.group(1) or 'dw'}' AND table_type = 'BASE TABLE' ORDER BY 1")),
+    (re.compile(r"\bapprox_distinct\s*\(", re.IGNORECASE), "approx_count_distinct("),
+    (re.compile(r"\bapprox_percentile\s*\(", re.IGNORECASE), "quantile_cont("),
+    (re.compile(r"TABLESAMPLE\s+BERNOULLI\s*\(\s*([\d.]+)\s*\)", re.IGNORECASE), r"TABLESAMPLE \1% (bernoulli)"),
+    (re.compile(r"TABLESAMPLE\s+SYSTEM\s*\(\s*([\d.]+)\s*\)", re.IGNORECASE), r"TABLESAMPLE \1% (system)"),
+]
+
+def translate_sql(sql):
+    """Adapta SQL do Trino para o dialeto do DuckDB"""
+    for pattern, replacement in SQL_TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+def generate_monetization_data(rows=DEFAULT_ROWS, days=DEFAULT_DAYS, skew=DEFAULT_SKEW,
+                               seed=DEFAULT_SEED, end_date=None):
+    """
+    Gera um dw.monetization_total sintético.
+
+    Args:
+        rows (int): Quantidade de anúncios.
+        days (int): Quantidade de partições diárias (terminando em end_date).
+        skew (float): Expoente da lei de potência de categorias/usuários (0 = uniforme).
+        seed (int): Semente para resultados reprodutíveis.
+        end_date (date): Última partição (padrão: ontem).
+
+    Returns:
+        pd.DataFrame: Dados com o schema de dw.monetization_total.
+    """
+    rng = np.random.default_rng(seed)
+    end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+    start = pd.Timestamp(end_date) - pd.Timedelta(days=days - 1)
+
+    # Partições com sazonalidade semanal e leve crescimento ao longo do período
+    day_index = np.arange(days)
+    day_weights = (1 + 0.3 * np.sin(2 * np.pi * day_index / 7)) * (1 + 0.5 * day_index / max(days, 1))
+    day_offsets = rng.choice(days, size=rows, p=day_weights / day_weights.sum())
+    seconds = rng.integers(0, 86400, size=rows)
+    creation_ts = start + pd.to_timedelta(day_offsets, unit='D') + pd.to_timedelta(seconds, unit='s')
+
+    categories = np.arange(1, 121)
+    category_weights = 1.0 / categories ** skew
+    category = rng.choice(categories, size=rows, p=category_weights / category_weights.sum())
+    users = (rng.random(rows) ** (1 + skew) * 500000).astype(np.int64) + 1
+
+    # Preço log-normal com nível por categoria; ~5% sem preço
+    category_level = rng.uniform(3.0, 7.5, size=categories.max() + 1)
+    price = np.round(np.exp(rng.normal(category_level[category], 0.8)), 2)
+    price[rng.random(rows) < 0.05] = np.nan
+
+    approval_ts = creation_ts + pd.to_timedelta(rng.integers(30, 600, size=rows), unit='s')
+    deletion_ts = approval_ts + pd.to_timedelta(rng.integers(1, 90, size=rows), unit='D')
+
+    return pd.DataFrame({
+        'ad_id_pk': np.arange(rows, dtype=np.int64) + 1100000000,
+        'ad_id_nk': rng.integers(870000000, 890000000, size=rows),
+        'list_id_nk': rng.integers(690000000, 700000000, size=rows),
+        'user_id_fk': users,
+        'account_id_fk': users * 7 + 1000,
+        'ad_type_id_fk': rng.choice([1, 2, 3], size=rows, p=[0.8, 0.15, 0.05]),
+        'category_id_fk': category,
+        'platform_id_fk': rng.choice([11, 12, 13, 14], size=rows, p=[0.45, 0.35, 0.15, 0.05]),
+        'ad_lister_type_id_fk': rng.choice([1, 2], size=rows, p=[0.85, 0.15]),
+        'action_type_id_nk': rng.choice(['new', 'edit', 'renew'], size=rows, p=[0.7, 0.2, 0.1]),
+        'reason_removed_detail_id_fk': rng.choice([-1, 1, 2, 3], size=rows),
+        'transition': rng.choice(['user_deleted', 'expired_deleted', 'approved', 'refused'], size=rows,
+                                 p=[0.4, 0.3, 0.25, 0.05]),
+        'location_id_fk': rng.integers(1, 60000, size=rows),
+        'area_id_fk': rng.integers(1, 60, size=rows),
+        'price': price,
+        'phone_hidden': rng.random(rows) < 0.4,
+        'rank_approval': rng.integers(1, 20000, size=rows),
+        'rank_approval_app': rng.integers(1, 2000, size=rows),
+        'recommend_level': np.full(rows, np.nan),
+        'creation_date': creation_ts.normalize(),
+        'creation_ts': creation_ts,
+        'approval_date': approval_ts.normalize(),
+        'approval_ts': approval_ts,
+        'deletion_date': deletion_ts.normalize(),
+        'deletion_ts': deletion_ts,
+        'insert_date': creation_ts.normalize() + pd.Timedelta(days=1, hours=3),
+        'update_date': deletion_ts + pd.Timedelta(days=1),
+        'year': creation_ts.year.astype(np.int32),
+        'month': creation_ts.month.astype(np.int32),
+        'day': creation_ts.day.astype(np.int32),
+    })
+
+class LocalQuery(QueryHandle):
+    """Query executada no DuckDB local, com latência simulada e cancelamento"""
+
+    backend = 'local'
+
+    _ids = itertools.count(1)
+
+    def __init__(self, engine, query):
+        super().__init__(query)
+        self.engine = engine
+        self.cursor = engine.conn.cursor()
+        self._cancel_event = threading.Event()
+        self._query_id = f"local_{datetime.now():%Y%m%d_%H%M%S}_{next(self._ids):05d}"
+
+    @property
+    def query_id(self):
+        return self._query_id
+
+    def _fetch(self):
+        # Latência de fila/rede do cluster, interrompível por cancelamento
+        if self.engine.latency and self._cancel_event.wait(self.engine.latency):
+            raise RuntimeError(f"Query {self.query_id} cancelada")
+        try:
+            return self.cursor.execute(translate_sql(self.query)).df()
+        finally:
+            self.cursor.close()
+
+    def _fetch_arrow(self):
+        if self.engine.latency and self._cancel_event.wait(self.engine.latency):
+            raise RuntimeError(f"Query {self.query_id} cancelada")
+        try:
+            return self.cursor.execute(translate_sql(self.query)).fetch_arrow_table()
+        finally:
+            self.cursor.close()
+
+    def _cancel(self):
+        self._cancel_event.set()
+        self.cursor.interrupt()
+
+class LocalTrinoEngine:
+    """Backend de queries local com dw.monetization_total sintético"""
+
+    name = 'local'
+
+    def __init__(self, rows=DEFAULT_ROWS, days=DEFAULT_DAYS, skew=DEFAULT_SKEW,
+                 seed=DEFAULT_SEED, latency=DEFAULT_LATENCY, path=':memory:'):
+        if duckdb is None:
+            raise ImportError("DuckDB não instalado (pip install duckdb)")
+        self.rows = rows
+        self.days = days
+        self.skew = skew
+        self.seed = seed
+        self.latency = latency
+        self.conn = duckdb.connect(path)
+        self._load()
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv('BISCOITAO_LOCAL_DB', ':memory:'))
+
+    def _load(self):
+        exists = self.conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'dw' AND table_name = 'monetization_total'"
+        ).fetchone()[0]
+        if exists:
+            return  # banco local persistido já carregado
+
+        started_at = datetime.now()
+        data = generate_monetization_data(self.rows, self.days, self.skew, self.seed)
+        self.conn.execute("CREATE SCHEMA IF NOT EXISTS dw")
+        self.conn.register('synthetic_monetization', data)
+        date_columns = ", ".join(f"CAST({col} AS DATE) AS {col}" for col in
+                                 ['creation_date', 'approval_date', 'deletion_date'])
+        self.conn.execute(f"""
+            CREATE TABLE {TABLE_NAME} AS
+            SELECT * REPLACE ({date_columns}) FROM synthetic_monetization ORDER BY year, month, day
+        """)
+        self.conn.unregister('synthetic_monetization')
+        # Metadados de partição no formato do conector Hive do Trino
+        self.conn.execute(f"""
+            CREATE VIEW dw."monetization_total$partitions" AS
+            SELECT DISTINCT year, month, day FROM {TABLE_NAME}
+        """)
+        elapsed = (datetime.now() - started_at).total_seconds()
+        print(f"🧪 Trino local: {self.rows:,} linhas em {self.days} partições (skew={self.skew}) em {elapsed:.1f}s")
+
+    def submit(self, query, arrow=False):
+        # DuckDB já entrega Arrow nativamente: o mesmo handle atende result() e arrow()
+        return LocalQuery(self, query)
+
+    def execute(self, query):
+        return self.submit(query).result()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python local_engine.py \"SELECT ... FROM dw.monetization_total\"")
+        sys.exit(1)
+    engine = LocalTrinoEngine.from_env()
+    print(engine.execute(" ".join(sys.argv[1:])))
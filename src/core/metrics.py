@@ -0,0 +1,444 @@
+"""
+Metrics - Métricas no formato de exposição do Prometheus
+Registro mínimo de contadores, gauges e histogramas (sem dependência do
+prometheus_client), alimentado pelos spans do tracing: latência HTTP por
+endpoint, duração e bytes das queries, acertos de cache, fila de
+renderização, conversão de PDF, rodadas de polling do Toqan e execução
+especulativa.
+
+Pré-fork: cada worker tem seu próprio registro em memória, então um scrape
+respondido por um worker só veria os números dele. Com o modo multiprocesso
+(ligado pelo servidor pré-fork, ver enable_multiprocess) cada processo grava
+periodicamente um retrato do seu registro em BISCOITAO_METRICS_DIR e o
+/metrics soma os retratos de todos: contadores e histogramas de workers que
+morreram continuam na soma (não andam para trás); gauges só contam processos
+vivos (somados, ou um por pid com multiprocess_mode='liveall').
+"""
+
+import os
+import sys
+import glob
+import json
+import math
+import time
+import threading
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.tracing import add_span_listener
+from src.core.deadline import abandoned_work_counts
+from src.core.prefork import register_fork_safe
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+METRICS_DIR = os.getenv('BISCOITAO_METRICS_DIR', os.path.join(PROJECT_ROOT, 'output', 'metrics'))
+FLUSH_INTERVAL = float(os.getenv('BISCOITAO_METRICS_FLUSH_SECONDS', '5'))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Estado serializável (retrato do processo para o modo multiprocesso)"""
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {'type': self.type, 'documentation': self.documentation,
+                'labelnames': list(self.labelnames), 'values': values}
+
+    def merge(self, snapshot, pid=None, alive=True):
+        """Soma o retrato de outro processo a esta métrica"""
+        with self._lock:
+            for key, value in snapshot['values']:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        missing = set(self.labelnames) - set(labels)
+        if missing:
+            raise ValueError(f"Labels faltando em {self.name}: {', '.join(sorted(missing))}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        """
+        multiprocess_mode: 'livesum' soma os processos vivos (ex: requisições em
+        andamento); 'liveall' expõe um valor por pid (ex: tamanho de um recurso compartilhado).
+        """
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def snapshot(self):
+        return {**super().snapshot(), 'multiprocess_mode': self.multiprocess_mode}
+
+    def merge(self, snapshot, pid=None, alive=True):
+        if not alive:
+            return  # valor de um worker que já saiu
+        if self.multiprocess_mode == 'liveall' and pid is not None:
+            if 'pid' not in self.labelnames:
+                self.labelnames += ('pid',)
+            snapshot = {'values': [[list(key) + [str(pid)], value] for key, value in snapshot['values']]}
+        super().merge(snapshot)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), {'buckets': list(s['buckets']), 'sum': s['sum'], 'count': s['count']}]
+                      for key, s in self._values.items()]
+        return {'type': self.type, 'documentation': self.documentation,
+                'labelnames': list(self.labelnames), 'buckets': list(self.buckets[:-1]), 'values': values}
+
+    def merge(self, snapshot, pid=None, alive=True):
+        with self._lock:
+            for key, other in snapshot['values']:
+                state = self._values.setdefault(tuple(key), {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+                state['buckets'] = [a + b for a, b in zip(state['buckets'], other['buckets'])]
+                state['sum'] += other['sum']
+                state['count'] += other['count']
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, {'buckets': list(s['buckets']), 'sum': s['sum'], 'count': s['count']})
+                           for key, s in self._values.items())
+        lines = self.header()
+        for key, state in items:
+            for bound, count in zip(self.buckets, state['buckets']):
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+def _from_snapshot(name, snapshot):
+    """Métrica vazia com o mesmo tipo, labels e buckets do retrato"""
+    if snapshot['type'] == 'histogram':
+        return Histogram(name, snapshot['documentation'], snapshot['labelnames'], snapshot['buckets'])
+    if snapshot['type'] == 'gauge':
+        return Gauge(name, snapshot['documentation'], snapshot['labelnames'],
+                     snapshot.get('multiprocess_mode', 'livesum'))
+    return Counter(name, snapshot['documentation'], snapshot['labelnames'])
+
+class MetricsRegistry:
+    """Conjunto de métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._derived = []
+        self._lock = threading.Lock()
+        self.directory = None  # modo multiprocesso desligado
+        self._flusher = None
+        self._stop = threading.Event()
+        register_fork_safe(self)
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        return self._register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """collector() retorna métricas do processo calculadas na hora da coleta"""
+        self._collectors.append(collector)
+
+    def register_derived(self, derive):
+        """derive(métricas por nome) calcula métricas a partir do total (ex: taxas de acerto)"""
+        self._derived.append(derive)
+
+    def local_metrics(self):
+        """Métricas deste processo (registradas + coletores)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for collector in self._collectors:
+            try:
+                metrics.extend(collector())
+            except Exception as e:
+                print(f"⚠️ Falha ao coletar métricas: {e}")
+        return metrics
+
+    # ------------------------------------------------------------------ multiprocesso
+
+    def enable_multiprocess(self, directory=METRICS_DIR, interval=FLUSH_INTERVAL):
+        """
+        Liga a agregação entre processos (chamado pelo mestre do pré-fork antes
+        de criar os workers): limpa retratos de execuções anteriores e grava o
+        do mestre; cada worker grava o seu a cada interval segundos.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, 'metrics.*.json')):
+            os.remove(path)
+        self.directory = directory
+        self.interval = interval
+        self.flush()
+        self._start_flusher()
+
+    def _snapshot_path(self, pid=None):
+        return os.path.join(self.directory, f"metrics.{pid or os.getpid()}.json")
+
+    def flush(self):
+        """Grava o retrato deste processo (troca atômica do arquivo)"""
+        if self.directory is None:
+            return
+        snapshot = {'pid': os.getpid(), 'metrics': {m.name: m.snapshot() for m in self.local_metrics()}}
+        path = self._snapshot_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(path + '.tmp', path)
+
+    def _start_flusher(self):
+        def loop():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️ Falha ao gravar métricas do processo {os.getpid()}: {e}")
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _release_before_fork(self):
+        self.flush()  # o que o mestre mediu até aqui fica no retrato dele
+
+    def _after_fork(self):
+        """Worker começa do zero (os números herdados já estão no retrato do mestre)"""
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric.reset()
+        if self.directory is None:
+            return
+        # pid reaproveitado de um worker morto: o retrato dele continua somando
+        path = self._snapshot_path()
+        if os.path.exists(path):
+            os.replace(path, os.path.join(self.directory, f"metrics.dead-{os.getpid()}-{time.time_ns()}.json"))
+        self._start_flusher()
+
+    def merged_metrics(self):
+        """Métricas somadas de todos os retratos (ou só as deste processo, fora do modo multiprocesso)"""
+        if self.directory is None:
+            return self.local_metrics()
+        self.flush()
+        merged = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, 'metrics.*.json'))):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # retrato sendo trocado ou removido
+            alive = not os.path.basename(path).startswith('metrics.dead-') and _pid_alive(snapshot['pid'])
+            for name, state in snapshot['metrics'].items():
+                if name not in merged:
+                    merged[name] = _from_snapshot(name, state)
+                merged[name].merge(state, pid=snapshot['pid'], alive=alive)
+        return list(merged.values())
+
+    def render(self):
+        """Texto no formato de exposição 0.0.4 do Prometheus"""
+        metrics = self.merged_metrics()
+        by_name = {metric.name: metric for metric in metrics}
+        for derive in self._derived:
+            try:
+                metrics.extend(derive(by_name))
+            except Exception as e:
+                print(f"⚠️ Falha ao calcular métricas derivadas: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'biscoitao_http_requests_total', 'Requisições HTTP atendidas', ['method', 'endpoint', 'status'])
+HTTP_LATENCY = REGISTRY.histogram(
+    'biscoitao_http_request_duration_seconds', 'Latência das requisições HTTP por endpoint', ['method', 'endpoint'])
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'biscoitao_http_requests_in_flight', 'Requisições HTTP em andamento')
+QUERY_DURATION = REGISTRY.histogram(
+    'biscoitao_query_duration_seconds', 'Duração das queries no backend (Trino ou local)', ['backend', 'status'])
+QUERY_BYTES = REGISTRY.histogram(
+    'biscoitao_query_result_bytes', 'Tamanho em memória dos resultados das queries', ['backend'], BYTES_BUCKETS)
+QUERY_ROWS = REGISTRY.counter(
+    'biscoitao_query_rows_total', 'Linhas retornadas pelas queries', ['backend'])
+CACHE_REQUESTS = REGISTRY.counter(
+    'biscoitao_cache_requests_total', 'Consultas aos caches (result = hit|miss)', ['cache', 'result'])
+RENDER_QUEUE = REGISTRY.gauge(
+    'biscoitao_render_queue_depth', 'Gráficos sendo renderizados neste momento')
+RENDER_DURATION = REGISTRY.histogram(
+    'biscoitao_render_duration_seconds', 'Tempo de renderização de gráficos', ['viz_type'])
+PDF_CONVERSION = REGISTRY.histogram(
+    'biscoitao_pdf_conversion_seconds', 'Tempo de conversão Markdown -> PDF', ['converted'])
+TOQAN_POLLS = REGISTRY.counter(
+    'biscoitao_toqan_polling_rounds_total', 'Rodadas de polling do get_answer do Toqan', ['status_code'])
+TOQAN_CONVERSATIONS = REGISTRY.counter(
+    'biscoitao_toqan_conversations_total', 'Conversas criadas no Toqan', ['status_code'])
+SPECULATIVE_QUERIES = REGISTRY.counter(
+    'biscoitao_speculative_queries_total', 'Queries especulativas por desfecho (hit|miss|miss_discarded|fallback)', ['outcome'])
+SPECULATIVE_SAVED = REGISTRY.histogram(
+    'biscoitao_speculative_saved_seconds', 'Tempo poupado pela sobreposição Toqan + Trino')
+SPECULATIVE_WASTED = REGISTRY.counter(
+    'biscoitao_speculative_wasted_seconds_total',
+    'Tempo de Trino descartado: especulação cancelada (miss) ou SQL do Toqan recusada (miss_discarded)')
+STAGE_DURATION = REGISTRY.histogram(
+    'biscoitao_stage_duration_seconds', 'Duração de cada estágio do pipeline (spans)', ['stage', 'status'])
+
+def _abandoned_work():
+    """Trabalho abandonado por prazo esgotado (contado pelo módulo de prazos)"""
+    abandoned = Counter('biscoitao_abandoned_work_total', 'Trabalho abandonado por prazo esgotado', ['stage'])
+    for stage, count in abandoned_work_counts().items():
+        abandoned.inc(count, stage=stage)
+    return [abandoned]
+
+def _cache_hit_ratio(metrics):
+    """Taxa de acerto por cache, sobre o total de todos os processos"""
+    hit_ratio = Gauge('biscoitao_cache_hit_ratio', 'Fração de acertos por cache desde o início do servidor', ['cache'])
+    requests = metrics.get(CACHE_REQUESTS.name)
+    with requests._lock:
+        values = dict(requests._values)
+    for cache in {cache for cache, _ in values}:
+        hits, misses = values.get((cache, 'hit'), 0), values.get((cache, 'miss'), 0)
+        if hits + misses:
+            hit_ratio.set(hits / (hits + misses), cache=cache)
+    return [hit_ratio]
+
+REGISTRY.register_collector(_abandoned_work)
+REGISTRY.register_derived(_cache_hit_ratio)
+
+def _on_span_start(span):
+    if span.name == 'http.request':
+        HTTP_IN_FLIGHT.inc()
+    elif span.name == 'chart.render':
+        RENDER_QUEUE.inc()
+
+def _on_span_end(span):
+    attributes = span.attributes
+    duration = span.duration or 0.0
+    STAGE_DURATION.observe(duration, stage=span.name, status=span.status)
+
+    if span.name == 'http.request':
+        HTTP_IN_FLIGHT.dec()
+        endpoint = attributes.get('endpoint', 'unmatched')
+        status = attributes.get('status_code', 500 if span.status == 'error' else 200)
+        HTTP_REQUESTS.inc(method=attributes.get('method', ''), endpoint=endpoint, status=status)
+        HTTP_LATENCY.observe(duration, method=attributes.get('method', ''), endpoint=endpoint)
+    elif span.name == 'sql.execute':
+        backend = attributes.get('backend') or 'unknown'
+        QUERY_DURATION.observe(duration, backend=backend, status=span.status)
+        if 'bytes' in attributes:
+            QUERY_BYTES.observe(attributes['bytes'], backend=backend)
+        QUERY_ROWS.inc(attributes.get('rows', 0), backend=backend)
+    elif span.name == 'cache.fetch':
+        CACHE_REQUESTS.inc(cache='result', result='hit' if attributes.get('hit') else 'miss')
+    elif span.name == 'rollup.query':
+        CACHE_REQUESTS.inc(cache='rollup', result='hit' if span.status == 'ok' else 'miss')
+    elif span.name == 'chart.render':
+        RENDER_QUEUE.dec()
+        RENDER_DURATION.observe(duration, viz_type=attributes.get('viz_type', 'unknown'))
+    elif span.name == 'file.write' and attributes.get('format') == 'pdf':
+        PDF_CONVERSION.observe(duration, converted=bool(attributes.get('converted')))
+    elif span.name == 'llm.toqan.get_answer':
+        TOQAN_POLLS.inc(status_code=attributes.get('status_code', 'error'))
+    elif span.name == 'llm.toqan.create_conversation':
+        TOQAN_CONVERSATIONS.inc(status_code=attributes.get('status_code', 'error'))
+    elif span.name == 'speculative.execute' and 'outcome' in attributes:
+        SPECULATIVE_QUERIES.inc(outcome=attributes['outcome'])
+        if attributes['outcome'] in ('miss', 'miss_discarded'):
+            SPECULATIVE_WASTED.inc(attributes.get('wasted_seconds', 0.0))
+        else:
+            SPECULATIVE_SAVED.observe(attributes.get('saved_seconds', 0.0))
+
+add_span_listener(on_start=_on_span_start, on_end=_on_span_end)
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,46 @@
+"""
+Prefork - Recursos que precisam ser reabertos depois de um fork
+Conexões SQLite/DuckDB, executores e threads não sobrevivem ao fork dos
+workers do servidor de produção: cada worker precisa das suas. Os recursos se
+registram aqui e o os.register_at_fork reabre tudo no processo filho (vale
+para o pré-fork próprio e para o gunicorn com preload_app).
+"""
+
+import os
+import weakref
+
+_resources = weakref.WeakSet()
+_abandoned = []  # conexões herdadas: não podem ser usadas nem fechadas no filho
+
+def register_fork_safe(resource):
+    """
+    Registra um recurso com _after_fork() (obrigatório, chamado no filho) e
+    _release_before_fork() (opcional, chamado pelo mestre antes de criar os workers).
+    """
+    _resources.add(resource)
+    return resource
+
+def abandon(handle):
+    """Mantém viva uma conexão herdada do pai (fechá-la no filho liberaria locks do pai)"""
+    if handle is not None:
+        _abandoned.append(handle)
+
+def release_before_fork():
+    """Chamado pelo mestre depois do preload: solta o que os workers vão reabrir"""
+    for resource in list(_resources):
+        release = getattr(resource, '_release_before_fork', None)
+        if release is None:
+            continue
+        try:
+            release()
+        except Exception as e:
+            print(f"⚠️ Falha ao liberar {type(resource).__name__} antes do fork: {e}")
+
+def _after_fork_in_child():
+    for resource in list(_resources):
+        try:
+            resource._after_fork()
+        except Exception as e:
+            print(f"⚠️ Falha ao reabrir {type(resource).__name__} no worker {os.getpid()}: {e}")
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,283 @@
+"""
+Prewarm - Pré-aquecimento das perguntas mais populares
+Antes do expediente, minera o log de perguntas, planeja as top-K via
+AdvancedQueryBuilder, executa (aquecendo o cache de resultados) e pré-renderiza
+gráfico (em cada perfil de renderização), HTML e PDF. O manifesto registra os
+artefatos prontos para que a primeira requisição do dia reaproveite o gráfico
+em vez de renderizar de novo.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.query_log import get_default_log, normalize_question, logging_suppressed
+from src.core.result_cache import cache_ttl_scope, WARM_TTL
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_PREWARM_DIR = os.getenv('BISCOITAO_PREWARM_DIR', os.path.join(PROJECT_ROOT, 'output', 'prewarm'))
+DEFAULT_TOP_K = int(os.getenv('BISCOITAO_PREWARM_TOP_K', '10'))
+DEFAULT_LOOKBACK_DAYS = int(os.getenv('BISCOITAO_PREWARM_DAYS', '14'))
+DEFAULT_PREWARM_AT = os.getenv('BISCOITAO_PREWARM_AT', '07:00')  # antes do expediente
+DEFAULT_FORMATS = tuple(os.getenv('BISCOITAO_PREWARM_FORMATS', 'chart,html').split(','))
+# Perfis de renderização pré-aquecidos (todos saem do mesmo layout do gráfico)
+DEFAULT_PROFILES = tuple(os.getenv('BISCOITAO_PREWARM_PROFILES', 'web,thumbnail').split(','))
+
+def data_fingerprint(data):
+    """Hash do conteúdo de um DataFrame (artefatos só valem para os mesmos dados)"""
+    hashed = pd.util.hash_pandas_object(data, index=False).values.tobytes()
+    return hashlib.sha1(hashed + ",".join(map(str, data.columns)).encode('utf-8')).hexdigest()
+
+class PrewarmManifest:
+    """Artefatos pré-renderizados por pergunta (JSON em disco)"""
+
+    def __init__(self, directory=DEFAULT_PREWARM_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, 'manifest.json')
+        self._lock = threading.Lock()
+        self._entries = None
+        self._mtime = None
+
+    def _load(self):
+        # Recarrega se o job (outro processo) reescreveu o manifesto
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if self._entries is None or mtime != self._mtime:
+            entries = {}
+            if mtime is not None:
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        entries = json.load(f)
+                except ValueError:
+                    entries = {}
+            self._entries, self._mtime = entries, mtime
+        return self._entries
+
+    def entries(self):
+        with self._lock:
+            return dict(self._load())
+
+    def get(self, instruction):
+        with self._lock:
+            return self._load().get(normalize_question(instruction))
+
+    def lookup(self, instruction, query, fingerprint):
+        """Entrada pré-aquecida ainda válida para a mesma query e os mesmos dados"""
+        entry = self.get(instruction)
+        if not entry or entry.get('query') != query:
+            return None
+        if entry.get('data_fingerprint') != fingerprint:
+            return None  # dados mudaram depois do pré-aquecimento
+        chart_file = entry.get('chart_file')
+        if not chart_file or not os.path.exists(chart_file):
+            return None
+        return entry
+
+    def save(self, entries):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._entries, self._mtime = None, None
+
+def _load_pdf_generator():
+    """Gerador de PDF do protótipo (archive/), carregado apenas quando pedido"""
+    archive_dir = os.path.join(PROJECT_ROOT, 'archive')
+    if archive_dir not in sys.path:
+        sys.path.append(archive_dir)
+    from pdf_report_generator import ProfessionalPDFReportGenerator
+    return ProfessionalPDFReportGenerator()
+
+class PrewarmJob:
+    """Executa e pré-renderiza as perguntas mais frequentes"""
+
+    def __init__(self, top_k=DEFAULT_TOP_K, days=DEFAULT_LOOKBACK_DAYS, formats=DEFAULT_FORMATS,
+                 query_log=None, manifest=None, report_generator=None, at=DEFAULT_PREWARM_AT,
+                 profiles=DEFAULT_PROFILES):
+        """
+        Args:
+            top_k (int): Quantas perguntas pré-aquecer.
+            days (int): Janela do log minerada.
+            formats (tuple): Artefatos a gerar: 'chart', 'html' e/ou 'pdf'.
+            at (str): Horário diário (HH:MM) do agendamento.
+            profiles (tuple): Perfis de renderização do gráfico ('web', 'thumbnail', 'print').
+        """
+        self.top_k = top_k
+        self.days = days
+        self.formats = tuple(f.strip() for f in formats if f.strip())
+        self.profiles = [p.strip() for p in profiles if p.strip()]
+        self.query_log = query_log or get_default_log()
+        self.manifest = manifest or PrewarmManifest()
+        self.at = at
+        self._report_generator = report_generator
+        self._html_generator = None
+        self._pdf_generator = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def report_generator(self):
+        if self._report_generator is None:
+            from src.generators.visual_assistant import IntelligentReportGenerator
+            self._report_generator = IntelligentReportGenerator()
+        return self._report_generator
+
+    def candidates(self):
+        """Top-K perguntas do log, já planejadas pelo AdvancedQueryBuilder"""
+        planned = []
+        builder = self.report_generator.query_builder
+        for item in self.query_log.top_questions(self.top_k, self.days):
+            query, viz_type, source = builder.route_query(item['instruction'], item['table'])
+            if not query:
+                print(f"⚠️ Sem plano para: {item['instruction']}")
+                continue
+            planned.append({**item, 'query': query, 'viz_type': viz_type, 'source': source})
+        return planned
+
+    def warm_question(self, candidate):
+        """Executa uma pergunta e gera seus artefatos"""
+        instruction = candidate['instruction']
+        started_at = time.monotonic()
+        # Uma análise por pergunta: HTML e PDF saem do mesmo contexto, sem nova consulta
+        context = self.report_generator.analyze(instruction, candidate['table'], render_profile=self.profiles or None)
+        result = context.report
+        if not result:
+            return None
+
+        entry = {
+            'instruction': instruction,
+            'table': candidate['table'],
+            'count': candidate['count'],
+            'query': result['query'],
+            'viz_type': result['viz_type'],
+            'source': result.get('source'),
+            'data_fingerprint': result['data_fingerprint'],
+            'chart_file': os.path.abspath(result['chart_file']) if result.get('chart_file') else None,
+            'chart_files': {profile: os.path.abspath(path) for profile, path in (result.get('chart_files') or {}).items()},
+            'warmed_at': datetime.now().isoformat()
+        }
+
+        if 'html' in self.formats:
+            if self._html_generator is None:
+                from src.generators.html_generator import HTMLReportGenerator
+                self._html_generator = HTMLReportGenerator()
+                self._html_generator.visual_generator = self.report_generator
+            html = self._html_generator.generate_html_report(instruction, auto_open=False, context=context)
+            entry['html_file'] = os.path.abspath(html['html_file']) if html else None
+
+        if 'pdf' in self.formats:
+            try:
+                if self._pdf_generator is None:
+                    self._pdf_generator = _load_pdf_generator()
+                    self._pdf_generator.visual_generator = self.report_generator
+                pdf = self._pdf_generator.generate_professional_pdf_report(instruction, candidate['table'],
+                                                                           context=context)
+                entry['pdf_file'] = os.path.abspath(pdf['pdf_file']) if pdf and pdf.get('pdf_file') else None
+            except Exception as e:
+                print(f"⚠️ PDF não pré-gerado para '{instruction}': {e}")
+
+        entry['duration'] = round(time.monotonic() - started_at, 2)
+        return entry
+
+    def run(self):
+        """Um ciclo de pré-aquecimento; retorna o resumo"""
+        started_at = time.monotonic()
+        candidates = self.candidates()
+        print(f"🔥 Pré-aquecendo {len(candidates)} perguntas populares ({', '.join(self.formats)})")
+
+        entries = {}
+        failed = 0
+        # Execuções internas não contam como perguntas dos analistas; os resultados
+        # aquecidos valem o expediente inteiro (não o TTL de uma requisição)
+        with logging_suppressed(), cache_ttl_scope(WARM_TTL):
+            for candidate in candidates:
+                try:
+                    entry = self.warm_question(candidate)
+                except Exception as e:
+                    entry = None
+                    print(f"❌ Falha ao pré-aquecer '{candidate['instruction']}': {e}")
+                if entry:
+                    entries[candidate['question']] = entry
+                    print(f"   ✅ {candidate['instruction']} ({entry['duration']}s)")
+                else:
+                    failed += 1
+
+        self.manifest.save(entries)
+        summary = {
+            'warmed': len(entries),
+            'failed': failed,
+            'duration': round(time.monotonic() - started_at, 2),
+            'finished_at': datetime.now().isoformat()
+        }
+        print(f"🔥 Pré-aquecimento concluído: {summary}")
+        return summary
+
+    # ------------------------------------------------------------------ agendamento
+
+    def seconds_until_next_run(self, now=None):
+        now = now or datetime.now()
+        hour, minute = (int(part) for part in self.at.split(':'))
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def run_forever(self):
+        print(f"⏱️ Pré-aquecimento diário às {self.at} (top {self.top_k} dos últimos {self.days} dias)")
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"❌ Erro no pré-aquecimento: {e}")
+
+    def start(self):
+        """Agenda o job em uma thread daemon (uso dentro do Flask)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='prewarm', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+def prewarm_report(days=1):
+    """Taxa de acerto quente + estado do manifesto"""
+    report = get_default_log().warm_hit_report(days)
+    entries = PrewarmManifest().entries()
+    report['prewarmed_questions'] = len(entries)
+    report['last_warmed_at'] = max((e.get('warmed_at', '') for e in entries.values()), default=None)
+    return report
+
+def start_in_process_prewarm(report_generator=None):
+    """Liga o agendamento dentro do processo web se BISCOITAO_PREWARM_IN_PROCESS=1"""
+    if os.getenv('BISCOITAO_PREWARM_IN_PROCESS') != '1':
+        return None
+    job = PrewarmJob(report_generator=report_generator)
+    job.start()
+    return job
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'once'
+    if command == 'once':
+        PrewarmJob().run()
+    elif command == 'schedule':
+        try:
+            PrewarmJob().run_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Pré-aquecimento encerrado")
+    elif command == 'report':
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        print(json.dumps(prewarm_report(days), indent=2, ensure_ascii=False))
+    else:
+        print("Uso: python prewarm.py [once|schedule|report [dias]]")
+        sys.exit(1)
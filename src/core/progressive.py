@@ -0,0 +1,227 @@
+"""
+Progressive - Resposta de uma pergunta em etapas, à medida que ficam prontas
+Em vez de esperar o pipeline inteiro, o analista recebe:
+
+    intent    tipo de gráfico, origem (rollup/trino) e a SQL planejada
+    estimate  resposta aproximada (amostra TABLESAMPLE com margens), quando
+              a consulta exata ainda não terminou
+    table     resultado exato
+    insights  insights automáticos e resposta conversacional
+    chart     URL do gráfico renderizado (ou o gráfico em texto, chart_format='text')
+    done      tempos por etapa (ou 'error' no lugar de qualquer etapa)
+
+A consulta amostrada e a exata são submetidas juntas. As etapas são escritas
+uma única vez (ProgressiveAnswer.steps, um gerador que entrega eventos e
+futures) e consumidas por um driver síncrono (Flask, iter_events) ou
+assíncrono (ASGI, aiter_events). Enquanto espera, o driver emite heartbeats:
+uma stream parada custa uma espera em future, o trabalho roda num pool
+compartilhado e limitado.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from .approximate import ApproximatePlan
+from .deadline import DeadlineExceeded
+from .prefork import register_fork_safe
+from .query_log import log_question
+from .tracing import trace_summary
+
+PROGRESSIVE_WORKERS = int(os.getenv('BISCOITAO_PROGRESSIVE_WORKERS', '32'))
+# matplotlib (pyplot) não é thread-safe: gráficos numa única thread
+PROGRESSIVE_CPU_WORKERS = int(os.getenv('BISCOITAO_PROGRESSIVE_CPU_WORKERS', '1'))
+HEARTBEAT_SECONDS = float(os.getenv('BISCOITAO_SSE_HEARTBEAT', '10'))
+TABLE_ROWS = int(os.getenv('BISCOITAO_PROGRESSIVE_TABLE_ROWS', '200'))
+
+HEARTBEAT = ('heartbeat', None)
+
+def _records(data, limit=TABLE_ROWS):
+    """Linhas do resultado em formato JSON (no máximo limit)"""
+    return {
+        'columns': [str(column) for column in data.columns],
+        'rows': len(data),
+        'records': data.head(limit).to_dict('records'),
+        'truncated': len(data) > limit,
+    }
+
+class ProgressiveAnswer:
+    """Etapas de uma pergunta como eventos (nome, payload), intercaladas com futures"""
+
+    def __init__(self, generator, instruction, table_name="dw.monetization_total", exact=False,
+                 render_chart=True, io_executor=None, cpu_executor=None, chart_url="/chart/{}",
+                 chart_format='png', render_profile=None):
+        self.generator = generator
+        self.instruction = instruction
+        self.table_name = table_name
+        self.exact = exact
+        self.render_chart = render_chart
+        self.io_executor = io_executor or default_executor()
+        self.cpu_executor = cpu_executor or default_executor(cpu=True)
+        self.chart_url = chart_url
+        self.chart_format = chart_format
+        self.render_profile = render_profile
+        self.started_at = time.monotonic()
+        self.timings = {}
+        self.pending = []
+
+    def _submit(self, executor, function, *args, **kwargs):
+        # A thread herda o prazo da requisição e o trace atual
+        future = executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+        self.pending.append(future)
+        return future
+
+    def _event(self, name, payload):
+        self.timings[name] = round(time.monotonic() - self.started_at, 3)
+        payload['elapsed'] = self.timings[name]
+        return name, payload
+
+    def _fetch_exact(self, query, source):
+        if source == 'rollup':
+            return self.generator.query_builder.rollup_store.query(query), True
+        return self.generator._fetch_data(query)
+
+    def cancel(self):
+        """Descarta etapas ainda não iniciadas (cliente desconectou)"""
+        for future in self.pending:
+            future.cancel()
+
+    def steps(self):
+        """Gerador de eventos (nome, payload) e futures; recebe de volta o resultado de cada future"""
+        generator, builder = self.generator, self.generator.query_builder
+        try:
+            query, viz_type, source = yield self._submit(self.io_executor, builder.route_query,
+                                                         self.instruction, self.table_name)
+            if not query:
+                yield self._event('error', {'error': 'Não foi possível gerar query apropriada para esta pergunta'})
+                return
+
+            plan = ApproximatePlan(query) if source == 'trino' and not self.exact else None
+            plan = plan if plan is not None and plan.sql and plan.sampled else None
+            yield self._event('intent', {
+                'question': self.instruction,
+                'intents': builder.detect_visualization_intent(self.instruction),
+                'viz_type': viz_type,
+                'source': source,
+                'sql': query,
+                'sample_sql': plan.sql if plan else None,
+            })
+
+            exact_future = self._submit(self.io_executor, self._fetch_exact, query, source)
+            if plan is not None:
+                sample_future = self._submit(self.io_executor, generator._fetch_data, plan.sql)
+                try:
+                    sample, _ = yield sample_future
+                    estimated = plan.estimate(sample)
+                    if not exact_future.done() and not estimated.empty:
+                        yield self._event('estimate', {
+                            **plan.summary(estimated),
+                            'response': generator._generate_conversational_response(estimated, self.instruction,
+                                                                                    viz_type),
+                            'table': _records(estimated),
+                        })
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ Estimativa por amostragem indisponível: {e}")
+
+            data, cache_hit = yield exact_future
+            if data.empty:
+                yield self._event('error', {'error': 'Nenhum dado encontrado para a consulta', 'sql': query})
+                return
+            yield self._event('table', {'sql': query, 'cache_hit': cache_hit, **_records(data)})
+
+            insights = generator._generate_insights(data, self.instruction, viz_type)
+            response = generator._generate_conversational_response(data, self.instruction, viz_type)
+            yield self._event('insights', {'insights': insights, 'response': response})
+
+            if self.render_chart and self.chart_format == 'text':
+                yield self._event('chart', {'format': 'text',
+                                            'text': generator._render_text_chart(data, self.instruction, viz_type)})
+            elif self.render_chart:
+                chart_file = yield self._submit(self.cpu_executor, generator._render_chart, data.copy(),
+                                                self.instruction, viz_type, None, self.chart_format,
+                                                self.render_profile)
+                yield self._event('chart', {'format': self.chart_format, 'filename': chart_file,
+                                            'download_url': self.chart_url.format(chart_file)})
+
+            log_question(self.instruction, table_name=self.table_name, source=source,
+                         cache_hit=cache_hit or source == 'rollup', prewarmed=False, artifact_hit=False,
+                         duration=time.monotonic() - self.started_at)
+            yield self._event('done', {'timings': dict(self.timings), 'trace': trace_summary()})
+        except DeadlineExceeded as e:
+            yield self._event('error', {'error': 'Prazo da requisição esgotado', 'stage': e.stage})
+        except Exception as e:
+            print(f"❌ Erro na resposta progressiva: {e}")
+            yield self._event('error', {'error': str(e)})
+
+def iter_events(answer, heartbeat=HEARTBEAT_SECONDS):
+    """Driver síncrono: eventos (nome, payload) e HEARTBEAT enquanto espera"""
+    steps = answer.steps()
+    value, error = None, None
+    try:
+        while True:
+            try:
+                item = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration:
+                return
+            value, error = None, None
+            if not isinstance(item, Future):
+                yield item
+                continue
+            while not wait([item], timeout=heartbeat).done:
+                yield HEARTBEAT
+            try:
+                value = item.result()
+            except Exception as e:
+                error = e
+    finally:
+        answer.cancel()
+        steps.close()
+
+async def aiter_events(answer, heartbeat=HEARTBEAT_SECONDS):
+    """Driver assíncrono: cada stream é uma corrotina esperando futures do pool"""
+    steps = answer.steps()
+    value, error = None, None
+    try:
+        while True:
+            try:
+                item = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration:
+                return
+            value, error = None, None
+            if not isinstance(item, Future):
+                yield item
+                continue
+            waiter = asyncio.wrap_future(item)
+            while not (await asyncio.wait({waiter}, timeout=heartbeat))[0]:
+                yield HEARTBEAT
+            try:
+                value = waiter.result()
+            except Exception as e:
+                error = e
+    finally:
+        answer.cancel()
+        steps.close()
+
+class _ProgressiveExecutors:
+    """Pools compartilhados pelas streams do processo (recriados no fork dos workers)"""
+
+    def __init__(self, io_workers=PROGRESSIVE_WORKERS, cpu_workers=PROGRESSIVE_CPU_WORKERS):
+        self.io_workers, self.cpu_workers = io_workers, cpu_workers
+        self._after_fork()
+        register_fork_safe(self)
+
+    def _after_fork(self):
+        self.io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='progressive-io')
+        self.cpu = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix='progressive-cpu')
+
+_default = None
+
+def default_executor(cpu=False):
+    global _default
+    if _default is None:
+        _default = _ProgressiveExecutors()
+    return _default.cpu if cpu else _default.io
@@ -5,21 +5,27 @@ from pyhive import trino
 import os
 from dotenv import load_dotenv
 
-def execute_query(query):
-    """
-    Executa uma query na tabela dw.monetization_total e retorna o resultado como um DataFrame.
+import sys
+import threading
 
-    Args:
-        query (str): A query SQL a ser executada.
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.deadline import current_deadline, check_deadline, record_abandoned, DeadlineExceeded
+from src.core.tracing import span
+from src.core.slow_query_log import record_slow_query
+
+def get_connection():
+    """
+    Abre uma conexão com o Trino usando as credenciais do .env.
 
     Returns:
-        pd.DataFrame: Resultado da query em formato DataFrame.
+        trino.Connection: Conexão DB-API do PyHive.
     """
     load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
     USUARIO_OLX = os.getenv('USUARIO_OLX')
     SENHA_OLX = os.getenv('SENHA_OLX')
 
-    conn = trino.connect(
+    return trino.connect(
         host='trino-gateway.dataeng.bigdata.olxbr.io',
         port=443,
         protocol='https',
@@ -28,10 +34,207 @@ def execute_query(query):
         password=SENHA_OLX
     )
 
-    return pd.read_sql(query, conn)
+class QueryHandle:
+    """Query já submetida a um backend, que pode ser aguardada ou cancelada"""
+
+    backend = None
+
+    def __init__(self, query):
+        check_deadline('trino_submit')
+        self.query = query
+        self.cancelled = False
+
+    @property
+    def query_id(self):
+        return None
+
+    def _fetch(self):
+        """Bloqueia até o fim da query e retorna o DataFrame (implementado pelo backend)"""
+        raise NotImplementedError
+
+    def _cancel(self):
+        raise NotImplementedError
+
+    def _fetch_arrow(self):
+        """Resultado como pyarrow.Table (backends sem caminho Arrow nativo convertem o DataFrame)"""
+        import pyarrow as pa
+        return pa.Table.from_pandas(self._fetch(), preserve_index=False)
+
+    def result(self):
+        """Aguarda o fim da query e retorna o resultado como DataFrame
+        
+        Se a requisição tiver prazo, a query é cancelada no backend assim que
+        ele esgotar, em vez de continuar consumindo o cluster.
+        """
+        return self._collect(self._fetch)
+
+    def arrow(self):
+        """Como result(), mas retorna um pyarrow.Table"""
+        return self._collect(self._fetch_arrow)
+
+    def _collect(self, fetch):
+        current = None
+        try:
+            with span('sql.execute', backend=self.backend, sql=" ".join(self.query.split())[:500]) as current:
+                deadline = current_deadline()
+                unregister = deadline.register(self.cancel) if deadline else None
+                try:
+                    data = fetch()
+                except Exception:
+                    if deadline is not None and deadline.expired():
+                        record_abandoned('trino_query')
+                        raise DeadlineExceeded('trino_query')
+                    raise
+                finally:
+                    if unregister:
+                        unregister()
+                    current.set(query_id=self.query_id)
+                if self.cancelled and deadline is not None and deadline.expired():
+                    record_abandoned('trino_query')
+                    raise DeadlineExceeded('trino_query')
+                nbytes = data.nbytes if hasattr(data, 'nbytes') else data.memory_usage(index=False).sum()
+                current.set(rows=len(data), bytes=int(nbytes))
+                return data
+        finally:
+            # Queries acima do limite vão para o slow-query log (com as estatísticas do Trino)
+            if current is not None:
+                record_slow_query(self, current)
+
+    def cancel(self):
+        """Cancela a query no backend, liberando recursos"""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        try:
+            self._cancel()
+        except Exception as e:
+            print(f"⚠️ Não foi possível cancelar a query {self.query_id}: {e}")
+
+class TrinoQuery(QueryHandle):
+    """Query submetida ao Trino via PyHive"""
+
+    backend = 'trino'
+
+    def __init__(self, query, connection=None):
+        super().__init__(query)
+        self.cursor = (connection or get_connection()).cursor()
+        self.cursor.execute(query)
+
+    @property
+    def query_id(self):
+        """Id da query no Trino (útil para rastrear cancelamentos)"""
+        return getattr(self.cursor, 'last_query_id', None)
+
+    def _fetch(self):
+        rows = self.cursor.fetchall()
+        columns = [col[0] for col in self.cursor.description] if self.cursor.description else []
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+    def _cancel(self):
+        # DELETE no nextUri
+        self.cursor.cancel()
+
+class TrinoBackend:
+    """Backend padrão: cluster Trino do datalake"""
+
+    name = 'trino'
+
+    def submit(self, query, arrow=False):
+        if arrow:
+            # Resultado decodificado direto em colunas Arrow (sem tuplas do DB-API)
+            from src.core.arrow_fetch import ArrowTrinoQuery
+            return ArrowTrinoQuery(query)
+        return TrinoQuery(query)
+
+def _local_backend():
+    from src.core.local_engine import LocalTrinoEngine
+    return LocalTrinoEngine.from_env()
+
+# Backends disponíveis (BISCOITAO_QUERY_BACKEND escolhe qual usar)
+BACKEND_FACTORIES = {
+    'trino': TrinoBackend,
+    'local': _local_backend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def _reset_backend_after_fork():
+    # Conexões do backend (ex: DuckDB do Trino local) não atravessam o fork: recria sob demanda
+    global _backend, _backend_lock
+    _backend = None
+    _backend_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_backend_after_fork)
+
+def register_backend(name, factory):
+    """Registra um backend: factory() retorna objeto com submit(query) -> QueryHandle"""
+    BACKEND_FACTORIES[name] = factory
+
+def set_backend(backend):
+    """Troca o backend do processo (objeto, nome registrado ou None para voltar ao padrão)"""
+    global _backend
+    if isinstance(backend, str):
+        if backend not in BACKEND_FACTORIES:
+            raise ValueError(f"Backend desconhecido: {backend} (disponíveis: {', '.join(BACKEND_FACTORIES)})")
+        backend = BACKEND_FACTORIES[backend]()
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+def get_backend():
+    """Backend atual (criado a partir de BISCOITAO_QUERY_BACKEND na primeira chamada)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.getenv('BISCOITAO_QUERY_BACKEND', 'trino')
+            if name not in BACKEND_FACTORIES:
+                raise ValueError(f"Backend desconhecido: {name} (disponíveis: {', '.join(BACKEND_FACTORIES)})")
+            _backend = BACKEND_FACTORIES[name]()
+        return _backend
+
+def submit_query(query, arrow=False):
+    """
+    Submete uma query ao backend atual sem aguardar o resultado.
+
+    Args:
+        query (str): A query SQL a ser executada.
+        arrow (bool): Usa o caminho de leitura Arrow do backend (ver arrow_fetch.py).
+
+    Returns:
+        QueryHandle: Handle para aguardar (result/arrow) ou cancelar (cancel) a query.
+    """
+    backend = get_backend()
+    return backend.submit(query, arrow=True) if arrow else backend.submit(query)
+
+def execute_query(query, arrow=False):
+    """
+    Executa uma query na tabela dw.monetization_total e retorna o resultado como um DataFrame.
+
+    Args:
+        query (str): A query SQL a ser executada.
+        arrow (bool): Decodifica o resultado em colunas Arrow antes de montar o DataFrame.
+
+    Returns:
+        pd.DataFrame: Resultado da query em formato DataFrame.
+    """
+    if arrow:
+        return submit_query(query, arrow=True).arrow().to_pandas()
+    return submit_query(query).result()
+
+def execute_arrow(query):
+    """
+    Executa uma query e retorna o resultado como pyarrow.Table (colunar, sem cópia para NumPy).
+
+    Args:
+        query (str): A query SQL a ser executada.
+
+    Returns:
+        pyarrow.Table: Resultado da query.
+    """
+    return submit_query(query, arrow=True).arrow()
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) > 1:
         query = " ".join(sys.argv[1:])
         try:
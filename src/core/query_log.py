@@ -0,0 +1,132 @@
+"""
+Query Log - Registro das perguntas respondidas
+Log JSON-lines com cada pergunta, de onde veio o resultado (rollup, cache ou
+Trino) e se ela estava pré-aquecida. Alimenta o pré-aquecimento (top-K
+perguntas) e o relatório de taxa de acerto quente.
+
+Um arquivo por dia (questions.2024-05-31.jsonl ao lado de BISCOITAO_QUERY_LOG,
+ver daily_log): cada worker só faz append no arquivo do dia, a leitura dos
+últimos N dias só abre os arquivos da janela e dias além de
+BISCOITAO_QUERY_LOG_DAYS são apagados.
+"""
+
+import os
+import sys
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.daily_log import DailyJsonLog
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_QUERY_LOG = os.getenv(
+    'BISCOITAO_QUERY_LOG',
+    os.path.join(PROJECT_ROOT, 'output', 'logs', 'questions.jsonl')
+)
+# Dias de log mantidos (o pré-aquecimento minera BISCOITAO_PREWARM_DAYS, padrão 14)
+RETENTION_DAYS = int(os.getenv('BISCOITAO_QUERY_LOG_DAYS', '30'))
+
+# Execuções internas (pré-aquecimento) não entram no log de perguntas
+_logging_enabled = contextvars.ContextVar('biscoitao_query_log_enabled', default=True)
+
+def normalize_question(instruction):
+    """Forma canônica da pergunta (agrupa variações de caixa/espaços/pontuação final)"""
+    return " ".join(instruction.lower().split()).rstrip(' ?.!')
+
+class QueryLog(DailyJsonLog):
+    """Log append-only de perguntas em JSON-lines, um arquivo por dia"""
+
+    def __init__(self, path=DEFAULT_QUERY_LOG, retention_days=RETENTION_DAYS):
+        super().__init__(path, retention_days)
+
+    def record(self, instruction, table_name=None, source=None, cache_hit=False,
+               prewarmed=False, artifact_hit=False, duration=None):
+        """Registra uma pergunta respondida"""
+        if not _logging_enabled.get():
+            return
+        self.append({
+            'timestamp': datetime.now().isoformat(),
+            'question': normalize_question(instruction),
+            'instruction': instruction,
+            'table': table_name,
+            'source': source,
+            'cache_hit': bool(cache_hit),
+            'prewarmed': bool(prewarmed),
+            'artifact_hit': bool(artifact_hit),
+            'duration': round(duration, 3) if duration is not None else None
+        })
+
+    def top_questions(self, k=10, days=14):
+        """
+        Perguntas mais frequentes no período.
+
+        Returns:
+            list: [{'question', 'instruction', 'table', 'count'}] em ordem decrescente.
+        """
+        entries = self.entries(days)
+        counts = Counter(entry['question'] for entry in entries)
+        latest = {}
+        for entry in entries:
+            latest[entry['question']] = entry  # mantém a redação mais recente
+        return [
+            {
+                'question': question,
+                'instruction': latest[question]['instruction'],
+                'table': latest[question].get('table') or 'dw.monetization_total',
+                'count': count
+            }
+            for question, count in counts.most_common(k)
+        ]
+
+    def warm_hit_report(self, days=1):
+        """Taxas de acerto quente (cache/artefato) das perguntas do período"""
+        entries = self.entries(days)
+        prewarmed = [entry for entry in entries if entry.get('prewarmed')]
+        first_of_day = {}
+        for entry in entries:
+            key = (entry['timestamp'][:10], entry['question'])
+            first_of_day.setdefault(key, entry)
+
+        def rate(items, field):
+            return round(sum(1 for item in items if item.get(field)) / len(items), 3) if items else None
+
+        return {
+            'requests': len(entries),
+            'prewarmed_requests': len(prewarmed),
+            'cache_hit_rate': rate(entries, 'cache_hit'),
+            'warm_hit_rate': rate(prewarmed, 'cache_hit'),
+            'artifact_hit_rate': rate(prewarmed, 'artifact_hit'),
+            # Primeira requisição do dia de cada pergunta: a que pagava o Trino frio
+            'first_request_hit_rate': rate(list(first_of_day.values()), 'cache_hit'),
+            'rollup_rate': round(sum(1 for e in entries if e.get('source') == 'rollup') / len(entries), 3) if entries else None
+        }
+
+@contextmanager
+def logging_suppressed():
+    """Não registra as perguntas executadas dentro do bloco (ex: pré-aquecimento)"""
+    token = _logging_enabled.set(False)
+    try:
+        yield
+    finally:
+        _logging_enabled.reset(token)
+
+_default_log = None
+_default_log_lock = threading.Lock()
+
+def get_default_log():
+    global _default_log
+    with _default_log_lock:
+        if _default_log is None:
+            _default_log = QueryLog()
+        return _default_log
+
+def log_question(instruction, **kwargs):
+    """Registra a pergunta no log padrão sem nunca derrubar a requisição"""
+    try:
+        get_default_log().record(instruction, **kwargs)
+    except Exception as e:
+        print(f"⚠️ Não foi possível registrar a pergunta: {e}")
@@ -0,0 +1,223 @@
+"""
+Refresh Scheduler - Atualização incremental por partição
+Detecta partições (year/month/day) novas ou reescritas de dw.monetization_total
+via metadados $partitions e recalcula apenas as entradas de cache e as fatias
+do rollup local afetadas, das mais pedidas para as menos, com limite de
+consultas simultâneas no Trino. Roda como thread dentro do Flask ou como
+worker separado (python src/core/refresh_scheduler.py). As fatias do rollup
+de um ciclo saem numa única geração nova do DuckDB (ver rollup_store): o
+refresh não disputa o arquivo com os workers que o consultam.
+"""
+
+import os
+import sys
+import time
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.query import execute_query
+from src.core.result_cache import get_default_cache, WARM_TTL
+from src.core.rollup_store import RollupStore, SOURCE_TABLE, PARTITIONS_TABLE, AVAILABLE as ROLLUP_AVAILABLE
+
+DEFAULT_INTERVAL = float(os.getenv('BISCOITAO_REFRESH_INTERVAL', '300'))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('BISCOITAO_REFRESH_CONCURRENCY', '2'))
+DEFAULT_RECENT_DAYS = int(os.getenv('BISCOITAO_REFRESH_RECENT_DAYS', '3'))
+DEFAULT_MAX_RECOMPUTE = int(os.getenv('BISCOITAO_REFRESH_MAX_RECOMPUTE', '20'))
+
+class PartitionRefreshScheduler:
+    """Recalcula caches e rollups apenas quando partições mudam no Trino"""
+
+    def __init__(self, cache=None, rollup=None, execute=execute_query,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, interval=DEFAULT_INTERVAL,
+                 recent_days=DEFAULT_RECENT_DAYS, max_recompute=DEFAULT_MAX_RECOMPUTE):
+        """
+        Args:
+            cache (QueryResultCache): Cache de resultados a manter atualizado.
+            rollup (RollupStore): Rollup local a manter atualizado.
+            execute (callable): Executa SQL no Trino e retorna DataFrame.
+            max_concurrency (int): Máximo de queries simultâneas no Trino.
+            interval (float): Segundos entre verificações.
+            recent_days (int): Dias recentes verificados quanto a reescrita.
+            max_recompute (int): Entradas recalculadas por ciclo (o resto é invalidado).
+        """
+        self.cache = cache
+        self.rollup = rollup
+        self.execute = execute
+        self.max_concurrency = max(1, max_concurrency)
+        self.interval = interval
+        self.recent_days = recent_days
+        self.max_recompute = max_recompute
+        self.known_partitions = None  # primeira verificação só registra o estado atual
+        self.fingerprints = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    # ------------------------------------------------------------------ detecção
+
+    def landed_partitions(self):
+        df = self.execute(f"SELECT year, month, day FROM {PARTITIONS_TABLE}")
+        return {(int(r.year), int(r.month), int(r.day)) for r in df.itertuples(index=False)}
+
+    def recent_fingerprints(self, partitions):
+        """Contagem e soma de preço das partições recentes (detecta reescritas)"""
+        if not partitions:
+            return {}
+        condition = " OR ".join(f"(year={y} AND month={m} AND day={d})" for y, m, d in sorted(partitions))
+        df = self.execute(f"""
+            SELECT year, month, day, COUNT(*) AS row_count, SUM(price) AS sum_price
+            FROM {SOURCE_TABLE}
+            WHERE {condition}
+            GROUP BY year, month, day
+        """)
+        return {
+            (int(r.year), int(r.month), int(r.day)): (int(r.row_count), round(float(r.sum_price or 0), 2))
+            for r in df.itertuples(index=False)
+        }
+
+    def detect_changes(self):
+        """Partições novas desde a última verificação ou reescritas na janela recente"""
+        landed = self.landed_partitions()
+        cutoff = (datetime.now() - timedelta(days=self.recent_days)).date()
+        recent = {p for p in landed if datetime(*p).date() >= cutoff}
+        fingerprints = self.recent_fingerprints(recent)
+
+        if self.known_partitions is None:
+            changed = set()
+        else:
+            changed = landed - self.known_partitions
+            changed |= {p for p, fp in fingerprints.items()
+                        if p in self.fingerprints and self.fingerprints[p] != fp}
+
+        self.known_partitions = landed
+        self.fingerprints = fingerprints
+        return landed, changed
+
+    # ------------------------------------------------------------------ atualização
+
+    def run_once(self):
+        """Um ciclo completo: detecta mudanças e recalcula o que foi afetado"""
+        started_at = time.monotonic()
+        landed, changed = self.detect_changes()
+
+        rollup_slices = set()
+        if self.rollup is not None:
+            # Fatias novas para o rollup + reescritas, mais recentes primeiro
+            rollup_slices = (landed - self.rollup.refreshed_partitions()) | (changed & landed)
+        rollup_slices = sorted(rollup_slices, reverse=True)
+
+        entries = self.cache.entries_affected_by(changed) if self.cache is not None else []
+        to_recompute = entries[:self.max_recompute]
+        to_invalidate = [entry['key'] for entry in entries[self.max_recompute:]]
+        if to_invalidate:
+            self.cache.invalidate(to_invalidate)
+
+        summary = {
+            'changed_partitions': len(changed),
+            'rollup_slices': 0,
+            'recomputed': 0,
+            'invalidated': len(to_invalidate),
+            'failed': 0
+        }
+        if not rollup_slices and not to_recompute:
+            if self.rollup is not None:
+                self.rollup.apply(landed=landed)  # só publica se a listagem mudou
+            self.last_run = datetime.now()
+            return summary
+
+        print(f"🔄 Refresh: {len(changed)} partições alteradas, {len(rollup_slices)} fatias do rollup, "
+              f"{len(to_recompute)} entradas de cache")
+
+        frames = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='partition-refresh') as executor:
+            futures = {}
+            for year, month, day in rollup_slices:
+                futures[executor.submit(self.rollup.fetch_partition, year, month, day)] = ('rollup', (year, month, day))
+            for entry in to_recompute:
+                futures[executor.submit(self._recompute_entry, entry)] = ('cache', entry['key'])
+
+            for future in as_completed(futures):
+                kind, item = futures[future]
+                try:
+                    result = future.result()
+                    if kind == 'rollup':
+                        frames[item] = result
+                    else:
+                        summary['recomputed'] += 1
+                except Exception as e:
+                    summary['failed'] += 1
+                    print(f"❌ Falha ao atualizar {kind} {item}: {str(e)[:100]}")
+                    if kind == 'cache':
+                        # Melhor ir ao Trino na próxima requisição do que servir dado velho
+                        self.cache.invalidate([item])
+
+        if self.rollup is not None:
+            # Uma geração por ciclo; meses com partição pendente saem do rollup (landed)
+            self.rollup.apply(frames, landed=landed)
+            summary['rollup_slices'] = len(frames)
+
+        self.last_run = datetime.now()
+        print(f"✅ Refresh concluído em {time.monotonic() - started_at:.1f}s: {summary}")
+        return summary
+
+    def _recompute_entry(self, entry):
+        data = self.execute(entry['sql'])
+        if data is None or data.empty:
+            self.cache.invalidate([entry['key']])
+        else:
+            self.cache.put(entry['sql'], data, ttl=WARM_TTL)  # recalculado: vale o expediente
+
+    # ------------------------------------------------------------------ execução em background
+
+    def start(self):
+        """Inicia o loop em uma thread daemon (uso dentro do Flask)"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='partition-refresh', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        print(f"⏱️ Refresh de partições a cada {self.interval:.0f}s (até {self.max_concurrency} queries simultâneas)")
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Erro no ciclo de refresh: {e}")
+            self._stop.wait(self.interval)
+
+def create_default_scheduler():
+    """Scheduler ligado ao cache e ao rollup padrão (o rollup exige DuckDB instalado)"""
+    if not ROLLUP_AVAILABLE:
+        print("⚠️ DuckDB não instalado: refresh só do cache de resultados")
+    # Erro ao abrir o rollup sobe: um refresh que pula o rollup em silêncio o deixa velho
+    rollup = RollupStore() if ROLLUP_AVAILABLE else None
+    return PartitionRefreshScheduler(cache=get_default_cache(), rollup=rollup)
+
+def start_in_process_scheduler():
+    """Liga o scheduler dentro do processo web se BISCOITAO_REFRESH_IN_PROCESS=1"""
+    if os.getenv('BISCOITAO_REFRESH_IN_PROCESS') != '1':
+        return None
+    scheduler = create_default_scheduler()
+    scheduler.start()
+    return scheduler
+
+if __name__ == "__main__":
+    scheduler = create_default_scheduler()
+    if len(sys.argv) > 1 and sys.argv[1] == 'once':
+        # Duas passadas: a primeira registra o estado atual das partições
+        scheduler.run_once()
+        print(scheduler.run_once())
+    else:
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+            print("\n👋 Refresh encerrado")
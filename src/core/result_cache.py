@@ -0,0 +1,254 @@
+"""
+Result Cache - Cache de resultados de queries do Trino
+Guarda o DataFrame de cada SQL em SQLite (compartilhado entre o Flask e o
+worker de atualização), junto com as partições (year/month) de que ele depende
+e quantas vezes foi pedido. Entradas são recalculadas pelo
+PartitionRefreshScheduler quando partições relevantes mudam no Trino; como o
+agendador pode não estar rodando (e perguntas com janela relativa, como
+"últimos 6 meses", mudam sem partição nova), uma entrada mais velha que o
+seu TTL conta como ausente e a próxima requisição vai ao Trino. O TTL é por
+entrada: BISCOITAO_RESULT_CACHE_TTL (padrão 1h) para resultados de
+requisições e BISCOITAO_RESULT_CACHE_WARM_TTL (padrão 16h, o expediente) para
+os gravados pelo pré-aquecimento e pelo scheduler (cache_ttl_scope); 0 = sem
+limite.
+"""
+
+import os
+import re
+import sys
+import json
+import pickle
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.query import execute_query
+from src.core.prefork import register_fork_safe, abandon
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_PATH = os.getenv(
+    'BISCOITAO_RESULT_CACHE',
+    os.path.join(PROJECT_ROOT, 'output', 'cache', 'query_results.sqlite')
+)
+DEFAULT_TTL = float(os.getenv('BISCOITAO_RESULT_CACHE_TTL', '3600'))
+# Pré-aquecido às 07:00 precisa valer até o fim do expediente
+WARM_TTL = float(os.getenv('BISCOITAO_RESULT_CACHE_WARM_TTL', str(16 * 3600)))
+
+_entry_ttl = contextvars.ContextVar('biscoitao_result_cache_ttl', default=None)
+
+# Filtros de data reconhecidos (colunas de partição ou EXTRACT sobre a data)
+_YEAR_MONTH_PATTERNS = [
+    r"extract\s*\(\s*year\s+from\s+\w+\s*\)\s*=\s*(\d{4})\s+and\s+extract\s*\(\s*month\s+from\s+\w+\s*\)\s*=\s*(\d{1,2})",
+    r"\byear\s*=\s*(\d{4})\s+and\s+month\s*=\s*(\d{1,2})\b",
+]
+_YEAR_PATTERNS = [
+    r"extract\s*\(\s*year\s+from\s+\w+\s*\)\s*=\s*(\d{4})",
+    r"\byear\s*=\s*(\d{4})\b",
+]
+_RELATIVE_DATE = re.compile(r"current_date|current_timestamp|\bnow\s*\(|\binterval\b", re.IGNORECASE)
+# Faixas abertas sobre as partições ("últimos N meses", mês de todos os anos)
+_OPEN_RANGE = re.compile(r"\byear\s*\*|\byear\s*[<>]|\bmonth\s+in\s*\(", re.IGNORECASE)
+
+def normalize_sql(sql):
+    """SQL sem espaços redundantes (chave estável para o cache)"""
+    return " ".join(sql.split())
+
+def partition_scope(sql):
+    """
+    Meses de que o resultado de uma query depende.
+
+    Returns:
+        list | None: Lista de [ano, mês] (mês None = ano inteiro) ou None quando a
+        query depende de todas as partições (sem filtro ou com data relativa).
+    """
+    lower = normalize_sql(sql).lower()
+    if _RELATIVE_DATE.search(lower) or _OPEN_RANGE.search(lower):
+        return None
+
+    scope = set()
+    remaining = lower
+    for pattern in _YEAR_MONTH_PATTERNS:
+        for year, month in re.findall(pattern, remaining):
+            scope.add((int(year), int(month)))
+        remaining = re.sub(pattern, " ", remaining)
+    for pattern in _YEAR_PATTERNS:
+        for year in re.findall(pattern, remaining):
+            scope.add((int(year), None))
+
+    return sorted([list(item) for item in scope], key=lambda item: (item[0], item[1] or 0)) or None
+
+def scope_matches(scope, partitions):
+    """Indica se alguma partição (year, month, day) afeta o escopo"""
+    if scope is None:
+        return bool(partitions)
+    months = {(year, month) for year, month in scope}
+    return any((year, month) in months or (year, None) in months for year, month, _ in partitions)
+
+@contextmanager
+def cache_ttl_scope(ttl):
+    """Resultados gravados dentro do bloco usam esse TTL (ex: WARM_TTL no pré-aquecimento)"""
+    token = _entry_ttl.set(ttl)
+    try:
+        yield
+    finally:
+        _entry_ttl.reset(token)
+
+class QueryResultCache:
+    """Cache SQL -> DataFrame com dependências de partição e contagem de acessos"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        register_fork_safe(self)
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_results (
+                    key TEXT PRIMARY KEY,
+                    sql TEXT NOT NULL,
+                    scope TEXT,
+                    hits INTEGER DEFAULT 0,
+                    created_at TEXT,
+                    refreshed_at TEXT,
+                    payload BLOB,
+                    ttl REAL
+                )
+            """)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(query_results)")}
+            if 'ttl' not in columns:  # cache criado antes do TTL por entrada
+                self.conn.execute("ALTER TABLE query_results ADD COLUMN ttl REAL")
+            self.conn.commit()
+
+    def _after_fork(self):
+        # Cada worker abre sua conexão; o arquivo (WAL) continua compartilhado
+        abandon(self.conn)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+
+    @staticmethod
+    def key(sql):
+        return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()
+
+    def expired(self, refreshed_at, ttl=None):
+        """Indica se uma entrada atualizada em refreshed_at passou do seu TTL (None = TTL padrão)"""
+        ttl = self.ttl if ttl is None else ttl
+        if not ttl or ttl <= 0:
+            return False
+        return datetime.fromisoformat(refreshed_at) < datetime.now() - timedelta(seconds=ttl)
+
+    def get(self, sql):
+        """Resultado em cache (None se ausente ou vencido); conta o acesso"""
+        key = self.key(sql)
+        with self._lock:
+            row = self.conn.execute("SELECT refreshed_at, ttl, payload FROM query_results WHERE key=?",
+                                    (key,)).fetchone()
+            if row is None or self.expired(row[0], row[1]):
+                return None
+            self.conn.execute("UPDATE query_results SET hits = hits + 1 WHERE key=?", (key,))
+            self.conn.commit()
+        return pickle.loads(row[2])
+
+    def version(self, sql):
+        """Versão do resultado em cache (chave + última atualização) sem carregar o payload (None se vencido)"""
+        key = self.key(sql)
+        with self._lock:
+            row = self.conn.execute("SELECT refreshed_at, ttl FROM query_results WHERE key=?", (key,)).fetchone()
+        return f"{key}:{row[0]}" if row and not self.expired(row[0], row[1]) else None
+
+    def put(self, sql, data, scope=None, ttl=None):
+        """Guarda (ou substitui) o resultado de uma query, preservando os acessos
+
+        ttl: validade em segundos desta entrada (None = a do cache_ttl_scope ou o TTL padrão).
+        """
+        key = self.key(sql)
+        if scope is None:
+            scope = partition_scope(sql)
+        if ttl is None:
+            ttl = _entry_ttl.get()
+        now = datetime.now().isoformat()
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO query_results (key, sql, scope, hits, created_at, refreshed_at, payload, ttl)
+                VALUES (?, ?, ?, 0, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    scope=excluded.scope, refreshed_at=excluded.refreshed_at,
+                    payload=excluded.payload, ttl=excluded.ttl
+            """, (key, normalize_sql(sql), json.dumps(scope), now, now, payload, ttl))
+            self.conn.commit()
+
+    def fetch(self, sql, execute=execute_query):
+        """
+        Retorna do cache ou executa no Trino e guarda o resultado não vazio.
+
+        Returns:
+            tuple: (DataFrame, veio_do_cache)
+        """
+        cached = self.get(sql)
+        if cached is not None:
+            print("⚡ Resultado servido do cache")
+            return cached, True
+        data = execute(sql)
+        if data is not None and not data.empty:
+            self.put(sql, data)
+            # Primeira execução já conta como um pedido
+            with self._lock:
+                self.conn.execute("UPDATE query_results SET hits = 1 WHERE key=?", (self.key(sql),))
+                self.conn.commit()
+        return data, False
+
+    def get_or_execute(self, sql, execute=execute_query):
+        """Retorna do cache ou executa no Trino e guarda o resultado não vazio"""
+        return self.fetch(sql, execute)[0]
+
+    def entries_affected_by(self, partitions):
+        """Entradas que dependem das partições alteradas, das mais pedidas para as menos"""
+        if not partitions:
+            return []
+        with self._lock:
+            rows = self.conn.execute("SELECT key, sql, scope, hits FROM query_results").fetchall()
+        affected = [
+            {'key': key, 'sql': sql, 'hits': hits}
+            for key, sql, scope, hits in rows
+            if scope_matches(json.loads(scope) if scope else None, partitions)
+        ]
+        return sorted(affected, key=lambda entry: entry['hits'], reverse=True)
+
+    def invalidate(self, keys):
+        """Remove entradas (a próxima requisição vai ao Trino)"""
+        with self._lock:
+            self.conn.executemany("DELETE FROM query_results WHERE key=?", [(key,) for key in keys])
+            self.conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, hits = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM query_results"
+            ).fetchone()
+        return {'entries': entries, 'hits': hits, 'path': self.path, 'ttl': self.ttl, 'warm_ttl': WARM_TTL}
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Cache compartilhado do processo (None se desligado com BISCOITAO_RESULT_CACHE=off ou indisponível)"""
+    global _default_cache
+    if DEFAULT_CACHE_PATH == 'off':
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = QueryResultCache()
+            except Exception as e:
+                print(f"⚠️ Cache de resultados indisponível: {e}")
+                return None
+        return _default_cache
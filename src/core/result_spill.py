@@ -0,0 +1,280 @@
+"""
+Result Spill - Resultados grandes em arquivo Arrow mapeado em memória
+Acima de BISCOITAO_SPILL_ROWS linhas (ou BISCOITAO_SPILL_BYTES bytes) o
+DataFrame do resultado é gravado em lotes num arquivo Arrow IPC no diretório
+de rascunho e reaberto com memory map: o processo não guarda mais uma cópia
+própria dos dados, só as páginas do arquivo que forem lidas (e que o kernel
+pode descartar). Chunks, gráficos e sumários leem fatias preguiçosas
+(result[inicio:fim], result['coluna']) convertidas para pandas só na hora.
+
+Ciclo de vida dos arquivos:
+    spill_scope()   arquivos criados dentro do bloco são apagados na saída
+                    (o Flask abre um escopo por requisição: src.api.spill)
+    SpillCache      arquivos reaproveitados entre requisições pela versão do
+                    resultado no QueryResultCache; a versão nova apaga a antiga
+
+Apagar o arquivo não invalida leituras em andamento: o mapeamento continua
+válido até o último buffer Arrow que o referencia ser coletado.
+"""
+
+import os
+import sys
+import uuid
+import weakref
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow é opcional: sem ele os resultados ficam em memória
+    pa = None
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.tracing import span
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SPILL_DIR = os.getenv('BISCOITAO_SPILL_DIR', os.path.join(PROJECT_ROOT, 'output', 'cache', 'spill'))
+SPILL_ROWS = int(os.getenv('BISCOITAO_SPILL_ROWS', '200000'))
+SPILL_BYTES = int(os.getenv('BISCOITAO_SPILL_BYTES', str(64 * 1024 * 1024)))
+SPILL_CACHE_ENTRIES = int(os.getenv('BISCOITAO_SPILL_CACHE_ENTRIES', '8'))
+# Mesmo tamanho dos chunks do SimpleDataProcessor: cada chunk sai de um único lote
+BATCH_ROWS = 25000
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def result_bytes(data):
+    """Tamanho aproximado em memória (sem inspecionar strings: barato em qualquer tamanho)"""
+    if isinstance(data, SpilledResult):
+        return data.nbytes
+    if pa is not None and isinstance(data, pa.Table):
+        return data.nbytes
+    return int(data.memory_usage(index=False, deep=False).sum())
+
+def should_spill(data, max_rows=None, max_bytes=None):
+    """Indica se o resultado passa dos limites de linhas/bytes para ir ao disco"""
+    if pa is None or isinstance(data, SpilledResult):
+        return False
+    max_rows = SPILL_ROWS if max_rows is None else max_rows
+    max_bytes = SPILL_BYTES if max_bytes is None else max_bytes
+    return len(data) > max_rows or result_bytes(data) > max_bytes
+
+def write_arrow(data, path, batch_rows=BATCH_ROWS):
+    """
+    Grava um DataFrame (ou pyarrow.Table) em lotes num arquivo Arrow IPC.
+
+    Cada lote é convertido e escrito separadamente: o pico extra de memória
+    é de um lote, não de uma segunda cópia do resultado inteiro.
+    """
+    if pa is None:
+        raise ImportError("pyarrow não instalado (pip install pyarrow)")
+    is_frame = isinstance(data, pd.DataFrame)
+    schema = pa.Schema.from_pandas(data, preserve_index=False) if is_frame else data.schema
+    if is_frame:
+        schema = schema.remove_metadata()
+    with span('result.spill', rows=len(data)) as spill_span:
+        try:
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                for start in range(0, len(data), batch_rows):
+                    if is_frame:
+                        batch = pa.RecordBatch.from_pandas(data.iloc[start:start + batch_rows],
+                                                           schema=schema, preserve_index=False)
+                        writer.write_batch(batch)
+                    else:
+                        writer.write_table(data.slice(start, batch_rows))
+        except BaseException:
+            _remove(path)
+            raise
+        spill_span.set(bytes=os.path.getsize(path))
+    return path
+
+class SpilledResult:
+    """Resultado tabular num arquivo Arrow IPC mapeado em memória, lido em fatias"""
+
+    def __init__(self, path, dtypes=None, delete=True):
+        self.path = path
+        self._reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        # read_all sobre memory map não copia: os buffers apontam para o arquivo
+        self._table = self._reader.read_all()
+        if dtypes is None:
+            dtypes = self._table.schema.empty_table().to_pandas().dtypes
+        self._dtypes = dtypes
+        self.closed = False
+        # delete=False: arquivo de outro dono (ex: cursores do ResultStore), só é lido
+        self._finalizer = weakref.finalize(self, _remove, path) if delete else None
+
+    @classmethod
+    def write(cls, data, directory=None, batch_rows=BATCH_ROWS):
+        """Grava um DataFrame (ou pyarrow.Table) com write_arrow e o reabre mapeado"""
+        directory = directory or SPILL_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = write_arrow(data, os.path.join(directory, f"result_{os.getpid()}_{uuid.uuid4().hex}.arrow"),
+                           batch_rows)
+        result = cls(path, dtypes=data.dtypes if isinstance(data, pd.DataFrame) else None)
+        _register(result)
+        return result
+
+    def __len__(self):
+        return self._table.num_rows
+
+    @property
+    def columns(self):
+        return pd.Index(self._table.column_names)
+
+    @property
+    def dtypes(self):
+        """dtypes do DataFrame original (o schema reportado não muda com o spill)"""
+        return self._dtypes
+
+    @property
+    def shape(self):
+        return len(self), self._table.num_columns
+
+    @property
+    def nbytes(self):
+        return self._table.nbytes
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def arrow(self, offset=0, length=None):
+        """Fatia como pyarrow.Table (sem cópia: continua apontando para o arquivo)"""
+        return self._table.slice(offset, length)
+
+    def slice(self, offset, length=None):
+        """Fatia [offset, offset + length) como DataFrame (índice a partir de offset)"""
+        frame = self._table.slice(offset, length).to_pandas()
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        return frame
+
+    def iter_chunks(self, size=BATCH_ROWS):
+        """DataFrames de até size linhas, um de cada vez"""
+        for start in range(0, len(self), size):
+            yield self.slice(start, size)
+
+    def column(self, name):
+        """Uma coluna como Series (só as páginas dessa coluna são lidas)"""
+        return self._table.column(name).to_pandas().rename(name)
+
+    def head(self, n=5):
+        return self.slice(0, n)
+
+    def to_pandas(self):
+        """Resultado inteiro em memória (evite para resultados grandes)"""
+        return self.slice(0)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("SpilledResult só aceita fatias contíguas")
+            return self.slice(start, max(stop - start, 0))
+        if isinstance(key, str):
+            return self.column(key)
+        return self._table.select(list(key)).to_pandas()
+
+    def close(self):
+        """Apaga o arquivo; leituras em andamento continuam válidas até serem coletadas"""
+        self.closed = True
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"SpilledResult({len(self):,} linhas, {self.nbytes / 1e6:.1f}MB, {self.path})"
+
+_current_spills = contextvars.ContextVar('biscoitao_spills', default=None)
+
+def _register(result):
+    spills = _current_spills.get()
+    if spills is not None:
+        spills.append(result)
+
+@contextmanager
+def spill_scope():
+    """Apaga, na saída do bloco, os arquivos criados por spill_if_large dentro dele"""
+    spills = []
+    token = _current_spills.set(spills)
+    try:
+        yield spills
+    finally:
+        _current_spills.reset(token)
+        for result in spills:
+            result.close()
+
+@contextmanager
+def _detached():
+    # Arquivos do SpillCache vivem além da requisição que os criou
+    token = _current_spills.set(None)
+    try:
+        yield
+    finally:
+        _current_spills.reset(token)
+
+def spill_if_large(data, max_rows=None, max_bytes=None, directory=None):
+    """O próprio resultado se pequeno (ou sem pyarrow); senão um SpilledResult no escopo atual"""
+    if not should_spill(data, max_rows, max_bytes):
+        return data
+    result = SpilledResult.write(data, directory)
+    print(f"💽 Resultado grande ({len(result):,} linhas) enviado ao disco: {os.path.basename(result.path)}")
+    return result
+
+class SpillCache:
+    """Resultados grandes já no disco, reaproveitados pela versão do QueryResultCache"""
+
+    def __init__(self, max_entries=SPILL_CACHE_ENTRIES, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()  # chave -> (versão, SpilledResult)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(version):
+        # Versões do QueryResultCache são 'chave:refreshed_at'
+        return version.split(':', 1)[0]
+
+    def get(self, version):
+        key = self._key(version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, version, data):
+        """Resultado pronto para uso: SpilledResult (guardado) se grande, senão o próprio data"""
+        if not should_spill(data):
+            return data
+        with _detached():
+            result = spill_if_large(data, max_rows=0, directory=self.directory)
+        key = self._key(version)
+        with self._lock:
+            stale = [self._entries.pop(key)[1]] if key in self._entries else []
+            self._entries[key] = (version, result)
+            while len(self._entries) > self.max_entries:
+                stale.append(self._entries.popitem(last=False)[1][1])
+        for old in stale:
+            old.close()
+        return result
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for _, result in entries:
+            result.close()
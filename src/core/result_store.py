@@ -0,0 +1,209 @@
+"""
+Result Store - Cursores paginados para resultados grandes do /query
+Quando o SimpleDataProcessor escolhe a estratégia em chunks, o resultado vai
+para um cursor no servidor em vez de seguir inteiro na resposta: a primeira
+resposta leva metadados, schema e a primeira página, e as demais páginas são
+buscadas sob demanda por page token (ex: '3f2a...c1.1').
+
+Cada cursor é um arquivo Arrow IPC (lido com memory map, como os resultados
+do spill) e um JSON de metadados em BISCOITAO_CURSOR_DIR: qualquer worker do
+servidor pré-fork serve qualquer página. Cursores expiram
+BISCOITAO_CURSOR_TTL segundos após a última criação/reuso e são apagados
+na próxima criação de cursor (varredura) ou ao serem pedidos depois de
+expirados.
+
+Resultados que já estão no disco (SpilledResult) viram cursor por hard link,
+sem regravar. Com a versão do QueryResultCache o id do cursor é estável: a
+mesma pergunta sobre os mesmos dados reaproveita o cursor existente.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import secrets
+from datetime import datetime
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.data_processor import CsvChunks, SimpleDataProcessor
+from src.core.result_spill import SpilledResult, write_arrow, pa
+from src.core.tracing import span
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CURSOR_DIR = os.getenv('BISCOITAO_CURSOR_DIR', os.path.join(PROJECT_ROOT, 'output', 'cache', 'cursors'))
+CURSOR_TTL = float(os.getenv('BISCOITAO_CURSOR_TTL', '900'))
+PAGE_ROWS = SimpleDataProcessor.CHUNK_SIZE
+
+_CURSOR = re.compile(r"^[0-9a-f]{32}$")
+_TOKEN = re.compile(r"^([0-9a-f]{32})\.(\d+)$")
+
+class CursorNotFound(LookupError):
+    """Cursor inexistente ou expirado (o cliente deve refazer a consulta)"""
+
+def page_token(cursor, page):
+    return f"{cursor}.{page}"
+
+def parse_token(token):
+    """(cursor, página) de um page token; CursorNotFound se o formato é inválido"""
+    match = _TOKEN.match(token or '')
+    if not match:
+        raise CursorNotFound(token)
+    return match.group(1), int(match.group(2))
+
+class ResultStore:
+    """Cursores paginados em disco, compartilhados pelos workers do servidor"""
+
+    def __init__(self, directory=CURSOR_DIR, ttl=CURSOR_TTL, page_rows=PAGE_ROWS):
+        self.directory = directory
+        self.ttl = ttl
+        self.page_rows = page_rows
+
+    def _paths(self, cursor):
+        if not _CURSOR.match(cursor or ''):
+            raise CursorNotFound(cursor)  # ids vêm da URL: nunca viram caminhos arbitrários
+        return os.path.join(self.directory, f"{cursor}.arrow"), os.path.join(self.directory, f"{cursor}.json")
+
+    def _read_meta(self, cursor):
+        try:
+            with open(self._paths(cursor)[1], encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta):
+        path = self._paths(meta['cursor'])[1]
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temporary, path)  # atômico: outro worker nunca lê metadados pela metade
+
+    def _write_data(self, data, path):
+        if isinstance(data, SpilledResult):
+            try:
+                os.link(data.path, path)  # já está no disco: o cursor é só mais um nome
+                return
+            except OSError:
+                data = data.arrow()
+        write_arrow(data, path)
+
+    def cursor_id(self, version):
+        """Id estável do cursor de uma versão do QueryResultCache"""
+        return hashlib.sha1(f"{version}\x1f{self.page_rows}".encode('utf-8')).hexdigest()[:32]
+
+    def create(self, data, version=None):
+        """
+        Abre (ou reaproveita) um cursor para o resultado.
+
+        Args:
+            data: DataFrame ou SpilledResult
+            version: versão do resultado no QueryResultCache (id estável) ou None
+
+        Returns:
+            dict: Metadados do cursor (cursor, rows, pages, page_rows, expires_at...)
+        """
+        self.sweep()
+        os.makedirs(self.directory, exist_ok=True)
+        cursor = self.cursor_id(version) if version else secrets.token_hex(16)
+        now = time.time()
+        meta = self._read_meta(cursor)
+        data_path = self._paths(cursor)[0]
+        if meta is None or not os.path.exists(data_path):
+            with span('result.cursor', rows=len(data)):
+                temporary = f"{data_path}.{os.getpid()}.tmp"
+                self._write_data(data, temporary)
+                os.replace(temporary, data_path)
+            meta = {
+                'cursor': cursor,
+                'rows': len(data),
+                'columns': len(data.columns),
+                'schema': dict(data.dtypes.astype(str)),
+                'page_rows': self.page_rows,
+                'pages': (len(data) + self.page_rows - 1) // self.page_rows,
+                'created_at': datetime.now().isoformat(),
+            }
+        meta['expires_at'] = now + self.ttl
+        self._write_meta(meta)
+        return meta
+
+    def meta(self, cursor):
+        """Metadados de um cursor válido (CursorNotFound se não existe ou expirou)"""
+        meta = self._read_meta(cursor)
+        if meta is None:
+            raise CursorNotFound(cursor)
+        if meta['expires_at'] < time.time():
+            self.delete(cursor)
+            raise CursorNotFound(cursor)
+        return meta
+
+    def touch(self, cursor):
+        """Renova a validade de um cursor ainda vivo (CursorNotFound se não existe ou expirou)"""
+        meta = self.meta(cursor)
+        meta['expires_at'] = time.time() + self.ttl
+        self._write_meta(meta)
+        return meta
+
+    def page(self, cursor, page):
+        """(metadados, CSV da página); a página é lida do arquivo mapeado"""
+        meta = self.meta(cursor)
+        if not 0 <= page < meta['pages']:
+            raise IndexError(page)
+        try:
+            result = SpilledResult(self._paths(cursor)[0], delete=False)
+        except (OSError, pa.ArrowInvalid):
+            raise CursorNotFound(cursor)
+        with span('result.cursor.page', page=page):
+            return meta, CsvChunks(result, meta['page_rows'])[page]
+
+    def first_page(self, cursor):
+        """(CSV da primeira página, token da segunda ou None); lida do cursor como todas as outras"""
+        meta, data = self.page(cursor, 0)
+        return data, page_token(cursor, 1) if meta['pages'] > 1 else None
+
+    def delete(self, cursor):
+        """Apaga o cursor (cliente terminou antes da última página); leituras em curso seguem válidas"""
+        removed = False
+        try:
+            paths = self._paths(cursor)
+        except CursorNotFound:
+            return False
+        for path in paths:
+            try:
+                os.unlink(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def sweep(self):
+        """Apaga os cursores expirados (e arquivos temporários órfãos); retorna quantos"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        now, removed = time.time(), 0
+        for name in names:
+            cursor, extension = os.path.splitext(name)
+            if extension == '.json' and _CURSOR.match(cursor):
+                meta = self._read_meta(cursor)
+                if meta is not None and meta['expires_at'] < now:
+                    removed += self.delete(cursor)
+            elif extension == '.tmp':
+                path = os.path.join(self.directory, name)
+                try:
+                    if os.path.getmtime(path) < now - self.ttl:
+                        os.unlink(path)
+                except OSError:
+                    pass
+        return removed
+
+_default_store = None
+
+def get_default_store():
+    """ResultStore do processo (None sem pyarrow: o /query devolve todos os chunks)"""
+    global _default_store
+    if _default_store is None and pa is not None:
+        _default_store = ResultStore()
+    return _default_store
@@ -0,0 +1,395 @@
+"""
+Rollup Store - Agregados locais de dw.monetization_total
+Materializa em DuckDB local um rollup dia × categoria × plataforma da tabela de
+monetização, consultado na granularidade mensal. A atualização é incremental
+por partição (year/month/day) do Trino: só partições novas são agregadas.
+Um mês só é respondido pelo rollup quando todas as partições dele vistas no
+Trino (landed_partitions, registradas a cada refresh) estão materializadas:
+um mês parcial (refresh limitado ou interrompido) continua indo ao Trino.
+Perguntas elegíveis ("receita de dezembro", "Q1 vs Q2", "últimos 6 meses",
+"por categoria") são respondidas em milissegundos sem ir ao Trino.
+
+Gerações: o DuckDB não abre um arquivo para escrita enquanto outro processo o
+mantém aberto (nem somente leitura). Por isso ninguém escreve no arquivo em
+uso: cada refresh copia a geração atual para um arquivo novo
+(monetization_total.duckdb.g<timestamp>), escreve nele e publica trocando
+atomicamente o link monetization_total.duckdb. Leitores (workers, health)
+abrem a geração apontada somente leitura e reabrem quando o link muda. Um
+lock de arquivo serializa os escritores (refresh CLI, scheduler).
+"""
+
+import os
+import sys
+import time
+import fcntl
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import duckdb
+except ImportError:  # DuckDB é opcional: sem ele tudo continua indo ao Trino
+    duckdb = None
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.query import execute_query
+from src.core.prefork import register_fork_safe, abandon
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_ROLLUP_PATH = os.getenv(
+    'BISCOITAO_ROLLUP_DB',
+    os.path.join(PROJECT_ROOT, 'output', 'rollups', 'monetization_total.duckdb')
+)
+
+SOURCE_TABLE = 'dw.monetization_total'
+PARTITIONS_TABLE = 'dw."monetization_total$partitions"'
+DIMENSIONS = {'category': 'category_id_fk', 'platform': 'platform_id_fk'}
+AVAILABLE = duckdb is not None
+_writer_lock = threading.Lock()
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS monetization_daily (
+        year INTEGER, month INTEGER, day INTEGER,
+        category_id_fk BIGINT, platform_id_fk BIGINT,
+        record_count BIGINT, price_count BIGINT,
+        sum_price DOUBLE, sum_price_sq DOUBLE,
+        min_price DOUBLE, max_price DOUBLE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS refreshed_partitions (
+        year INTEGER, month INTEGER, day INTEGER,
+        row_count BIGINT, refreshed_at TIMESTAMP
+    )
+    """,
+    # Partições vistas no Trino na última listagem (base da verificação de mês completo)
+    """
+    CREATE TABLE IF NOT EXISTS landed_partitions (
+        year INTEGER, month INTEGER, day INTEGER
+    )
+    """,
+    # Visão mensal usada pelas perguntas (médias/desvios recompostos a partir das somas)
+    """
+    CREATE OR REPLACE VIEW monetization_monthly AS
+    SELECT year, month, category_id_fk, platform_id_fk,
+           SUM(record_count) AS record_count,
+           SUM(price_count) AS price_count,
+           SUM(sum_price) AS sum_price,
+           SUM(sum_price_sq) AS sum_price_sq,
+           MIN(min_price) AS min_price,
+           MAX(max_price) AS max_price
+    FROM monetization_daily
+    GROUP BY year, month, category_id_fk, platform_id_fk
+    """,
+]
+
+class RollupStore:
+    """Rollup local (DuckDB) de receita/preço por mês × categoria × plataforma"""
+
+    def __init__(self, path=DEFAULT_ROLLUP_PATH, execute=execute_query, read_only=False):
+        """
+        Args:
+            path (str): Link para a geração atual (':memory:' escreve no próprio banco, sem gerações).
+            execute (callable): Executa SQL no Trino e retorna DataFrame.
+            read_only (bool): Só consulta (workers); senão também publica gerações novas.
+        """
+        if duckdb is None:
+            raise ImportError("DuckDB não instalado (pip install duckdb)")
+        self.path = path
+        self.execute_remote = execute
+        self.read_only = read_only
+        self.conn = None
+        self.generation = None
+        self._lock = threading.Lock()
+        if path == ':memory:':
+            self.conn = duckdb.connect(path)
+            for statement in TABLES:
+                self.conn.execute(statement)
+        elif not read_only:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if not os.path.exists(path):
+                with self._writing():
+                    pass  # primeira geração, só com as tabelas
+        register_fork_safe(self)
+
+    @classmethod
+    def open_default(cls, read_only=True):
+        """Abre o rollup padrão para consulta se ele já foi materializado (None caso contrário)"""
+        if duckdb is None or not os.path.exists(DEFAULT_ROLLUP_PATH):
+            return None
+        try:
+            return cls(DEFAULT_ROLLUP_PATH, read_only=read_only)
+        except Exception as e:
+            print(f"⚠️ Rollup local indisponível: {e}")
+            return None
+
+    def _release_before_fork(self):
+        # Os workers reabrem a geração atual por conta própria
+        if self.path != ':memory:':
+            with self._lock:
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                self.generation = None
+
+    def _after_fork(self):
+        """Workers reabrem a geração atual somente leitura na primeira consulta"""
+        if self.path == ':memory:':
+            return
+        abandon(self.conn)
+        self._lock = threading.Lock()
+        self.conn = None
+        self.generation = None
+
+    # ------------------------------------------------------------------ gerações
+
+    def _reader(self):
+        """Conexão somente leitura com a geração atual (chamar com self._lock)"""
+        if self.path == ':memory:':
+            return self.conn
+        for attempt in range(3):
+            generation = os.path.realpath(self.path)
+            if self.conn is not None and generation == self.generation:
+                return self.conn
+            if self.conn is not None:
+                # Fecha antes de reabrir: o DuckDB reaproveita o banco já aberto no mesmo caminho
+                self.conn.close()
+                self.conn = None
+            try:
+                self.conn = duckdb.connect(generation, read_only=True)
+                self.generation = generation
+                return self.conn
+            except duckdb.IOException:
+                if attempt == 2 or os.path.exists(generation):
+                    raise
+                # Geração removida entre a leitura do link e a abertura: lê o link de novo
+        return self.conn
+
+    @contextmanager
+    def _writing(self):
+        """Conexão de escrita com uma geração nova, publicada ao sair sem erro"""
+        if self.path == ':memory:':
+            with self._lock:
+                yield self.conn
+            return
+        if self.read_only:
+            raise RuntimeError("Rollup aberto somente leitura: o refresh roda no scheduler ou na CLI")
+
+        # Um escritor por vez: threads pelo lock do módulo, processos pelo lockf (que,
+        # ao contrário do flock, não é herdado por um worker criado no meio do refresh)
+        with _writer_lock, open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.lockf(lock_file, fcntl.LOCK_EX)
+            current = os.path.realpath(self.path) if os.path.exists(self.path) else None
+            generation = f"{self.path}.g{time.time_ns()}"
+            if current is not None:
+                shutil.copyfile(current, generation)
+            conn = duckdb.connect(generation)
+            try:
+                for statement in TABLES:
+                    conn.execute(statement)
+                yield conn
+                conn.execute("CHECKPOINT")
+                conn.close()
+            except BaseException:
+                conn.close()
+                self._remove_generation(generation)
+                raise
+
+            # Publica: troca atômica do link para a geração nova
+            link = f"{self.path}.link{os.getpid()}"
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(os.path.basename(generation), link)
+            os.replace(link, self.path)
+            self._prune_generations(keep={generation, current})
+
+    def _remove_generation(self, generation):
+        for path in (generation, f"{generation}.wal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _prune_generations(self, keep):
+        """Remove gerações antigas (mantém a atual e a anterior, ainda aberta por leitores)"""
+        directory, name = os.path.split(os.path.abspath(self.path))
+        keep = {os.path.realpath(path) for path in keep if path}
+        for entry in os.listdir(directory):
+            if not entry.startswith(f"{name}.g") or entry.endswith('.wal'):
+                continue
+            generation = os.path.join(directory, entry)
+            if os.path.realpath(generation) not in keep:
+                try:
+                    self._remove_generation(generation)
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------ refresh
+
+    def landed_partitions(self):
+        """Partições (year, month, day) existentes no Trino"""
+        df = self.execute_remote(f"SELECT year, month, day FROM {PARTITIONS_TABLE}")
+        return {(int(r.year), int(r.month), int(r.day)) for r in df.itertuples(index=False)}
+
+    def recorded_landed(self):
+        """Partições existentes no Trino segundo a última listagem registrada"""
+        return self._partitions("SELECT year, month, day FROM landed_partitions")
+
+    def refreshed_partitions(self):
+        """Partições já materializadas localmente"""
+        return self._partitions("SELECT year, month, day FROM refreshed_partitions")
+
+    def _partitions(self, sql):
+        with self._lock:
+            try:
+                rows = self._reader().execute(sql).fetchall()
+            except duckdb.CatalogException:
+                return set()  # rollup anterior à tabela
+        return {(int(y), int(m), int(d)) for y, m, d in rows}
+
+    def fetch_partition(self, year, month, day):
+        """Agrega uma partição no Trino (sem escrever localmente)"""
+        df = self.execute_remote(f"""
+            SELECT {DIMENSIONS['category']} AS category_id_fk,
+                   {DIMENSIONS['platform']} AS platform_id_fk,
+                   COUNT(*) AS record_count,
+                   COUNT(price) AS price_count,
+                   SUM(price) AS sum_price,
+                   SUM(price * price) AS sum_price_sq,
+                   MIN(price) AS min_price,
+                   MAX(price) AS max_price
+            FROM {SOURCE_TABLE}
+            WHERE year={year} AND month={month} AND day={day}
+            GROUP BY {DIMENSIONS['category']}, {DIMENSIONS['platform']}
+        """)
+        df.insert(0, 'day', day)
+        df.insert(0, 'month', month)
+        df.insert(0, 'year', year)
+        return df
+
+    def apply(self, frames=None, landed=None):
+        """
+        Publica numa única geração as fatias agregadas e a listagem de partições.
+
+        Args:
+            frames (dict): (year, month, day) -> DataFrame de fetch_partition (substitui a fatia).
+            landed (set): Partições existentes no Trino (None mantém a listagem registrada).
+
+        Returns:
+            bool: Se uma geração nova foi publicada (nada muda -> nenhuma cópia).
+        """
+        frames = frames or {}
+        if not frames and (landed is None or set(landed) == self.recorded_landed()):
+            return False
+
+        with self._writing() as conn:
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                if landed is not None:
+                    conn.execute("DELETE FROM landed_partitions")
+                    if landed:
+                        conn.executemany("INSERT INTO landed_partitions VALUES (?, ?, ?)",
+                                         [list(partition) for partition in sorted(landed)])
+                for (year, month, day), df in sorted(frames.items()):
+                    conn.execute("DELETE FROM monetization_daily WHERE year=? AND month=? AND day=?", [year, month, day])
+                    conn.execute("DELETE FROM refreshed_partitions WHERE year=? AND month=? AND day=?", [year, month, day])
+                    conn.register('partition_rollup', df)
+                    conn.execute("""
+                        INSERT INTO monetization_daily
+                        SELECT year, month, day, category_id_fk, platform_id_fk, record_count,
+                               price_count, sum_price, sum_price_sq, min_price, max_price
+                        FROM partition_rollup
+                    """)
+                    conn.unregister('partition_rollup')
+                    conn.execute(
+                        "INSERT INTO refreshed_partitions VALUES (?, ?, ?, ?, ?)",
+                        [year, month, day, int(df['record_count'].sum()) if not df.empty else 0, datetime.now()]
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def record_landed(self, partitions):
+        """Substitui a lista local de partições existentes no Trino"""
+        return self.apply(landed=partitions)
+
+    def refresh_partition(self, year, month, day):
+        """Reagrega uma partição do Trino e substitui a fatia local correspondente"""
+        df = self.fetch_partition(year, month, day)
+        self.apply({(year, month, day): df})
+        return len(df)
+
+    def refresh(self, max_partitions=None):
+        """Materializa apenas as partições que chegaram desde a última atualização"""
+        landed = self.landed_partitions()
+        pending = sorted(landed - self.refreshed_partitions())
+        if max_partitions:
+            pending = pending[-max_partitions:]  # prioriza as mais recentes
+
+        print(f"🔄 Rollup: {len(pending)} partições novas para materializar")
+        frames = {}
+        for year, month, day in pending:
+            frames[(year, month, day)] = self.fetch_partition(year, month, day)
+            print(f"   ✅ {year}-{month:02d}-{day:02d}: {len(frames[(year, month, day)])} grupos categoria × plataforma")
+        self.apply(frames, landed=landed)
+        return pending
+
+    def export_parquet(self, directory):
+        """Exporta o rollup diário em Parquet particionado por ano/mês"""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._reader().execute(
+                f"COPY monetization_daily TO '{directory}' (FORMAT PARQUET, PARTITION_BY (year, month), OVERWRITE_OR_IGNORE)"
+            )
+        return directory
+
+    # ------------------------------------------------------------------ consulta
+
+    def month_coverage(self):
+        """Meses (year, month) existentes no Trino -> se todas as suas partições estão materializadas"""
+        with self._lock:
+            try:
+                rows = self._reader().execute("""
+                    SELECT l.year, l.month, bool_and(r.year IS NOT NULL)
+                    FROM landed_partitions l
+                    LEFT JOIN refreshed_partitions r
+                           ON r.year = l.year AND r.month = l.month AND r.day = l.day
+                    GROUP BY l.year, l.month
+                """).fetchall()
+            except duckdb.CatalogException:
+                return {}  # rollup anterior ao registro das partições: completude desconhecida
+        return {(int(year), int(month)): bool(complete) for year, month, complete in rows}
+
+    def covers(self, year, month):
+        """Indica se todas as partições do mês existentes no Trino já estão materializadas"""
+        return self.month_coverage().get((year, month), False)
+
+    def is_fresh(self, max_lag_days=2):
+        """Indica se a partição mais recente materializada é de até max_lag_days atrás"""
+        with self._lock:
+            latest = self._reader().execute(
+                "SELECT MAX(make_date(year, month, day)) FROM refreshed_partitions"
+            ).fetchone()[0]
+        if latest is None:
+            return False
+        return latest >= (datetime.now() - timedelta(days=max_lag_days)).date()
+
+    def query(self, sql):
+        """Executa SQL DuckDB sobre o rollup e retorna um DataFrame"""
+        with self._lock:
+            return self._reader().execute(sql).df()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('refresh', 'export'):
+        print("Uso: python rollup_store.py refresh [max_partições]")
+        print("     python rollup_store.py export <diretório_parquet>")
+        sys.exit(1)
+
+    if sys.argv[1] == 'refresh':
+        # Publica uma geração nova: pode rodar com os workers lendo o rollup
+        RollupStore().refresh(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        print(f"📦 Parquet exportado em: {RollupStore(read_only=True).export_parquet(sys.argv[2])}")
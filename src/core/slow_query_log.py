@@ -0,0 +1,271 @@
+"""
+Slow Query Log - Registro e perfil das queries lentas
+Toda query acima do limite (BISCOITAO_SLOW_QUERY_SECONDS) é registrada com o
+SQL, a pergunta que a originou, o tempo de planejamento, o id da query no
+Trino, as estatísticas do Trino (CPU, wall, bytes lidos, pico de memória via
+/v1/query/{id}) e o tamanho do resultado. O log é JSON-lines com um arquivo
+por dia (seguro entre os workers pré-fork, ver daily_log) e retenção de
+BISCOITAO_SLOW_QUERY_LOG_DAYS; a CLI lista os piores fingerprints de SQL.
+
+Uso:
+    python src/core/slow_query_log.py worst --days 7 --sort total
+    python src/core/slow_query_log.py tail -n 20
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from dotenv import load_dotenv
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.prefork import register_fork_safe
+from src.core.daily_log import DailyJsonLog
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SLOW_QUERY_SECONDS = float(os.getenv('BISCOITAO_SLOW_QUERY_SECONDS', '5'))
+DEFAULT_SLOW_QUERY_LOG = os.getenv(
+    'BISCOITAO_SLOW_QUERY_LOG',
+    os.path.join(PROJECT_ROOT, 'output', 'logs', 'slow_queries.jsonl')
+)
+RETENTION_DAYS = int(os.getenv('BISCOITAO_SLOW_QUERY_LOG_DAYS', '30'))
+STATS_TIMEOUT = float(os.getenv('BISCOITAO_TRINO_STATS_TIMEOUT', '5'))
+
+# ------------------------------------------------------------------ fingerprint
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+def sql_fingerprint(sql):
+    """Forma da query sem literais: agrupa a mesma pergunta em meses/valores diferentes
+
+    Returns:
+        tuple: (fingerprint, sql normalizado)
+    """
+    normalized = _COMMENTS.sub(" ", sql)
+    normalized = _STRINGS.sub("?", normalized)
+    normalized = _NUMBERS.sub("?", normalized)
+    normalized = _IN_LISTS.sub("(?)", normalized)
+    normalized = " ".join(normalized.lower().split())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+# ------------------------------------------------------------------ estatísticas do Trino
+
+_DURATION_UNITS = {'ns': 1e-9, 'us': 1e-6, 'ms': 1e-3, 's': 1.0, 'm': 60.0, 'h': 3600.0, 'd': 86400.0}
+_SIZE_UNITS = {'B': 1, 'kB': 1e3, 'KB': 1e3, 'MB': 1e6, 'GB': 1e9, 'TB': 1e12, 'PB': 1e15}
+
+def parse_duration(value):
+    """'1.23s' / '850.00ms' (formato io.airlift Duration) -> segundos"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-z]+)\s*", str(value or ''))
+    if not match or match.group(2) not in _DURATION_UNITS:
+        return None
+    return round(float(match.group(1)) * _DURATION_UNITS[match.group(2)], 4)
+
+def parse_data_size(value):
+    """'12.3MB' (formato io.airlift DataSize) -> bytes"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]+)\s*", str(value or ''))
+    if not match or match.group(2) not in _SIZE_UNITS:
+        return None
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+def fetch_trino_stats(query_id, timeout=STATS_TIMEOUT):
+    """Estatísticas de uma query concluída pela API REST do coordenador (/v1/query/{id})"""
+    from src.core.arrow_fetch import TRINO_URL  # mesmo coordenador do caminho Arrow (BISCOITAO_TRINO_URL)
+    load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+    user = os.getenv('USUARIO_OLX')
+    response = requests.get(
+        f"{TRINO_URL.rstrip('/')}/v1/query/{query_id}",
+        auth=(user, os.getenv('SENHA_OLX')),
+        headers={'X-Trino-User': user or ''},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    info = response.json()
+    stats = info.get('queryStats', {})
+    return {
+        'state': info.get('state'),
+        'wall_seconds': parse_duration(stats.get('elapsedTime')),
+        'queued_seconds': parse_duration(stats.get('queuedTime')),
+        'planning_seconds': parse_duration(stats.get('planningTime')),
+        'cpu_seconds': parse_duration(stats.get('totalCpuTime')),
+        'scanned_bytes': parse_data_size(stats.get('physicalInputDataSize') or stats.get('processedInputDataSize')),
+        'scanned_rows': stats.get('physicalInputPositions', stats.get('processedInputPositions')),
+        'peak_memory_bytes': parse_data_size(stats.get('peakUserMemoryReservation')),
+        'peak_total_memory_bytes': parse_data_size(stats.get('peakTotalMemoryReservation')),
+        'output_bytes': parse_data_size(stats.get('outputDataSize')),
+    }
+
+STATS_FETCHERS = {'trino': fetch_trino_stats}
+
+# ------------------------------------------------------------------ log
+
+class SlowQueryLog(DailyJsonLog):
+    """Log JSON-lines de queries acima do limite, um arquivo por dia"""
+
+    def __init__(self, path=DEFAULT_SLOW_QUERY_LOG, threshold=SLOW_QUERY_SECONDS,
+                 retention_days=RETENTION_DAYS):
+        super().__init__(path, retention_days)
+        self.threshold = threshold
+        # Estatísticas do Trino buscadas fora da thread da requisição
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-log')
+        register_fork_safe(self)
+
+    def _after_fork(self):
+        # A thread do executor do pai não existe no worker
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-log')
+
+    def build_entry(self, handle, sql_span):
+        """Monta o registro a partir da query e do span 'sql.execute' concluído"""
+        attributes = sql_span.attributes
+        fingerprint, normalized = sql_fingerprint(handle.query)
+
+        # Pergunta e planejamento vêm dos spans do mesmo trace
+        report = sql_span.parent
+        while report is not None and report.name != 'report.generate':
+            report = report.parent
+        plan = next((s for s in reversed(sql_span.trace.spans) if s.name == 'plan'), None)
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'fingerprint': fingerprint,
+            'normalized_sql': normalized,
+            'sql': handle.query,
+            'backend': handle.backend,
+            'query_id': handle.query_id,
+            'question': report.attributes.get('question') if report else None,
+            'plan': {k: plan.attributes.get(k) for k in ('viz_type', 'source')} if plan else None,
+            'plan_seconds': round(plan.duration, 4) if plan and plan.duration is not None else None,
+            'duration_seconds': round(sql_span.duration, 4),
+            'status': sql_span.status,
+            'error': sql_span.error,
+            'rows': attributes.get('rows'),
+            'result_bytes': attributes.get('bytes'),
+            'trace_id': sql_span.trace.trace_id,
+            'stats': None,
+        }
+
+    def _write(self, entry):
+        fetcher = STATS_FETCHERS.get(entry['backend'])
+        if fetcher and entry['query_id']:
+            try:
+                entry['stats'] = fetcher(entry['query_id'])
+            except Exception as e:
+                entry['stats_error'] = f"{type(e).__name__}: {str(e)[:200]}"
+        self.append(entry)
+
+    def record_if_slow(self, handle, sql_span):
+        """Registra a query se ela passou do limite (as estatísticas chegam em segundo plano)"""
+        if sql_span.duration is None or sql_span.duration < self.threshold:
+            return None
+        entry = self.build_entry(handle, sql_span)
+        print(f"🐢 Query lenta ({entry['duration_seconds']:.1f}s, {entry['fingerprint']}) registrada em {self.path}")
+        return self._executor.submit(self._write, entry)
+
+    def worst_offenders(self, limit=10, days=None, sort='total'):
+        """
+        Agrupa as queries lentas por fingerprint.
+
+        Args:
+            sort (str): 'total' (tempo somado), 'max', 'count', 'cpu' ou 'scanned'.
+        """
+        groups = {}
+        for entry in self.entries(days):
+            group = groups.setdefault(entry['fingerprint'], {
+                'fingerprint': entry['fingerprint'], 'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                'cpu_seconds': 0.0, 'max_scanned_bytes': 0, 'max_peak_memory_bytes': 0,
+                'questions': set(), 'sample_sql': entry['sql'], 'last_query_id': None, 'last_seen': None,
+            })
+            stats = entry.get('stats') or {}
+            group['count'] += 1
+            group['total_seconds'] += entry['duration_seconds']
+            group['max_seconds'] = max(group['max_seconds'], entry['duration_seconds'])
+            group['cpu_seconds'] += stats.get('cpu_seconds') or 0.0
+            group['max_scanned_bytes'] = max(group['max_scanned_bytes'], stats.get('scanned_bytes') or 0)
+            group['max_peak_memory_bytes'] = max(group['max_peak_memory_bytes'], stats.get('peak_memory_bytes') or 0)
+            if entry.get('question'):
+                group['questions'].add(entry['question'])
+            group['last_query_id'] = entry.get('query_id') or group['last_query_id']
+            group['last_seen'] = entry['timestamp']
+
+        keys = {'total': 'total_seconds', 'max': 'max_seconds', 'count': 'count',
+                'cpu': 'cpu_seconds', 'scanned': 'max_scanned_bytes'}
+        ranked = sorted(groups.values(), key=lambda g: g[keys[sort]], reverse=True)[:limit]
+        for group in ranked:
+            group['questions'] = sorted(group['questions'])
+            group['total_seconds'] = round(group['total_seconds'], 3)
+            group['avg_seconds'] = round(group['total_seconds'] / group['count'], 3)
+            group['cpu_seconds'] = round(group['cpu_seconds'], 3)
+        return ranked
+
+_default_log = None
+
+def get_default_log():
+    global _default_log
+    if _default_log is None:
+        _default_log = SlowQueryLog()
+    return _default_log
+
+def record_slow_query(handle, sql_span):
+    """Ponto de entrada usado por QueryHandle.result (nunca interrompe a query)"""
+    try:
+        return get_default_log().record_if_slow(handle, sql_span)
+    except Exception as e:
+        print(f"⚠️ Falha ao registrar query lenta: {e}")
+        return None
+
+def _format_bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if value < 1024 or unit == 'TB':
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Queries lentas do Biscoitão")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worst = subparsers.add_parser('worst', help="Piores fingerprints de SQL")
+    worst.add_argument('--limit', type=int, default=10)
+    worst.add_argument('--days', type=int, help="Só os últimos N dias")
+    worst.add_argument('--sort', choices=['total', 'max', 'count', 'cpu', 'scanned'], default='total')
+    worst.add_argument('--json', action='store_true', help="Saída em JSON")
+    tail = subparsers.add_parser('tail', help="Últimas queries lentas")
+    tail.add_argument('-n', type=int, default=20)
+    args = parser.parse_args()
+
+    log = get_default_log()
+    if args.command == 'tail':
+        for entry in log.entries()[-args.n:]:
+            cpu = (entry.get('stats') or {}).get('cpu_seconds')
+            print(f"{entry['timestamp'][:19]}  {entry['duration_seconds']:>7.2f}s  {entry['fingerprint']}  "
+                  f"{entry.get('query_id') or '-'}  cpu={f'{cpu}s' if cpu is not None else '-'}  "
+                  f"{entry.get('question') or ''}")
+        return
+
+    offenders = log.worst_offenders(args.limit, args.days, args.sort)
+    if args.json:
+        print(json.dumps(offenders, indent=2, ensure_ascii=False))
+        return
+    if not offenders:
+        print(f"✅ Nenhuma query acima de {log.threshold}s em {log.path}")
+        return
+    print(f"🐢 Piores queries por '{args.sort}' (limite {log.threshold}s)")
+    print("=" * 78)
+    for position, group in enumerate(offenders, 1):
+        print(f"{position:>2}. {group['fingerprint']}  {group['count']}x  total {group['total_seconds']}s  "
+              f"média {group['avg_seconds']}s  máx {group['max_seconds']}s")
+        print(f"    cpu {group['cpu_seconds']}s  lidos até {_format_bytes(group['max_scanned_bytes'])}  "
+              f"pico de memória {_format_bytes(group['max_peak_memory_bytes'])}  última: {group['last_query_id']}")
+        for question in group['questions'][:3]:
+            print(f"    💬 {question}")
+        print(f"    📝 {' '.join(group['sample_sql'].split())[:160]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Speculative - Execução especulativa da query planejada localmente
+No fluxo sequencial a pergunta vai ao Toqan para interpretação e só depois o
+SQL roda no Trino. Aqui a SQL do AdvancedQueryBuilder é disparada no Trino ao
+mesmo tempo em que o Toqan avalia o plano: se ele concordar, o resultado
+especulativo é usado (economizando o tempo da menor das duas etapas); se
+discordar e propuser outra SQL, ela é executada enquanto a especulação segue
+rodando, e a especulação só é cancelada no Trino quando o resultado do Toqan
+é aceito (accept, ex: colunas que os gráficos sabem desenhar). Recusado, o
+resultado especulativo é usado sem executar o plano de novo.
+
+Desfechos registrados (métricas, span 'speculative.execute' e stats()):
+    hit             Toqan concordou com o plano
+    miss            Toqan propôs outra SQL, aceita (especulação cancelada)
+    miss_discarded  Toqan propôs outra SQL, recusada ou com erro: fica o plano local
+    fallback        Toqan indisponível ou resposta sem parecer: fica o plano local
+"""
+
+import os
+import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .query import submit_query
+from .deadline import DeadlineExceeded
+from .tracing import span
+from .prefork import register_fork_safe
+
+SPECULATIVE_ENABLED = os.getenv('BISCOITAO_SPECULATIVE', 'off').lower() in ('1', 'on', 'true')
+SPECULATIVE_WORKERS = int(os.getenv('BISCOITAO_SPECULATIVE_WORKERS', '4'))
+
+_READ_ONLY_SQL = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+def normalize_plan(sql):
+    """SQL comparável: minúsculas, sem espaços redundantes nem ';' final"""
+    return " ".join(sql.lower().split()).rstrip(' ;')
+
+def is_read_only(sql):
+    """Só aceita do Toqan uma única consulta SELECT/WITH"""
+    return bool(sql) and bool(_READ_ONLY_SQL.match(sql)) and ';' not in sql.strip().rstrip(';')
+
+def plan_verdict(interpretation, planned_sql):
+    """
+    Compara a interpretação do Toqan com o plano local.
+
+    Returns:
+        tuple: (desfecho, sql) — ('hit', plano), ('miss', sql do Toqan) ou ('fallback', plano).
+    """
+    if not isinstance(interpretation, dict):
+        return 'fallback', planned_sql
+    toqan_sql = (interpretation.get('sql') or '').strip()
+    if toqan_sql and normalize_plan(toqan_sql) == normalize_plan(planned_sql):
+        return 'hit', planned_sql
+    agrees = interpretation.get('agrees')
+    if agrees is True or str(agrees).lower() in ('true', 'sim', 'yes'):
+        return 'hit', planned_sql
+    if agrees is not None and is_read_only(toqan_sql):
+        return 'miss', toqan_sql
+    # Discordância sem SQL utilizável (ou resposta livre): o plano local continua valendo
+    return 'fallback', planned_sql
+
+class SpeculationStats:
+    """Taxa de acerto e tempo economizado/desperdiçado pela especulação no processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.outcomes = {'hit': 0, 'miss': 0, 'miss_discarded': 0, 'fallback': 0}
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+
+    def record(self, outcome, saved=0.0, wasted=0.0):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.saved_seconds += saved
+            self.wasted_seconds += wasted
+
+    def snapshot(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            saved, wasted = self.saved_seconds, self.wasted_seconds
+        # Pareceres do Toqan sobre o plano (a SQL dele ter sido usada ou não)
+        judged = outcomes['hit'] + outcomes['miss'] + outcomes['miss_discarded']
+        return {
+            'outcomes': outcomes,
+            'hit_rate': round(outcomes['hit'] / judged, 3) if judged else None,
+            'saved_seconds': round(saved, 3),
+            'wasted_seconds': round(wasted, 3),
+        }
+
+_stats = SpeculationStats()
+
+def speculation_stats():
+    """Resumo da especulação desde o início do processo"""
+    return _stats.snapshot()
+
+class Speculation:
+    """Query planejada rodando em segundo plano, que pode ser usada ou cancelada"""
+
+    def __init__(self, sql, executor, fetch=None, submit=submit_query):
+        self.sql = sql
+        self.submit = submit
+        self.fetch = fetch
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.cancelled = False
+        self._handle = None
+        self._lock = threading.Lock()
+        # A thread herda o prazo da requisição e o trace atual
+        self._future = executor.submit(contextvars.copy_context().run, self._run)
+
+    def _execute(self, sql):
+        handle = self.submit(sql)
+        with self._lock:
+            self._handle = handle
+            cancel_now = self.cancelled
+        if cancel_now:
+            handle.cancel()
+            return None
+        return handle.result()
+
+    def _run(self):
+        try:
+            with span('speculative.query'):
+                if self.fetch is not None:
+                    return self.fetch(self.sql, execute=self._execute)
+                return self._execute(self.sql), False
+        finally:
+            self.finished_at = time.monotonic()
+
+    def result(self):
+        """(DataFrame, veio_do_cache) da query especulativa (aguarda se preciso)"""
+        return self._future.result()
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def cancel(self):
+        """Cancela no Trino (ou antes de submeter); retorna o tempo de cluster já gasto"""
+        with self._lock:
+            self.cancelled = True
+            handle = self._handle
+        self._future.cancel()
+        if handle is not None and self.finished_at is None:
+            handle.cancel()
+            print("🛑 Query especulativa cancelada no Trino")
+        return self.elapsed
+
+class SpeculativeRunner:
+    """Sobrepõe a interpretação do Toqan e a execução da query planejada"""
+
+    def __init__(self, interpret, fetch=None, submit=submit_query, max_workers=SPECULATIVE_WORKERS, stats=None):
+        """
+        Args:
+            interpret (callable): interpret(pergunta, sql_planejada) -> dict com 'agrees' e/ou 'sql' (ou None).
+            fetch (callable): fetch(sql, execute=...) -> (DataFrame, veio_do_cache), ex: QueryResultCache.fetch.
+            submit (callable): Função que submete SQL e retorna um handle com result()/cancel().
+        """
+        self.interpret = interpret
+        self.fetch = fetch
+        self.submit = submit
+        self.stats = stats or _stats
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speculative')
+        register_fork_safe(self)
+
+    def _after_fork(self):
+        # Threads do executor não atravessam o fork dos workers
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='speculative')
+
+    def _fetch_toqan_sql(self, sql):
+        if self.fetch is not None:
+            return self.fetch(sql)
+        return self.submit(sql).result(), False
+
+    def run(self, instruction, planned_sql, accept=None):
+        """
+        Executa a pergunta com especulação.
+
+        Args:
+            accept (callable): accept(DataFrame) -> bool, se o resultado da SQL do Toqan
+                serve; recusado, fica o resultado especulativo do plano (desfecho miss_discarded).
+
+        Returns:
+            dict: data, cache_hit, sql (a que produziu data), outcome, interpretation e tempos.
+        """
+        with span('speculative.execute') as spec_span:
+            speculation = Speculation(planned_sql, self.executor, self.fetch, self.submit)
+
+            started_at = time.monotonic()
+            try:
+                interpretation = self.interpret(instruction, planned_sql)
+            except DeadlineExceeded:
+                speculation.cancel()
+                raise
+            except Exception as e:
+                print(f"⚠️ Interpretação do Toqan falhou, mantendo o plano local: {e}")
+                interpretation = None
+            interpret_seconds = time.monotonic() - started_at
+
+            outcome, sql = plan_verdict(interpretation, planned_sql)
+            saved = wasted = 0.0
+            if outcome == 'miss':
+                # A especulação continua até o resultado do Toqan ser aceito
+                print("🔀 Toqan discordou do plano; executando a SQL sugerida")
+                toqan_started_at = time.monotonic()
+                try:
+                    data, cache_hit = self._fetch_toqan_sql(sql)
+                    accepted = accept is None or bool(accept(data))
+                except DeadlineExceeded:
+                    speculation.cancel()
+                    raise
+                except Exception as e:
+                    print(f"⚠️ SQL do Toqan falhou: {e}")
+                    accepted = False
+                if accepted:
+                    wasted = speculation.cancel()
+                else:
+                    print("↩️ Resultado do Toqan recusado; usando o resultado especulativo do plano local")
+                    outcome, sql = 'miss_discarded', planned_sql
+                    wasted = time.monotonic() - toqan_started_at
+                    data, cache_hit = speculation.result()
+            else:
+                data, cache_hit = speculation.result()
+                # Em sequência, interpretação e query somariam: a sobreposição poupa a menor delas
+                saved = min(interpret_seconds, speculation.elapsed)
+                if outcome == 'hit':
+                    print(f"🎯 Toqan confirmou o plano; resultado especulativo usado ({saved:.2f}s poupados)")
+
+            self.stats.record(outcome, saved, wasted)
+            spec_span.set(outcome=outcome, saved_seconds=round(saved, 3), wasted_seconds=round(wasted, 3),
+                          interpret_seconds=round(interpret_seconds, 3))
+            return {
+                'data': data,
+                'cache_hit': cache_hit,
+                'sql': sql,
+                'outcome': outcome,
+                'interpretation': interpretation,
+                'interpret_seconds': round(interpret_seconds, 3),
+                'saved_seconds': round(saved, 3),
+                'wasted_seconds': round(wasted, 3),
+            }
+
+def toqan_interpreter(client):
+    """interpret() que pede ao Toqan para validar (ou corrigir) a SQL planejada"""
+
+    def interpret(instruction, planned_sql):
+        context = f"""
+        Você é um analista de dados especialista em SQL (Trino) e negócios de marketplace.
+
+        PERGUNTA DO USUÁRIO: {instruction}
+
+        SQL PLANEJADA: {planned_sql}
+
+        A SQL planejada responde corretamente à pergunta? Retorne apenas um JSON:
+        {{
+            "agrees": true ou false,
+            "sql": "SQL corrigida (somente se agrees for false)",
+            "interpretation": "o que o usuário quer saber"
+        }}
+        """
+        return client.ask_json(context)
+
+    return interpret
@@ -0,0 +1,148 @@
+"""
+Strategy Racer - Execução paralela das estratégias de fallback
+Dispara as N estratégias de maior prioridade ao mesmo tempo no Trino e fica com
+o resultado não vazio de maior prioridade, cancelando as consultas perdedoras.
+"""
+
+import os
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .query import submit_query
+from .deadline import remaining_time, check_deadline
+
+DEFAULT_MAX_PARALLEL = int(os.getenv('BISCOITAO_RACE_PARALLEL', '3'))
+DEFAULT_DEADLINE = float(os.getenv('BISCOITAO_RACE_DEADLINE', '25'))
+
+class StrategyRacer:
+    """Corrida entre estratégias de query com prazo global"""
+
+    def __init__(self, submit=submit_query, max_parallel=DEFAULT_MAX_PARALLEL, deadline=DEFAULT_DEADLINE):
+        """
+        Args:
+            submit (callable): Função que submete SQL e retorna um handle com result()/cancel().
+            max_parallel (int): Quantas estratégias podem rodar ao mesmo tempo.
+            deadline (float): Prazo global da corrida em segundos (None = sem prazo).
+        """
+        self.submit = submit
+        self.max_parallel = max(1, max_parallel)
+        self.deadline = deadline
+
+    def race(self, queries):
+        """
+        Executa as estratégias em paralelo respeitando a ordem de prioridade.
+
+        Args:
+            queries (list): Lista de (estratégia, sql) em ordem de prioridade.
+
+        Returns:
+            tuple: (DataFrame, estratégia, sql) vencedores ou (None, None, None).
+        """
+        if not queries:
+            return None, None, None
+
+        started_at = time.monotonic()
+        # O prazo da corrida nunca ultrapassa o prazo da requisição
+        budget = remaining_time(self.deadline)
+        deadline_at = started_at + budget if budget is not None else None
+
+        handles = {}
+        cancelled = set()
+        lock = threading.Lock()
+        outcomes = {}  # índice -> DataFrame não vazio ou None (vazio/erro)
+        running = {}   # future -> índice
+        next_index = 0
+
+        def run(index):
+            strategy, sql = queries[index]
+            handle = self.submit(sql)
+            with lock:
+                handles[index] = handle
+                cancel_now = index in cancelled
+            if cancel_now:
+                handle.cancel()
+                return None
+            return handle.result()
+
+        def cancel(index):
+            with lock:
+                cancelled.add(index)
+                handle = handles.get(index)
+            if handle is not None:
+                handle.cancel()
+                print(f"🛑 Estratégia {queries[index][0]} cancelada no Trino")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='strategy-race')
+        try:
+            while True:
+                winner = self._decide(outcomes, len(queries))
+                if winner is not None:
+                    break
+
+                # Mantém até max_parallel estratégias rodando, sempre as de maior prioridade
+                while len(running) < self.max_parallel and next_index < len(queries):
+                    print(f"🔄 Disparando estratégia: {queries[next_index][0]}")
+                    # Copia o contexto para a thread herdar o prazo da requisição
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, run, next_index)] = next_index
+                    next_index += 1
+
+                if not running:
+                    break
+
+                timeout = None
+                if deadline_at is not None:
+                    timeout = deadline_at - time.monotonic()
+                    if timeout <= 0:
+                        print(f"⏰ Prazo de {budget:.0f}s da corrida esgotado")
+                        winner = self._best_available(outcomes)
+                        break
+
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    strategy = queries[index][0]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"❌ Estratégia {strategy} falhou: {str(e)[:100]}...")
+                        result = None
+                    if result is not None and not result.empty:
+                        outcomes[index] = result
+                    else:
+                        outcomes[index] = None
+
+            for future, index in running.items():
+                if index != winner:
+                    cancel(index)
+
+            elapsed = time.monotonic() - started_at
+            if winner is None:
+                print(f"❌ Nenhuma estratégia retornou dados ({elapsed:.1f}s)")
+                check_deadline('strategy_race')
+                return None, None, None
+
+            strategy, sql = queries[winner]
+            print(f"✅ Sucesso com estratégia: {strategy} ({elapsed:.1f}s)")
+            return outcomes[winner], strategy, sql
+        finally:
+            # Perdedoras já foram canceladas; não espera as threads terminarem
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _decide(self, outcomes, total):
+        """Retorna o índice vencedor quando todas as estratégias mais prioritárias já falharam"""
+        for index in range(total):
+            if index not in outcomes:
+                return None
+            if outcomes[index] is not None:
+                return index
+        return None
+
+    def _best_available(self, outcomes):
+        """Melhor resultado não vazio já disponível (usado quando o prazo acaba)"""
+        for index in sorted(outcomes):
+            if outcomes[index] is not None:
+                return index
+        return None
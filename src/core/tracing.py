@@ -0,0 +1,253 @@
+"""
+Tracing - Spans por estágio do pipeline
+Mede cada estágio de uma análise (schema, SQL, processamento, gráfico,
+escrita de arquivos, chamadas ao LLM) com spans aninhados propagados via
+contextvars. Traces concluídos são resumidos nos metadados do relatório e
+nas respostas Flask e, com BISCOITAO_TRACE_EXPORT=jsonl|otlp, exportados em
+JSON-lines ou no formato OTLP/JSON do OpenTelemetry (um arquivo por dia,
+seguro entre os workers pré-fork, com retenção de BISCOITAO_TRACE_DAYS: os
+spans levam o SQL inteiro de cada requisição).
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.daily_log import DailyJsonLog
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TRACE_EXPORT = os.getenv('BISCOITAO_TRACE_EXPORT', 'off')  # jsonl | otlp | off
+TRACE_FILE = os.getenv('BISCOITAO_TRACE_FILE', os.path.join(PROJECT_ROOT, 'output', 'traces', 'spans.jsonl'))
+TRACE_RETENTION_DAYS = int(os.getenv('BISCOITAO_TRACE_DAYS', '7'))
+SERVICE_NAME = os.getenv('BISCOITAO_SERVICE_NAME', 'biscoitao')
+
+class Span:
+    """Intervalo de tempo nomeado com atributos"""
+
+    def __init__(self, name, trace, parent=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        """Acrescenta atributos (ex: linhas retornadas, bytes escritos)"""
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def end(self, error=None):
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = 'error'
+            self.error = f"{type(error).__name__}: {str(error)[:200]}"
+        _notify('on_end', self)
+        self.trace._finish(self)
+
+    @property
+    def duration_ms(self):
+        return round((self.duration or 0) * 1000, 2)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+    def to_otlp(self):
+        """Span no formato OTLP/JSON (opentelemetry-proto)"""
+        end_ns = self.start_ns + int((self.duration or 0) * 1e9)
+        record = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.status == 'error' else {'code': 1},
+        }
+        if self.parent_id:
+            record['parentSpanId'] = self.parent_id
+        return record
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+class Trace:
+    """Conjunto de spans de uma requisição/análise"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans = []
+        self.root = None
+        self._lock = threading.Lock()
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+        if span is self.root:
+            export_trace(self)
+
+    def summary(self):
+        """Resumo por estágio para metadados de relatório e respostas HTTP"""
+        with self._lock:
+            spans = list(self.spans)
+        stages = {}
+        sql = []
+        for span in spans:
+            if span is self.root:
+                continue
+            stage = stages.setdefault(span.name, {'count': 0, 'total_ms': 0.0})
+            stage['count'] += 1
+            stage['total_ms'] = round(stage['total_ms'] + span.duration_ms, 2)
+            if span.name == 'sql.execute':
+                sql.append({k: span.attributes.get(k) for k in ('backend', 'query_id', 'rows', 'bytes')}
+                           | {'duration_ms': span.duration_ms, 'status': span.status})
+        root = self.root
+        total_ms = None
+        if root is not None:
+            # Trace ainda aberto (ex: resumo dentro da requisição): tempo decorrido até agora
+            total_ms = root.duration_ms if root.duration is not None else round((time.perf_counter() - root._start) * 1000, 2)
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': total_ms,
+            'stages': dict(sorted(stages.items(), key=lambda item: item[1]['total_ms'], reverse=True)),
+            'sql': sql,
+        }
+
+_current_span = contextvars.ContextVar('biscoitao_span', default=None)
+
+# Ouvintes de início/fim de span (ex: métricas Prometheus)
+_span_listeners = []
+
+def add_span_listener(on_start=None, on_end=None):
+    """Registra callbacks chamados com o span no início e no fim de cada estágio"""
+    _span_listeners.append({'on_start': on_start, 'on_end': on_end})
+
+def _notify(event, span):
+    for listener in _span_listeners:
+        callback = listener[event]
+        if callback is None:
+            continue
+        try:
+            callback(span)
+        except Exception as e:
+            print(f"⚠️ Falha no ouvinte de spans: {e}")
+
+def current_span():
+    return _current_span.get()
+
+def current_trace():
+    span = _current_span.get()
+    return span.trace if span else None
+
+def start_span(name, **attributes):
+    """Abre um span filho do atual (ou a raiz de um novo trace) e o torna o atual
+
+    Returns:
+        tuple: (span, token) — feche com end_span(span, token).
+    """
+    parent = _current_span.get()
+    trace = parent.trace if parent else Trace()
+    span = Span(name, trace, parent, attributes)
+    if parent is None:
+        trace.root = span
+    _notify('on_start', span)
+    return span, _current_span.set(span)
+
+def end_span(span, token, error=None):
+    _current_span.reset(token)
+    span.end(error)
+
+@contextmanager
+def span(name, **attributes):
+    """Mede o bloco como um span (aninhado no span atual, se houver)"""
+    opened, token = start_span(name, **attributes)
+    try:
+        yield opened
+    except BaseException as e:
+        end_span(opened, token, e)
+        raise
+    end_span(opened, token)
+
+def traced(name):
+    """Decorator que mede a função inteira como um span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def trace_summary():
+    """Resumo do trace atual (None fora de um trace)"""
+    trace = current_trace()
+    return trace.summary() if trace else None
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+_export_lock = threading.Lock()
+_export_log = None
+
+def _trace_log():
+    """Arquivo de traces do dia (criado no primeiro export)"""
+    global _export_log
+    with _export_lock:
+        if _export_log is None:
+            _export_log = DailyJsonLog(TRACE_FILE, TRACE_RETENTION_DAYS)
+        return _export_log
+
+def export_trace(trace):
+    """Grava os spans do trace concluído no arquivo configurado"""
+    if TRACE_EXPORT == 'off':
+        return
+    try:
+        with trace._lock:
+            spans = list(trace.spans)
+        if TRACE_EXPORT == 'otlp':
+            lines = [json.dumps({
+                'resourceSpans': [{
+                    'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+                    'scopeSpans': [{
+                        'scope': {'name': 'biscoitao.tracing'},
+                        'spans': [s.to_otlp() for s in spans],
+                    }],
+                }]
+            }, ensure_ascii=False, default=str)]
+        else:
+            lines = [json.dumps(s.to_dict(), ensure_ascii=False, default=str) for s in spans]
+        _trace_log().append(*lines)  # o trace inteiro numa única escrita
+    except Exception as e:
+        print(f"⚠️ Falha ao exportar trace {trace.trace_id}: {e}")
@@ -4,7 +4,7 @@ Geradores de relatórios e visualizações
 """
 
 from .visual_assistant import IntelligentReportGenerator
-from .html_generator import HTMLReportGenerator  
-from .pdf_generator import ProfessionalPDFReportGenerator
+from .html_generator import HTMLReportGenerator
+from .insight_engine import InsightEngine
 
-__all__ = ['IntelligentReportGenerator', 'HTMLReportGenerator', 'ProfessionalPDFReportGenerator']
+__all__ = ['IntelligentReportGenerator', 'HTMLReportGenerator', 'InsightEngine']
@@ -0,0 +1,107 @@
+"""
+Downsampling - Redução de pontos de séries longas antes de desenhar
+Resultados em grão diário de vários anos viram dezenas de milhares de pontos:
+o gráfico fica lento de renderizar e o PNG/SVG incha sem mostrar mais nada.
+Antes de desenhar, a série é reduzida a BISCOITAO_CHART_MAX_POINTS pontos:
+
+    lttb     Largest-Triangle-Three-Buckets: um ponto por bucket, o que forma
+             o maior triângulo com o ponto escolhido no bucket anterior e a
+             média do seguinte (preserva a forma visual, picos incluídos)
+    minmax   mínimo e máximo de cada bucket (preserva todos os extremos;
+             bom para séries ruidosas)
+    off      sem redução
+
+O primeiro e o último ponto são sempre mantidos. Só os pontos desenhados são
+reduzidos: a linha de tendência continua sendo ajustada sobre a série inteira.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = int(os.getenv('BISCOITAO_CHART_MAX_POINTS', '1000'))
+SPARKLINE_POINTS = int(os.getenv('BISCOITAO_SPARKLINE_POINTS', '60'))
+METHOD = os.getenv('BISCOITAO_DOWNSAMPLE', 'lttb').lower()
+METHODS = ('lttb', 'minmax', 'off')
+
+def numeric_axis(x):
+    """Eixo x como float64: datas em ns, números como estão, o resto pela posição"""
+    x = pd.Series(x) if not isinstance(x, pd.Series) else x
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=np.float64)
+    return np.arange(len(x), dtype=np.float64)
+
+def _bucket_edges(length, buckets):
+    # Primeiro e último ponto ficam de fora: buckets dividem o miolo [1, length - 1)
+    return np.linspace(1, length - 1, buckets + 1).astype(np.int64)
+
+def lttb_indices(x, y, threshold):
+    """Posições dos threshold pontos escolhidos pelo LTTB (ordenadas)"""
+    length = len(y)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = _bucket_edges(length, threshold - 2)
+    # Média de cada bucket (o vértice "seguinte" do triângulo), de uma vez com reduceat
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:length - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:length - 1], edges[:-1] - 1) / counts
+    mean_x = np.append(mean_x, x[-1])
+    mean_y = np.append(mean_y, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        # Área (x2) do triângulo anterior-candidato-média seguinte para todo o bucket
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_indices(y, threshold):
+    """Posições do mínimo e do máximo de cada bucket (ordenadas; no máximo threshold)"""
+    length = len(y)
+    if threshold >= length or threshold < 4:
+        return np.arange(length)
+    y = np.asarray(y, dtype=np.float64)
+    buckets = (threshold - 2) // 2
+    edges = _bucket_edges(length, buckets)
+    size = int(np.diff(edges).max())
+    # Buckets como linhas de uma matriz (completadas com NaN) para argmin/argmax vetorizados
+    positions = edges[:-1, None] + np.arange(size)[None, :]
+    valid = positions < edges[1:, None]
+    values = np.where(valid, y[np.minimum(positions, length - 1)], np.nan)
+    lows = edges[:-1] + np.nanargmin(values, axis=1)
+    highs = edges[:-1] + np.nanargmax(values, axis=1)
+    return np.unique(np.concatenate([[0, length - 1], lows, highs]))
+
+def downsample_indices(x, y, max_points=None, method=None):
+    """Posições dos pontos a desenhar (valores ausentes ficam de fora da escolha)"""
+    max_points = MAX_POINTS if max_points is None else max_points
+    method = (method or METHOD).lower()
+    y = np.asarray(y, dtype=np.float64)
+    if method == 'off' or len(y) <= max_points:
+        return np.arange(len(y))
+    finite = np.flatnonzero(np.isfinite(y))
+    x = numeric_axis(x)[finite]
+    if method == 'minmax':
+        chosen = minmax_indices(y[finite], max_points)
+    else:
+        chosen = lttb_indices(x, y[finite], max_points)
+    return finite[chosen]
+
+def downsample(data, x_col, y_col, max_points=None, method=None):
+    """Linhas de data a desenhar (o próprio data se já cabe em max_points)"""
+    max_points = MAX_POINTS if max_points is None else max_points
+    if len(data) <= max_points:
+        return data
+    x = data[x_col] if x_col is not None else np.arange(len(data))
+    return data.iloc[downsample_indices(x, data[y_col], max_points, method)]
@@ -11,12 +11,16 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import base64
+from html import escape
 from io import BytesIO
 import warnings
 
 # Imports relativos para nova estrutura
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from src.generators.visual_assistant import IntelligentReportGenerator
+from src.generators.render_profiles import mime_type
+from src.core.deadline import check_deadline
+from src.core.tracing import span, file_size
 
 warnings.filterwarnings("ignore")
 
@@ -52,13 +56,17 @@ class HTMLReportGenerator:
         # Configuração do seaborn
         sns.set_palette(self.viridis_colors)
     
-    def generate_html_report(self, instruction, auto_open=True):
+    def generate_html_report(self, instruction, auto_open=True, chart_format=None, context=None):
         """
         Gera relatório HTML completo com análise visual e insights
         
         Args:
             instruction (str): Instrução para análise
             auto_open (bool): Se deve abrir automaticamente no navegador
+            chart_format (str): 'png'/'webp' (base64) ou 'svg' (embutido inline, sem matplotlib);
+                padrão: o formato do perfil 'web'
+            context (AnalysisContext): Análise já feita da pergunta (sem nova consulta; o
+                gráfico 'web' só é renderizado se o contexto ainda não o tem)
             
         Returns:
             dict: Resultado com caminhos dos arquivos gerados
@@ -66,14 +74,22 @@ class HTMLReportGenerator:
         print(f"📊 Gerando relatório HTML para: {instruction}")
         print("=" * 60)
         
-        # Gera análise visual
-        result = self.visual_generator.generate_complete_report(instruction)
+        # Gera análise visual (ou reaproveita a do contexto)
+        if context is None:
+            context = self.visual_generator.analyze(instruction, chart_format=chart_format, render_profile='web')
+            result = context.report
+        elif context.ok:
+            result = dict(context.report, chart_file=self.visual_generator.context_chart(context, 'web',
+                                                                                         chart_format))
+        else:
+            result = None
         
         if not result:
             print("❌ Não foi possível gerar análise visual")
             return None
         
         # Gera HTML consolidado
+        check_deadline('html_write')
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         html_filename = f"relatorio_biscoitao_{timestamp}.html"
         
@@ -84,8 +100,11 @@ class HTMLReportGenerator:
         os.makedirs(output_dir, exist_ok=True)
         html_path = os.path.join(output_dir, html_filename)
         
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with span('file.write', format='html') as write_span:
+            with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            write_span.set(file=html_path, bytes=file_size(html_path))
+        context.add_artifact('html', html_path)
         
         print(f"✅ Relatório HTML gerado: {html_filename}")
         
@@ -104,11 +123,19 @@ class HTMLReportGenerator:
     def _create_html_content(self, result, instruction, timestamp):
         """Cria conteúdo HTML do relatório"""
         
-        # Converte gráfico para base64
-        chart_base64 = ""
+        # SVG vai inline no HTML; PNG/WebP são convertidos para base64
+        chart_html = '<p class="no-chart">Gráfico não disponível</p>'
         if result.get('chart_file') and os.path.exists(result['chart_file']):
-            with open(result['chart_file'], 'rb') as f:
-                chart_base64 = base64.b64encode(f.read()).decode()
+            if result['chart_file'].endswith('.svg'):
+                with open(result['chart_file'], encoding='utf-8') as f:
+                    chart_html = f'<div class="chart-image">{f.read()}</div>'
+            else:
+                with open(result['chart_file'], 'rb') as f:
+                    chart_base64 = base64.b64encode(f.read()).decode()
+                chart_html = (f'<img src="data:{mime_type(result["chart_file"])};base64,{chart_base64}" '
+                              f'alt="Gráfico de Análise" class="chart-image">')
+        elif result.get('chart_text'):
+            chart_html = f'<pre class="chart-text">{escape(result["chart_text"])}</pre>'
         
         # Template HTML com design profissional
         html_template = f"""
@@ -147,7 +174,7 @@ class HTMLReportGenerator:
         <div class="content-grid">
             <div class="chart-section">
                 <h2>📈 Visualização</h2>
-                {f'<img src="data:image/png;base64,{chart_base64}" alt="Gráfico de Análise" class="chart-image">' if chart_base64 else '<p class="no-chart">Gráfico não disponível</p>'}
+                {chart_html}
             </div>
             
             <div class="insights-section">
@@ -375,7 +402,7 @@ class HTMLReportGenerator:
     
     def _format_data_table(self, data):
         """Formata dados como tabela HTML"""
-        if not data:
+        if data is None or len(data) == 0:
             return '<p class="no-chart">Nenhum dado disponível</p>'
         
         # Converte para DataFrame se necessário
@@ -0,0 +1,237 @@
+"""
+Insight Engine - Insights vetorizados para milhares de séries de uma vez
+Recebe um resultado em formato longo (período × dimensão × métrica), ex:
+year, month, category, avg_value, record_count, e calcula para cada série
+(dimensões + métrica) crescimento, volatilidade (CV), picos/vales, variação
+mensal (MoM), anual (YoY) e participação no total, sem laço por série: as
+séries viram códigos inteiros, são ordenadas uma vez e as estatísticas saem
+de reduções NumPy por segmento (reduceat) e buscas binárias.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.rollup_store import DIMENSIONS
+
+# Colunas tratadas como dimensão mesmo quando numéricas (ids de categoria/plataforma)
+DIMENSION_HINTS = tuple(DIMENSIONS)
+MONTHLY_PERIODS = ('year', 'month')
+
+class InsightEngine:
+    """Estatísticas e insights por série, vetorizados com NumPy/groupby"""
+
+    def __init__(self, strong_growth=10.0, moderate_growth=2.0, high_cv=20.0):
+        self.strong_growth = strong_growth
+        self.moderate_growth = moderate_growth
+        self.high_cv = high_cv
+
+    def detect_columns(self, data, period_columns=None, dimension_columns=None, metric_columns=None):
+        """Papel de cada coluna: (períodos, dimensões, métricas)"""
+        if period_columns is None:
+            if all(column in data.columns for column in MONTHLY_PERIODS):
+                period_columns = MONTHLY_PERIODS
+            elif 'period' in data.columns:
+                period_columns = ('period',)
+            else:
+                period_columns = ()
+        period_columns = tuple(period_columns)
+        if dimension_columns is None:
+            dimension_columns = [column for column in data.columns if column not in period_columns and
+                                 (column in DIMENSION_HINTS or not is_numeric_dtype(data[column]))]
+        if metric_columns is None:
+            metric_columns = [column for column in data.columns
+                              if column not in period_columns and column not in dimension_columns]
+        return period_columns, list(dimension_columns), list(metric_columns)
+
+    def _ordinals(self, frame, period_columns):
+        """Período como inteiro crescente (meses corridos quando mensal) e se é mensal"""
+        if period_columns == MONTHLY_PERIODS:
+            years = frame['year'].to_numpy(dtype=np.int64)
+            months = frame['month'].to_numpy(dtype=np.int64)
+            return years * 12 + months - 1, True
+        if not period_columns:
+            return np.arange(len(frame), dtype=np.int64), False
+        column = frame[period_columns[0]]
+        if is_numeric_dtype(column):
+            return column.to_numpy(dtype=np.int64), False
+        return pd.to_datetime(column).dt.to_period('M').array.asi8.astype(np.int64), True
+
+    def _period_labels(self, frame, period_columns, positions):
+        if not period_columns:
+            return np.full(len(positions), None, dtype=object)
+        rows = frame.iloc[positions]
+        if period_columns == MONTHLY_PERIODS:
+            return (rows['month'].astype(str) + '/' + rows['year'].astype(str)).to_numpy()
+        return rows[period_columns[0]].astype(str).to_numpy()
+
+    def summarize(self, data, period_columns=None, dimension_columns=None, metric_columns=None):
+        """
+        Uma linha por série com as estatísticas.
+
+        Returns:
+            DataFrame: dimensões, metric, points, first, last, growth_pct, mean, std, cv_pct,
+            peak_value/peak_period, valley_value/valley_period, mom_pct, yoy_pct,
+            total, share_pct e rank (por total, dentro da métrica).
+        """
+        periods, dimensions, metrics = self.detect_columns(data, period_columns, dimension_columns, metric_columns)
+        keys = dimensions + ['metric']
+        long = data.melt(id_vars=dimensions + list(periods), value_vars=metrics,
+                         var_name='metric', value_name='value')
+        long = long[long['value'].notna()].reset_index(drop=True)
+        if long.empty:
+            return pd.DataFrame(columns=keys)
+
+        codes = long.groupby(keys, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+        ordinals, monthly = self._ordinals(long, periods)
+        order = np.lexsort((ordinals, codes))
+        codes, ordinals = codes[order], ordinals[order]
+        values = long['value'].to_numpy(dtype=np.float64)[order]
+        size = len(values)
+
+        # Segmentos contíguos: [starts[i], ends[i]) são os pontos da série i, em ordem de período
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], size]
+        counts = ends - starts
+        series = np.repeat(np.arange(len(starts)), counts)
+
+        first, last = values[starts], values[ends - 1]
+        totals = np.add.reduceat(values, starts)
+        means = totals / counts
+        squares = np.add.reduceat((values - means[series]) ** 2, starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stds = np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+            growth = np.where(first != 0, (last - first) / first * 100, np.nan)
+            cv = np.where(means != 0, stds / means * 100, np.nan)
+
+        # Pico/vale: primeira ocorrência do máximo/mínimo de cada série
+        peaks, valleys = np.maximum.reduceat(values, starts), np.minimum.reduceat(values, starts)
+        positions = np.arange(size)
+        peak_at = np.minimum.reduceat(np.where(values == peaks[series], positions, size), starts)
+        valley_at = np.minimum.reduceat(np.where(values == valleys[series], positions, size), starts)
+
+        mom = np.full(len(starts), np.nan)
+        yoy = np.full(len(starts), np.nan)
+        if periods:
+            # MoM: o ponto anterior existe e é exatamente o período anterior
+            previous = ends - 2
+            has_previous = counts >= 2
+            previous = np.where(has_previous, previous, 0)
+            valid = has_previous & (ordinals[previous] == ordinals[ends - 1] - 1) & (values[previous] != 0)
+            mom[valid] = (last[valid] - values[previous][valid]) / values[previous][valid] * 100
+            if monthly:
+                # YoY: busca binária do mesmo mês do ano anterior na chave (série, período)
+                base = ordinals.min() - 12
+                span = ordinals.max() - base + 1
+                composite = codes.astype(np.int64) * span + (ordinals - base)
+                target = np.arange(len(starts), dtype=np.int64) * span + (ordinals[ends - 1] - 12 - base)
+                found = np.minimum(np.searchsorted(composite, target), size - 1)
+                valid = (composite[found] == target) & (values[found] != 0)
+                yoy[valid] = (last[valid] - values[found][valid]) / values[found][valid] * 100
+
+        summary = long.iloc[order[starts]][keys].reset_index(drop=True)
+        summary['points'] = counts
+        summary['first'], summary['last'] = first, last
+        summary['growth_pct'] = growth
+        summary['mean'], summary['std'], summary['cv_pct'] = means, stds, cv
+        summary['peak_value'] = peaks
+        summary['peak_period'] = self._period_labels(long, periods, order[peak_at])
+        summary['valley_value'] = valleys
+        summary['valley_period'] = self._period_labels(long, periods, order[valley_at])
+        summary['mom_pct'], summary['yoy_pct'] = mom, yoy
+        summary['total'] = totals
+        by_metric = summary.groupby('metric', sort=False)['total']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            summary['share_pct'] = summary['total'] / by_metric.transform('sum') * 100
+        summary['rank'] = by_metric.rank(ascending=False, method='first').astype(np.int64)
+        return summary
+
+    def concentration(self, summary):
+        """Por métrica: participação da líder, das 3 maiores e índice HHI (0-10000)"""
+        if summary.empty:
+            return pd.DataFrame(columns=['metric', 'series', 'top_share_pct', 'top3_share_pct', 'hhi'])
+        shares = summary[['metric', 'rank', 'share_pct']]
+        grouped = shares.groupby('metric', sort=False)
+        result = pd.DataFrame({
+            'series': grouped.size(),
+            'top_share_pct': shares[shares['rank'] == 1].groupby('metric', sort=False)['share_pct'].sum(),
+            'top3_share_pct': shares[shares['rank'] <= 3].groupby('metric', sort=False)['share_pct'].sum(),
+            'hhi': (shares['share_pct'] ** 2).groupby(shares['metric'], sort=False).sum(),
+        })
+        return result.reset_index().rename(columns={'index': 'metric'})
+
+    def _series_name(self, row, dimensions):
+        return " / ".join(str(row[column]) for column in dimensions) or row['metric']
+
+    def _growth_message(self, growth):
+        if growth > self.strong_growth:
+            return f"📈 Tendência de crescimento forte: {growth:.1f}%"
+        if growth > self.moderate_growth:
+            return f"📊 Crescimento moderado: {growth:.1f}%"
+        if growth < -self.strong_growth:
+            return f"📉 Declínio significativo: {growth:.1f}%"
+        if growth < -self.moderate_growth:
+            return f"📊 Declínio moderado: {growth:.1f}%"
+        return f"📊 Tendência estável: variação de {growth:.1f}%"
+
+    def insights(self, data, period_columns=None, dimension_columns=None, metric_columns=None, limit=3):
+        """Frases de insight: detalhadas para uma série, destaques (top N) para muitas"""
+        periods, dimensions, metrics = self.detect_columns(data, period_columns, dimension_columns, metric_columns)
+        summary = self.summarize(data, periods, dimensions, metrics)
+        if summary.empty:
+            return []
+
+        insights = []
+        for metric, series in summary.groupby('metric', sort=False):
+            if periods and len(series) == 1:
+                insights.extend(self._single_series(series.iloc[0]))
+            elif periods:
+                insights.extend(self._many_series(series, dimensions, limit))
+            if not periods or len(series) > 1:
+                insights.extend(self._ranking(series, dimensions))
+        return insights
+
+    def _single_series(self, row):
+        insights = []
+        if row['points'] < 2:
+            return insights
+        if not np.isnan(row['growth_pct']):
+            insights.append(self._growth_message(row['growth_pct']))
+        if row['cv_pct'] > self.high_cv:
+            insights.append(f"⚠️ Alta volatilidade detectada (CV: {row['cv_pct']:.1f}%)")
+        if row['peak_period'] is not None:
+            insights.append(f"🔝 Pico em {row['peak_period']}: {row['peak_value']:.2f}")
+            insights.append(f"🔻 Vale em {row['valley_period']}: {row['valley_value']:.2f}")
+        if not np.isnan(row['yoy_pct']):
+            insights.append(f"📅 Em relação ao mesmo mês do ano anterior: {row['yoy_pct']:+.1f}%")
+        return insights
+
+    def _many_series(self, series, dimensions, limit):
+        growth = series['growth_pct']
+        rising = int((growth > self.moderate_growth).sum())
+        falling = int((growth < -self.moderate_growth).sum())
+        insights = [f"📊 {len(series)} séries: {rising} em alta, {falling} em queda, "
+                    f"{len(series) - rising - falling} estáveis"]
+        ranked = series[growth.notna()]
+        for _, row in ranked.nlargest(limit, 'growth_pct').iterrows():
+            if row['growth_pct'] > self.moderate_growth:
+                insights.append(f"📈 Crescimento em {self._series_name(row, dimensions)}: {row['growth_pct']:.1f}%")
+        for _, row in ranked.nsmallest(limit, 'growth_pct').iterrows():
+            if row['growth_pct'] < -self.moderate_growth:
+                insights.append(f"📉 Queda em {self._series_name(row, dimensions)}: {row['growth_pct']:.1f}%")
+        volatile = series[series['cv_pct'] > self.high_cv].nlargest(limit, 'cv_pct')
+        for _, row in volatile.iterrows():
+            insights.append(f"⚠️ Alta volatilidade em {self._series_name(row, dimensions)} (CV: {row['cv_pct']:.1f}%)")
+        return insights
+
+    def _ranking(self, series, dimensions):
+        if len(series) < 2:
+            return []
+        leader = series[series['rank'] == 1].iloc[0]
+        top3 = series.loc[series['rank'] <= 3, 'share_pct'].sum()
+        return [f"🥇 Categoria líder: {self._series_name(leader, dimensions)} ({leader['share_pct']:.1f}% do total)",
+                f"📊 Top 3 representam {top3:.1f}% do total"]
@@ -0,0 +1,126 @@
+"""
+Render Profiles - Resolução, formato e compressão por destino do gráfico
+Todo gráfico era salvo a 300 dpi, fosse para a prévia de uma célula do Sheets,
+uma página HTML ou um PDF impresso. Cada gerador agora pede o perfil mais
+barato que atende o seu destino:
+
+    thumbnail  prévia no Sheets e listagens   PNG   48 dpi, otimizado
+    web        API e relatórios HTML          WebP 100 dpi, qualidade 80
+    print      PDF / impressão                PNG  300 dpi
+
+Formatos: png e webp (rasterizados pelo VisualizationEngine) e svg (templates
+do SvgChartEngine, sem dpi). BISCOITAO_RENDER_PROFILE escolhe o perfil de quem
+não pede nenhum e BISCOITAO_RENDER_PROFILE_<NOME>=formato[:dpi[:compressão]]
+redefine um perfil (ex: BISCOITAO_RENDER_PROFILE_WEB=png:100:6). A compressão
+é o compress_level (0-9) no PNG e a qualidade (0-100) no WebP.
+
+Vários perfis do mesmo gráfico saem de uma só figura: o layout e o recorte
+(o bbox_inches='tight') são calculados uma vez e cada perfil só rasteriza.
+"""
+
+import os
+
+FORMATS = ('png', 'webp', 'svg')
+MIME_TYPES = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}
+# Mesma folga do bbox_inches='tight' (rcParams['savefig.pad_inches'])
+PAD_INCHES = 0.1
+
+class RenderProfile:
+    """Como um gráfico é gravado para um destino (thumbnail, web, print...)"""
+
+    def __init__(self, name, image_format='png', dpi=100, compression=None):
+        self.name = name
+        self.image_format = image_format if image_format in FORMATS else 'png'
+        self.dpi = dpi
+        self.compression = compression
+
+    @property
+    def vector(self):
+        return self.image_format == 'svg'
+
+    def savefig_kwargs(self, image_format=None):
+        """Argumentos do savefig para rasterizar neste perfil (em image_format, se dado)"""
+        image_format = image_format or self.image_format
+        if image_format == 'svg':
+            return {'format': 'svg'}  # vetorial (matplotlib): dpi e compressão não se aplicam
+        if image_format == 'webp':
+            quality = 80 if self.compression is None else self.compression
+            return {'format': 'webp', 'dpi': self.dpi, 'pil_kwargs': {'quality': quality, 'method': 4}}
+        level = 6 if self.compression is None else self.compression
+        # optimize só compensa em imagens pequenas: a 300 dpi custa mais que economiza
+        return {'format': 'png', 'dpi': self.dpi,
+                'pil_kwargs': {'compress_level': level, 'optimize': self.dpi <= 100}}
+
+    def to_dict(self):
+        return {'name': self.name, 'format': self.image_format, 'dpi': None if self.vector else self.dpi,
+                'compression': self.compression}
+
+def parse_profile(name, spec, base=None):
+    """Perfil a partir de 'formato[:dpi[:compressão]]' (campos ausentes vêm de base)"""
+    parts = [part.strip() for part in spec.split(':')]
+    image_format = parts[0].lower() or (base.image_format if base else 'png')
+    dpi = int(parts[1]) if len(parts) > 1 and parts[1] else (base.dpi if base else 100)
+    compression = int(parts[2]) if len(parts) > 2 and parts[2] else (base.compression if base else None)
+    return RenderProfile(name, image_format, dpi, compression)
+
+def _load_profiles():
+    profiles = {
+        'thumbnail': RenderProfile('thumbnail', 'png', dpi=48, compression=9),
+        'web': RenderProfile('web', 'webp', dpi=100, compression=80),
+        'print': RenderProfile('print', 'png', dpi=300),
+    }
+    for name, profile in list(profiles.items()):
+        spec = os.getenv(f'BISCOITAO_RENDER_PROFILE_{name.upper()}')
+        if spec:
+            profiles[name] = parse_profile(name, spec, profile)
+    return profiles
+
+PROFILES = _load_profiles()
+DEFAULT_RENDER_PROFILE = os.getenv('BISCOITAO_RENDER_PROFILE', 'web').lower()
+
+def get_profile(value=None):
+    """RenderProfile pelo nome (desconhecido ou vazio: o perfil padrão do servidor)"""
+    if isinstance(value, RenderProfile):
+        return value
+    name = str(value or DEFAULT_RENDER_PROFILE).lower()
+    return PROFILES.get(name) or PROFILES.get(DEFAULT_RENDER_PROFILE) or PROFILES['web']
+
+def resolve_profiles(value=None):
+    """Lista de perfis a partir de um nome, 'web,print' ou lista (sem repetir)"""
+    if isinstance(value, str) and ',' in value:
+        value = value.split(',')
+    names = value if isinstance(value, (list, tuple)) else [value]
+    profiles = []
+    for name in names:
+        profile = get_profile(name)
+        if profile.name not in [item.name for item in profiles]:
+            profiles.append(profile)
+    return profiles
+
+def file_format(filename):
+    """Formato de um gráfico pela extensão (png, webp, svg ou None)"""
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    return extension if extension in FORMATS else None
+
+def mime_type(filename):
+    """Content-Type de um gráfico pela extensão"""
+    return MIME_TYPES.get(file_format(filename), 'application/octet-stream')
+
+def save_figure(figure, targets):
+    """
+    Grava a figura em cada (arquivo, perfil, formato) com um só layout.
+
+    O recorte justo é medido uma vez (o bbox_inches='tight' refaria o desenho
+    a cada savefig) e reaproveitado por todos os perfis: cada um só rasteriza
+    na sua resolução e compressão.
+
+    Returns:
+        list: Arquivos gravados, na ordem de targets
+    """
+    renderer = figure.canvas.get_renderer()
+    bbox = figure.get_tightbbox(renderer).padded(PAD_INCHES)
+    files = []
+    for filename, profile, image_format in targets:
+        figure.savefig(filename, bbox_inches=bbox, **profile.savefig_kwargs(image_format))
+        files.append(filename)
+    return files
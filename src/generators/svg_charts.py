@@ -0,0 +1,280 @@
+"""
+SVG Charts - Gráficos leves sem matplotlib
+Alternativa ao VisualizationEngine para respostas do Sheets e relatórios HTML:
+os mesmos line_chart/bar_chart montados direto como SVG a partir de templates
+(sem figura, rasterização a 300 dpi nem base64) e um modo texto com
+sparklines/barras Unicode que cabe numa célula ou numa mensagem.
+
+Formatos (chart_format por requisição; sem ele, o do perfil de renderização):
+    png   VisualizationEngine (matplotlib + seaborn, dpi do perfil)
+    webp  VisualizationEngine, comprimido em WebP
+    svg   SvgChartEngine (arquivo .svg de poucos KB, embutível inline no HTML)
+    text  text_chart (sparkline ou barras Unicode, sem arquivo)
+"""
+
+import os
+import sys
+from html import escape
+
+import numpy as np
+import pandas as pd
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.deadline import check_deadline
+from src.generators.downsampling import downsample_indices, SPARKLINE_POINTS
+
+CHART_FORMATS = ('png', 'webp', 'svg', 'text')
+# Vazio: cada requisição usa o formato do seu perfil de renderização (render_profiles)
+DEFAULT_CHART_FORMAT = os.getenv('BISCOITAO_CHART_FORMAT', '').lower() or None
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+MONTH_NAMES = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+# Mesma paleta husl (8 cores) dos gráficos PNG
+PALETTE = ['#f77189', '#d58c32', '#a4a031', '#50b131', '#34ae91', '#37abb5', '#3ba3ec', '#bb83f4']
+
+def resolve_chart_format(value, fallback='png'):
+    """Formato pedido normalizado (desconhecido ou vazio: BISCOITAO_CHART_FORMAT, senão fallback)"""
+    value = str(value or '').lower()
+    if value in CHART_FORMATS:
+        return value
+    return DEFAULT_CHART_FORMAT if DEFAULT_CHART_FORMAT in CHART_FORMATS else fallback
+
+def chart_title(instruction, chart_type):
+    """Título do gráfico a partir da pergunta"""
+    lower = instruction.lower()
+    if 'média' in lower:
+        metric = 'Média'
+    elif 'soma' in lower or 'total' in lower:
+        metric = 'Total'
+    elif 'quantidade' in lower:
+        metric = 'Quantidade'
+    else:
+        metric = 'Análise'
+
+    if chart_type == 'temporal':
+        return f'{metric} ao Longo do Tempo'
+    elif chart_type == 'categorical':
+        return f'{metric} por Categoria'
+    return f'{metric} - Análise de Dados'
+
+def metric_name(column_name):
+    """Nome legível da métrica"""
+    if 'price' in column_name.lower():
+        return 'Preço (R$)'
+    elif 'avg_' in column_name:
+        return 'Média'
+    elif 'sum_' in column_name:
+        return 'Soma Total'
+    elif 'count' in column_name:
+        return 'Quantidade'
+    return column_name.replace('_', ' ').title()
+
+def value_column(data):
+    """Coluna de valores (mesma regra dos gráficos PNG)"""
+    value_cols = [col for col in data.columns if 'avg_' in col or 'sum_' in col or 'value' in col]
+    return value_cols[0] if value_cols else data.columns[1]
+
+def period_labels(data, rows=None):
+    """Rótulos do eixo x: 'Jan-24' para year/month, senão a primeira coluna (só das posições rows, se dadas)"""
+    if rows is not None:
+        data = data.iloc[rows]
+    if 'year' in data.columns and 'month' in data.columns:
+        return [f"{MONTH_NAMES[int(month)]}-{int(year) % 100:02d}"
+                for year, month in zip(data['year'], data['month'])]
+    return [str(value) for value in data[data.columns[0]]]
+
+def _number(value):
+    """Valor compacto para rótulos (1.2k, 3.4M)"""
+    magnitude = abs(value)
+    if magnitude >= 1e6:
+        return f"{value / 1e6:.1f}M"
+    if magnitude >= 1e4:
+        return f"{value / 1e3:.1f}k"
+    return f"{round(value, 2):g}"
+
+def sparkline(values):
+    """Série como blocos Unicode ▁▂▃▄▅▆▇█ (valores ausentes viram espaço)"""
+    values = pd.to_numeric(pd.Series(list(values)), errors='coerce')
+    valid = values.dropna()
+    if valid.empty:
+        return ""
+    low, high = valid.min(), valid.max()
+    span = high - low
+    blocks = []
+    for value in values:
+        if pd.isna(value):
+            blocks.append(' ')
+        elif span == 0:
+            blocks.append(SPARK_BLOCKS[len(SPARK_BLOCKS) // 2])
+        else:
+            blocks.append(SPARK_BLOCKS[int(round((value - low) / span * (len(SPARK_BLOCKS) - 1)))])
+    return "".join(blocks)
+
+def text_bars(labels, values, width=15):
+    """Linhas 'rótulo: ████░░░ valor' escaladas entre o mínimo e o máximo"""
+    pairs = [(label, value) for label, value in zip(labels, values) if not pd.isna(value)]
+    if not pairs:
+        return []
+    high = max(value for _, value in pairs)
+    low = min(value for _, value in pairs)
+    label_width = max(6, min(18, max(len(str(label)) for label, _ in pairs)))
+    lines = []
+    for label, value in pairs:
+        proportion = (value - low) / (high - low) if high > low else 1
+        length = max(1, int(proportion * width))
+        lines.append(f"  {str(label)[:label_width]:>{label_width}}: {'█' * length}{'░' * (width - length)} {value:,.2f}")
+    return lines
+
+def text_chart(data, viz_type, instruction=""):
+    """Gráfico em texto: sparkline para séries temporais, barras para categorias"""
+    if len(data) < 1:
+        return ""
+    value_col = value_column(data)
+    values = data[value_col].astype(float)
+    if viz_type == 'bar_chart':
+        top = data.head(10)
+        lines = [f"📊 {chart_title(instruction, 'categorical')}"]
+        return "\n".join(lines + text_bars(top[data.columns[0]].astype(str), top[value_col].astype(float)))
+    labels = period_labels(data, [0, len(data) - 1])
+    valid = values.dropna()
+    if valid.empty:
+        return ""
+    spark = values.iloc[downsample_indices(np.arange(len(values)), values, SPARKLINE_POINTS)]
+    return (f"📈 {chart_title(instruction, 'temporal')}: {sparkline(spark)} "
+            f"{labels[0]} → {labels[-1]} (mín {valid.min():,.2f}, máx {valid.max():,.2f}, último {valid.iloc[-1]:,.2f})")
+
+class SvgChartEngine:
+    """Gráficos de linha e barras em SVG montado direto de templates (sem matplotlib)"""
+
+    def __init__(self, width=720, height=360):
+        self.width = width
+        self.height = height
+        self.margin = {'left': 64, 'right': 20, 'top': 40, 'bottom': 72}
+        self.colors = PALETTE
+
+    @property
+    def plot_box(self):
+        m = self.margin
+        return m['left'], m['top'], self.width - m['left'] - m['right'], self.height - m['top'] - m['bottom']
+
+    def _ticks(self, low, high, count=5):
+        """Marcas 'redondas' no eixo y cobrindo [low, high]"""
+        if high == low:
+            high, low = high + 1, low - 1
+        raw = (high - low) / count
+        magnitude = 10 ** np.floor(np.log10(raw))
+        step = next(factor * magnitude for factor in (1, 2, 2.5, 5, 10) if factor * magnitude >= raw)
+        start = np.floor(low / step) * step
+        return [start + index * step for index in range(int(np.ceil((high - start) / step)) + 1)]
+
+    def _document(self, title, body, x_label, y_label):
+        left, top, width, height = self.plot_box
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {self.width} {self.height}" '
+                f'width="{self.width}" height="{self.height}" font-family="sans-serif" font-size="11">'
+                f'<rect width="100%" height="100%" fill="#fff"/>'
+                f'<text x="{self.width / 2:g}" y="24" text-anchor="middle" font-size="15" font-weight="bold">'
+                f'{escape(title)}</text>{body}'
+                f'<text x="{left + width / 2:g}" y="{self.height - 8}" text-anchor="middle" font-size="12">'
+                f'{escape(x_label)}</text>'
+                f'<text transform="translate(14 {top + height / 2:g}) rotate(-90)" text-anchor="middle" '
+                f'font-size="12">{escape(y_label)}</text></svg>')
+
+    def _y_axis(self, ticks, y):
+        left, _, width, _ = self.plot_box
+        grid = "".join(f'<path d="M{left} {y(tick):.1f}h{width}"/>' for tick in ticks)
+        labels = "".join(f'<text x="{left - 6}" y="{y(tick) + 4:.1f}">{_number(tick)}</text>' for tick in ticks)
+        return (f'<g stroke="#ddd">{grid}</g>'
+                f'<g text-anchor="end" fill="#555">{labels}</g>')
+
+    def _x_labels(self, labels, positions, limit=12):
+        _, top, _, height = self.plot_box
+        step = max(1, int(np.ceil(len(labels) / limit)))
+        base = top + height + 14
+        items = "".join(f'<text transform="translate({positions[index]:.1f} {base}) rotate(-45)">'
+                        f'{escape(str(labels[index])[:18])}</text>'
+                        for index in range(0, len(labels), step))
+        return f'<g text-anchor="end" fill="#555">{items}</g>'
+
+    def line_chart_svg(self, data, instruction):
+        """SVG do gráfico de linha temporal (pontos, tendência linear e eixos)"""
+        y_col = value_column(data)
+        values = data[y_col].astype(float).to_numpy()
+        left, top, width, height = self.plot_box
+
+        trend = None
+        if len(values) > 2:
+            trend = np.poly1d(np.polyfit(range(len(values)), values, 1))(range(len(values)))
+        finite = values[np.isfinite(values)]
+        low, high = (finite.min(), finite.max()) if finite.size else (0.0, 1.0)
+        if trend is not None:
+            low, high = min(low, trend.min()), max(high, trend.max())
+        ticks = self._ticks(low, high)
+        y_low, y_high = ticks[0], ticks[-1]
+
+        def y(value):
+            return top + height - (value - y_low) / (y_high - y_low) * height
+
+        positions = np.array([left + width / 2]) if len(values) == 1 else np.linspace(left, left + width, len(values))
+        # Só os pontos escolhidos pelo downsampling viram vértices (a tendência usa a série inteira)
+        drawn = [(positions[index], values[index]) for index in downsample_indices(np.arange(len(values)), values)
+                 if np.isfinite(values[index])]
+        points = " ".join(f"{x:.1f},{y(value):.1f}" for x, value in drawn)
+        body = [self._y_axis(ticks, y),
+                f'<polyline points="{points}" fill="none" stroke="{self.colors[0]}" stroke-width="2.5"/>']
+        if len(drawn) <= 60:
+            body.append(f'<g fill="{self.colors[0]}">' + "".join(
+                f'<circle cx="{x:.1f}" cy="{y(value):.1f}" r="3.5"/>' for x, value in drawn) + '</g>')
+        if trend is not None:
+            body.append(f'<path d="M{positions[0]:.1f} {y(trend[0]):.1f}L{positions[-1]:.1f} {y(trend[-1]):.1f}" '
+                        f'stroke="{self.colors[1]}" stroke-width="1.5" stroke-dasharray="6 4" opacity=".7"/>'
+                        f'<text x="{left + width - 4}" y="{top + 12}" text-anchor="end" fill="{self.colors[1]}">'
+                        f'- - Tendência</text>')
+        # Rótulos só das posições exibidas (no máximo 12), sem formatar a série inteira
+        rows = np.arange(0, len(values), max(1, int(np.ceil(len(values) / 12))))
+        body.append(self._x_labels(period_labels(data, rows), positions[rows]))
+        x_label = 'Período' if 'year' in data.columns and 'month' in data.columns else data.columns[0]
+        return self._document(chart_title(instruction, 'temporal'), "".join(body), x_label, metric_name(y_col))
+
+    def bar_chart_svg(self, data, instruction):
+        """SVG do gráfico de barras (até 10 categorias, valor sobre cada barra)"""
+        cat_col = data.columns[0]
+        value_col = value_column(data)
+        data = data.head(10)
+        values = data[value_col].astype(float).to_numpy()
+        left, top, width, height = self.plot_box
+        ticks = self._ticks(min(0.0, values.min()), max(0.0, values.max()))
+        y_low, y_high = ticks[0], ticks[-1]
+
+        def y(value):
+            return top + height - (value - y_low) / (y_high - y_low) * height
+
+        slot = width / max(len(values), 1)
+        bar_width = slot * 0.8
+        positions = [left + slot * (index + 0.5) for index in range(len(values))]
+        bars, labels = [], []
+        for index, (x, value) in enumerate(zip(positions, values)):
+            y0, y1 = sorted((y(0.0), y(value)))
+            bars.append(f'<rect x="{x - bar_width / 2:.1f}" y="{y0:.1f}" width="{bar_width:.1f}" '
+                        f'height="{y1 - y0:.1f}" fill="{self.colors[index % len(self.colors)]}"/>')
+            labels.append(f'<text x="{x:.1f}" y="{y(value) - 4:.1f}">{value:.1f}</text>')
+        body = (self._y_axis(ticks, y) + "".join(bars) +
+                f'<g text-anchor="middle" font-weight="bold">{"".join(labels)}</g>' +
+                self._x_labels([str(value) for value in data[cat_col]], positions))
+        return self._document(chart_title(instruction, 'categorical'), body,
+                              cat_col.replace('_', ' ').title(), metric_name(value_col))
+
+    def _save(self, svg, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(svg)
+        return filename
+
+    def create_line_chart(self, data, instruction, filename):
+        """Grava o gráfico de linha em filename (.svg) e o retorna"""
+        check_deadline('chart_render')
+        return self._save(self.line_chart_svg(data, instruction), filename)
+
+    def create_bar_chart(self, data, instruction, filename):
+        """Grava o gráfico de barras em filename (.svg) e o retorna"""
+        check_deadline('chart_render')
+        return self._save(self.bar_chart_svg(data, instruction), filename)
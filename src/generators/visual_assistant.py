@@ -6,10 +6,14 @@ Sistema avançado para análise automatizada de dados com geração de gráficos
 import sys
 import re
 import os
-from datetime import datetime
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import warnings
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
 import seaborn as sns
 import numpy as np
 from dotenv import load_dotenv
@@ -17,6 +21,21 @@ from dotenv import load_dotenv
 # Imports relativos para nova estrutura
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from src.core.query import execute_query
+from src.core.deadline import check_deadline, DeadlineExceeded
+from src.core.rollup_store import RollupStore, SOURCE_TABLE, DIMENSIONS
+from src.core.result_cache import get_default_cache
+from src.core.query_log import log_question
+from src.core.prewarm import PrewarmManifest, data_fingerprint
+from src.core.tracing import span, trace_summary, file_size
+from src.core.batch_planner import BatchPlanner, DEFAULT_BATCH_CONCURRENCY
+from src.core.analysis_context import AnalysisContext
+from src.generators.insight_engine import InsightEngine
+from src.generators.svg_charts import SvgChartEngine, chart_title, metric_name, text_chart, resolve_chart_format
+from src.generators.downsampling import downsample_indices
+from src.generators.render_profiles import get_profile, resolve_profiles, save_figure, file_format
+from src.core.speculative import SpeculativeRunner, SPECULATIVE_ENABLED, toqan_interpreter
+from src.core.approximate import ApproximatePlan, wants_approximation
+from src.integrations.toqan_api import ToqanAPIClient
 
 # Configurações
 load_dotenv()
@@ -24,11 +43,20 @@ warnings.filterwarnings("ignore")
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
+# Catálogo de schema compartilhado pelas instâncias do processo (pré-carregado pelo servidor pré-fork)
+SCHEMA_CATALOG = {'columns': {}, 'numeric_columns': {}}
+
 class DatabaseExplorer:
     """Explora e mapeia as tabelas e colunas disponíveis no banco de dados"""
     
     def __init__(self):
-        self.columns_cache = {}
+        self.columns_cache = SCHEMA_CATALOG['columns']
+        self.numeric_columns_cache = SCHEMA_CATALOG['numeric_columns']
+    
+    def preload(self, table_name):
+        """Carrega colunas e tipos da tabela no catálogo (antes do fork dos workers)"""
+        return {'columns': len(self.get_table_columns(table_name)),
+                'numeric_columns': len(self.get_numeric_columns(table_name))}
     
     def get_table_columns(self, table_name):
         """Obtém colunas de uma tabela específica"""
@@ -36,10 +64,13 @@ class DatabaseExplorer:
             return self.columns_cache[table_name]
         
         try:
-            result = execute_query(f"DESCRIBE {table_name}")
+            with span('schema.describe', table=table_name):
+                result = execute_query(f"DESCRIBE {table_name}")
             columns = result['Column'].tolist() if 'Column' in result.columns else []
             self.columns_cache[table_name] = columns
             return columns
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Erro ao buscar colunas de {table_name}: {e}")
             return []
@@ -77,16 +108,23 @@ class DatabaseExplorer:
     
     def get_numeric_columns(self, table_name):
         """Identifica colunas numéricas da tabela"""
+        if table_name in self.numeric_columns_cache:
+            return self.numeric_columns_cache[table_name]
+        
         try:
             # Faz uma query simples para identificar tipos
-            result = execute_query(f"SELECT * FROM {table_name} LIMIT 1")
+            with span('schema.numeric_columns', table=table_name):
+                result = execute_query(f"SELECT * FROM {table_name} LIMIT 1")
             numeric_columns = []
             
             for col in result.columns:
                 if result[col].dtype in ['int64', 'float64', 'int32', 'float32']:
                     numeric_columns.append(col)
             
+            self.numeric_columns_cache[table_name] = numeric_columns
             return numeric_columns
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Erro ao identificar colunas numéricas: {e}")
             # Fallback: assume colunas comuns como numéricas
@@ -109,6 +147,8 @@ class AdvancedQueryBuilder:
             "jul": 7, "julho": 7, "ago": 8, "agosto": 8, "set": 9, "setembro": 9,
             "out": 10, "outubro": 10, "nov": 11, "novembro": 11, "dez": 12, "dezembro": 12
         }
+        # Rollup local de monetization_total (None se ainda não materializado)
+        self.rollup_store = RollupStore.open_default()
     
     def detect_visualization_intent(self, instruction):
         """Detecta que tipo de visualização é mais apropriada"""
@@ -134,63 +174,244 @@ class AdvancedQueryBuilder:
         
         return detected_types if detected_types else ['bar_chart']  # default
     
-    def extract_date_filters(self, instruction, table_name):
-        """Extrai filtros de data otimizados para visualização"""
-        columns = self.explorer.get_table_columns(table_name)
+    MONTH_YEAR_PATTERN = r"(jan|janeiro|fev|fevereiro|mar|março|abr|abril|mai|maio|jun|junho|jul|julho|ago|agosto|set|setembro|out|outubro|nov|novembro|dez|dezembro)[- ]?(\d{2,4})\b"
+    QUARTER_PATTERN = r"\b(?:q|t)([1-4])\b|\b(primeiro|segundo|terceiro|quarto)\s+trimestre"
+    QUARTER_NAMES = {'primeiro': 1, 'segundo': 2, 'terceiro': 3, 'quarto': 4}
+    
+    def extract_period(self, instruction):
+        """Período pedido na pergunta (o mesmo para o Trino e para o rollup)
         
-        date_columns = {}
-        for col in columns:
-            col_lower = col.lower()
-            if any(date_keyword in col_lower for date_keyword in ['year', 'ano']):
-                date_columns['year'] = col
-            if any(date_keyword in col_lower for date_keyword in ['month', 'mes', 'mês']):
-                date_columns['month'] = col
-            if any(date_keyword in col_lower for date_keyword in ['date', 'data', 'creation', 'event']):
-                date_columns['date'] = col
-        
-        # Busca por períodos específicos
-        date_pattern = r"(jan|janeiro|fev|fevereiro|mar|março|abr|abril|mai|maio|jun|junho|jul|julho|ago|agosto|set|setembro|out|outubro|nov|novembro|dez|dezembro)[- ]?(\d{2,4})"
-        matches = re.findall(date_pattern, instruction.lower())
-        
-        # Busca por ranges temporais (ex: "últimos 6 meses", "2023", "primeiro trimestre")
-        year_pattern = r"\b(20\d{2})\b"
-        year_matches = re.findall(year_pattern, instruction)
-        
-        month_range_pattern = r"últimos?\s+(\d+)\s+meses?"
-        month_range = re.search(month_range_pattern, instruction.lower())
-        
-        date_conditions = []
-        
-        # Períodos específicos
-        for month_str, year_str in matches:
-            month = self.month_mapping.get(month_str)
+        Returns:
+            dict: months [(ano, mês)] explícitos ou de trimestres, years (anos inteiros),
+            months_back (N de "últimos N meses": N meses inteiros antes do atual, mais o atual),
+            bare_months (mês sem ano: o mês em todos os anos) e daily (granularidade diária).
+        """
+        instruction_lower = instruction.lower()
+        today = datetime.now()
+        
+        months = []
+        for month_str, year_str in re.findall(self.MONTH_YEAR_PATTERN, instruction_lower):
             year = int(year_str)
             if year < 100:
                 year += 2000
-            
-            if 'date' in date_columns:
-                date_conditions.append(f"(EXTRACT(YEAR FROM {date_columns['date']})={year} AND EXTRACT(MONTH FROM {date_columns['date']})={month})")
+            months.append((year, self.month_mapping[month_str]))
         
-        # Anos específicos
-        for year in year_matches:
-            if year not in [match[1] for match in matches]:
-                if 'date' in date_columns:
-                    date_conditions.append(f"EXTRACT(YEAR FROM {date_columns['date']})={year}")
+        years = []
+        for year in re.findall(r"\b(20\d{2})\b", instruction_lower):
+            if int(year) not in years and int(year) not in [y for y, _ in months]:
+                years.append(int(year))
         
-        # Range de meses
-        if month_range and 'date' in date_columns:
-            months = int(month_range.group(1))
-            date_conditions.append(f"{date_columns['date']} >= CURRENT_DATE - INTERVAL '{months}' MONTH")
+        quarters = sorted({int(number) if number else self.QUARTER_NAMES[name]
+                           for number, name in re.findall(self.QUARTER_PATTERN, instruction_lower)})
+        if quarters:
+            # "Q1 vs Q2 2024": os anos citados são os dos trimestres (sem ano, o atual)
+            months += [(y, m) for y in (years or [today.year]) for q in quarters
+                       for m in range(3 * q - 2, 3 * q + 1)]
+            years = []
         
-        if len(date_conditions) > 1:
-            return [" OR ".join(date_conditions)]
-        elif len(date_conditions) == 1:
-            return [date_conditions[0]]
+        month_range = re.search(r"últimos?\s+(\d+)\s+meses?", instruction_lower)
+        months_back = int(month_range.group(1)) if month_range else None
         
-        return []
+        bare_months = []
+        if not months and not years and months_back is None:
+            bare_months = sorted({number for word, number in self.month_mapping.items()
+                                  if len(word) > 3 and re.search(rf"\b{word}\b", instruction_lower)})
+        
+        return {
+            'months': months,
+            'years': years,
+            'months_back': months_back,
+            'bare_months': bare_months,
+            'daily': bool(re.search(r"\b(semanas?|ontem|hoje|dias?|diári[oa])\b", instruction_lower)),
+        }
     
-    def build_visualization_query(self, instruction, table_name="dw.monetization_total"):
-        """Constrói query otimizada para visualização"""
+    @staticmethod
+    def window_start(months_back, today=None):
+        """(ano, mês) inicial de "últimos N meses" (N meses inteiros antes do atual)"""
+        today = today or datetime.now()
+        index = today.year * 12 + today.month - 1 - months_back
+        return index // 12, index % 12 + 1
+    
+    def period_condition(self, period, year_expr, month_expr):
+        """Filtro SQL do período sobre as expressões de ano e mês ('' = sem filtro)"""
+        terms = [f"({year_expr}={year} AND {month_expr}={month})" for year, month in period['months']]
+        terms += [f"{year_expr}={year}" for year in period['years']]
+        if period['months_back'] is not None:
+            start_year, start_month = self.window_start(period['months_back'])
+            terms.append(f"{year_expr} * 100 + {month_expr} >= {start_year * 100 + start_month}")
+        if period['bare_months']:
+            terms.append(f"{month_expr} IN ({', '.join(str(m) for m in period['bare_months'])})")
+        return " OR ".join(terms)
+    
+    def time_expressions(self, table_name):
+        """Expressões (ano, mês) da tabela
+        
+        Colunas de partição year/month quando existem (o mesmo corte do rollup, com
+        poda de partições no Trino); senão EXTRACT sobre a coluna de data.
+        """
+        columns = self.explorer.get_table_columns(table_name)
+        if 'year' in columns and 'month' in columns:
+            return 'year', 'month'
+        date_column = None
+        for col in columns:
+            if any(date_keyword in col.lower() for date_keyword in ['date', 'data', 'creation', 'event']):
+                date_column = col
+        if date_column is None:
+            return None
+        return f"EXTRACT(YEAR FROM {date_column})", f"EXTRACT(MONTH FROM {date_column})"
+    
+    def extract_date_filters(self, instruction, table_name):
+        """Extrai filtros de data otimizados para visualização"""
+        time_columns = self.time_expressions(table_name)
+        if time_columns is None:
+            return []
+        condition = self.period_condition(self.extract_period(instruction), *time_columns)
+        return [condition] if condition else []
+    
+    # Termos que exigem colunas fora do rollup (usuários, status, produtos, contagens distintas)
+    ROLLUP_BLOCKERS = ['usuário', 'usuario', 'cliente', 'status', 'produto', 'anúncio', 'anuncio',
+                       'distint', 'únic', 'unic', 'região', 'estado', 'cidade']
+    
+    def route_query(self, instruction, table_name="dw.monetization_total"):
+        """Escolhe onde responder a pergunta: rollup local ou Trino
+        
+        Returns:
+            tuple: (query, viz_type, source) com source 'rollup' ou 'trino'.
+        """
+        try:
+            query, viz_type = self.build_rollup_query(instruction, table_name)
+        except Exception as e:
+            print(f"⚠️ Rollup local ignorado: {e}")
+            query, viz_type = None, None
+        
+        if query:
+            return query, viz_type, 'rollup'
+        
+        query, viz_type = self.build_visualization_query(instruction, table_name)
+        return query, viz_type, 'trino'
+    
+    def build_rollup_query(self, instruction, table_name="dw.monetization_total"):
+        """Constrói query DuckDB sobre o rollup local, se ela der a mesma resposta do Trino
+        
+        O rollup só responde o plano que o Trino executaria (mesma métrica, mesma
+        dimensão, mesmo período em year/month) e só se todos os meses do período
+        existentes no Trino estiverem inteiramente materializados.
+        """
+        if self.rollup_store is None or table_name != SOURCE_TABLE:
+            return None, None
+        
+        instruction_lower = instruction.lower()
+        if any(blocker in instruction_lower for blocker in self.ROLLUP_BLOCKERS):
+            return None, None
+        
+        period = self.extract_period(instruction)
+        if period['daily']:
+            return None, None  # granularidade diária fica com o Trino
+        
+        plan = self.visualization_plan(instruction, table_name)
+        if plan is None or plan['value'] != 'price' or plan['time'] != ('year', 'month'):
+            return None, None
+        if plan['kind'] == 'bar' and plan['dimension'] in DIMENSIONS.values():
+            dimension = plan['dimension']
+        elif plan['kind'] == 'line':
+            dimension = None
+        else:
+            return None, None
+        
+        if not self._rollup_covers(period):
+            return None, None
+        
+        condition = self.period_condition(period, 'year', 'month')
+        where = f"WHERE {condition}" if condition else ""
+        avg_value = "SUM(sum_price) / NULLIF(SUM(price_count), 0)"
+        
+        # Mesmas colunas de saída das queries do Trino (gráficos e insights não mudam)
+        if dimension:
+            query = f"""
+            SELECT 
+                {dimension} as category,
+                {avg_value} as avg_value,
+                CAST(SUM(record_count) AS BIGINT) as record_count
+            FROM monetization_monthly
+            {where}
+            GROUP BY {dimension}
+            ORDER BY avg_value DESC
+            LIMIT 15
+            """
+            return query.strip(), 'bar_chart'
+        
+        query = f"""
+        SELECT 
+            year,
+            month,
+            {avg_value} as avg_value,
+            CAST(SUM(record_count) AS BIGINT) as record_count,
+            SQRT(GREATEST((SUM(sum_price_sq) - SUM(sum_price) * SUM(sum_price) / SUM(price_count))
+                          / NULLIF(SUM(price_count) - 1, 0), 0)) as stddev_value
+        FROM monetization_monthly
+        {where}
+        GROUP BY year, month
+        ORDER BY year, month
+        """
+        return query.strip(), 'line_chart'
+    
+    def _rollup_covers(self, period):
+        """Indica se o rollup tem, completos, todos os meses do período existentes no Trino"""
+        coverage = self.rollup_store.month_coverage()  # (ano, mês) no Trino -> materializado inteiro
+        today = datetime.now()
+        current = (today.year, today.month)
+        
+        # Período aberto (sem filtro, "últimos N meses", mês sem ano) vira meses concretos
+        wanted = set(period['months'])
+        wanted |= {(year, month) for year in period['years'] for month in range(1, 13)}
+        if period['months_back'] is not None:
+            start = self.window_start(period['months_back'])
+            wanted |= {(year, month) for year, month in coverage if start <= (year, month) <= current}
+            wanted.add(current)
+        if period['bare_months']:
+            wanted |= {(year, month) for year, month in coverage if month in period['bare_months']}
+        if not (period['months'] or period['years'] or period['months_back'] is not None or period['bare_months']):
+            wanted = set(coverage) | {current}
+        
+        months = [month for month in wanted if month in coverage]
+        if not months or not all(coverage[month] for month in months):
+            return False
+        # A listagem de partições só vale até o último refresh: meses recentes exigem rollup recente
+        recent = (today - timedelta(days=2)).year, (today - timedelta(days=2)).month
+        if any(month >= recent for month in wanted):
+            return self.rollup_store.is_fresh()
+        return True
+    
+    def approximate_query(self, instruction, query, exact=False):
+        """Plano amostrado (TABLESAMPLE/approx_*) de uma query do Trino para perguntas exploratórias
+        
+        Returns:
+            ApproximatePlan | None: None quando a pergunta deve rodar exata.
+        """
+        if exact or not query or not wants_approximation(instruction):
+            return None
+        plan = ApproximatePlan(query)
+        return plan if plan.sql else None
+    
+    def _dimension_column(self, instruction_lower, columns, numeric_columns):
+        """Coluna categórica do gráfico de barras: a citada na pergunta ou a primeira do schema"""
+        for word, keyword in (('plataforma', 'platform'), ('categoria', 'category')):
+            if word in instruction_lower:
+                named = [col for col in columns if keyword in col.lower()]
+                if named:
+                    return named[0]
+        for col in columns:
+            if col not in numeric_columns and any(cat_keyword in col.lower() for cat_keyword in ['category', 'status', 'type', 'platform', 'product']):
+                return col
+        return None
+    
+    def visualization_plan(self, instruction, table_name="dw.monetization_total"):
+        """Decisões da query de visualização (tipo, métrica, dimensão, período)
+        
+        Returns:
+            dict | None: kind ('line', 'bar', 'count_bar' ou 'trend'), value (coluna
+            numérica), dimension, time (expressões de ano e mês) e where (filtro de data).
+        """
         viz_types = self.detect_visualization_intent(instruction)
         relevant_columns = self.explorer.find_relevant_columns(instruction, table_name)
         numeric_columns = self.explorer.get_numeric_columns(table_name)
@@ -212,81 +433,93 @@ class AdvancedQueryBuilder:
             main_column = numeric_columns[0] if numeric_columns else None
         
         columns = self.explorer.get_table_columns(table_name)
-        date_columns = {}
-        for col in columns:
-            col_lower = col.lower()
-            if any(date_keyword in col_lower for date_keyword in ['date', 'data', 'creation', 'event']):
-                date_columns['date'] = col
+        time_columns = self.time_expressions(table_name)
+        plan = {'value': main_column, 'dimension': None, 'time': time_columns,
+                'where': date_filters[0] if date_filters else ''}
+        
+        if 'line_chart' in viz_types and main_column and time_columns:
+            return {**plan, 'kind': 'line'}
+        
+        # Gráfico de barras (comparação categórica)
+        if 'bar_chart' in viz_types and main_column:
+            dimension = self._dimension_column(instruction.lower(), columns, numeric_columns)
+            if dimension:
+                return {**plan, 'kind': 'bar', 'dimension': dimension}
+            if columns:
+                # Fallback: usa a primeira coluna como categoria, mas apenas contagem
+                return {**plan, 'kind': 'count_bar', 'dimension': columns[0]}
+        
+        if main_column and time_columns:
+            return {**plan, 'kind': 'trend'}
+        return None
+    
+    def build_visualization_query(self, instruction, table_name="dw.monetization_total"):
+        """Constrói query otimizada para visualização"""
+        plan = self.visualization_plan(instruction, table_name)
+        if plan is None:
+            return None, None
+        
+        main_column = plan['value']
+        where = f"WHERE {plan['where']}" if plan['where'] else ''
         
         # Query para gráfico de linha temporal
-        if 'line_chart' in viz_types and main_column and 'date' in date_columns:
+        if plan['kind'] == 'line':
+            year_expr, month_expr = plan['time']
             query = f"""
             SELECT 
-                EXTRACT(YEAR FROM {date_columns['date']}) as year,
-                EXTRACT(MONTH FROM {date_columns['date']}) as month,
+                {year_expr} as year,
+                {month_expr} as month,
                 AVG({main_column}) as avg_value,
                 COUNT(*) as record_count,
                 STDDEV({main_column}) as stddev_value
             FROM {table_name}
-            {f'WHERE {date_filters[0]}' if date_filters else ''}
-            GROUP BY EXTRACT(YEAR FROM {date_columns['date']}), EXTRACT(MONTH FROM {date_columns['date']})
+            {where}
+            GROUP BY {year_expr}, {month_expr}
             ORDER BY year, month
             """
             return query.strip(), 'line_chart'
         
         # Query para gráfico de barras (comparação categórica)
-        elif 'bar_chart' in viz_types and main_column:
-            # Busca por colunas categóricas (não numéricas)
-            categorical_cols = []
-            for col in columns:
-                if col not in numeric_columns and any(cat_keyword in col.lower() for cat_keyword in ['category', 'status', 'type', 'platform', 'product']):
-                    categorical_cols.append(col)
-            
-            if categorical_cols:
-                cat_col = categorical_cols[0]
-                query = f"""
-                SELECT 
-                    {cat_col} as category,
-                    AVG({main_column}) as avg_value,
-                    COUNT(*) as record_count
-                FROM {table_name}
-                {f'WHERE {date_filters[0]}' if date_filters else ''}
-                GROUP BY {cat_col}
-                ORDER BY avg_value DESC
-                LIMIT 15
-                """
-                return query.strip(), 'bar_chart'
-            else:
-                # Fallback: usa alguma coluna como categórica, mas apenas contagem
-                if columns:
-                    cat_col = columns[0]  # Primeira coluna como categoria
-                    query = f"""
-                    SELECT 
-                        {cat_col} as category,
-                        COUNT(*) as record_count
-                    FROM {table_name}
-                    {f'WHERE {date_filters[0]}' if date_filters else ''}
-                    GROUP BY {cat_col}
-                    ORDER BY record_count DESC
-                    LIMIT 15
-                    """
-                    return query.strip(), 'bar_chart'
+        if plan['kind'] == 'bar':
+            query = f"""
+            SELECT 
+                {plan['dimension']} as category,
+                AVG({main_column}) as avg_value,
+                COUNT(*) as record_count
+            FROM {table_name}
+            {where}
+            GROUP BY {plan['dimension']}
+            ORDER BY avg_value DESC
+            LIMIT 15
+            """
+            return query.strip(), 'bar_chart'
         
-        # Query fallback (temporal simples)
-        if main_column and 'date' in date_columns:
+        if plan['kind'] == 'count_bar':
             query = f"""
             SELECT 
-                EXTRACT(YEAR FROM {date_columns['date']}) as year,
-                EXTRACT(MONTH FROM {date_columns['date']}) as month,
-                AVG({main_column}) as avg_value
+                {plan['dimension']} as category,
+                COUNT(*) as record_count
             FROM {table_name}
-            {f'WHERE {date_filters[0]}' if date_filters else ''}
-            GROUP BY EXTRACT(YEAR FROM {date_columns['date']}), EXTRACT(MONTH FROM {date_columns['date']})
-            ORDER BY year, month
+            {where}
+            GROUP BY {plan['dimension']}
+            ORDER BY record_count DESC
+            LIMIT 15
             """
-            return query.strip(), 'line_chart'
+            return query.strip(), 'bar_chart'
         
-        return None, None
+        # Query fallback (temporal simples)
+        year_expr, month_expr = plan['time']
+        query = f"""
+        SELECT 
+            {year_expr} as year,
+            {month_expr} as month,
+            AVG({main_column}) as avg_value
+        FROM {table_name}
+        {where}
+        GROUP BY {year_expr}, {month_expr}
+        ORDER BY year, month
+        """
+        return query.strip(), 'line_chart'
 
 class VisualizationEngine:
     """Engine para geração de gráficos inteligentes"""
@@ -295,9 +528,32 @@ class VisualizationEngine:
         self.fig_size = (12, 6)
         self.colors = sns.color_palette("husl", 8)
     
-    def create_line_chart(self, data, instruction, filename):
-        """Cria gráfico de linha temporal"""
-        plt.figure(figsize=self.fig_size)
+    def create_line_chart(self, data, instruction, filename, profile='print'):
+        """Cria gráfico de linha temporal (no perfil de renderização dado; formato pela extensão)"""
+        return self.render('line_chart', data, instruction, [(filename, get_profile(profile), file_format(filename))])[0]
+    
+    def create_bar_chart(self, data, instruction, filename, profile='print'):
+        """Cria gráfico de barras (no perfil de renderização dado; formato pela extensão)"""
+        return self.render('bar_chart', data, instruction, [(filename, get_profile(profile), file_format(filename))])[0]
+    
+    def render(self, viz_type, data, instruction, targets):
+        """
+        Desenha o gráfico uma vez e o grava em cada (arquivo, perfil, formato) de targets:
+        thumbnail, web e print saem do mesmo layout, cada um na sua resolução e compressão.
+        """
+        check_deadline('chart_render')
+        draw = self._draw_bar_chart if viz_type == 'bar_chart' else self._draw_line_chart
+        figure = draw(data, instruction)
+        try:
+            files = save_figure(figure, targets)
+            plt.show()
+            return files
+        finally:
+            plt.close(figure)  # figuras abertas acumulam memória no servidor
+    
+    def _draw_line_chart(self, data, instruction):
+        """Desenha o gráfico de linha temporal e retorna a figura"""
+        figure = plt.figure(figsize=self.fig_size)
         
         if 'year' in data.columns and 'month' in data.columns:
             # Cria coluna de data
@@ -314,13 +570,16 @@ class VisualizationEngine:
         value_cols = [col for col in data.columns if 'avg_' in col or 'sum_' in col or 'value' in col]
         y_col = value_cols[0] if value_cols else data.columns[1]
         
-        plt.plot(x_data, data[y_col], marker='o', linewidth=2.5, markersize=8, color=self.colors[0])
-        
-        # Adiciona linha de tendência se há múltiplos pontos
+        # Séries longas: desenha só os pontos escolhidos pelo downsampling (LTTB/min-max)
+        drawn = downsample_indices(x_data, data[y_col])
+        plt.plot(x_data.iloc[drawn], data[y_col].iloc[drawn], marker='o' if len(drawn) <= 60 else None,
+                 linewidth=2.5 if len(drawn) <= 60 else 1.5, markersize=8, color=self.colors[0])
+
+        # Adiciona linha de tendência se há múltiplos pontos (ajustada sobre a série inteira)
         if len(data) > 2:
             z = np.polyfit(range(len(data)), data[y_col], 1)
             p = np.poly1d(z)
-            plt.plot(x_data, p(range(len(data))), "--", alpha=0.7, color=self.colors[1], label='Tendência')
+            plt.plot(x_data.iloc[drawn], p(drawn), "--", alpha=0.7, color=self.colors[1], label='Tendência')
             plt.legend()
         
         plt.title(self._generate_chart_title(instruction, 'temporal'), fontsize=14, fontweight='bold')
@@ -328,16 +587,17 @@ class VisualizationEngine:
         plt.ylabel(self._extract_metric_name(y_col), fontsize=12)
         plt.grid(True, alpha=0.3)
         plt.xticks(rotation=45)
+        if not (pd.api.types.is_numeric_dtype(x_data) or pd.api.types.is_datetime64_any_dtype(x_data)):
+            # Eixo categórico (datas em texto): no máximo 12 rótulos, como nos gráficos SVG;
+            # um rótulo por ponto custava a maior parte do desenho em séries diárias
+            plt.gca().xaxis.set_major_locator(MaxNLocator(12))
         plt.tight_layout()
         
-        plt.savefig(filename, dpi=300, bbox_inches='tight')
-        plt.show()
-        
-        return filename
+        return figure
     
-    def create_bar_chart(self, data, instruction, filename):
-        """Cria gráfico de barras"""
-        plt.figure(figsize=self.fig_size)
+    def _draw_bar_chart(self, data, instruction):
+        """Desenha o gráfico de barras e retorna a figura"""
+        figure = plt.figure(figsize=self.fig_size)
         
         # Identifica colunas
         cat_col = data.columns[0]
@@ -362,41 +622,15 @@ class VisualizationEngine:
         plt.grid(True, alpha=0.3, axis='y')
         plt.tight_layout()
         
-        plt.savefig(filename, dpi=300, bbox_inches='tight')
-        plt.show()
-        
-        return filename
+        return figure
     
     def _generate_chart_title(self, instruction, chart_type):
-        """Gera título inteligente para o gráfico"""
-        if 'média' in instruction.lower():
-            metric = 'Média'
-        elif 'soma' in instruction.lower() or 'total' in instruction.lower():
-            metric = 'Total'
-        elif 'quantidade' in instruction.lower():
-            metric = 'Quantidade'
-        else:
-            metric = 'Análise'
-        
-        if chart_type == 'temporal':
-            return f'{metric} ao Longo do Tempo'
-        elif chart_type == 'categorical':
-            return f'{metric} por Categoria'
-        else:
-            return f'{metric} - Análise de Dados'
+        """Gera título inteligente para o gráfico (o mesmo dos gráficos SVG)"""
+        return chart_title(instruction, chart_type)
     
     def _extract_metric_name(self, column_name):
         """Extrai nome legível da métrica"""
-        if 'price' in column_name.lower():
-            return 'Preço (R$)'
-        elif 'avg_' in column_name:
-            return 'Média'
-        elif 'sum_' in column_name:
-            return 'Soma Total'
-        elif 'count' in column_name:
-            return 'Quantidade'
-        else:
-            return column_name.replace('_', ' ').title()
+        return metric_name(column_name)
 
 class IntelligentReportGenerator:
     """Gerador de relatórios completos com análise + visualização"""
@@ -404,145 +638,481 @@ class IntelligentReportGenerator:
     def __init__(self):
         self.query_builder = AdvancedQueryBuilder()
         self.viz_engine = VisualizationEngine()
+        self.svg_engine = SvgChartEngine()  # chart_format='svg': sem matplotlib
+        self.insight_engine = InsightEngine()
+        # Resultados do Trino mantidos atualizados pelo PartitionRefreshScheduler
+        self.result_cache = get_default_cache()
+        # Artefatos pré-renderizados pelo PrewarmJob antes do expediente
+        self.prewarm_manifest = PrewarmManifest()
+        # Interpretação do Toqan sobreposta à query planejada (BISCOITAO_SPECULATIVE=on)
+        self.speculative = self._create_speculative_runner() if SPECULATIVE_ENABLED else None
+    
+    def _create_speculative_runner(self):
+        toqan = ToqanAPIClient()
+        if not toqan.available:
+            print("⚠️ Execução especulativa desligada: TOQAN_API_KEY não configurada")
+            return None
+        return SpeculativeRunner(toqan_interpreter(toqan),
+                                 fetch=self.result_cache.fetch if self.result_cache else None)
     
-    def generate_complete_report(self, instruction, table_name="dw.monetization_total"):
-        """Gera relatório completo com dados, gráficos e insights"""
+    def generate_complete_report(self, instruction, table_name="dw.monetization_total", exact=False,
+                                 chart_format=None, render_profile=None, render_chart=True):
+        """
+        Gera relatório completo com dados, gráficos e insights (exact=True: sem amostragem).
+        chart_format: 'png'/'webp' (matplotlib), 'svg' ou 'text' (sparkline/barras Unicode).
+        render_profile: 'thumbnail', 'web' ou 'print' (ou lista: todos saem do mesmo layout).
+        render_chart=False: sem gráfico (para quem desenha o seu, como os relatórios PDF).
+        """
+        with span('report.generate', table=table_name, question=instruction) as report_span:
+            result = self._generate_complete_report(instruction, table_name, exact, chart_format, render_profile,
+                                                    render_chart)
+            report_span.set(success=result is not None)
+            if result is not None:
+                # Tempos por estágio (schema, SQL, gráfico, insights...) nos metadados
+                result['trace'] = trace_summary()
+            return result
+    
+    def analyze(self, instruction, table_name="dw.monetization_total", exact=False, chart_format=None,
+                render_profile=None, render_chart=True):
+        """
+        Analisa a pergunta uma vez e retorna o AnalysisContext que os demais geradores
+        (HTML, PDF, Sheets) consomem sem consultar o Trino de novo (ok=False se falhou).
+        """
+        report = self.generate_complete_report(instruction, table_name, exact, chart_format, render_profile,
+                                               render_chart)
+        return AnalysisContext(instruction, table_name, report)
+    
+    def context_chart(self, context, render_profile='web', chart_format=None):
+        """Gráfico do contexto no perfil pedido: o já renderizado ou, se falta, renderiza e registra"""
+        profile = get_profile(render_profile)
+        chart_format = resolve_chart_format(chart_format, None) or profile.image_format
+        if chart_format == 'text':
+            return None  # texto não é arquivo: vem em report['chart_text']
+        name = profile.name if chart_format == profile.image_format else f"{profile.name}.{chart_format}"
+        chart_file = context.artifact(name)
+        if chart_file is not None and file_format(chart_file) != chart_format:
+            chart_file = None  # a análise pediu outro formato (ex: chart_format='svg')
+        if chart_file is None and context.ok:
+            chart_file = self._render_chart(context.data, context.question, context.viz_type,
+                                            chart_format=chart_format, render_profile=profile)
+            context.add_artifact(name, chart_file)
+        return chart_file
+    
+    def generate_batch_report(self, instructions, table_name="dw.monetization_total", render_charts=False,
+                              max_concurrency=DEFAULT_BATCH_CONCURRENCY, merge=True, chart_format=None,
+                              render_profile='thumbnail'):
+        """
+        Responde várias perguntas de uma vez (ex: recálculo de uma planilha inteira).
         
+        Planeja o lote em conjunto, executa as queries compartilhadas em paralelo
+        (até max_concurrency) e recorta a resposta de cada pergunta.
+        
+        Args:
+            instructions (list): Perguntas do lote.
+            render_charts (bool): Gera os gráficos (padrão: só texto e insights).
+            chart_format (str): Formato dos gráficos: 'png', 'webp', 'svg' ou 'text'.
+            render_profile (str): Perfil de renderização (padrão: 'thumbnail', a prévia na célula).
+            max_concurrency (int): Queries compartilhadas executando ao mesmo tempo.
+            merge (bool): Une queries que diferem só nos meses (False = só deduplica).
+        
+        Returns:
+            dict: 'answers' na ordem das perguntas e 'plan' com as queries compartilhadas.
+        """
+        with span('batch.generate', table=table_name, questions=len(instructions)) as batch_span:
+            started_at = time.monotonic()
+            answers = [None] * len(instructions)
+            plans = {}
+            
+            with span('batch.plan'):
+                for index, instruction in enumerate(instructions):
+                    try:
+                        query, viz_type, source = self.query_builder.route_query(instruction, table_name)
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        print(f"❌ Erro ao planejar '{instruction}': {e}")
+                        query, viz_type, source = None, None, None
+                    if query:
+                        plans[index] = (query, viz_type, source)
+                    else:
+                        answers[index] = {'question': instruction, 'success': False,
+                                          'error': 'Não foi possível gerar query apropriada para esta pergunta'}
+                shared = BatchPlanner(merge).plan([(index, query, source)
+                                                   for index, (query, _, source) in plans.items()])
+            
+            print(f"🧮 Lote: {len(instructions)} perguntas -> {len(shared)} queries compartilhadas")
+            batch_span.set(shared_queries=len(shared))
+            results = self._execute_shared(shared, max_concurrency)
+            
+            for position, (shared_query, (data, cache_hit, error)) in enumerate(zip(shared, results)):
+                for index, slicer in shared_query.members:
+                    instruction = instructions[index]
+                    query, viz_type, source = plans[index]
+                    try:
+                        if error and source == 'rollup':
+                            # Rollup indisponível: a pergunta volta para o Trino individualmente
+                            query, viz_type = self.query_builder.build_visualization_query(instruction, table_name)
+                            source = 'trino'
+                            member_data, member_hit = self._fetch_data(query) if query else (None, False)
+                        elif error:
+                            raise RuntimeError(error)
+                        else:
+                            member_data, member_hit = slicer(data), cache_hit
+                        report = None
+                        if member_data is not None:
+                            report = self._report_from_data(instruction, table_name, query, viz_type, source,
+                                                            member_data, member_hit, started_at,
+                                                            render_chart=render_charts, chart_tag=f"{index:03d}",
+                                                            chart_format=chart_format,
+                                                            render_profile=render_profile)
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        print(f"❌ Erro ao responder '{instruction}': {e}")
+                        answers[index] = {'question': instruction, 'success': False, 'error': str(e)}
+                        continue
+                    
+                    if report is None:
+                        answers[index] = {'question': instruction, 'success': False,
+                                          'error': 'Nenhum dado encontrado para a consulta'}
+                    else:
+                        answers[index] = {'question': instruction, 'success': True,
+                                          'shared_query': position, **report}
+            
+            answered = sum(1 for answer in answers if answer['success'])
+            batch_span.set(answered=answered)
+            return {
+                'answers': answers,
+                'plan': {
+                    'questions': len(instructions),
+                    'planned': len(plans),
+                    'answered': answered,
+                    'queries_executed': len(shared),
+                    'shared_queries': [query.to_dict() for query in shared],
+                    'duration': round(time.monotonic() - started_at, 3)
+                },
+                'trace': trace_summary()
+            }
+    
+    def _execute_shared(self, shared, max_concurrency):
+        """Executa as queries compartilhadas em paralelo
+        
+        Returns:
+            list: (DataFrame, veio_do_cache, erro) na ordem das queries.
+        """
+        def run(shared_query):
+            try:
+                if shared_query.source == 'rollup':
+                    with span('rollup.query') as rollup_span:
+                        data = self.query_builder.rollup_store.query(shared_query.sql)
+                        rollup_span.set(rows=len(data))
+                    return data, False, None
+                data, cache_hit = self._fetch_data(shared_query.sql)
+                return data, cache_hit, None
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                print(f"⚠️ Falha na query compartilhada ({shared_query.kind}): {e}")
+                return None, False, str(e)
+        
+        if not shared:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(shared))),
+                                thread_name_prefix='batch-query') as executor:
+            # Cada thread herda o prazo da requisição e o trace atual
+            futures = [executor.submit(contextvars.copy_context().run, run, query) for query in shared]
+            return [future.result() for future in futures]
+    
+    def _generate_complete_report(self, instruction, table_name, exact=False, chart_format=None,
+                                  render_profile=None, render_chart=True):
         print(f"🎨 Gerando relatório visual para: {instruction}")
         print("=" * 60)
+        started_at = time.monotonic()
         
-        # 1. Constrói e executa query
-        query, viz_type = self.query_builder.build_visualization_query(instruction, table_name)
+        # 1. Constrói e executa query (no rollup local quando a pergunta é elegível)
+        with span('plan') as plan_span:
+            query, viz_type, source = self.query_builder.route_query(instruction, table_name)
+            plan_span.set(viz_type=viz_type, source=source)
         
         if not query:
             print("❌ Não foi possível gerar query apropriada para visualização.")
             return None
         
         print(f"📊 Tipo de visualização detectado: {viz_type}")
-        print(f"📝 Query gerada:")
+        print(f"📝 Query gerada ({source}):")
         print(f"   {query}")
         print()
         
         try:
-            data = execute_query(query)
-            
-            if data.empty:
-                print("❌ Nenhum dado encontrado para a consulta.")
-                return None
-            
-            print(f"✅ Dados obtidos: {len(data)} registros")
-            print()
-            
-            # 2. Mostra dados tabulares
-            print("📋 Dados encontrados:")
-            print(data.to_string(index=False))
-            print()
-            
-            # 3. Gera visualização
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"grafico_{viz_type}_{timestamp}.png"
+            data = None
+            cache_hit = False
+            if source == 'rollup':
+                try:
+                    with span('rollup.query') as rollup_span:
+                        data = self.query_builder.rollup_store.query(query)
+                        rollup_span.set(rows=len(data))
+                    print("⚡ Respondido pelo rollup local (sem Trino)")
+                except Exception as e:
+                    print(f"⚠️ Falha no rollup local, consultando o Trino: {e}")
+                    query, viz_type = self.query_builder.build_visualization_query(instruction, table_name)
+                    source = 'trino'
+                    if not query:
+                        return None
+            approximation = None
+            plan = self.query_builder.approximate_query(instruction, query, exact) if source == 'trino' else None
+            if data is None and plan is not None:
+                # Pergunta exploratória: amostra com margem de erro (exata se a estimativa não servir)
+                data, cache_hit, query, approximation = self._fetch_approximate(plan)
+            speculation = None
+            if data is None and source == 'trino' and self.speculative is not None:
+                # Query planejada já corre no Trino enquanto o Toqan avalia o plano
+                # SQL livre do Toqan só substitui o plano se as colunas servirem aos gráficos
+                speculation = self.speculative.run(instruction, query, accept=self._viz_type_for_frame)
+                if speculation['outcome'] == 'miss':
+                    # O gráfico segue as colunas que a SQL do Toqan devolveu, não o plano local
+                    viz_type = self._viz_type_for_frame(speculation['data'])
+                data, cache_hit, query = speculation['data'], speculation['cache_hit'], speculation['sql']
+            if data is None:
+                data, cache_hit = self._fetch_data(query)
             
-            print(f"🎨 Gerando gráfico: {filename}")
-            
-            if viz_type == 'line_chart':
-                chart_file = self.viz_engine.create_line_chart(data, instruction, filename)
-            elif viz_type == 'bar_chart':
-                chart_file = self.viz_engine.create_bar_chart(data, instruction, filename)
-            else:
-                chart_file = self.viz_engine.create_line_chart(data, instruction, filename)
+            report = self._report_from_data(instruction, table_name, query, viz_type, source,
+                                            data, cache_hit, started_at, render_chart=render_chart,
+                                            approximation=approximation, chart_format=chart_format,
+                                            render_profile=render_profile)
+            if report is not None and speculation is not None:
+                report['speculation'] = {key: speculation[key] for key in
+                                         ('outcome', 'interpret_seconds', 'saved_seconds', 'wasted_seconds')}
+            return report
             
-            # 4. Gera insights automáticos
+        except DeadlineExceeded:
+            print("⏰ Prazo da requisição esgotado, análise abandonada.")
+            raise
+        except Exception as e:
+            print(f"❌ Erro ao executar análise: {e}")
+            return None
+    
+    @staticmethod
+    def _viz_type_for_frame(data):
+        """
+        Tipo de gráfico que as colunas de um resultado permitem (None se nenhum).
+        
+        Os gráficos e insights esperam uma métrica (avg_/sum_/value) numérica e, na
+        linha, year/month ou uma data na primeira coluna.
+        """
+        if data is None or len(data.columns) < 2:
+            return None
+        metrics = [col for col in data.columns
+                   if ('avg_' in col or 'sum_' in col or 'value' in col)
+                   and pd.api.types.is_numeric_dtype(data[col])]
+        if not metrics:
+            return None
+        if {'year', 'month'} <= set(data.columns) or pd.api.types.is_datetime64_any_dtype(data[data.columns[0]]):
+            return 'line_chart'
+        if data.columns[0] in metrics:
+            return None  # barras: a primeira coluna é a dimensão
+        return 'bar_chart'
+    
+    def _fetch_data(self, query):
+        """Executa a query no Trino passando pelo cache de resultados
+
+        Returns:
+            tuple: (DataFrame, veio_do_cache)
+        """
+        if not self.result_cache:
+            return execute_query(query), False
+        with span('cache.fetch') as cache_span:
+            data, cache_hit = self.result_cache.fetch(query)
+            cache_span.set(hit=cache_hit)
+        return data, cache_hit
+    
+    def _fetch_approximate(self, plan):
+        """Executa o plano amostrado; refaz exata se a amostra for pequena ou a margem grande demais
+        
+        Returns:
+            tuple: (DataFrame, veio_do_cache, sql executada, (plano, resumo) ou None se exata)
+        """
+        with span('approximate.query', sample_percent=plan.sample_percent) as approx_span:
+            data, cache_hit = self._fetch_data(plan.sql)
+            estimated = plan.estimate(data)
+            reason = plan.fallback_reason(estimated)
+            approx_span.set(fallback=reason)
+        if reason is None:
+            summary = plan.summary(estimated)
+            print(f"🎲 Resposta aproximada ({plan.sample_percent:g}% de amostra, "
+                  f"margem até ±{summary['max_relative_error_pct']}%)")
+            return estimated, cache_hit, plan.sql, (plan, summary)
+        print(f"🎯 Estimativa descartada ({reason}); executando a consulta exata")
+        data, cache_hit = self._fetch_data(plan.exact_sql)
+        return data, cache_hit, plan.exact_sql, None
+    
+    def _report_from_data(self, instruction, table_name, query, viz_type, source, data, cache_hit,
+                          started_at, render_chart=True, chart_tag=None, approximation=None, chart_format=None,
+                          render_profile=None):
+        """Gráfico, insights e resposta a partir dos dados já obtidos (None se vazios)"""
+        profiles = resolve_profiles(render_profile)
+        # Formato explícito (requisição ou BISCOITAO_CHART_FORMAT) vale para todos os perfis;
+        # sem ele, cada perfil grava no seu formato
+        requested_format = resolve_chart_format(chart_format, None)
+        chart_format = requested_format or profiles[0].image_format
+        if data.empty:
+            print("❌ Nenhum dado encontrado para a consulta.")
+            return None
+        
+        print(f"✅ Dados obtidos: {len(data)} registros")
+        print()
+        
+        # 2. Mostra dados tabulares
+        print("📋 Dados encontrados:")
+        print(data.to_string(index=False))
+        print()
+        
+        # 3. Gera visualização (ou reaproveita a pré-renderizada para os mesmos dados)
+        fingerprint = data_fingerprint(data)  # antes do gráfico, que acrescenta colunas
+        prewarmed = self.prewarm_manifest.get(instruction) is not None
+        warm_entry = self.prewarm_manifest.lookup(instruction, query, fingerprint) \
+            if prewarmed and chart_format != 'text' else None
+        warm_files = self._prewarmed_charts(warm_entry, profiles, requested_format) if warm_entry else None
+        chart_files, chart_text = {}, None
+        
+        if warm_files:
+            chart_files = warm_files
+            print(f"🔥 Gráfico pré-aquecido reaproveitado: {', '.join(warm_files.values())}")
+        elif not render_chart:
+            pass  # lotes do Sheets: só texto, sem renderizar
+        elif chart_format == 'text':
+            chart_text = self._render_text_chart(data, instruction, viz_type)
+        else:
+            chart_files = self._render_charts(data, instruction, viz_type, chart_tag, requested_format, profiles)
+        chart_file = next(iter(chart_files.values()), None)
+        
+        # 4. Gera insights automáticos
+        with span('process.insights', rows=len(data)):
             insights = self._generate_insights(data, instruction, viz_type)
-            
+            if approximation is not None:
+                insights += approximation[0].insights(data, viz_type)
+        
+        if chart_file:
             print(f"💾 Gráfico salvo: {chart_file}")
             print()
-            
-            if insights:
-                print("🔍 Insights automáticos:")
-                for insight in insights:
-                    print(f"   • {insight}")
-                print()
-            
-            # 5. Resposta conversacional
+        elif chart_text:
+            print(chart_text)
+            print()
+        
+        if insights:
+            print("🔍 Insights automáticos:")
+            for insight in insights:
+                print(f"   • {insight}")
+            print()
+        
+        # 5. Resposta conversacional
+        with span('process.response'):
             response = self._generate_conversational_response(data, instruction, viz_type)
-            print(f"💬 Resumo: {response}")
-            
-            return {
-                'data': data,
-                'chart_file': chart_file,
-                'query': query,
-                'viz_type': viz_type,
-                'insights': insights,
-                'response': response
-            }
-            
-        except Exception as e:
-            print(f"❌ Erro ao executar análise: {e}")
-            return None
+            if approximation is not None and approximation[1]['max_relative_error_pct'] is not None:
+                response += (f" Valores estimados por amostragem (margem de até "
+                             f"±{approximation[1]['max_relative_error_pct']}%, IC {approximation[0].confidence:.0%}).")
+        print(f"💬 Resumo: {response}")
+        
+        log_question(instruction, table_name=table_name, source=source,
+                     cache_hit=cache_hit or source == 'rollup', prewarmed=prewarmed,
+                     artifact_hit=bool(warm_files), duration=time.monotonic() - started_at)
+        
+        return {
+            'data': data,
+            'chart_file': chart_file,
+            'chart_files': chart_files,
+            'chart_format': file_format(chart_file) if chart_file else ('text' if chart_text else None),
+            'chart_text': chart_text,
+            'render_profile': profiles[0].name,
+            'query': query,
+            'viz_type': viz_type,
+            'insights': insights,
+            'response': response,
+            'source': source,
+            'data_fingerprint': fingerprint,
+            'approximation': approximation[1] if approximation is not None else None
+        }
     
-    def _generate_insights(self, data, instruction, viz_type):
-        """Gera insights automáticos baseados nos dados"""
-        insights = []
+    def _render_chart(self, data, instruction, viz_type, chart_tag=None, chart_format=None, render_profile=None):
+        """Renderiza o gráfico do tipo detectado num perfil e retorna o arquivo"""
+        charts = self._render_charts(data, instruction, viz_type, chart_tag, chart_format, render_profile)
+        return next(iter(charts.values()))
+    
+    def _render_charts(self, data, instruction, viz_type, chart_tag=None, chart_format=None, render_profile=None):
+        """
+        Renderiza o gráfico em cada perfil pedido e retorna {perfil: arquivo}.
+        
+        PNG/WebP de todos os perfis saem de uma só figura do VisualizationEngine
+        (cada perfil só rasteriza); SVG é vetorial, um arquivo serve a todos.
+        chart_format None: cada perfil no seu próprio formato.
+        """
+        profiles = resolve_profiles(render_profile)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = f"grafico_{viz_type}_{timestamp}{f'_{chart_tag}' if chart_tag else ''}"
+        formats = {profile.name: chart_format or profile.image_format for profile in profiles}
+        charts = {}
         
+        if 'svg' in formats.values():
+            filename = f"{base}.svg"
+            print(f"🎨 Gerando gráfico: {filename}")
+            with span('chart.render', viz_type=viz_type, format='svg') as chart_span:
+                if viz_type == 'bar_chart':
+                    chart_file = self.svg_engine.create_bar_chart(data, instruction, filename)
+                else:
+                    chart_file = self.svg_engine.create_line_chart(data, instruction, filename)
+                chart_span.set(file=chart_file, bytes=file_size(chart_file))
+            charts.update({name: chart_file for name, image_format in formats.items() if image_format == 'svg'})
+        
+        raster = [profile for profile in profiles if formats[profile.name] != 'svg']
+        if raster:
+            # Um perfil: nome de sempre; vários: o perfil vai no nome de cada arquivo
+            targets = [(f"{base}{f'_{profile.name}' if len(raster) > 1 else ''}.{formats[profile.name]}",
+                        profile, formats[profile.name]) for profile in raster]
+            for filename, _, _ in targets:
+                print(f"🎨 Gerando gráfico: {filename}")
+            with span('chart.render', viz_type=viz_type, format=formats[raster[0].name],
+                      profiles=','.join(profile.name for profile in raster)) as chart_span:
+                files = self.viz_engine.render(viz_type, data, instruction, targets)
+                chart_span.set(file=files[0], bytes=sum(file_size(path) or 0 for path in files))
+            charts.update({profile.name: path for profile, path in zip(raster, files)})
+        return {profile.name: charts[profile.name] for profile in profiles}
+    
+    def _prewarmed_charts(self, entry, profiles, chart_format=None):
+        """Gráficos pré-renderizados para os perfis pedidos ({perfil: arquivo}; None se falta algum)"""
+        # Manifestos anteriores aos perfis só têm chart_file (PNG a 300 dpi)
+        charts = entry.get('chart_files') or {'print': entry.get('chart_file')}
+        files = {}
+        for profile in profiles:
+            path = charts.get(profile.name)
+            if not path or not os.path.exists(path) or file_format(path) != (chart_format or profile.image_format):
+                return None
+            files[profile.name] = path
+        return files
+    
+    def _render_text_chart(self, data, instruction, viz_type):
+        """Gráfico em texto (sparkline/barras Unicode), sem arquivo"""
+        with span('chart.render', viz_type=viz_type, format='text') as chart_span:
+            chart_text = text_chart(data, viz_type, instruction)
+            chart_span.set(bytes=len(chart_text.encode('utf-8')))
+        return chart_text
+    
+    def _generate_insights(self, data, instruction, viz_type):
+        """Gera insights automáticos baseados nos dados (uma ou várias séries)"""
         if len(data) < 2:
-            return insights
+            return []
         
-        # Insights para dados temporais
+        # Dados temporais: uma série por dimensão (ex: categoria × mês)
         if viz_type == 'line_chart' and 'avg_value' in data.columns:
-            values = data['avg_value'].dropna()
-            
-            if len(values) > 1:
-                # Tendência geral
-                first_val = values.iloc[0]
-                last_val = values.iloc[-1]
-                growth = ((last_val - first_val) / first_val) * 100
-                
-                if growth > 10:
-                    insights.append(f"📈 Tendência de crescimento forte: {growth:.1f}%")
-                elif growth > 2:
-                    insights.append(f"📊 Crescimento moderado: {growth:.1f}%")
-                elif growth < -10:
-                    insights.append(f"📉 Declínio significativo: {growth:.1f}%")
-                elif growth < -2:
-                    insights.append(f"📊 Declínio moderado: {growth:.1f}%")
-                else:
-                    insights.append(f"📊 Tendência estável: variação de {growth:.1f}%")
-                
-                # Volatilidade
-                std_dev = values.std()
-                mean_val = values.mean()
-                if std_dev / mean_val > 0.2:
-                    insights.append(f"⚠️ Alta volatilidade detectada (CV: {(std_dev/mean_val)*100:.1f}%)")
-                
-                # Picos e vales
-                max_val = values.max()
-                min_val = values.min()
-                max_idx = values.idxmax()
-                min_idx = values.idxmin()
-                
-                if 'year' in data.columns and 'month' in data.columns:
-                    max_period = f"{data.loc[max_idx, 'month']}/{data.loc[max_idx, 'year']}"
-                    min_period = f"{data.loc[min_idx, 'month']}/{data.loc[min_idx, 'year']}"
-                    insights.append(f"🔝 Pico em {max_period}: {max_val:.2f}")
-                    insights.append(f"🔻 Vale em {min_period}: {min_val:.2f}")
-        
-        # Insights para dados categóricos
-        elif viz_type == 'bar_chart' and len(data) > 1:
+            # 'date' é derivada de year/month pelo gráfico de linha: não é uma dimensão
+            frame = data.drop(columns='date') if {'year', 'month', 'date'} <= set(data.columns) else data
+            return self.insight_engine.insights(frame, metric_columns=['avg_value'])
+        
+        # Dados categóricos: ranking e concentração pela primeira coluna
+        if viz_type == 'bar_chart':
             value_col = [col for col in data.columns if 'avg_' in col or 'sum_' in col or 'value' in col][0]
-            
-            if value_col in data.columns:
-                top_category = data.iloc[0]
-                total_sum = data[value_col].sum()
-                top_percentage = (top_category[value_col] / total_sum) * 100
-                
-                insights.append(f"🥇 Categoria líder: {top_category.iloc[0]} ({top_percentage:.1f}% do total)")
-                
-                # Concentração
-                top_3_sum = data[value_col].head(3).sum()
-                top_3_percentage = (top_3_sum / total_sum) * 100
-                insights.append(f"📊 Top 3 representam {top_3_percentage:.1f}% do total")
+            return self.insight_engine.insights(data, period_columns=(), dimension_columns=[data.columns[0]],
+                                                metric_columns=[value_col])
         
-        return insights
+        return []
     
     def _generate_conversational_response(self, data, instruction, viz_type):
         """Gera resposta conversacional baseada na análise"""
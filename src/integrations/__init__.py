@@ -3,7 +3,6 @@ Biscoitão Integrations Module
 Integrações com sistemas externos
 """
 
-from .sheets_integrator import BiscoitaoSheetsIntegrator
-from .toqan_api import ToqanAPIClient
+from .toqan_api import ToqanAPIClient, AsyncToqanAPIClient
 
-__all__ = ['BiscoitaoSheetsIntegrator', 'ToqanAPIClient']
+__all__ = ['ToqanAPIClient', 'AsyncToqanAPIClient']
@@ -0,0 +1,178 @@
+"""
+Toqan API - Cliente da API de IA conversacional
+Cria a conversa (create_conversation) e faz polling do get_answer até a
+resposta ficar pronta. A versão síncrona usa requests; a assíncrona usa httpx
+quando instalado e, sem ele, manda cada chamada HTTP para uma thread. Nas
+duas, a espera entre os polls respeita o prazo da requisição, e na
+assíncrona ela não ocupa nenhuma thread.
+"""
+
+import os
+import re
+import sys
+import json
+import asyncio
+
+import requests
+from dotenv import load_dotenv
+
+try:
+    import httpx
+except ImportError:  # httpx é opcional: sem ele o cliente assíncrono usa threads
+    httpx = None
+
+# Imports relativos para nova estrutura
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.core.deadline import check_deadline, remaining_time, deadline_sleep, async_deadline_sleep
+from src.core.tracing import span
+
+load_dotenv()
+
+TOQAN_BASE_URL = os.getenv('TOQAN_BASE_URL', 'https://api.coco.prod.toqan.ai/api')
+POLL_INTERVAL = float(os.getenv('BISCOITAO_TOQAN_POLL_INTERVAL', '1'))
+MAX_POLLS = int(os.getenv('BISCOITAO_TOQAN_MAX_POLLS', '15'))
+CREATE_TIMEOUT = 10
+POLL_TIMEOUT = 5
+
+def parse_json_answer(answer):
+    """JSON contido na resposta do Toqan (ou {'explanation': resposta} se não houver)"""
+    try:
+        json_match = re.search(r'\{.*\}', answer, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+    except ValueError:
+        pass
+    return {"explanation": answer}
+
+def _conversation_ids(status_code, data):
+    if status_code != 200:
+        return None
+    conversation_id, request_id = data.get('conversation_id'), data.get('request_id')
+    return (conversation_id, request_id) if conversation_id and request_id else None
+
+def _completed_answer(status_code, data):
+    if status_code == 200 and data.get('status') in ['completed', 'finished'] and data.get('answer'):
+        return data['answer']
+    return None
+
+class ToqanAPIClient:
+    """Cliente síncrono (bloqueia a thread durante o polling)"""
+
+    def __init__(self, api_key=None, base_url=TOQAN_BASE_URL, session=None):
+        self.api_key = api_key or os.getenv('TOQAN_API_KEY')
+        self.base_url = base_url
+        self.session = session or requests.Session()
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    def create_conversation(self, message):
+        """Inicia a conversa; retorna (conversation_id, request_id) ou None"""
+        check_deadline('toqan_create')
+        with span('llm.toqan.create_conversation') as llm_span:
+            response = self.session.post(
+                f"{self.base_url}/create_conversation",
+                headers={"x-api-key": self.api_key},
+                json={"user_message": message},
+                timeout=remaining_time(CREATE_TIMEOUT)
+            )
+            llm_span.set(status_code=response.status_code, prompt_chars=len(message))
+        return _conversation_ids(response.status_code, response.json() if response.status_code == 200 else {})
+
+    def get_answer(self, conversation_id, request_id):
+        """Uma rodada de polling; retorna a resposta se já estiver pronta"""
+        with span('llm.toqan.get_answer') as llm_span:
+            response = self.session.get(
+                f"{self.base_url}/get_answer",
+                params={'conversation_id': conversation_id, 'request_id': request_id},
+                headers={"x-api-key": self.api_key},
+                timeout=remaining_time(POLL_TIMEOUT)
+            )
+            llm_span.set(status_code=response.status_code)
+        return _completed_answer(response.status_code, response.json() if response.status_code == 200 else {})
+
+    def ask(self, message, max_polls=MAX_POLLS, poll_interval=POLL_INTERVAL):
+        """Pergunta e aguarda a resposta (None se não houver chave, erro HTTP ou demora)"""
+        if not self.available:
+            return None
+        ids = self.create_conversation(message)
+        if ids is None:
+            return None
+        for _ in range(max_polls):
+            deadline_sleep(poll_interval, 'toqan_polling')
+            answer = self.get_answer(*ids)
+            if answer:
+                return answer
+        return None
+
+    def ask_json(self, message, max_polls=MAX_POLLS, poll_interval=POLL_INTERVAL):
+        answer = self.ask(message, max_polls, poll_interval)
+        return parse_json_answer(answer) if answer else None
+
+class AsyncToqanAPIClient:
+    """Cliente assíncrono: centenas de conversas pendentes sem uma thread por polling"""
+
+    def __init__(self, api_key=None, base_url=TOQAN_BASE_URL):
+        self.api_key = api_key or os.getenv('TOQAN_API_KEY')
+        self.base_url = base_url
+        self._client = httpx.AsyncClient() if httpx is not None else None
+        self._sync = ToqanAPIClient(self.api_key, base_url) if httpx is None else None
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    async def _request(self, method, path, timeout, **kwargs):
+        """(status, json) da chamada HTTP, via httpx ou requests em uma thread"""
+        url = f"{self.base_url}/{path}"
+        headers = {"x-api-key": self.api_key}
+        if self._client is not None:
+            response = await self._client.request(method, url, headers=headers, timeout=timeout, **kwargs)
+        else:
+            response = await asyncio.to_thread(self._sync.session.request, method, url,
+                                               headers=headers, timeout=timeout, **kwargs)
+        return response.status_code, response.json() if response.status_code == 200 else {}
+
+    async def create_conversation(self, message):
+        check_deadline('toqan_create')
+        with span('llm.toqan.create_conversation', transport='httpx' if self._client else 'thread') as llm_span:
+            status_code, data = await self._request('POST', 'create_conversation', remaining_time(CREATE_TIMEOUT),
+                                                    json={"user_message": message})
+            llm_span.set(status_code=status_code, prompt_chars=len(message))
+        return _conversation_ids(status_code, data)
+
+    async def get_answer(self, conversation_id, request_id):
+        with span('llm.toqan.get_answer') as llm_span:
+            status_code, data = await self._request(
+                'GET', 'get_answer', remaining_time(POLL_TIMEOUT),
+                params={'conversation_id': conversation_id, 'request_id': request_id})
+            llm_span.set(status_code=status_code)
+        return _completed_answer(status_code, data)
+
+    async def ask(self, message, max_polls=MAX_POLLS, poll_interval=POLL_INTERVAL):
+        if not self.available:
+            return None
+        ids = await self.create_conversation(message)
+        if ids is None:
+            return None
+        for _ in range(max_polls):
+            await async_deadline_sleep(poll_interval, 'toqan_polling')
+            answer = await self.get_answer(*ids)
+            if answer:
+                return answer
+        return None
+
+    async def ask_json(self, message, max_polls=MAX_POLLS, poll_interval=POLL_INTERVAL):
+        answer = await self.ask(message, max_polls, poll_interval)
+        return parse_json_answer(answer) if answer else None
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()